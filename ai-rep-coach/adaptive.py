@@ -0,0 +1,141 @@
+"""
+Helpers for running pose inference below camera rate: landmark extrapolation between detections and a
+controller that picks model_complexity and the detection interval to stay within a latency budget.
+Pure NumPy, so replayed tracks can be used to check that rep counting stays accurate.
+"""
+import numpy as np
+
+from landmarks import new_pose_array, X, Z
+
+class LandmarkExtrapolator:
+    """
+    Predicts the pose on frames where detection is skipped, assuming constant landmark velocity
+    since the last two detections. Visibility is carried over from the last detection.
+    """
+    def __init__(self, max_gap=4):
+        self.max_gap = max_gap # Never extrapolate further than this many frames past a detection
+        self._last = new_pose_array()
+        self._velocity = np.zeros((self._last.shape[0], Z + 1 - X), dtype=np.float32)
+        self._last_index = None
+        self._has_velocity = False
+
+    def reset(self):
+        self._last_index = None
+        self._has_velocity = False
+
+    def update(self, frame_index, pose):
+        """
+        Feeds a detection result (None when nobody was detected).
+        """
+        if pose is None:
+            self.reset()
+            return
+        if self._last_index is not None and frame_index > self._last_index:
+            np.subtract(pose[:, X:Z + 1], self._last[:, X:Z + 1], out=self._velocity)
+            self._velocity /= frame_index - self._last_index
+            self._has_velocity = True
+        else:
+            self._has_velocity = False
+        self._last[:] = pose
+        self._last_index = frame_index
+
+    def can_predict(self, frame_index):
+        return self._last_index is not None and 0 < frame_index - self._last_index <= self.max_gap
+
+    def predict(self, frame_index, out):
+        """
+        Writes the predicted pose for frame_index into out and returns it.
+        """
+        out[:] = self._last
+        if self._has_velocity:
+            out[:, X:Z + 1] += self._velocity * (frame_index - self._last_index)
+        return out
+
+class AdaptiveController:
+    """
+    Chooses (model_complexity, detect_every) to keep the average inference cost per frame within
+    `budget_ms`. Levels go from best quality to cheapest; the controller steps down after `patience`
+    consecutive detections over budget and back up after a longer stretch comfortably under it.
+    """
+    LEVELS = [(2, 1), (1, 1), (0, 1), (0, 2), (0, 3), (0, 4)]
+
+    def __init__(self, budget_ms, start_level=1, patience=10, smoothing=0.2):
+        self.levels = list(self.LEVELS)
+        self.budget = budget_ms / 1000.0
+        self.level = start_level
+        self.patience = patience
+        self.smoothing = smoothing
+        self.ema = None # Smoothed seconds per detection at the current level
+        self._over = 0
+        self._under = 0
+
+    @property
+    def model_complexity(self):
+        return self.levels[self.level][0]
+
+    @property
+    def detect_every(self):
+        return self.levels[self.level][1]
+
+    def cost_per_frame(self):
+        return self.ema / self.detect_every if self.ema is not None else None
+
+    def update(self, seconds):
+        """
+        Records the latency of one detection. Returns True if the level changed.
+        """
+        self.ema = seconds if self.ema is None else self.ema + self.smoothing * (seconds - self.ema)
+        cost = self.cost_per_frame()
+        if cost > self.budget:
+            self._over += 1
+            self._under = 0
+        elif cost < self.budget * 0.5:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if self._over >= self.patience and self.level < len(self.levels) - 1:
+            return self._set_level(self.level + 1)
+        if self._under >= self.patience * 3 and self.level > 0:
+            return self._set_level(self.level - 1)
+        return False
+
+    def replace_complexity(self, unavailable, fallback):
+        """
+        Rewrites the levels to use `fallback` wherever `unavailable` was (e.g. a model that could not be
+        loaded), keeping the detection interval the current level asked for.
+        """
+        wanted = (fallback if self.model_complexity == unavailable else self.model_complexity, self.detect_every)
+        levels = []
+        for complexity, detect_every in self.levels:
+            level = (fallback if complexity == unavailable else complexity, detect_every)
+            if level not in levels:
+                levels.append(level)
+        self.levels = levels
+        self.level = levels.index(wanted)
+
+    def _set_level(self, level):
+        self.level = level
+        self.ema = None # Latency at the new level is not known yet
+        self._over = self._under = 0
+        return True
+
+def replay_with_skipping(poses, exercise, detect_every, max_gap=None):
+    """
+    Replays a pose sequence (e.g. LandmarkTrack.landmarks) as if detection only ran every
+    `detect_every` frames, extrapolating the frames in between exactly like PoseEngine does.
+    NaN rows (nobody detected) are treated as failed detections. Returns the exercise.
+    """
+    extrapolator = LandmarkExtrapolator(max_gap=max_gap or detect_every)
+    predicted = new_pose_array()
+    for index, pose in enumerate(poses):
+        if index % detect_every and extrapolator.can_predict(index):
+            exercise.process(extrapolator.predict(index, predicted))
+            continue
+        if np.isnan(pose[0, 0]):
+            extrapolator.update(index, None)
+            continue
+        extrapolator.update(index, pose)
+        exercise.process(pose)
+    return exercise
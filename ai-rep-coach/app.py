@@ -1,12 +1,23 @@
 import streamlit as st
 import cv2
-import numpy as np
-import mediapipe as mp
 from pose_engine import PoseEngine
-from exercises import BicepCurl, PushUp, ShoulderPress, FrontRaise, ShoulderRotation, NeckRotation
-from gemini_coach import GeminiCoach
-from utils import draw_angles
+from exercises import EXERCISES
+from exercise_recognizer import AutoExercise, RecognizerModel
+from rep_analytics import RepSegmenter
+from coach_dispatcher import CoachDispatcher
+from gemini_coach import GeminiCoach, GeminiClient
+from feedback_cache import FeedbackCache
+from overlay import OverlayRenderer, FrameEncoder
+from pipeline import Pipeline
+from landmark_filter import LandmarkFilter
+from telemetry import Telemetry, JsonlExporter, MetricsServer
+from session_store import SessionStore, SessionLog
+from ui_state import UIState, panel_updates
+import atexit
 import os
+import time
+import uuid
+import weakref
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,40 +29,109 @@ st.subheader("Your personal AI-powered fitness assistant")
 
 # Sidebar
 st.sidebar.title("Settings")
+# "Auto Detect" is offered when a recognizer model is available (train one with train_recognizer.py)
+recognizer_model = os.getenv("RECOGNIZER_MODEL", "recognizer.npz")
+auto_detect = os.path.exists(recognizer_model)
 exercise_option = st.sidebar.selectbox(
     "Select Exercise",
-    ("Bicep Curl", "Push Up", "Shoulder Press", "Front Raise", "Shoulder Rotation", "Neck Rotation")
+    (("Auto Detect",) if auto_detect else ()) + tuple(EXERCISES)
 )
 
+# The side to follow: the better visible one by default, so right-handed and mirrored setups count too
+side_option = st.sidebar.selectbox("Side", ("Auto", "Left", "Right"))
+per_side = st.sidebar.checkbox("Count each side separately", value=False, help="For alternating movements")
+# Hysteresis on stage changes and form warnings: a jittery frame near a threshold neither counts nor flickers
+steady = st.sidebar.checkbox("Steady counting", value=True,
+                             help="Angles must pass a threshold by 5° for 2 frames; warnings clear 5° back")
+hysteresis = {"margin": 5, "frames": 2, "band": 5} if steady else None
+
+# Workouts are stored per user, so counts and history survive a page reload
+user = st.sidebar.text_input("User", value=os.getenv("WORKOUT_USER", "guest")).strip() or "guest"
+
 # Load API Key from env or sidebar
 env_api_key = os.getenv("GEMINI_API_KEY", "")
 api_key = st.sidebar.text_input("Gemini API Key", value=env_api_key, type="password")
+if not api_key:
+    st.sidebar.caption("No API key: the coach uses built-in tips. Enter a Gemini API Key for AI feedback.")
+
+@st.cache_resource
+def get_feedback_cache():
+    # One cache for every session, persisted across restarts
+    cache = FeedbackCache(path=os.getenv("COACH_CACHE_PATH", ".coach_cache.json"))
+    atexit.register(cache.close) # Keeps what was added since the last autosave
+    return cache
+
+@st.cache_resource
+def get_coach_dispatcher(api_key):
+    # Browser sessions share the model calls: pending feedback is sent in batches, within one rate limit
+    return CoachDispatcher(GeminiClient(api_key), calls_per_minute=float(os.getenv("COACH_CALLS_PER_MINUTE", "30")),
+                           cache=get_feedback_cache())
+
+@st.cache_resource
+def get_metrics_registry():
+    # {session id: Telemetry} for every live session; served on METRICS_PORT (/metrics, /metrics.json) if set.
+    # Weak values, so a closed session's telemetry goes away with its session state.
+    registry = weakref.WeakValueDictionary()
+    port = os.getenv("METRICS_PORT")
+    if port:
+        MetricsServer(registry, host=os.getenv("METRICS_HOST", "127.0.0.1"), port=int(port))
+    return registry
+
+@st.cache_resource
+def get_session_store():
+    # One store, and one background writer thread, shared by every session
+    return SessionStore(os.getenv("WORKOUT_DB", "workouts.db"))
 
 # Initialize components
+if 'telemetry' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:8]
+    st.session_state.telemetry = Telemetry()
+    get_metrics_registry()[st.session_state.session_id] = st.session_state.telemetry
+telemetry = st.session_state.telemetry
+
 if 'pose_engine' not in st.session_state:
-    st.session_state.pose_engine = PoseEngine()
+    # Load the model up front, so the first camera frame does not stall on it
+    with st.spinner("Loading pose model..."):
+        st.session_state.pose_engine = PoseEngine()
+        st.session_state.pose_engine.warm_up()
 
 if 'coach' not in st.session_state or st.session_state.get('api_key') != api_key:
-    st.session_state.coach = GeminiCoach(api_key)
+    if 'coach' in st.session_state:
+        st.session_state.coach.close()
+    # Coach requests run on a background worker; get_feedback never blocks the frame loop
+    if api_key:
+        st.session_state.coach = get_coach_dispatcher(api_key).register(st.session_state.session_id, telemetry)
+    else:
+        st.session_state.coach = GeminiCoach(api_key, cache=get_feedback_cache(), telemetry=telemetry)
     st.session_state.api_key = api_key
 
 # Exercise selection logic
-if 'current_exercise_name' not in st.session_state or st.session_state.current_exercise_name != exercise_option:
-    if exercise_option == "Bicep Curl":
-        st.session_state.exercise = BicepCurl()
-    elif exercise_option == "Push Up":
-        st.session_state.exercise = PushUp()
-    elif exercise_option == "Shoulder Press":
-        st.session_state.exercise = ShoulderPress()
-    elif exercise_option == "Front Raise":
-        st.session_state.exercise = FrontRaise()
-    elif exercise_option == "Shoulder Rotation":
-        st.session_state.exercise = ShoulderRotation()
-    elif exercise_option == "Neck Rotation":
-        st.session_state.exercise = NeckRotation()
-    st.session_state.current_exercise_name = exercise_option
+store = get_session_store()
+exercise_settings = (exercise_option, user, side_option, per_side, steady)
+if st.session_state.get('exercise_settings') != exercise_settings:
+    if exercise_option == "Auto Detect":
+        st.session_state.exercise = AutoExercise(RecognizerModel.load(recognizer_model), hysteresis=hysteresis)
+    else:
+        st.session_state.exercise = EXERCISES[exercise_option](side=side_option.lower(), per_side=per_side,
+                                                               hysteresis=hysteresis)
+    # Per-side counting labels the angles "Left ..." / "Right ...": one segmenter would mix both sides' reps,
+    # so rep analytics (and the reps in the workout history) are off in that mode
+    st.session_state.rep_segmenter = None if per_side else RepSegmenter.for_exercise(exercise_option)
+    # A session updated in the last few minutes was interrupted (page reload): carry on counting from it
+    resumed = store.resume(user, exercise_option)
+    if resumed and exercise_option != "Auto Detect":
+        session_id = resumed["id"]
+        st.session_state.exercise.counter = resumed["reps"]
+        if st.session_state.rep_segmenter is not None:
+            st.session_state.rep_segmenter.last_reps = resumed["reps"]
+    else:
+        session_id = store.start_session(user, exercise_option)
+    st.session_state.session_log = SessionLog(store, session_id, landmarks=os.getenv("STORE_LANDMARKS") == "1")
+    st.session_state.exercise_settings = exercise_settings
 
 exercise = st.session_state.exercise
+rep_segmenter = st.session_state.rep_segmenter
+session_log = st.session_state.session_log
 pose_engine = st.session_state.pose_engine
 coach = st.session_state.coach
 
@@ -61,6 +141,7 @@ col1, col2 = st.columns([2, 1])
 with col2:
     st.markdown("### Metrics")
     reps_placeholder = st.empty()
+    rep_stats_placeholder = st.empty()
     stage_placeholder = st.empty()
     feedback_placeholder = st.empty()
     
@@ -72,67 +153,122 @@ with col2:
     st.markdown("### Live Angles 📐")
     angles_placeholder = st.empty()
 
+    with st.expander("Workout History 📅"):
+        history = store.daily_totals(user, since=time.time() - 30 * 86400)
+        if history:
+            st.table([{
+                "Day": row["day"], "Exercise": row["exercise"], "Reps": row["reps"],
+                "Avg range (deg)": row["avg_range"],
+                "Tempo up/down (s)": f"{row['avg_concentric']:.1f} / {row['avg_eccentric']:.1f}",
+                "Reps with warnings": row["warned_reps"],
+            } for row in reversed(history)])
+        else:
+            st.caption("No workouts in the last 30 days yet.")
+
 run = st.checkbox('Start Camera', value=True)
 FRAME_WINDOW = col1.image([])
 
-cap = cv2.VideoCapture(0)
+# Landmark smoothing between pose detection and rep counting (steadier counts and warnings)
+smoothing = st.sidebar.selectbox("Landmark smoothing", ("One Euro", "Kalman", "Off"))
+
+# Video sent to the browser: compressed, downscaled and rate-limited (the rep counting still sees every frame)
+stream_format = st.sidebar.selectbox("Video format", ("JPEG", "WebP"))
+stream_quality = st.sidebar.slider("Video quality", 30, 95, 70)
+stream_fps = st.sidebar.slider("Video fps", 5, 30, 15)
+
+# Panel widgets are only sent when they change, and the live angles at most this often
+angle_rate = st.sidebar.slider("Angle updates per second", 1, 15, 4)
+
+show_debug = st.sidebar.checkbox("Show debug metrics", value=False)
+debug_placeholder = st.sidebar.empty()
+
+ui = UIState({
+    "reps": reps_placeholder, "rep_stats": rep_stats_placeholder, "stage": stage_placeholder,
+    "feedback": feedback_placeholder, "coach": ai_message_placeholder, "angles": angles_placeholder,
+    "debug": debug_placeholder,
+}, rates={"angles": angle_rate, "debug": 1}, telemetry=telemetry)
+
+# Optional JSONL log of telemetry snapshots, one line every few seconds
+telemetry_log = os.getenv("TELEMETRY_LOG")
+exporter = JsonlExporter(telemetry_log, telemetry, extra={"session": st.session_state.session_id}) if telemetry_log else None
 
 last_feedback = "Ready to start!"
 
-while run:
-    ret, frame = cap.read()
-    if not ret:
-        st.write("Failed to access camera")
-        break
-    
-    # Process frame
-    image, results = pose_engine.process_frame(frame)
-    
+if run:
+    # Capture and inference run on their own threads; this loop is the render/UI stage
+    cap = cv2.VideoCapture(0)
+    landmark_filter = LandmarkFilter(smoothing.lower().replace(" ", "_")) if smoothing != "Off" else None
+    renderer = OverlayRenderer()
+    encoder = FrameEncoder(stream_format.lower(), quality=stream_quality, max_fps=stream_fps)
+    pipeline = Pipeline(cap, pose_engine, exercise, telemetry=telemetry, landmark_filter=landmark_filter,
+                        rep_segmenter=rep_segmenter, session_log=session_log).start()
     try:
-        landmarks = results.pose_landmarks.landmark
-        
-        # Exercise Logic
-        angles, keypoint = exercise.process(landmarks)
-        
-        # Visualization
-        draw_angles(image, angles)
-        
-        # Update Metrics
-        metrics = exercise.get_metrics()
-        reps_placeholder.metric("Reps", metrics["reps"])
-        stage_placeholder.text(f"Stage: {metrics['stage']}")
-        
-        # Display Angles in Sidebar
-        angle_text = ""
-        for label, (val, _) in metrics["angles"].items():
-            angle_text += f"**{label}**: {int(val)}°\n\n"
-        angles_placeholder.markdown(angle_text)
-        
-        if metrics["warnings"]:
-            feedback_placeholder.error(f"⚠️ {metrics['warnings'][0]}")
-        else:
-            feedback_placeholder.success("Form looks good!")
+        while run:
+            result = pipeline.get_result(timeout=1.0)
+            if result is None:
+                if pipeline.finished:
+                    st.write("Failed to access camera")
+                    break
+                continue
             
-        # AI Coach
-        ai_feedback = coach.get_feedback(
-            exercise.name, 
-            metrics["reps"], 
-            metrics["stage"], 
-            metrics["warnings"],
-            metrics["angles"]
-        )
-        
-        if ai_feedback:
-            last_feedback = ai_feedback
+            metrics = result["metrics"]
             
-        ai_message_placeholder.info(f"🤖 Coach: {last_feedback}")
-        
-    except Exception as e:
-        pass # Landmarks might not be visible
-        
-    # Draw landmarks
-    image = pose_engine.draw_landmarks(image, results)
-    
-    FRAME_WINDOW.image(image)
+            # Nobody in frame (metrics is None): neither branch runs and only the video below updates
+            if metrics is not None and not metrics.get("visible", True):
+                # The exercise skipped a frame it could not see well enough; the count is unchanged
+                ui.show("feedback", "warning", "Move so the camera can see your whole arm or leg")
+            elif metrics is not None:
+                try:
+                    # Update Metrics
+                    with telemetry.timer("ui"):
+                        # Auto Detect: show what was recognized
+                        exercise_name = exercise.name if "exercise" in metrics else None
+                        for key, method, content in panel_updates(metrics, exercise_name):
+                            ui.show(key, method, *content)
 
-cap.release()
+                    # AI Coach
+                    with telemetry.timer("coach"):
+                        ai_feedback = coach.get_feedback(
+                            exercise.name, 
+                            metrics["reps"], 
+                            metrics["stage"], 
+                            metrics["warnings"],
+                            metrics["angles"],
+                            metrics.get("rep_summary")
+                        )
+                    
+                    if ai_feedback:
+                        last_feedback = ai_feedback
+                        
+                    ui.show("coach", "info", f"🤖 Coach: {last_feedback}")
+                    
+                except Exception as e:
+                    # Counted and shown in the debug panel instead of disappearing
+                    telemetry.record_error("render", e)
+                
+            # Frames over the video rate are neither drawn nor encoded
+            if encoder.due():
+                with telemetry.timer("draw"):
+                    image = encoder.fit(result["image"])
+                    renderer.draw(image, result["pose"], metrics["angles"] if metrics else None)
+                with telemetry.timer("encode"):
+                    data = encoder.encode(image)
+                with telemetry.timer("frame_update"):
+                    FRAME_WINDOW.image(data)
+            
+            if show_debug and ui.due("debug"):
+                ui.show("debug", "json", {
+                    "pipeline": pipeline.stats(),
+                    "telemetry": telemetry.snapshot(),
+                    "coach": coach.get_stats(),
+                    "video": encoder.stats,
+                    "ui": dict(ui.stats),
+                })
+            # Angle text held back by its rate goes out once its slot comes, so the last value always shows
+            ui.flush()
+            if exporter:
+                exporter.maybe_export()
+    finally:
+        # Also runs when Streamlit interrupts the script on a rerun
+        pipeline.stop()
+        cap.release()
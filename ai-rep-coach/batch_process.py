@@ -0,0 +1,206 @@
+"""
+Offline batch scoring of recorded workout videos.
+
+Runs PoseEngine + an Exercise over every video in a directory and writes, per video, a per-frame
+table (visible, reps, stage, angles, warnings) plus a summary table with the rep count of every video.
+Videos are spread over a process pool with one MediaPipe Pose per worker.
+
+Usage (from the ai-rep-coach directory):
+    python batch_process.py uploads/ --exercise "Bicep Curl" --output results/ --workers 4 --stride 2
+
+Parquet output (--format parquet) needs pandas and pyarrow.
+With --tracks, the landmarks of each video are also saved as a landmark_track so later
+threshold changes can be re-scored without running pose inference again.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+
+import cv2
+
+from exercises import EXERCISES
+from landmark_track import TrackWriter
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+# One PoseEngine per worker process, created by init_worker
+_pose_engine = None
+
+def init_worker(model_complexity=1):
+    global _pose_engine
+    from pose_engine import PoseEngine
+    _pose_engine = PoseEngine(model_complexity=model_complexity)
+    # Load the model now, so the first video's timing does not include it
+    _pose_engine.warm_up()
+
+def find_videos(input_dir):
+    videos = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                videos.append(os.path.join(root, name))
+    return sorted(videos)
+
+def output_name(path, input_dir):
+    """
+    Output file stem for a video: its path under input_dir without the extension, subdirectories joined with
+    "__", so a/set1.mp4 and b/set1.mp4 do not write the same files.
+    """
+    relative = os.path.splitext(os.path.relpath(path, input_dir))[0]
+    return relative.replace(os.sep, "__")
+
+def score_video(path, exercise_name, stride=1, pose_engine=None, track_path=None):
+    """
+    Runs one video through the pose engine and exercise.
+    Only every `stride`-th frame is decoded and processed; the others are skipped with grab().
+    If track_path is given, the processed frames' landmarks are recorded there (see landmark_track).
+    Returns (rows, summary): rows is a list of per-frame dicts, summary a dict for the summary table.
+    """
+    pose_engine = pose_engine or _pose_engine
+    pose_engine.reset()
+    exercise = EXERCISES[exercise_name]()
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    recorder = None
+    if track_path:
+        recorder = TrackWriter(track_path, fps=fps / stride,
+                               metadata={"source": path, "exercise": exercise_name, "stride": stride})
+
+    rows = []
+    frame_index = 0
+    detected = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            if frame_index % stride:
+                # Skipped frames are only demuxed, never decoded
+                if not cap.grab():
+                    break
+                frame_index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            _, _, pose = pose_engine.process_frame(frame)
+            if recorder:
+                recorder.append(pose, frame_index / fps)
+            row = {"frame": frame_index, "time_s": round(frame_index / fps, 4), "detected": pose is not None}
+            if pose is not None:
+                detected += 1
+                exercise.process(pose)
+                metrics = exercise.get_metrics()
+                # False on frames the exercise skipped as not seen well enough: no angles, nothing counted
+                row["visible"] = metrics["visible"]
+                row["reps"] = metrics["reps"]
+                row["stage"] = metrics["stage"]
+                for label, (value, _) in metrics["angles"].items():
+                    row[label] = round(float(value), 2)
+                row["warnings"] = "|".join(metrics["warnings"])
+            rows.append(row)
+            frame_index += 1
+    finally:
+        cap.release()
+        if recorder:
+            recorder.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "video": path,
+        "exercise": exercise_name,
+        "reps": exercise.counter,
+        "frames": frame_index,
+        "processed_frames": len(rows),
+        "detected_frames": detected,
+        "seconds": round(elapsed, 3),
+        "processed_fps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+    }
+    return rows, summary
+
+def write_table(rows, path, fmt):
+    """
+    Writes a list of dicts as CSV or Parquet. Columns are the union of all keys, in first-seen order.
+    """
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+
+    if fmt == "parquet":
+        try:
+            import pandas as pd
+        except ImportError:
+            raise SystemExit("Parquet output needs pandas and pyarrow: pip install pandas pyarrow")
+        pd.DataFrame(rows, columns=columns).to_parquet(path, index=False)
+        return
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def process_one(job):
+    """
+    Pool task: scores one video and writes its per-frame table. Errors are reported in the summary, not raised,
+    so one corrupt upload does not abort the whole batch.
+    """
+    path, input_dir, exercise_name, stride, output_dir, fmt, save_track = job
+    try:
+        name = output_name(path, input_dir)
+        track_path = os.path.join(output_dir, f"{name}.track") if save_track else None
+        rows, summary = score_video(path, exercise_name, stride, track_path=track_path)
+        write_table(rows, os.path.join(output_dir, f"{name}.{fmt}"), fmt)
+    except Exception as e:
+        summary = {"video": path, "exercise": exercise_name, "error": str(e)}
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir", help="Directory of recorded workout videos (searched recursively)")
+    parser.add_argument("--exercise", default="Bicep Curl", choices=list(EXERCISES))
+    parser.add_argument("--output", default="batch_results", help="Output directory")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (one MediaPipe Pose each)")
+    parser.add_argument("--stride", type=int, default=1, help="Process every Nth frame")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1, 2])
+    parser.add_argument("--tracks", action="store_true", help="Also save each video's landmarks as a replayable track")
+    args = parser.parse_args()
+
+    videos = find_videos(args.input_dir)
+    if not videos:
+        parser.error(f"No videos found in {args.input_dir}")
+    os.makedirs(args.output, exist_ok=True)
+
+    jobs = [(path, args.input_dir, args.exercise, max(1, args.stride), args.output, args.format, args.tracks)
+            for path in videos]
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"Scoring {len(jobs)} videos with {workers} workers")
+
+    summaries = []
+    total_frames = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(args.model_complexity,)) as pool:
+        for done, summary in enumerate(pool.imap_unordered(process_one, jobs), 1):
+            summaries.append(summary)
+            elapsed = time.perf_counter() - start
+            if "error" in summary:
+                print(f"[{done}/{len(jobs)}] {summary['video']}: ERROR {summary['error']}")
+                continue
+            total_frames += summary["processed_frames"]
+            print(f"[{done}/{len(jobs)}] {summary['video']}: {summary['reps']} reps, "
+                  f"{summary['processed_frames']} frames at {summary['processed_fps']} fps "
+                  f"| total {total_frames / elapsed:.1f} frames/s, {done / elapsed * 3600:.0f} videos/h")
+
+    summaries.sort(key=lambda s: s["video"])
+    write_table(summaries, os.path.join(args.output, f"summary.{args.format}"), args.format)
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s: {total_frames} frames, {total_frames / elapsed:.1f} frames/s")
+
+if __name__ == "__main__":
+    main()
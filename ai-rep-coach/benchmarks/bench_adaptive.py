@@ -0,0 +1,74 @@
+"""
+Benchmark of adaptive inference: rep-count accuracy when detection is skipped, and PoseEngine cost
+per frame at different inference sizes and detection intervals.
+
+Rep accuracy is checked by replaying recorded tracks (see landmark_track.py) as if detection only ran
+every Nth frame; without --tracks, synthetic curl sequences at a few tempos are used.
+Synthetic noise frames contain nobody, so detection is never skipped on them; pass --video with a
+person in view to see the effect of detect_every on PoseEngine.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_adaptive
+    python -m benchmarks.bench_adaptive --tracks tracks/*.track --exercise "Push Up"
+    python -m benchmarks.bench_adaptive --video clip.mp4 --sizes 0 320 256
+"""
+import argparse
+
+from adaptive import replay_with_skipping
+from benchmarks.bench_hot_path import load_clip
+from benchmarks.harness import measure, synthetic_poses, save_results, print_table
+from exercises import EXERCISES
+
+def rep_accuracy(sequences, exercise_cls, intervals):
+    """
+    {sequence name: {detect_every: reps}} for every replayed sequence.
+    """
+    counts = {}
+    for name, poses in sequences.items():
+        counts[name] = {n: replay_with_skipping(poses, exercise_cls(), n).counter for n in intervals}
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", nargs="*", default=[], help="Recorded landmark tracks to replay")
+    parser.add_argument("--exercise", default="Bicep Curl", choices=list(EXERCISES))
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 2, 3, 4, 6])
+    parser.add_argument("--video", help="Recorded clip for PoseEngine (default: synthetic 1280x720 frames)")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[0, 320, 256],
+                        help="Inference sizes to time (0 = full resolution)")
+    parser.add_argument("--skip-pose", action="store_true", help="Only check rep accuracy, no MediaPipe")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    if args.tracks:
+        from landmark_track import LandmarkTrack
+        sequences = {path: LandmarkTrack(path).landmarks for path in args.tracks}
+    else:
+        sequences = {f"synthetic period={period}": synthetic_poses(600, period=period) for period in (60, 30, 20)}
+
+    counts = rep_accuracy(sequences, EXERCISES[args.exercise], args.intervals)
+    print(f"{'sequence':<40}" + "".join(f"{f'every {n}':>10}" for n in args.intervals))
+    mismatches = 0
+    for name, by_interval in counts.items():
+        full = by_interval[args.intervals[0]]
+        mismatches += sum(reps != full for reps in by_interval.values())
+        print(f"{name:<40}" + "".join(f"{reps:>10}" for reps in by_interval.values()))
+    print(f"{mismatches} rep counts differ from detect_every={args.intervals[0]}\n")
+
+    stages = {}
+    if not args.skip_pose:
+        from pose_engine import PoseEngine
+        clip = load_clip(args.video, args.frames, size=(1280, 720))
+        for size in args.sizes:
+            for detect_every in (1, 3):
+                engine = PoseEngine(inference_size=size or None, detect_every=detect_every)
+                stages[f"process_frame size={size or 'full'} every={detect_every}"] = measure(
+                    engine.process_frame, clip, warmup=5, track_allocations=False)
+        print_table(stages)
+
+    if args.output:
+        save_results(args.output, "adaptive", stages, {"rep_counts": counts, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
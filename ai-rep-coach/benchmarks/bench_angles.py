@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: scalar utils.calculate_angle vs vectorized utils.calculate_angles.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_angles
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from utils import calculate_angle, calculate_angles
+
+
+def scalar_path(triplets):
+    return [calculate_angle(a, b, c) for a, b, c in triplets]
+
+
+def vector_path(triplets):
+    return calculate_angles(triplets)
+
+
+def bench(n, dims, repeat):
+    rng = np.random.default_rng(0)
+    triplets = rng.random((n, 3, dims))
+    # The scalar path is fed Python lists, exactly as the exercises used to do
+    triplet_lists = triplets.tolist()
+
+    # Small batches are timed over many loops so the per-call figure is stable
+    number = max(1, 4096 // n)
+    scalar = min(timeit.repeat(lambda: scalar_path(triplet_lists), number=number, repeat=repeat)) / number
+    vector = min(timeit.repeat(lambda: vector_path(triplets), number=number, repeat=repeat)) / number
+    return scalar, vector
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 64, 1024, 16384])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'N':>8} {'dims':>5} {'scalar (us)':>14} {'vector (us)':>14} {'speedup':>9}")
+    for dims in (2, 3):
+        for n in args.sizes:
+            if dims == 3:
+                # calculate_angle only ever looked at x/y, so the 3D row is informational
+                scalar, vector = bench(n, 2, args.repeat)[0], bench(n, 3, args.repeat)[1]
+            else:
+                scalar, vector = bench(n, dims, args.repeat)
+            print(f"{n:>8} {dims:>5} {scalar * 1e6:>14.1f} {vector * 1e6:>14.1f} {scalar / vector:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Coach feedback for many concurrent sessions: a GeminiCoach per session against one shared CoachDispatcher.
+
+Both talk to a local FakeModelServer (coach_dispatcher.py) that answers after --latency seconds. Every
+session asks for feedback once per --cooldown seconds (the coach's feedback_cooldown, shortened so the run
+takes seconds instead of minutes), and --warn-share of the snapshots carry a form warning. The
+feedback cache is disabled, so every snapshot has to reach the model.
+
+Reports the model calls per minute the server saw (and rejected with --quota), sessions per call, and the
+feedback latency from a snapshot to its model message (p50/p95, overall and for snapshots with a form
+warning). Snapshots whose model message never came (a local template, or superseded by the session's next
+snapshot) count as fallbacks, overall and among those with a warning, which the dispatcher sends first.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_coach_dispatch
+    python -m benchmarks.bench_coach_dispatch --sessions 10 50 100 --duration 30 --calls-per-minute 60 --quota 120
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.harness import save_results
+from coach_dispatcher import CoachDispatcher, FakeModelServer, HttpModelClient
+from feedback_cache import FeedbackCache
+from gemini_coach import GeminiCoach
+
+def run(mode, sessions, args):
+    with FakeModelServer(latency=args.latency, quota_per_minute=args.quota) as server:
+        client = HttpModelClient(server.url)
+        dispatcher = None
+        if mode == "batched":
+            dispatcher = CoachDispatcher(client, calls_per_minute=args.calls_per_minute, max_batch=args.max_batch,
+                                         cache=FeedbackCache(ttl=-1), fallback_after=args.cooldown)
+            coaches = [dispatcher.register() for _ in range(sessions)]
+        else:
+            coaches = [GeminiCoach("", client=client, cache=FeedbackCache(ttl=-1), fallback_after=args.cooldown)
+                       for _ in range(sessions)]
+        rng = np.random.default_rng(0)
+        for coach in coaches:
+            coach.feedback_cooldown = args.cooldown
+            # Spread the sessions over the cooldown, as if they had started at different times
+            coach.last_feedback_time = time.time() - rng.uniform(0, args.cooldown)
+
+        submitted = [None] * sessions # (time, had a warning) of the snapshot waiting for its message
+        latencies, warned_latencies = [], []
+        snapshots, fallbacks = np.zeros(2, np.int64), np.zeros(2, np.int64) # Without, with a form warning
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.duration:
+            tick = time.perf_counter()
+            for index, coach in enumerate(coaches):
+                sent_before = coach.last_feedback_time
+                reps = int(tick - start)
+                warnings = ["Keep your elbow fixed at your side!"] if rng.random() < args.warn_share else []
+                feedback = coach.get_feedback("Bicep Curl", reps, "up", warnings, {"Curl": (90.0, [0, 0])})
+                if coach.last_feedback_time != sent_before:
+                    snapshots[int(bool(warnings))] += 1
+                    if submitted[index] is not None:
+                        fallbacks[submitted[index][1]] += 1 # Superseded before its message came
+                    submitted[index] = (time.perf_counter(), int(bool(warnings)))
+                if feedback and submitted[index] is not None:
+                    if feedback.startswith("Coach:"):
+                        latency = time.perf_counter() - submitted[index][0]
+                        latencies.append(latency)
+                        if submitted[index][1]:
+                            warned_latencies.append(latency)
+                    else:
+                        fallbacks[submitted[index][1]] += 1
+                    submitted[index] = None
+            time.sleep(max(0.0, args.tick - (time.perf_counter() - tick)))
+        for coach in coaches:
+            coach.close()
+        if dispatcher:
+            dispatcher.close()
+        stats = server.stats()
+        elapsed = time.perf_counter() - start
+
+    def percentile(values, q):
+        return round(float(np.percentile(values, q)) * 1e3, 1) if values else None
+    return {
+        "calls_per_minute": round(stats["calls"] / elapsed * 60, 1),
+        "rejected_per_minute": round(stats["rejected"] / elapsed * 60, 1),
+        "sessions_per_call": round(stats["sessions_per_call"] or 1.0, 1),
+        "snapshots": int(snapshots.sum()),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p95_warned_ms": percentile(warned_latencies, 95),
+        "fallback_share": round(float(fallbacks.sum() / max(snapshots.sum(), 1)), 3),
+        "warned_fallback_share": round(float(fallbacks[1] / max(snapshots[1], 1)), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", nargs="+", type=int, default=[10, 50])
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per run")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="Seconds between snapshots of a session")
+    parser.add_argument("--tick", type=float, default=0.1, help="Seconds between get_feedback calls")
+    parser.add_argument("--latency", type=float, default=0.8, help="Seconds the fake model takes per call")
+    parser.add_argument("--quota", type=int, default=None, help="Fake model answers 429 above this many calls/min")
+    parser.add_argument("--calls-per-minute", type=float, default=60, help="Dispatcher rate limit")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--warn-share", type=float, default=0.25, help="Share of snapshots with a form warning")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    print(f"fake model latency {args.latency}s, a snapshot per session every {args.cooldown}s, {args.duration}s runs")
+    print(f"{'sessions':>8} {'mode':<12} {'calls/min':>10} {'429/min':>8} {'per call':>9} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p95 warned':>11} {'fallbacks':>10} {'warned':>7}")
+    results = {}
+    for sessions in args.sessions:
+        for mode in ("per-session", "batched"):
+            result = results[f"{mode} x{sessions}"] = run(mode, sessions, args)
+            print(f"{sessions:>8} {mode:<12} {result['calls_per_minute']:>10.1f} {result['rejected_per_minute']:>8.1f} "
+                  f"{result['sessions_per_call']:>9.1f} {result['p50_ms'] or float('nan'):>8.0f} "
+                  f"{result['p95_ms'] or float('nan'):>8.0f} {result['p95_warned_ms'] or float('nan'):>11.0f} "
+                  f"{result['fallback_share']:>9.1%} {result['warned_fallback_share']:>6.1%}")
+    if args.output:
+        save_results(args.output, "coach_dispatch", {}, {"runs": results, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark for the landmark filter stage (landmark_filter.py) and threshold hysteresis (exercises.py, rule_engine.py).
+
+Synthetic curls get landmark jitter like the lightest MediaPipe model plus occasional bad wrist detections
+with low visibility. Each configuration reports the rep count against the true count, how often the
+form warning flickers (on/off toggles), the curl angle error against the clean sequence and the filter's
+per-frame cost. With --tracks, recorded tracks are replayed through every configuration instead (counts
+only, since there is no ground truth).
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_filter
+    python -m benchmarks.bench_filter --jitter 0.01 --outliers 0.05 --output filter.json
+    python -m benchmarks.bench_filter --tracks recordings/*.track
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.harness import measure, synthetic_poses, save_results, print_table
+from exercises import BicepCurl
+from landmark_filter import LandmarkFilter
+from landmark_track import LandmarkTrack
+from landmarks import LEFT_WRIST
+from rule_engine import RuleExercise
+
+FILTERS = {"raw": None, "one_euro": "one_euro", "kalman": "kalman"}
+HYSTERESIS = {"margin": 5, "frames": 2, "band": 5}
+
+def noisy_curls(frames, jitter, outliers, seed=0):
+    clean = synthetic_poses(frames, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    noisy = clean.copy()
+    noisy[..., :2] += rng.normal(0, jitter, noisy[..., :2].shape)
+    bad = rng.random(frames) < outliers
+    noisy[bad, LEFT_WRIST, :2] += rng.normal(0, 0.15, (int(bad.sum()), 2))
+    noisy[bad, LEFT_WRIST, 3] = 0.1
+    return clean, noisy
+
+def configurations():
+    """
+    (name, filter method, exercise factory) for every combination compared.
+    """
+    for filter_name, method in FILTERS.items():
+        yield f"{filter_name} + BicepCurl", method, BicepCurl
+        yield f"{filter_name} + BicepCurl, hysteresis", method, lambda: BicepCurl(hysteresis=HYSTERESIS)
+        yield f"{filter_name} + rules", method, lambda: RuleExercise("Bicep Curl")
+        yield f"{filter_name} + rules, hysteresis", method, lambda: RuleExercise("Bicep Curl", hysteresis=HYSTERESIS)
+
+def replay(poses, method, exercise):
+    landmark_filter = LandmarkFilter(method) if method else None
+    toggles, warned, curl = 0, False, []
+    for pose in poses:
+        if np.isnan(pose[0, 0]):
+            if landmark_filter:
+                landmark_filter(None)
+            continue
+        exercise.process(landmark_filter(pose) if landmark_filter else pose)
+        toggles += bool(exercise.form_warnings) != warned
+        warned = bool(exercise.form_warnings)
+        curl.append(next(iter(exercise.angles.values()))[0])
+    return exercise.counter, toggles, np.array(curl)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--jitter", type=float, default=0.008, help="Landmark noise (normalized coordinates)")
+    parser.add_argument("--outliers", type=float, default=0.03, help="Fraction of frames with a bad wrist detection")
+    parser.add_argument("--tracks", nargs="*", help="Replay recorded tracks instead of synthetic curls")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    if args.tracks:
+        print(f"{'configuration':<36}" + "".join(f"{path[-20:]:>22}" for path in args.tracks))
+        for name, method, factory in configurations():
+            counts = [replay(np.asarray(LandmarkTrack(path).landmarks), method, factory())[0] for path in args.tracks]
+            print(f"{name:<36}" + "".join(f"{count:>22}" for count in counts))
+        return
+
+    clean, noisy = noisy_curls(args.frames, args.jitter, args.outliers)
+    expected = replay(clean, None, BicepCurl())[0]
+    reference = np.array([BicepCurl().compute_angles(pose)[0] for pose in clean])
+    results = {}
+    print(f"True reps: {expected}\n")
+    print(f"{'configuration':<36} {'reps':>6} {'toggles':>8} {'angle err':>10}")
+    for name, method, factory in configurations():
+        reps, toggles, curl = replay(noisy, method, factory())
+        error = float(np.sqrt(np.mean((curl - reference) ** 2)))
+        results[name] = {"reps": int(reps), "warning_toggles": toggles, "angle_rmse": round(error, 2)}
+        print(f"{name:<36} {reps:>6} {toggles:>8} {error:>10.1f}")
+
+    stages = {f"LandmarkFilter({method})": measure(LandmarkFilter(method), noisy) for method in ("one_euro", "kalman")}
+    print()
+    print_table(stages)
+    if args.output:
+        save_results(args.output, "filter", stages, {"expected_reps": int(expected), "configurations": results,
+                                                     "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of the frame transport to pose worker processes: frames pickled through a queue vs a SharedFrameRing.
+
+Both run the same ProcessPosePool, which differs only in how a frame reaches a worker (transport="pickle" or
+"shared"), for 1..N worker processes. The caller keeps the pool full: it submits whenever a slot is free and
+collects a result otherwise. Reports throughput, submit-to-result latency and the CPU the capture process
+spends per frame, which includes the queue's pickling thread.
+
+--engine null only returns landmarks, so the transport is all that is measured. --engine pose runs a real
+PoseEngine in every worker, showing how much of the inference scaling the transport leaves.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_frame_transport
+    python -m benchmarks.bench_frame_transport --workers 1 2 4 8 --size 1280x720
+    python -m benchmarks.bench_frame_transport --engine pose --frames 300 --output transport.json
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.harness import save_results
+from frame_transport import ProcessPosePool, default_pose_engine
+from landmarks import new_pose_array
+
+class NullEngine:
+    """
+    Touches the frame like a pose engine would read it, and returns fixed landmarks.
+    """
+    def __init__(self):
+        self.pose_array = new_pose_array()
+
+    def process_frame(self, frame):
+        self.pose_array[0, 0] = frame[::64, ::64].mean()
+        return frame, None, self.pose_array
+
+ENGINES = {"null": NullEngine, "pose": default_pose_engine}
+
+def run(transport, workers, frames, engine, slots):
+    with ProcessPosePool(frames[0].shape, workers=workers, slots=slots, pose_engine_factory=ENGINES[engine],
+                         transport=transport) as pool:
+        pool.wait_ready()
+        latencies = []
+        cpu, start = time.process_time(), time.perf_counter()
+        for frame in frames:
+            while pool.submit(frame, block=False) is None:
+                latencies.append(pool.get_result()["latency_ms"])
+        while len(latencies) < len(frames):
+            latencies.append(pool.get_result()["latency_ms"])
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    return {
+        "fps": round(len(frames) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "capture_cpu_ms": round(cpu / len(frames) * 1e3, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--size", default="640x480", help="Frame size, WIDTHxHEIGHT")
+    parser.add_argument("--workers", nargs="+", type=int, default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--engine", default="null", choices=list(ENGINES))
+    parser.add_argument("--slots", type=int, help="Frames in flight (default: 2 per worker + 2)")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.split("x"))
+    rng = np.random.default_rng(0)
+    distinct = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+    frames = [distinct[index % len(distinct)] for index in range(args.frames)]
+
+    print(f"{args.frames} {args.size} frames, engine={args.engine}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'transport':<10} {'fps':>10} {'p50 ms':>10} {'p95 ms':>10} {'capture CPU ms/frame':>21}")
+    results = {}
+    for workers in args.workers:
+        for transport in ("pickle", "shared"):
+            result = results[f"{transport} x{workers}"] = run(transport, workers, frames, args.engine, args.slots)
+            print(f"{workers:>7} {transport:<10} {result['fps']:>10.1f} {result['p50_ms']:>10.2f} "
+                  f"{result['p95_ms']:>10.2f} {result['capture_cpu_ms']:>21.3f}")
+    if args.output:
+        save_results(args.output, "frame_transport", {}, {"runs": results, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
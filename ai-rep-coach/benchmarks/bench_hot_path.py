@@ -0,0 +1,156 @@
+"""
+Benchmark of the pose -> exercise -> render hot path.
+
+Stages: scalar/batched angle math, every Exercise.process, the declarative rule engine, PoseEngine.process_frame on a fixed clip,
+draw_angles, draw_landmarks, OverlayRenderer.draw and the full per-frame loop. Reports latency percentiles, fps and bytes
+allocated per call, and can save JSON results and compare them with an earlier run.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_hot_path --output before.json
+    python -m benchmarks.bench_hot_path --compare before.json
+    python -m benchmarks.bench_hot_path --video clip.mp4     # recorded clip instead of synthetic frames
+    python -m benchmarks.bench_hot_path --skip-pose          # no MediaPipe, pure Python stages only
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import measure, synthetic_poses, save_results, print_table, compare
+from exercises import EXERCISES
+from rep_analytics import RepSegmenter
+from rule_engine import RuleEngine, RuleExercise, load_definitions
+from telemetry import Telemetry
+from landmarks import LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, LEFT_HIP
+from overlay import OverlayRenderer
+from utils import calculate_angle, calculate_angles, draw_angles
+
+def load_clip(video, frames, size=(640, 480)):
+    """
+    Frames of a recorded clip, or deterministic noise frames of the given size when no video is given.
+    """
+    if video:
+        cap = cv2.VideoCapture(video)
+        clip = []
+        while len(clip) < frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            clip.append(frame)
+        cap.release()
+        if not clip:
+            raise SystemExit(f"Could not read frames from {video}")
+        return clip
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(frames)]
+
+def pose_to_landmark_list(pose):
+    """
+    Builds a MediaPipe NormalizedLandmarkList from a pose array, so drawing can be timed without a detection.
+    """
+    from mediapipe.framework.formats import landmark_pb2
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in pose.tolist():
+        landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmark_list
+
+class FakeResults:
+    def __init__(self, pose_landmarks):
+        self.pose_landmarks = pose_landmarks
+
+def run(args):
+    poses = synthetic_poses(args.poses)
+    stages = {}
+
+    # Angle math for one frame of a two-angle exercise (e.g. BicepCurl)
+    pose_lists = [pose[:, :2].tolist() for pose in poses]
+    stages["utils.calculate_angle x2"] = measure(
+        lambda p: (calculate_angle(p[LEFT_SHOULDER], p[LEFT_ELBOW], p[LEFT_WRIST]),
+                   calculate_angle(p[LEFT_ELBOW], p[LEFT_SHOULDER], p[LEFT_HIP])),
+        pose_lists)
+    triplets = np.array([[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST], [LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP]])
+    stages["utils.calculate_angles (2 joints)"] = measure(lambda p: calculate_angles(p[triplets, :2]), poses)
+
+    for name, cls in EXERCISES.items():
+        exercise = cls()
+        stages[f"{cls.__name__}.process"] = measure(exercise.process, poses)
+
+    # Declarative definitions: one exercise, and every definition in one vectorized pass
+    definitions = load_definitions()
+    stages["RuleExercise.process"] = measure(RuleExercise("Bicep Curl", definitions).process, poses)
+    stages[f"RuleEngine.process ({len(definitions)} exercises)"] = measure(RuleEngine(definitions).process, poses)
+
+    # Per-rep analytics on top of an exercise's metrics (the segmenter only does real work when a rep ends)
+    metrics = []
+    tracked = EXERCISES["Bicep Curl"]()
+    for pose in poses:
+        tracked.process(pose)
+        metrics.append(tracked.get_metrics())
+    segmenter = RepSegmenter.for_exercise("Bicep Curl", definitions)
+    stages["RepSegmenter.update"] = measure(lambda item: segmenter.update(item[0] / 30, item[1]),
+                                            list(enumerate(metrics)))
+
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    curl = EXERCISES["Bicep Curl"]()
+    curl.process(poses[0])
+    stages["draw_angles"] = measure(lambda _: draw_angles(image, curl.angles), range(len(poses)))
+    renderer = OverlayRenderer()
+    stages["OverlayRenderer.draw"] = measure(lambda pose: renderer.draw(image, pose, curl.angles), poses)
+
+    # Cost of instrumenting one stage, i.e. what leaving telemetry on adds per timed block
+    telemetry = Telemetry()
+
+    def timed_noop(_):
+        with telemetry.timer("noop"):
+            pass
+
+    stages["Telemetry.timer"] = measure(timed_noop, range(len(poses)))
+
+    if args.skip_pose:
+        return stages
+
+    from pose_engine import PoseEngine
+    pose_engine = PoseEngine()
+    clip = load_clip(args.video, args.frames)
+    results = FakeResults(pose_to_landmark_list(poses[0]))
+    stages["PoseEngine.draw_landmarks"] = measure(lambda _: pose_engine.draw_landmarks(image, results),
+                                                  range(len(poses)))
+
+    stages["PoseEngine.process_frame"] = measure(pose_engine.process_frame, clip, warmup=5)
+
+    exercise = EXERCISES[args.exercise]()
+    fallback = iter(np.resize(np.arange(len(poses)), 10 ** 6))
+
+    def full_loop(frame):
+        image, results, pose = pose_engine.process_frame(frame)
+        if pose is None:
+            # Synthetic frames contain nobody; keep the rest of the loop honest with a synthetic pose
+            pose = poses[next(fallback)]
+            results = FakeResults(pose_to_landmark_list(pose))
+        exercise.process(pose)
+        draw_angles(image, exercise.angles)
+        pose_engine.draw_landmarks(image, results)
+
+    stages["full_loop"] = measure(full_loop, clip, warmup=5)
+    return stages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--poses", type=int, default=2000, help="Synthetic pose frames for the pure Python stages")
+    parser.add_argument("--frames", type=int, default=100, help="Clip frames for the MediaPipe stages")
+    parser.add_argument("--video", help="Recorded clip for PoseEngine (default: synthetic 640x480 frames)")
+    parser.add_argument("--exercise", default="Bicep Curl", choices=list(EXERCISES))
+    parser.add_argument("--skip-pose", action="store_true", help="Skip the MediaPipe stages")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Compare with an earlier result file")
+    args = parser.parse_args()
+
+    stages = run(args)
+    print_table(stages)
+    if args.output:
+        save_results(args.output, "hot_path", stages, {"args": vars(args)})
+    if args.compare:
+        compare(args.compare, stages)
+
+if __name__ == "__main__":
+    main()
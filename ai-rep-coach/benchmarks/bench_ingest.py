@@ -0,0 +1,100 @@
+"""
+Throughput benchmark for landmark-only sessions (landmark_ingest.py + server.py), where clients run
+pose detection on-device and the server only decodes packets, reorders them and updates Exercise state.
+
+In-process stages time packet decoding and InferencePool.ingest_landmarks per request; the HTTP stage
+runs N synthetic clients that post requests of K packets as fast as the server answers and reports
+the total packets per second and the request latency.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_ingest
+    python -m benchmarks.bench_ingest --sessions 1 4 16 --packets-per-request 4 --half
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+
+from benchmarks.harness import measure, summarize, synthetic_poses, save_results, print_table
+from landmark_ingest import encode_packet, decode_packets
+from server import InferencePool, InferenceServer
+
+def make_requests(poses, packets_per_request, half):
+    packets = [encode_packet(seq, seq / 30, pose, half=half) for seq, pose in enumerate(poses)]
+    return [b"".join(packets[i:i + packets_per_request]) for i in range(0, len(packets), packets_per_request)]
+
+def http_level(base_url, sessions, requests, duration):
+    latencies, packets = [], [0]
+    lock = threading.Lock()
+    packets_per_request = len(decode_packets(requests[0]))
+
+    def client():
+        request = urllib.request.Request(f"{base_url}/sessions", data=b'{"exercise": "Bicep Curl"}')
+        with urllib.request.urlopen(request, timeout=30) as response:
+            session_id = json.loads(response.read())["session_id"]
+        # Each client streams the same recording, with sequence numbers that keep increasing
+        url = f"{base_url}/sessions/{session_id}/landmarks"
+        start = time.perf_counter()
+        index = sent = 0
+        while time.perf_counter() - start < duration and index < len(requests):
+            sent_at = time.perf_counter()
+            with urllib.request.urlopen(urllib.request.Request(url, data=requests[index]), timeout=30) as response:
+                response.read()
+            with lock:
+                latencies.append(time.perf_counter() - sent_at)
+            index += 1
+            sent += packets_per_request
+        with lock:
+            packets[0] += sent
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = summarize(latencies)
+    stats["packets_per_s"] = round(packets[0] / elapsed, 1)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=3000, help="Synthetic frames per client")
+    parser.add_argument("--packets-per-request", type=int, default=4)
+    parser.add_argument("--half", action="store_true", help="float16 landmarks (264 instead of 528 bytes)")
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per HTTP session count")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    poses = synthetic_poses(args.frames)
+    requests = make_requests(poses, args.packets_per_request, args.half)
+    stages = {"decode_packets": measure(decode_packets, requests)}
+
+    pool = InferencePool(workers=1, pose_engine_factory=object)
+    session = pool.create_session("Bicep Curl")
+    stages["InferencePool.ingest_landmarks"] = measure(lambda data: pool.ingest_landmarks(session.id, data),
+                                                       requests[:len(requests) // 2])
+    print(f"{args.packets_per_request} packets of {len(requests[0]) // args.packets_per_request} bytes per request")
+    print_table(stages)
+
+    server = InferenceServer(pool, port=0)
+    levels = {}
+    try:
+        print(f"\n{'sessions':>8} {'packets/s':>12} {'p50 ms':>8} {'p99 ms':>8}")
+        for sessions in args.sessions:
+            stats = http_level(f"http://127.0.0.1:{server.port}", sessions, requests, args.duration)
+            levels[str(sessions)] = stats
+            print(f"{sessions:>8} {stats['packets_per_s']:>12.1f} {stats['p50_us'] / 1e3:>8.2f} "
+                  f"{stats['p99_us'] / 1e3:>8.2f}")
+    finally:
+        server.close()
+
+    if args.output:
+        save_results(args.output, "ingest", stages, {"http": levels, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of multi-person mode: cost per frame and per person of MultiPersonEngine (one detection pass,
+per-person pose on crops) against running one full-frame PoseEngine per person, i.e. N separate pipelines.
+
+With --video (recorded group footage) the HOG detector finds the people; without it, N fixed person
+boxes are laid out side by side on synthetic frames so the scaling with N can still be measured.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_multi_person --video group.mp4
+    python -m benchmarks.bench_multi_person --people 1 2 4
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_hot_path import load_clip
+from benchmarks.harness import measure, save_results, print_table
+from exercises import EXERCISES
+from multi_person import MultiPersonEngine
+
+class FixedDetector:
+    """
+    N people standing side by side, for synthetic frames.
+    """
+    def __init__(self, people, width, height):
+        step = width / people
+        self.boxes = np.array([[i * step + step * 0.15, height * 0.1, (i + 1) * step - step * 0.15, height * 0.9]
+                               for i in range(people)], np.float32)
+
+    def detect(self, frame):
+        return self.boxes, np.ones(len(self.boxes), np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Recorded group footage (default: synthetic 1280x720 frames)")
+    parser.add_argument("--people", nargs="+", type=int, default=[1, 2, 4],
+                        help="People laid out on synthetic frames (ignored with --video)")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--detect-every", type=int, default=10)
+    parser.add_argument("--exercise", default="Bicep Curl", choices=list(EXERCISES))
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    from pose_engine import PoseEngine
+    clip = load_clip(args.video, args.frames, size=(1280, 720))
+    height, width = clip[0].shape[:2]
+    exercise_cls = EXERCISES[args.exercise]
+
+    stages = {}
+    single = PoseEngine()
+    stages["PoseEngine full frame (1 pipeline)"] = measure(single.process_frame, clip, warmup=5,
+                                                           track_allocations=False)
+    per_pipeline_us = stages["PoseEngine full frame (1 pipeline)"]["mean_us"]
+
+    runs = [None] if args.video else args.people
+    scaling = {}
+    for people in runs:
+        detector = None if args.video else FixedDetector(people, width, height)
+        engine = MultiPersonEngine(exercise_cls, detector=detector, detect_every=args.detect_every)
+        tracked = []
+        stages_name = "MultiPersonEngine" + (f" ({people} people)" if people else "")
+        stages[stages_name] = measure(lambda frame: tracked.append(len(engine.process_frame(frame))), clip,
+                                      warmup=5, track_allocations=False)
+        engine.close()
+        people = people or max(1.0, float(np.mean(tracked)))
+        per_frame_us = stages[stages_name]["mean_us"]
+        scaling[stages_name] = {
+            "people": people,
+            "per_person_us": round(per_frame_us / people, 1),
+            "separate_pipelines_us": round(per_pipeline_us * people, 1),
+            "speedup": round(per_pipeline_us * people / per_frame_us, 2),
+        }
+
+    print_table(stages)
+    print()
+    for name, values in scaling.items():
+        print(f"{name:<32} {values['people']:>5.1f} people  {values['per_person_us']:>10.1f} us/person  "
+              f"vs {values['separate_pipelines_us']:>10.1f} us for separate pipelines ({values['speedup']}x)")
+    if args.output:
+        save_results(args.output, "multi_person", stages, {"scaling": scaling, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark for automatic exercise recognition (exercise_recognizer.py).
+
+Trains a model on synthetic people doing each exercise (benchmarks.harness.synthetic_exercise_poses), evaluates
+it on unseen ones and times the per-frame work: RollingWindow.push, ExerciseRecognizer.update (including the
+frames that run the classifier) and AutoExercise.process against a single RuleExercise. Exits with status 1
+if the p99 of AutoExercise.process is over --budget-us.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_recognizer
+    python -m benchmarks.bench_recognizer --window 90 --budget-us 150 --output recognizer.json
+"""
+import argparse
+import sys
+
+
+from benchmarks.harness import measure, synthetic_exercise_poses, save_results, print_table
+from exercise_recognizer import AutoExercise, ExerciseRecognizer, RecognizerModel, RollingWindow, evaluate
+from rule_engine import RuleEngine, RuleExercise
+
+EXERCISE_NAMES = ("Bicep Curl", "Front Raise", "Shoulder Press", "Squat")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=900, help="Frames per synthetic sequence")
+    parser.add_argument("--people", type=int, default=3, help="Training sequences per exercise")
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--budget-us", type=float, default=200, help="Per-frame p99 budget of AutoExercise.process")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    train = [(synthetic_exercise_poses(name, args.frames, seed=seed), name)
+             for name in EXERCISE_NAMES for seed in range(args.people)]
+    model = RecognizerModel.fit([poses for poses, _ in train], [name for _, name in train], window=args.window)
+    test_names = EXERCISE_NAMES + ("Idle",)
+    test = [synthetic_exercise_poses(name, args.frames, seed=100 + index) for index, name in enumerate(test_names)]
+    report = evaluate(model, test, [name if name != "Idle" else None for name in test_names])
+    print(f"Window accuracy on unseen sequences: {report['window_accuracy']:.1%}")
+    for result in report["sequences"]:
+        print(f"  {result['label']}: active after {result['frames_to_recognize']} frames")
+
+    poses = test[0]
+    angles = RuleEngine(model.definitions).compute_angles(poses)[0]
+    window = RollingWindow(model.columns, model.window)
+    recognizer = ExerciseRecognizer(model)
+    auto, single = AutoExercise(model), RuleExercise("Bicep Curl")
+    stages = {
+        "RollingWindow.push": measure(window.push, angles),
+        "ExerciseRecognizer.update": measure(recognizer.update, angles),
+        "RuleExercise.process": measure(single.process, poses),
+        "AutoExercise.process": measure(auto.process, poses),
+    }
+    print()
+    print_table(stages)
+
+    p99 = stages["AutoExercise.process"]["p99_us"]
+    within = p99 <= args.budget_us
+    print(f"\nAutoExercise.process p99 {p99:.1f} us, budget {args.budget_us:.0f} us: {'ok' if within else 'OVER BUDGET'}")
+    if args.output:
+        save_results(args.output, "recognizer", stages, {"window_accuracy": report["window_accuracy"],
+                                                         "sequences": report["sequences"], "args": vars(args)})
+    if not within:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark of the rendering stage: drawing the overlay and getting frames to the browser.
+
+"before" is the previous app loop. It drew with utils.draw_angles and PoseEngine.draw_landmarks (MediaPipe's
+drawing utilities) on every frame and handed the raw frame to st.image. "after" is overlay.py:
+FrameEncoder.fit downscales to max_width, OverlayRenderer.draw draws, and JPEG/WebP encoding runs only on
+the frames FrameEncoder lets through (max_fps). Reports CPU per drawn frame, bytes per frame, and bandwidth
+and CPU per second of camera video.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_render
+    python -m benchmarks.bench_render --size 1280x720 --max-width 640 --quality 60 --max-fps 10
+    python -m benchmarks.bench_render --video clip.mp4 --output render.json
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_hot_path import load_clip, pose_to_landmark_list, FakeResults
+from benchmarks.harness import measure, synthetic_poses, save_results, print_table
+from exercises import BicepCurl
+from overlay import OverlayRenderer, FrameEncoder
+from utils import draw_angles
+
+def synthetic_scene(frames, size):
+    """
+    Camera-like frames: a lit background with a few shapes and sensor noise, so compression behaves as it
+    would on video (uniform random noise would not compress at all).
+    """
+    width, height = size
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.dstack([90 + 60 * x / width, 110 + 40 * y / height, 140 - 50 * x / width]).astype(np.float32)
+    for _ in range(6):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        cv2.rectangle(base, (int(x0), int(y0)), (int(x0 + width // 5), int(y0 + height // 4)),
+                      rng.uniform(30, 220, 3).tolist(), -1)
+    base = cv2.GaussianBlur(base, (0, 0), 3)
+    return [np.clip(base + rng.normal(0, 3, base.shape), 0, 255).astype(np.uint8) for _ in range(frames)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--video", help="Recorded clip (default: synthetic camera-like frames)")
+    parser.add_argument("--size", default="640x480", help="Synthetic frame size, WIDTHxHEIGHT")
+    parser.add_argument("--camera-fps", type=float, default=30, help="Frames delivered per second")
+    parser.add_argument("--max-fps", type=float, default=15, help="FrameEncoder frames sent per second")
+    parser.add_argument("--max-width", type=int, default=640)
+    parser.add_argument("--quality", type=int, default=70)
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    size = tuple(int(value) for value in args.size.split("x"))
+    clip = load_clip(args.video, args.frames) if args.video else synthetic_scene(args.frames, size)
+    poses = synthetic_poses(len(clip))
+    curl = BicepCurl()
+    angles = []
+    for pose in poses:
+        curl.process(pose)
+        angles.append(dict(curl.angles))
+    items = list(zip(clip, poses, angles))
+
+    import mediapipe as mp
+    results = [FakeResults(pose_to_landmark_list(pose)) for pose in poses]
+    drawing, mp_pose = mp.solutions.drawing_utils, mp.solutions.pose
+
+    def before(index):
+        # The old loop (drawing on a copy, so every call starts from a clean frame like a new camera frame)
+        image = clip[index].copy()
+        draw_angles(image, angles[index])
+        drawing.draw_landmarks(image, results[index].pose_landmarks, mp_pose.POSE_CONNECTIONS,
+                               drawing.DrawingSpec(color=(245, 117, 66), thickness=2, circle_radius=2),
+                               drawing.DrawingSpec(color=(245, 66, 230), thickness=2, circle_radius=2))
+        return image
+
+    renderer, smooth = OverlayRenderer(), OverlayRenderer(antialias=True)
+    encoders = {name: FrameEncoder(name, args.quality, args.max_fps, args.max_width) for name in ("jpeg", "webp")}
+    fitted = [encoders["jpeg"].fit(frame) for frame in clip]
+
+    stages = {
+        "before: draw_angles + draw_landmarks": measure(before, range(len(clip)), warmup=5),
+        "FrameEncoder.fit": measure(lambda item: encoders["jpeg"].fit(item[0]), items, warmup=5),
+        "OverlayRenderer.draw": measure(lambda item: renderer.draw(item[0].copy(), item[1], item[2]),
+                                        list(zip(fitted, poses, angles)), warmup=5),
+        "OverlayRenderer.draw (antialias)": measure(lambda item: smooth.draw(item[0].copy(), item[1], item[2]),
+                                                    list(zip(fitted, poses, angles)), warmup=5),
+        "frame copy (baseline)": measure(lambda frame: frame.copy(), fitted, warmup=5),
+    }
+    for name, encoder in encoders.items():
+        stages[f"{name} q{args.quality} encode"] = measure(encoder.encode, fitted, warmup=2, track_allocations=False)
+    print_table(stages)
+
+    # Per second of camera video: the old loop drew and sent every frame raw, the new one max_fps frames
+    raw_bytes = clip[0].nbytes
+    copy_us = stages["frame copy (baseline)"]["mean_us"]
+    draw_us = stages["OverlayRenderer.draw"]["mean_us"] - copy_us
+    sent = min(args.camera_fps, args.max_fps)
+    rows = {"before (raw frames)": (raw_bytes, args.camera_fps,
+                                    (stages["before: draw_angles + draw_landmarks"]["mean_us"] - copy_us) / 1e3)}
+    for name, encoder in encoders.items():
+        frame_bytes = encoder.stats["bytes"] / encoder.stats["sent"]
+        frame_ms = (stages["FrameEncoder.fit"]["mean_us"] + draw_us + stages[f"{name} q{args.quality} encode"]["mean_us"]) / 1e3
+        rows[f"after ({name} q{args.quality})"] = (frame_bytes, sent, frame_ms)
+    print(f"\n{'per second of video':<28} {'KB/frame':>10} {'frames/s':>10} {'MB/s':>8} {'ms/frame':>10} {'CPU ms/s':>10}")
+    summary = {}
+    for name, (frame_bytes, fps, frame_ms) in rows.items():
+        summary[name] = {"bytes_per_frame": round(frame_bytes), "frames_per_s": fps,
+                         "mb_per_s": round(frame_bytes * fps / 1e6, 2), "ms_per_frame": round(frame_ms, 3),
+                         "cpu_ms_per_s": round(frame_ms * fps, 1)}
+        print(f"{name:<28} {frame_bytes / 1e3:>10.1f} {fps:>10g} {frame_bytes * fps / 1e6:>8.2f} {frame_ms:>10.2f} "
+              f"{frame_ms * fps:>10.1f}")
+    print("(before excludes the encoding Streamlit then does for a raw array)")
+    if args.output:
+        save_results(args.output, "render", stages, {"per_second": summary, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
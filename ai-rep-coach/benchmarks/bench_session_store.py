@@ -0,0 +1,150 @@
+"""
+Benchmark of the workout store (session_store.py) at a million reps.
+
+Loads synthetic history (reps spread over users, exercises and days, in sessions of a few dozen reps)
+through SessionStore.add_rep. It reports the caller-side latency of add_rep, which the frame loop pays,
+and the sustained rate of the batched writer, compared with committing every rep on its own. It then
+times the history queries on the full table (per user, per exercise, per date, daily totals, resume)
+and the compaction job, with the database size before and after.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_session_store
+    python -m benchmarks.bench_session_store --reps 100000 --users 50 --output store.json
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.harness import measure, summarize, save_results, print_table
+from exercises import EXERCISES
+from session_store import SessionStore, INSERTS, connect
+
+DAY = 86400
+
+def synthetic_history(reps, users, days, session_reps=30, seed=0):
+    """
+    Yields (user, exercise, session start, rep dict) in time order per session, sessions spread over `days`.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(EXERCISES)
+    now = time.time()
+    for _ in range(reps // session_reps):
+        user = f"user{rng.integers(users)}"
+        exercise = names[rng.integers(len(names))]
+        started = now - rng.uniform(0, days) * DAY
+        low = rng.uniform(20, 60, session_reps)
+        tempo = rng.uniform(0.5, 1.5, (session_reps, 2))
+        end = started
+        for index in range(session_reps):
+            duration = tempo[index].sum() + 0.4
+            end += duration
+            yield user, exercise, started, {
+                "start": end - duration, "end": end, "min_angle": float(low[index]), "max_angle": float(low[index] + 110),
+                "concentric": float(tempo[index, 0]), "eccentric": float(tempo[index, 1]),
+                "warnings": ["Keep elbows close to your body"] if index % 10 == 9 else [],
+            }
+
+def load(store, history, chunk=100000):
+    """
+    add_rep for every rep; returns (caller latencies in seconds, reps per second including the final flush).
+    Waits for the writer every `chunk` reps so the queue stays bounded.
+    """
+    latencies = []
+    sessions = {}
+    perf_counter = time.perf_counter
+    start = perf_counter()
+    for count, (user, exercise, started, rep) in enumerate(history, 1):
+        key = (user, exercise, started)
+        session_id = sessions.get(key)
+        if session_id is None:
+            session_id = sessions[key] = store.start_session(user, exercise, started=started)
+        call = perf_counter()
+        store.add_rep(session_id, rep)
+        latencies.append(perf_counter() - call)
+        if count % chunk == 0:
+            store.flush(timeout=600)
+    store.flush(timeout=600)
+    return np.array(latencies), count / (perf_counter() - start)
+
+def unbatched_rate(path, history):
+    """
+    Reps per second when every rep is its own transaction (the naive way), on the same schema.
+    """
+    connection = connect(path)
+    count = 0
+    start = time.perf_counter()
+    for user, exercise, started, rep in history:
+        with connection:
+            connection.execute(INSERTS["rep"], ("unbatched", user, exercise, count, rep["start"], rep["end"],
+                                                rep["min_angle"], rep["max_angle"], rep["concentric"],
+                                                rep["eccentric"], None))
+        count += 1
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return count / elapsed
+
+def database_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reps", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=float, default=365, help="History spread over this many days")
+    parser.add_argument("--queries", type=int, default=200, help="Calls per query stage")
+    parser.add_argument("--raw-days", type=float, default=90, help="compact(): keep individual reps this long")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "workouts.db")
+        store = SessionStore(path, max_pending=500000)
+        latencies, rate = load(store, synthetic_history(args.reps, args.users, args.days))
+        # Into the same loaded database, so both pay the same index maintenance
+        unbatched = unbatched_rate(path, synthetic_history(min(args.reps, 3000), args.users, args.days, seed=1))
+        with sqlite3.connect(path) as connection:
+            connection.execute("DELETE FROM reps WHERE session_id = 'unbatched'")
+        size = database_size(path)
+        print(f"Loaded {len(latencies)} reps: {rate:,.0f} reps/s batched, {unbatched:,.0f} reps/s one transaction "
+              f"per rep; {size / 1e6:.1f} MB; dropped {store.stats['dropped']}")
+
+        rng = np.random.default_rng(2)
+        now = time.time()
+        users = [f"user{rng.integers(args.users)}" for _ in range(args.queries)]
+        exercises = [list(EXERCISES)[rng.integers(len(EXERCISES))] for _ in range(args.queries)]
+        days = [now - rng.uniform(1, args.days) * DAY for _ in range(args.queries)]
+        stages = {"add_rep (caller)": summarize(latencies)}
+        stages["history: user, last 30 days"] = measure(
+            lambda user: store.history(user=user, since=now - 30 * DAY, limit=100), users, track_allocations=False)
+        stages["history: exercise, one day"] = measure(
+            lambda index: store.history(exercise=exercises[index], since=days[index], until=days[index] + DAY),
+            range(args.queries), track_allocations=False)
+        stages["history: all users, one day"] = measure(
+            lambda day: store.history(since=day, until=day + DAY, limit=1000), days, track_allocations=False)
+        stages["daily_totals: user, one year"] = measure(
+            lambda user: store.daily_totals(user, since=now - 365 * DAY), users, track_allocations=False)
+        stages["resume"] = measure(lambda user: store.resume(user, "Bicep Curl", within=30 * DAY), users,
+                                   track_allocations=False)
+
+        start = time.perf_counter()
+        removed = store.compact(raw_days=args.raw_days, landmark_days=7)
+        compact_seconds = time.perf_counter() - start
+        stages["daily_totals: user, after compact"] = measure(
+            lambda user: store.daily_totals(user, since=now - 365 * DAY), users, track_allocations=False)
+        compacted_size = database_size(path)
+        store.close()
+
+    print_table(stages)
+    print(f"\ncompact(raw_days={args.raw_days:g}): {removed['reps']} reps rolled up in {compact_seconds:.1f} s, "
+          f"{size / 1e6:.1f} MB -> {compacted_size / 1e6:.1f} MB")
+    if args.output:
+        save_results(args.output, "session_store", stages, {
+            "reps_per_s": round(rate), "unbatched_reps_per_s": round(unbatched), "bytes": size,
+            "compact_s": round(compact_seconds, 2), "compacted_bytes": compacted_size, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Cold start benchmark: import time of every module and time to the first processed frame.
+
+Each measurement runs in a fresh interpreter, so nothing is cached between runs. For every module it reports
+the median wall time of `import module` and which heavy dependencies (cv2, mediapipe, google.genai,
+streamlit) the import pulled in. Time to first frame is measured from interpreter start to the first
+PoseEngine.process_frame result: import, engine construction, first frame and the steady-state frame, both
+cold and after PoseEngine.warm_up(). A pose worker pool reports how long until all its workers are ready.
+
+--baseline REV runs the import measurements on that git revision too (exported to a temporary directory),
+for a before/after table.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --baseline HEAD~1 --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.harness import save_results
+
+MODULES = ["utils", "exercises", "rule_engine", "rep_analytics", "exercise_recognizer", "landmark_filter",
+           "gemini_coach", "session_store", "pipeline", "server", "batch_process", "overlay", "pose_engine"]
+HEAVY = ("cv2", "mediapipe", "google.genai", "streamlit")
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+FIRST_FRAME_SCRIPT = """
+import time
+start = time.perf_counter()
+import json
+import numpy as np
+from pose_engine import PoseEngine
+imported = time.perf_counter()
+engine = PoseEngine()
+constructed = time.perf_counter()
+warm_up = engine.warm_up() if {warm} else 0.0
+frame = np.zeros((480, 640, 3), dtype=np.uint8)
+before = time.perf_counter()
+engine.process_frame(frame)
+first = time.perf_counter()
+for _ in range(5):
+    engine.process_frame(frame)
+steady = (time.perf_counter() - first) / 5
+print(json.dumps({{"import_s": imported - start, "construct_s": constructed - imported, "warm_up_s": warm_up,
+                  "first_frame_s": first - before, "steady_frame_s": steady, "total_s": first - start}}))
+"""
+
+POOL_SCRIPT = """
+import json, time
+import numpy as np
+from server import InferencePool
+start = time.perf_counter()
+pool = InferencePool(workers={workers}, warm_up={warm})
+pool.wait_ready()
+ready = time.perf_counter()
+session = pool.create_session("Bicep Curl")
+job = pool.submit(session.id, np.zeros((480, 640, 3), dtype=np.uint8))
+job.done.wait()
+print(json.dumps({{"ready_s": ready - start, "first_job_s": time.perf_counter() - ready}}))
+pool.close()
+"""
+
+def run_script(script, cwd):
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=cwd)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "failed")
+    return result.stdout.strip().splitlines()[-1]
+
+def import_times(cwd, runs):
+    """
+    {module: {"ms": median import time, "heavy": [heavy modules loaded]}} for the modules present in cwd.
+    """
+    results = {}
+    for module in MODULES:
+        if not os.path.exists(os.path.join(cwd, module + ".py")):
+            continue
+        times, heavy = [], ""
+        try:
+            for _ in range(runs):
+                elapsed, *loaded = run_script(IMPORT_SCRIPT.format(module=module, heavy=HEAVY), cwd).split()
+                times.append(float(elapsed))
+                heavy = loaded[0] if loaded else ""
+        except RuntimeError as e:
+            print(f"{module}: {e}")
+            continue
+        results[module] = {"ms": round(float(np.median(times)) * 1e3, 1), "heavy": heavy.split(",") if heavy else []}
+    return results
+
+def export_revision(revision, directory):
+    """
+    Extracts the ai-rep-coach directory of a git revision into `directory`; returns its path.
+    """
+    root = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True,
+                          check=True).stdout.strip()
+    prefix = os.path.relpath(os.getcwd(), root)
+    archive = subprocess.run(["git", "archive", revision, prefix], capture_output=True, check=True, cwd=root).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+    return os.path.join(directory, prefix)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per import measurement")
+    parser.add_argument("--baseline", metavar="REV", help="Also measure imports at this git revision")
+    parser.add_argument("--workers", type=int, default=2, help="Pose workers in the pool measurement")
+    parser.add_argument("--skip-pose", action="store_true", help="Only measure imports")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    current = import_times(os.getcwd(), args.runs)
+    baseline = {}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = import_times(export_revision(args.baseline, tmp), args.runs)
+
+    print(f"{'import':<22}" + (f"{args.baseline:>14} {'heavy':<28}" if baseline else "") + f"{'now ms':>10} heavy")
+    for module, result in current.items():
+        line = f"{module:<22}"
+        if baseline:
+            old = baseline.get(module)
+            line += f"{old['ms']:>14.1f} {','.join(old['heavy']):<28}" if old else f"{'-':>14} {'':<28}"
+        print(line + f"{result['ms']:>10.1f} {','.join(result['heavy'])}")
+
+    first_frame, pool = {}, {}
+    if not args.skip_pose:
+        print(f"\n{'time to first frame':<22}{'import':>9}{'construct':>11}{'warm_up':>9}{'first':>9}{'steady':>9}"
+              f"{'total':>9}  (ms)")
+        for warm in (False, True):
+            name = "warm_up()" if warm else "cold"
+            result = first_frame[name] = json.loads(run_script(FIRST_FRAME_SCRIPT.format(warm=warm), os.getcwd()))
+            print(f"{name:<22}" + "".join(f"{result[key] * 1e3:>{width}.1f}" for key, width in (
+                ("import_s", 9), ("construct_s", 11), ("warm_up_s", 9), ("first_frame_s", 9),
+                ("steady_frame_s", 9), ("total_s", 9))))
+        print(f"\n{args.workers} pose workers        {'ready ms':>10} {'first job ms':>13}")
+        for warm in (False, True):
+            name = "warm_up=True" if warm else "warm_up=False"
+            result = pool[name] = json.loads(run_script(POOL_SCRIPT.format(workers=args.workers, warm=warm),
+                                                        os.getcwd()))
+            print(f"{name:<22}{result['ready_s'] * 1e3:>10.1f} {result['first_job_s'] * 1e3:>13.1f}")
+
+    if args.output:
+        save_results(args.output, "startup", {}, {"imports": current, "baseline": baseline,
+                                                  "first_frame": first_frame, "pool": pool, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
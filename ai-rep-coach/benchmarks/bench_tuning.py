@@ -0,0 +1,69 @@
+"""
+Runtime of the threshold sweep (threshold_tuner.py): every grid combination advanced together in one RuleEngine,
+in one or several processes, against replaying each combination through its own RuleExercise.
+
+Recordings are synthetic sets of each exercise (harness.synthetic_exercise_poses). No rep labels are needed,
+since only the timing matters and the two ways of counting are checked against each other. Looping
+every combination would take hours, so it is timed on a sample of --loop-sample combinations and scaled up
+to the full grid. The sampled counts must match the vectorized ones.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_tuning
+    python -m benchmarks.bench_tuning --sets 8 --frames 900 --span 40 --step 1 --workers 1 4
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmarks.harness import synthetic_exercise_poses, save_results
+from exercise_recognizer import detected_angles
+from rule_engine import RuleEngine, load_definitions
+from threshold_tuner import parameter_grid, sweep, loop_counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exercises", nargs="+", default=["Bicep Curl", "Front Raise", "Shoulder Press", "Squat"])
+    parser.add_argument("--sets", type=int, default=4, help="Recordings per exercise")
+    parser.add_argument("--frames", type=int, default=600, help="Frames per recording")
+    parser.add_argument("--span", type=float, default=30)
+    parser.add_argument("--step", type=float, default=2)
+    parser.add_argument("--hold-frames", nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument("--workers", nargs="+", type=int, default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--loop-sample", type=int, default=10, help="Combinations timed one by one")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    definitions = load_definitions()
+    print(f"{args.sets} recordings x {args.frames} frames per exercise, {os.cpu_count()} CPUs")
+    print(f"{'exercise':<16} {'combinations':>12} " + "".join(f"{f'sweep x{w} s':>13}" for w in args.workers)
+          + f" {'loop s (est.)':>14} {'speedup':>8}")
+    results = {}
+    for name in args.exercises:
+        definition = definitions[name]
+        poses = [synthetic_exercise_poses(name, args.frames, seed=seed) for seed in range(args.sets)]
+        params = parameter_grid(definition, args.span, args.step, args.hold_frames)
+        engine = RuleEngine({name: definition})
+        result = results[name] = {"combinations": len(params), "sweep_s": {}}
+        for workers in args.workers:
+            start = time.perf_counter()
+            angles = [detected_angles(engine, recording) for recording in poses]
+            counts = sweep(definition, params, angles, workers)
+            result["sweep_s"][workers] = round(time.perf_counter() - start, 3)
+        sample = np.random.default_rng(0).choice(len(params), min(args.loop_sample, len(params)), replace=False)
+        start = time.perf_counter()
+        looped = loop_counts(name, definition, params[sample], poses)
+        per_combination = (time.perf_counter() - start) / len(sample)
+        if not np.array_equal(looped, counts[sample]):
+            raise AssertionError(f"{name}: looped and vectorized counts differ")
+        result["loop_s_estimated"] = round(per_combination * len(params), 1)
+        best = min(result["sweep_s"].values())
+        result["speedup"] = round(result["loop_s_estimated"] / best, 1)
+        print(f"{name:<16} {len(params):>12} " + "".join(f"{seconds:>13.2f}" for seconds in result["sweep_s"].values())
+              + f" {result['loop_s_estimated']:>14.1f} {result['speedup']:>7.0f}x")
+    if args.output:
+        save_results(args.output, "tuning", {}, {"exercises": results, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
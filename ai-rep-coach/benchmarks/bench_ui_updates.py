@@ -0,0 +1,106 @@
+"""
+Messages and CPU the Streamlit metrics panel costs per session: every widget rewritten on every frame (the app
+before ui_state.py) against UIState, which sends only changes and caps the angle text at --angle-rate.
+
+The metrics come from synthetic sets of an exercise run through its Exercise and a RepSegmenter at --fps,
+and the coach message changes every --coach-every seconds, as the coach cooldown allows. Placeholders are
+stand-ins that serialize every call to JSON, the way Streamlit serializes a delta message before it goes
+over the websocket, and count them. Streamlit's own protobuf, websocket and browser work per message come on
+top of the CPU measured here, so messages per second is the number that carries over to a live session.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.bench_ui_updates
+    python -m benchmarks.bench_ui_updates --exercise "Front Raise" --fps 15 --angle-rate 2 --seconds 120
+"""
+import argparse
+import json
+import time
+from collections import Counter
+
+from benchmarks.harness import synthetic_exercise_poses, save_results
+from exercises import EXERCISES
+from rep_analytics import RepSegmenter
+from ui_state import UIState, panel_updates
+
+class RecordingPlaceholder:
+    """
+    Stands in for st.empty(): every widget call is serialized and counted as one message.
+    """
+    def __init__(self, key, counts):
+        self.key = key
+        self.counts = counts
+        self.bytes = 0
+
+    def __getattr__(self, method):
+        def send(*content):
+            self.bytes += len(json.dumps([method, content], default=str))
+            self.counts[self.key] += 1
+        return send
+
+def frame_metrics(exercise_name, seconds, fps, coach_every):
+    """
+    (timestamp, metrics, coach message) for every frame of a synthetic set.
+    """
+    frames = int(seconds * fps)
+    exercise = EXERCISES[exercise_name]()
+    segmenter = RepSegmenter.for_exercise(exercise_name)
+    frames_out = []
+    for index, pose in enumerate(synthetic_exercise_poses(exercise_name, frames, period=2 * fps)):
+        timestamp = index / fps
+        exercise.process(pose)
+        metrics = exercise.get_metrics()
+        segmenter.update(timestamp, metrics)
+        metrics["rep_summary"] = segmenter.summary()
+        coach = f"🤖 Coach: message {int(timestamp // coach_every)}"
+        frames_out.append((timestamp, metrics, coach))
+    return frames_out
+
+def run(frames, mode, angle_rate):
+    counts = Counter()
+    placeholders = {key: RecordingPlaceholder(key, counts)
+                    for key in ("reps", "rep_stats", "stage", "angles", "feedback", "coach")}
+    ui = UIState(placeholders, rates={"angles": angle_rate})
+    start = time.process_time()
+    for timestamp, metrics, coach in frames:
+        if mode == "every frame":
+            for key, method, content in panel_updates(metrics):
+                getattr(placeholders[key], method)(*content)
+            placeholders["coach"].info(coach)
+        else:
+            for key, method, content in panel_updates(metrics):
+                ui.show(key, method, *content, now=timestamp)
+            ui.show("coach", "info", coach, now=timestamp)
+            ui.flush(now=timestamp)
+    cpu = time.process_time() - start
+    seconds = frames[-1][0] + frames[1][0]
+    return {
+        "messages_per_s": round(sum(counts.values()) / seconds, 1),
+        "kb_per_s": round(sum(p.bytes for p in placeholders.values()) / seconds / 1024, 2),
+        "cpu_ms_per_s": round(cpu / seconds * 1e3, 3),
+        "messages_per_widget": dict(counts),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exercise", default="Bicep Curl", choices=["Bicep Curl", "Front Raise", "Shoulder Press"])
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the synthetic set")
+    parser.add_argument("--fps", type=float, default=30, help="Frames per second reaching the UI loop")
+    parser.add_argument("--angle-rate", type=float, default=4, help="Angle text updates per second at most")
+    parser.add_argument("--coach-every", type=float, default=8, help="Seconds between coach messages")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    frames = frame_metrics(args.exercise, args.seconds, args.fps, args.coach_every)
+    reps = frames[-1][1]["reps"]
+    print(f"{args.exercise}: {args.seconds:g}s at {args.fps:g} fps, {reps} reps, angles at most {args.angle_rate:g}/s")
+    print(f"{'mode':<12} {'messages/s':>11} {'KB/s':>8} {'CPU ms/s':>9}  messages per widget")
+    results = {}
+    for mode in ("every frame", "UIState"):
+        result = results[mode] = run(frames, mode, args.angle_rate)
+        print(f"{mode:<12} {result['messages_per_s']:>11.1f} {result['kb_per_s']:>8.2f} {result['cpu_ms_per_s']:>9.3f}  "
+              f"{result['messages_per_widget']}")
+    if args.output:
+        save_results(args.output, "ui_updates", {}, {"modes": results, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
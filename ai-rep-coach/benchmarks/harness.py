@@ -0,0 +1,201 @@
+"""
+Shared helpers for the benchmarks: timing with latency percentiles, allocation tracking,
+JSON result files and comparison against a previous run.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from landmarks import (NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                       LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE, NUM_LANDMARKS)
+
+def measure(fn, inputs, warmup=10, track_allocations=True):
+    """
+    Calls fn(item) for every item in inputs and returns latency statistics.
+    Timing and allocation tracking are separate passes, since tracemalloc slows every allocation down.
+    Returns a dict with count, mean/p50/p90/p99/max latency in microseconds, fps and
+    alloc_bytes_per_call (mean peak of newly allocated memory during one call).
+    """
+    inputs = list(inputs)
+    for item in inputs[:warmup]:
+        fn(item)
+
+    latencies = np.empty(len(inputs))
+    perf_counter = time.perf_counter
+    for i, item in enumerate(inputs):
+        start = perf_counter()
+        fn(item)
+        latencies[i] = perf_counter() - start
+
+    result = summarize(latencies)
+    if track_allocations:
+        result["alloc_bytes_per_call"] = measure_allocations(fn, inputs[:200])
+    return result
+
+def summarize(latencies):
+    """
+    Latency statistics (input in seconds, output in microseconds) plus the implied calls per second.
+    """
+    latencies = np.asarray(latencies, dtype=np.float64)
+    us = latencies * 1e6
+    mean = float(us.mean()) if len(us) else 0.0
+    return {
+        "count": int(len(us)),
+        "mean_us": round(mean, 2),
+        "p50_us": round(float(np.percentile(us, 50)), 2) if len(us) else 0.0,
+        "p90_us": round(float(np.percentile(us, 90)), 2) if len(us) else 0.0,
+        "p99_us": round(float(np.percentile(us, 99)), 2) if len(us) else 0.0,
+        "max_us": round(float(us.max()), 2) if len(us) else 0.0,
+        "fps": round(1e6 / mean, 1) if mean else 0.0,
+    }
+
+def measure_allocations(fn, inputs):
+    """
+    Mean peak bytes allocated (and not necessarily kept) by one call of fn.
+    """
+    if not inputs:
+        return 0
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    peaks = []
+    try:
+        for item in inputs:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn(item)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return int(np.mean(peaks))
+
+def environment():
+    """
+    Metadata stored with every result file so runs can be matched to commits and machines.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def save_results(path, name, stages, extra=None):
+    results = {"benchmark": name, "environment": environment(), "stages": stages}
+    if extra:
+        results.update(extra)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return results
+
+def print_table(stages):
+    print(f"{'stage':<32} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10} {'fps':>10} {'alloc B':>10}")
+    for name, stats in stages.items():
+        print(f"{name:<32} {stats['p50_us']:>10.1f} {stats['p90_us']:>10.1f} {stats['p99_us']:>10.1f} "
+              f"{stats['fps']:>10.1f} {stats.get('alloc_bytes_per_call', 0):>10}")
+
+def compare(baseline_path, stages, metric="p50_us", threshold=0.10):
+    """
+    Prints the change of `metric` per stage against a saved result file.
+    Returns the names of stages that got slower by more than `threshold`.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline['environment'].get('commit')}), {metric}:")
+    regressions = []
+    for name, stats in stages.items():
+        old = baseline["stages"].get(name, {}).get(metric)
+        if not old:
+            print(f"{name:<32} {'new':>10}")
+            continue
+        change = (stats[metric] - old) / old
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<32} {old:>10.1f} -> {stats[metric]:>10.1f} ({change:+.1%}){flag}")
+    return regressions
+
+def synthetic_poses(frames=300, seed=0, period=60):
+    """
+    Deterministic (frames, 33, 4) float32 pose sequence: a person standing facing the camera while both
+    forearms swing between straight and fully curled every `period` frames, plus a little landmark jitter.
+    """
+    base = np.full((NUM_LANDMARKS, 4), (0.5, 0.2, 0.0, 0.9), dtype=np.float32)
+    joints = {
+        NOSE: (0.5, 0.2), LEFT_SHOULDER: (0.6, 0.3), RIGHT_SHOULDER: (0.4, 0.3),
+        LEFT_ELBOW: (0.62, 0.45), RIGHT_ELBOW: (0.38, 0.45),
+        LEFT_HIP: (0.57, 0.6), RIGHT_HIP: (0.43, 0.6), LEFT_KNEE: (0.57, 0.78), RIGHT_KNEE: (0.43, 0.78),
+        LEFT_ANKLE: (0.57, 0.95), RIGHT_ANKLE: (0.43, 0.95),
+    }
+    for index, (x, y) in joints.items():
+        base[index, :2] = (x, y)
+
+    rng = np.random.default_rng(seed)
+    poses = np.repeat(base[None], frames, axis=0)
+    # Forearm angle from the upper arm: 0 = arm straight down, ~165 degrees = fully curled
+    phase = np.radians(82.5 - 82.5 * np.cos(2 * np.pi * np.arange(frames) / period))
+    forearm = 0.15
+    for elbow, wrist in ((LEFT_ELBOW, LEFT_WRIST), (RIGHT_ELBOW, RIGHT_WRIST)):
+        poses[:, wrist, 0] = poses[:, elbow, 0] + forearm * np.sin(phase) * 0.3
+        poses[:, wrist, 1] = poses[:, elbow, 1] + forearm * np.cos(phase)
+    poses[:, :, :2] += rng.normal(0, 0.002, size=(frames, NUM_LANDMARKS, 2)).astype(np.float32)
+    return poses
+
+def synthetic_exercise_poses(exercise, frames=300, seed=0, period=60):
+    """
+    Deterministic (frames, 33, 4) pose sequence, seen from the side, of the left arm or legs doing an exercise:
+    "Bicep Curl", "Front Raise", "Shoulder Press", "Squat", or "Idle" (standing still). The seed also varies
+    the tempo (0.8x to 1.25x `period`), the starting phase and the landmark jitter, e.g. for training and
+    testing exercise recognition on different "people".
+    """
+    rng = np.random.default_rng(seed)
+    period = period * rng.uniform(0.8, 1.25)
+    t = 0.5 - 0.5 * np.cos(2 * np.pi * (np.arange(frames) / period + rng.uniform()))
+    poses = synthetic_poses(frames, seed=seed, period=period)
+    poses[:, :, :2] = synthetic_poses(1)[0, :, :2] # Same standing pose without the curling arms or the jitter
+
+    def direction(degrees):
+        # Unit vectors in image coordinates: 0 = straight down, 90 = forward (+x), 180 = straight up
+        radians = np.radians(degrees)
+        return np.stack([np.sin(radians), np.cos(radians)], axis=-1)
+
+    shoulder = poses[:, LEFT_SHOULDER, :2]
+    arm = {
+        "Bicep Curl": (0 * t, 155 * t),
+        "Front Raise": (95 * t, 95 * t),
+        "Shoulder Press": (80 + 90 * t, 200 - 25 * t),
+        "Idle": (0 * t, 0 * t),
+    }
+    if exercise in arm:
+        upper, forearm = arm[exercise]
+        poses[:, LEFT_ELBOW, :2] = shoulder + 0.15 * direction(upper)
+        poses[:, LEFT_WRIST, :2] = poses[:, LEFT_ELBOW, :2] + 0.15 * direction(forearm)
+    elif exercise == "Squat":
+        # Shin tilts forward, thigh back and the torso leans in: knee from ~180 to ~80 degrees
+        knee = poses[:, LEFT_ANKLE, :2] + 0.17 * direction(180 - 45 * t)
+        hip = knee + 0.18 * direction(180 + 55 * t)
+        shoulder_moved = hip + 0.3 * direction(180 - 30 * t)
+        upper_body = shoulder_moved - poses[:, LEFT_SHOULDER, :2]
+        poses[:, :LEFT_HIP, :2] += upper_body[:, None]
+        poses[:, (LEFT_HIP, RIGHT_HIP), :2] += (hip - poses[:, LEFT_HIP, :2])[:, None]
+        poses[:, (LEFT_KNEE, RIGHT_KNEE), :2] += (knee - poses[:, LEFT_KNEE, :2])[:, None]
+    else:
+        raise ValueError(f"No synthetic motion for {exercise!r}")
+    poses[:, :, :2] += rng.normal(0, 0.002, size=(frames, NUM_LANDMARKS, 2)).astype(np.float32)
+    return poses
@@ -0,0 +1,123 @@
+"""
+Load test for server.py: synthetic clients stream JPEG frames at a fixed fps and wait for each result.
+
+For every session count it reports the achieved fps per session, end-to-end latency percentiles and
+dropped frames, and from those the number of sessions each core can hold at the target fps and
+latency budget.
+
+Run from the ai-rep-coach directory:
+    python -m benchmarks.load_test --sessions 1 2 4 8
+    python -m benchmarks.load_test --fake-pose-ms 15      # scheduler/HTTP overhead only, no MediaPipe
+    python -m benchmarks.load_test --url http://host:8600 # an already running server
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+
+from benchmarks.harness import summarize, save_results
+
+class SleepPoseEngine:
+    """
+    Stands in for PoseEngine with a fixed inference time (sleeping releases the GIL, like MediaPipe's graph).
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def process_frame(self, frame):
+        time.sleep(self.seconds)
+        return frame, None, None
+
+def client(base_url, exercise, fps, duration, frames, latencies, statuses):
+    def post(path, data):
+        with urllib.request.urlopen(urllib.request.Request(base_url + path, data=data), timeout=30) as response:
+            return json.loads(response.read())
+
+    session_id = post("/sessions", json.dumps({"exercise": exercise}).encode())["session_id"]
+    interval = 1.0 / fps
+    next_time = start = time.perf_counter()
+    index = 0
+    while time.perf_counter() - start < duration:
+        sent = time.perf_counter()
+        try:
+            status = post(f"/sessions/{session_id}/frames?wait=1", frames[index % len(frames)])["status"]
+        except OSError:
+            status = "error"
+        latencies.append(time.perf_counter() - sent)
+        statuses[status] = statuses.get(status, 0) + 1
+        index += 1
+        next_time += interval
+        time.sleep(max(0.0, next_time - time.perf_counter()))
+    urllib.request.urlopen(urllib.request.Request(f"{base_url}/sessions/{session_id}", method="DELETE"), timeout=30)
+
+def run_level(base_url, sessions, args, frames):
+    latencies, statuses = [], {}
+    threads = [threading.Thread(target=client, args=(base_url, args.exercise, args.fps, args.duration, frames,
+                                                     latencies, statuses))
+               for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = summarize(latencies)
+    stats["p95_us"] = round(float(np.percentile(latencies, 95)) * 1e6, 2) if latencies else 0.0
+    stats["sessions"] = sessions
+    stats["fps_per_session"] = round(statuses.get("ok", 0) / args.duration / sessions, 1)
+    stats["statuses"] = statuses
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Server to test (default: start one in this process)")
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--fps", type=float, default=15, help="Frames per second sent by each client")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per session count")
+    parser.add_argument("--budget-ms", type=float, default=100, help="p95 latency budget for a session to count")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--fake-pose-ms", type=float, help="Replace MediaPipe with a fixed-time fake engine")
+    parser.add_argument("--exercise", default="Bicep Curl")
+    parser.add_argument("--output", help="Save results to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        from server import InferencePool, InferenceServer
+        factory = None
+        if args.fake_pose_ms is not None:
+            factory = lambda: SleepPoseEngine(args.fake_pose_ms / 1e3)
+        server = InferenceServer(InferencePool(workers=args.workers, pose_engine_factory=factory), port=0)
+        base_url = f"http://127.0.0.1:{server.port}"
+
+    rng = np.random.default_rng(0)
+    frames = [cv2.imencode(".jpg", rng.integers(0, 256, (360, 640, 3), dtype=np.uint8))[1].tobytes()
+              for _ in range(10)]
+
+    levels = {}
+    try:
+        print(f"{'sessions':>8} {'fps/session':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+        for sessions in args.sessions:
+            stats = run_level(base_url, sessions, args, frames)
+            levels[str(sessions)] = stats
+            print(f"{sessions:>8} {stats['fps_per_session']:>12.1f} {stats['p50_us'] / 1e3:>8.1f} "
+                  f"{stats['p95_us'] / 1e3:>8.1f} {stats['p99_us'] / 1e3:>8.1f}  {stats['statuses']}")
+    finally:
+        if server:
+            server.close()
+
+    sustained = [int(n) for n, s in levels.items()
+                 if s["fps_per_session"] >= 0.9 * args.fps and s["p95_us"] / 1e3 <= args.budget_ms]
+    cores = os.cpu_count() or 1
+    best = max(sustained, default=0)
+    print(f"\nSustained {best} sessions at {args.fps} fps within {args.budget_ms} ms: "
+          f"{best / cores:.2f} sessions per core ({cores} cores)")
+    if args.output:
+        save_results(args.output, "load_test", levels, {"sessions_per_core": best / cores, "args": vars(args)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""
+Shared coach dispatcher: one batched model request for the pending feedback of many sessions.
+
+A GeminiCoach per session sends its own request every feedback_cooldown seconds, so with many sessions the
+API calls (cost and rate limit pressure) grow with the session count. Here every session gets a SessionCoach
+with the same interface (get_feedback, poll, get_stats, close), but the snapshots it would send go to one
+CoachDispatcher. Its worker waits a moment for more sessions to join, takes up to max_batch of them (sessions
+with form warnings first, then the longest waiting), and asks the model for all of them in one prompt that
+returns a JSON object of messages keyed by session id. A token bucket caps the model calls per minute of the
+whole process; sessions that do not fit into a call wait for the next one, keeping only their newest snapshot.
+If a batch fails or its answer cannot be parsed, every session in it gets the local template message instead,
+and so does a session missing from the answer.
+
+    dispatcher = CoachDispatcher(GeminiClient(api_key), calls_per_minute=30)
+    coach = dispatcher.register(session_id)   # used like a GeminiCoach
+    feedback = coach.get_feedback(exercise_name, reps, stage, warnings, angles, rep_summary)
+
+FakeModelServer is a local HTTP stand-in for the model (HttpModelClient is its backend). It answers batched
+prompts and counts the calls, for the tests and benchmarks/bench_coach_dispatch.py.
+"""
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from feedback_cache import FeedbackCache, state_signature
+from gemini_coach import GeminiCoach, COACH_STYLES, start_call
+from rep_analytics import format_rep_summary
+from telemetry import Telemetry
+
+SESSIONS_MARKER = "Sessions (JSON):"
+
+BATCH_PROMPT = """
+You are a fitness coach for several people training at the same time.
+For every session below, write one short feedback message (under 20 words) in that session's style.
+
+Priority for each message:
+1. If there are form warnings, correct them immediately.
+2. If reps are rushed (under about 1s per phase) or the range of motion is shrinking, say so.
+3. If reps are increasing, motivate them.
+4. If nothing special, comment on their form or angles.
+
+Do not repeat a session's previous feedback exactly.
+Answer with only a JSON object mapping every session id to its message, e.g. {"id1": "...", "id2": "..."}.
+"""
+
+def parse_messages(text):
+    """
+    {session id: message} from a batch answer; the model may wrap the JSON object in prose or a code fence.
+    Raises ValueError if there is no JSON object.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("No JSON object in the coach answer")
+    messages = json.loads(text[start:end + 1])
+    if not isinstance(messages, dict):
+        raise ValueError("Coach answer is not a JSON object")
+    return {str(key): str(value).strip() for key, value in messages.items() if value}
+
+def batch_sessions(prompt):
+    """
+    The session states of a batched prompt (used by FakeModelServer); None for any other prompt.
+    """
+    if SESSIONS_MARKER not in prompt:
+        return None
+    return json.loads(prompt[prompt.index(SESSIONS_MARKER) + len(SESSIONS_MARKER):])
+
+class RateLimiter:
+    """
+    Token bucket: `calls_per_minute` on average, up to `burst` calls back to back.
+    """
+    def __init__(self, calls_per_minute, burst=1):
+        self.rate = calls_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Takes a token and returns 0 if one is available; otherwise the seconds until one will be.
+        """
+        with self._lock:
+            now = time.perf_counter()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+class SessionCoach(GeminiCoach):
+    """
+    A GeminiCoach whose requests go through a shared CoachDispatcher instead of a worker of its own.
+    Cache lookups, the template fallback and poll() work as in GeminiCoach.
+    """
+    def __init__(self, dispatcher, session_id, telemetry=None):
+        # No client, so GeminiCoach.__init__ does not start a worker of its own
+        super().__init__("", cache=dispatcher.cache, fallback_after=dispatcher.fallback_after, telemetry=telemetry)
+        self.dispatcher = dispatcher
+        self.session_id = session_id
+
+    def uses_model(self):
+        return True
+
+    def submit(self, snapshot):
+        self.dispatcher.submit(self, snapshot)
+
+    def close(self):
+        self.dispatcher.unregister(self.session_id)
+
+class CoachDispatcher:
+    def __init__(self, client, calls_per_minute=30, burst=2, max_batch=32, batch_window=0.25, timeout=15.0,
+                 max_retries=1, backoff=1.0, cache=None, fallback_after=3.0, telemetry=None):
+        """
+        client: any object with generate(prompt) -> str (GeminiClient, HttpModelClient, ...)
+        calls_per_minute, burst: global token bucket for the model calls, retries included
+        max_batch: sessions per model call at most
+        batch_window: seconds to wait after the first pending snapshot for others to join its batch
+        timeout, max_retries, backoff: per model call, as in GeminiCoach
+        cache: FeedbackCache shared by the session coaches (a private in-memory one by default)
+        fallback_after: seconds a session waits (queued or in flight) before its template message is shown meanwhile
+        telemetry: Telemetry receiving "coach_batch" call latencies and errors and "coach_feedback" latencies
+                   (from a session's snapshot to its message)
+        """
+        self.client = client
+        self.limiter = RateLimiter(calls_per_minute, burst)
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache if cache is not None else FeedbackCache()
+        self.fallback_after = fallback_after
+        self.telemetry = telemetry or Telemetry()
+        self.last_error = None
+        self.stats = {"requests": 0, "batches": 0, "sessions_sent": 0, "failures": 0, "timeouts": 0,
+                      "responses": 0, "fallbacks": 0}
+        self.latencies = deque(maxlen=4096) # Snapshot to model message, in seconds
+
+        self._coaches = {}
+        # Session id -> [coach, newest snapshot, first submit time]; a session is pending at most once
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="coach-dispatcher", daemon=True)
+        self._worker.start()
+
+    def register(self, session_id=None, telemetry=None):
+        """
+        A SessionCoach for a session (an id is made up if none is given). Usable as an InferencePool coach_factory.
+        """
+        with self._cond:
+            if session_id is None:
+                session_id = uuid.uuid4().hex[:12]
+            coach = self._coaches[session_id] = SessionCoach(self, session_id, telemetry)
+        return coach
+
+    def unregister(self, session_id):
+        with self._cond:
+            self._coaches.pop(session_id, None)
+            self._pending.pop(session_id, None)
+
+    def submit(self, coach, snapshot):
+        """
+        Queues a session's snapshot, replacing one of the same session that has not been sent yet.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            entry = self._pending.get(coach.session_id)
+            if entry is not None:
+                coach.stats["coalesced"] += 1
+                entry[1] = snapshot
+            else:
+                self._pending[coach.session_id] = [coach, snapshot, time.perf_counter()]
+            with coach._cond:
+                # The wait counts from the first snapshot, so a session stuck in the queue still gets its template
+                if coach._inflight is None:
+                    coach._inflight = [snapshot, time.perf_counter(), False]
+                else:
+                    coach._inflight[0] = snapshot
+            self._cond.notify()
+
+    def pending(self):
+        return len(self._pending)
+
+    def get_stats(self):
+        """
+        Dispatcher counters, sessions per call, feedback latency percentiles (ms) and the cache counters.
+        """
+        stats = dict(self.stats)
+        stats["sessions"] = len(self._coaches)
+        stats["pending"] = len(self._pending)
+        stats["sessions_per_batch"] = stats["sessions_sent"] / stats["batches"] if stats["batches"] else None
+        latencies = sorted(self.latencies)
+        for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95)):
+            stats[name] = latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1e3 if latencies else None
+        stats.update({f"cache_{name}": value for name, value in self.cache.stats.items()})
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify()
+
+    def build_prompt(self, batch):
+        """
+        One prompt for a batch of (coach, snapshot, submitted) entries: the instructions, then the session states.
+        """
+        sessions = []
+        for coach, snapshot, _ in batch:
+            state = {"id": coach.session_id, "exercise": snapshot["exercise"], "reps": snapshot["reps"],
+                     "form_warnings": snapshot["warnings"]}
+            # Per-rep statistics once there are some, the current angles before that
+            rep_summary = snapshot.get("rep_summary")
+            if rep_summary:
+                state["recent_reps"] = format_rep_summary(rep_summary)
+            else:
+                state["stage"] = snapshot["stage"]
+                state["angles"] = {label: int(value[0]) for label, value in snapshot["angles"].items()}
+            state["previous_feedback"] = coach.history[-2:]
+            state["style"] = random.choice(COACH_STYLES)
+            sessions.append(state)
+        return f"{BATCH_PROMPT}\n{SESSIONS_MARKER}\n{json.dumps(sessions)}"
+
+    def _wait(self, seconds):
+        """
+        Sleeps up to `seconds`, returning early (False) if the dispatcher is closed.
+        """
+        with self._cond:
+            return not self._cond.wait_for(lambda: self._closed, seconds)
+
+    def _wait_for_token(self):
+        while True:
+            wait = self.limiter.try_acquire()
+            if not wait:
+                return not self._closed
+            if not self._wait(wait):
+                return False
+
+    def _take_batch(self):
+        """
+        Removes up to max_batch pending sessions: those with form warnings first, then the longest waiting.
+        """
+        with self._cond:
+            order = sorted(self._pending.values(), key=lambda entry: (not entry[1]["warnings"], entry[2]))
+            batch = order[:self.max_batch]
+            for coach, _, _ in batch:
+                del self._pending[coach.session_id]
+        return batch
+
+    def _run(self):
+        """
+        Worker loop: gathers a batch, waits for the rate limiter and sends it; never touches the frame loops.
+        """
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                # Give other sessions a moment to join this batch
+                self._cond.wait_for(lambda: len(self._pending) >= self.max_batch or self._closed,
+                                    self.batch_window)
+            if not self._wait_for_token():
+                return
+            batch = self._take_batch()
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch):
+        prompt = self.build_prompt(batch)
+        messages, error = {}, None
+        for attempt in range(self.max_retries + 1):
+            if attempt and not (self._wait(self.backoff * 2 ** (attempt - 1)) and self._wait_for_token()):
+                return
+            self.stats["requests"] += 1
+            for coach, _, _ in batch:
+                coach.stats["requests"] += 1
+            start = time.perf_counter()
+            # One thread per attempt: a hung batch call must not hold up the next one, which serves every session
+            future = start_call(self.client.generate, prompt, name="coach-batch")
+            try:
+                messages = parse_messages(future.result(timeout=self.timeout))
+            except FutureTimeoutError:
+                self.stats["timeouts"] += 1
+                error = TimeoutError(f"no response within {self.timeout}s")
+                self.telemetry.record_error("coach_batch", error)
+                continue
+            except Exception as e:
+                self.stats["failures"] += 1
+                error = e
+                self.telemetry.record_error("coach_batch", e)
+                continue
+            self.telemetry.record("coach_batch", time.perf_counter() - start)
+            self.stats["batches"] += 1
+            self.stats["sessions_sent"] += len(batch)
+            error = None
+            break
+        if error is not None:
+            self.last_error = f"Error connecting to Coach: {str(error)}"
+
+        now = time.perf_counter()
+        for coach, snapshot, submitted in batch:
+            message = messages.get(coach.session_id)
+            with coach._cond:
+                inflight = coach._inflight
+                fallback_shown = bool(inflight and inflight[2])
+                # A newer snapshot of this session is already queued; it keeps its own wait
+                if inflight is not None and inflight[0] is snapshot:
+                    coach._inflight = None
+            if message:
+                latency = now - submitted
+                self.stats["responses"] += 1
+                self.latencies.append(latency)
+                self.telemetry.record("coach_feedback", latency)
+                coach.stats["responses"] += 1
+                coach.stats["last_latency"] = latency
+                coach.stats["total_latency"] += latency
+                self.cache.put(state_signature(snapshot), message)
+                coach.history.append(message)
+                coach._publish(message)
+            else:
+                # Failed batch, or the model skipped this session: keep the user coached with a local message
+                self.stats["fallbacks"] += 1
+                if error is not None:
+                    coach.last_error = self.last_error
+                if not fallback_shown:
+                    coach._publish_template(snapshot)
+
+class HttpModelClient:
+    """
+    Coach backend that POSTs {"prompt": ...} to a URL and returns the "text" of the JSON answer (FakeModelServer).
+    """
+    def __init__(self, url, timeout=30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt):
+        request = urllib.request.Request(self.url, data=json.dumps({"prompt": prompt}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)["text"]
+
+def fake_answer(prompt):
+    """
+    What FakeModelServer says: a JSON message per session for a batched prompt, one message otherwise.
+    """
+    sessions = batch_sessions(prompt)
+    if sessions is None:
+        return "Coach: nice work, keep it up!"
+    return json.dumps({state["id"]: f"Coach: {state['form_warnings'][0]}" if state["form_warnings"]
+                       else f"Coach: {state['reps']} reps, keep it up!" for state in sessions})
+
+class FakeModelServer:
+    """
+    Local HTTP stand-in for the model API, served from a background thread.
+        latency: seconds before every answer
+        quota_per_minute: answers 429 (like a rate limited API) once more calls than this arrived in the last minute
+        fail_first: number of initial calls answered with a 500
+    Every call is counted, for calls_per_minute() and stats().
+    """
+    def __init__(self, latency=0.0, quota_per_minute=None, fail_first=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.fail_first = fail_first
+        self.calls = [] # perf_counter time of every call
+        self.batches = [] # Session ids of every batched call, in order
+        self.rejected = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                prompt = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))["prompt"]
+                status = server._admit(prompt)
+                if status != 200:
+                    return self.reply(status, {"error": "Quota exceeded" if status == 429 else "Unavailable"})
+                time.sleep(server.latency)
+                self.reply(200, {"text": fake_answer(prompt)})
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-model", daemon=True)
+        self._thread.start()
+
+    def _admit(self, prompt):
+        now = time.perf_counter()
+        with self._lock:
+            recent = sum(1 for t in self.calls if now - t < 60)
+            if self.quota_per_minute is not None and recent >= self.quota_per_minute:
+                self.rejected += 1
+                return 429
+            self.calls.append(now)
+            sessions = batch_sessions(prompt)
+            self.batches.append([state["id"] for state in sessions] if sessions is not None else None)
+            return 500 if len(self.calls) <= self.fail_first else 200
+
+    def calls_per_minute(self):
+        """
+        Accepted calls per minute between the first and the last call (0 with fewer than two calls).
+        """
+        with self._lock:
+            if len(self.calls) < 2:
+                return 0.0
+            return (len(self.calls) - 1) / (self.calls[-1] - self.calls[0]) * 60
+
+    def stats(self):
+        sizes = [len(batch) for batch in self.batches if batch is not None]
+        return {"calls": len(self.calls), "rejected": self.rejected, "calls_per_minute": self.calls_per_minute(),
+                "sessions_per_call": sum(sizes) / len(sizes) if sizes else None}
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,275 @@
+"""
+Automatic exercise recognition from a rolling window of joint angles.
+
+Every frame already yields the angles of every exercise definition (rule_engine.RuleEngine). A RollingWindow
+keeps running sums over the last `window` frames of those angles, so the mean, standard deviation and mean
+frame-to-frame change of each angle cost the same to update whatever the window length. Every few frames a
+nearest-centroid model classifies that feature vector, and the recognizer switches exercise only after the
+same answer comes back several times in a row.
+
+AutoExercise puts this behind the usual Exercise interface: one RuleEngine counts reps for every definition
+in parallel and the recognizer chooses whose metrics are reported, so reps done before the exercise was
+recognized still count. Train a model on recorded tracks with train_recognizer.py.
+"""
+import json
+
+import numpy as np
+
+from exercises import Exercise
+from rule_engine import RuleEngine, follow_engine_sides, load_definitions
+
+class RollingWindow:
+    """
+    Mean, standard deviation and mean absolute change of every column over the last `size` rows pushed.
+    push() adds the new row to running sums and subtracts the one that leaves the ring buffer; the sums
+    are recomputed from the buffer once per lap so floating point drift cannot build up.
+    """
+    def __init__(self, columns, size=60):
+        self.size = size
+        self.entries = np.zeros((size, 3, columns)) # Per row: value, value squared, |change from previous row|
+        self.sums = np.zeros((3, columns))
+        self.previous = np.zeros(columns)
+        self.count = 0
+
+    def push(self, row):
+        slot = self.count % self.size
+        entry = self.entries[slot]
+        if self.count >= self.size:
+            self.sums -= entry
+        entry[0] = row
+        np.multiply(entry[0], entry[0], out=entry[1])
+        if self.count:
+            np.subtract(entry[0], self.previous, out=entry[2])
+            np.abs(entry[2], out=entry[2])
+        else:
+            entry[2] = 0
+        self.previous[:] = entry[0]
+        self.count += 1
+        if slot == self.size - 1:
+            self.entries.sum(axis=0, out=self.sums)
+        else:
+            self.sums += entry
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    def features(self):
+        """
+        [mean..., std..., mean |change|...] over the rows currently in the window.
+        """
+        rows = min(self.count, self.size) or 1
+        mean, squares, change = self.sums / rows
+        std = np.sqrt(np.maximum(squares - mean * mean, 0))
+        return np.concatenate([mean, std, change])
+
+    def reset(self):
+        self.sums[:] = 0
+        self.count = 0
+
+def detected_angles(engine, landmarks):
+    """
+    (T, A) angles of every detected frame of a (frames, 33, 4) recording (NaN rows = nobody detected).
+    """
+    landmarks = np.asarray(landmarks)
+    detected = ~np.isnan(landmarks[:, 0, 0])
+    return engine.compute_angles(landmarks[detected])[0]
+
+def window_features(angles, window, stride=1):
+    """
+    Features of every full window of a (T, A) angle sequence, one row per `stride` frames.
+    Computed with the same RollingWindow as the live recognizer, so training and inference agree exactly.
+    """
+    rolling = RollingWindow(angles.shape[1], window)
+    rows = []
+    for index, row in enumerate(angles):
+        rolling.push(row)
+        if rolling.full and (index - window + 1) % stride == 0:
+            rows.append(rolling.features())
+    return np.array(rows).reshape(-1, 3 * angles.shape[1])
+
+class RecognizerModel:
+    """
+    Nearest-centroid classifier over standardized window features.
+    Windows whose angles all vary by less than `min_std` degrees are idle (no exercise), and windows
+    further from the nearest centroid than `margin` times that class's 95th percentile training distance
+    are unknown; predict() returns None for both.
+    """
+    def __init__(self, classes, centroids, mean, scale, radius, definitions, window=60, min_std=10.0, margin=2.0):
+        self.classes = list(classes)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.radius = np.asarray(radius, dtype=np.float64)
+        self.definitions = definitions
+        self.window = int(window)
+        self.min_std = float(min_std)
+        self.margin = float(margin)
+        self.columns = len(self.mean) // 3
+
+    @classmethod
+    def fit(cls, sequences, labels, definitions=None, window=60, stride=5, **options):
+        """
+        Trains on (frames, 33, 4) landmark sequences, one exercise name per sequence.
+        """
+        definitions = definitions if definitions is not None else load_definitions()
+        engine = RuleEngine(definitions)
+        features, targets = [], []
+        for landmarks, label in zip(sequences, labels):
+            rows = window_features(detected_angles(engine, landmarks), window, stride)
+            features.append(rows)
+            targets.extend([label] * len(rows))
+        features = np.concatenate(features)
+        targets = np.array(targets)
+        if not len(features):
+            raise ValueError(f"No sequence is longer than the {window} frame window")
+
+        classes = sorted(set(targets.tolist()))
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0) + 1e-6
+        standardized = (features - mean) / scale
+        centroids, radius = [], []
+        for name in classes:
+            members = standardized[targets == name]
+            centroid = members.mean(axis=0)
+            centroids.append(centroid)
+            radius.append(np.percentile(np.linalg.norm(members - centroid, axis=1), 95) + 1e-6)
+        return cls(classes, centroids, mean, scale, radius, definitions, window, **options)
+
+    def distances(self, features):
+        standardized = (features - self.mean) / self.scale
+        return np.sqrt(((self.centroids - standardized) ** 2).sum(axis=-1))
+
+    def predict(self, features):
+        """
+        Exercise name for one feature vector, or None when idle or unlike every trained exercise.
+        """
+        if features[self.columns:2 * self.columns].max() < self.min_std:
+            return None
+        distances = self.distances(features)
+        best = int(np.argmin(distances))
+        if distances[best] > self.margin * self.radius[best]:
+            return None
+        return self.classes[best]
+
+    def save(self, path):
+        np.savez(path, classes=np.array(self.classes), centroids=self.centroids, mean=self.mean, scale=self.scale,
+                 radius=self.radius, definitions=np.array(json.dumps(self.definitions)), window=self.window,
+                 min_std=self.min_std, margin=self.margin)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["classes"].tolist(), data["centroids"], data["mean"], data["scale"], data["radius"],
+                       json.loads(str(data["definitions"])), int(data["window"]), float(data["min_std"]),
+                       float(data["margin"]))
+
+class ExerciseRecognizer:
+    """
+    Online recognizer: update(angles) once per detected frame, returns the active exercise name (or None).
+    The model runs every `classify_every` frames once half a window has been seen; a new exercise becomes
+    active after `switch_after` consecutive agreeing answers. Idle or unknown windows never clear the active
+    exercise, so it stays put while resting between sets.
+    """
+    def __init__(self, model, classify_every=5, switch_after=3):
+        self.model = model
+        self.classify_every = classify_every
+        self.switch_after = switch_after
+        self.window = RollingWindow(model.columns, model.window)
+        self.reset()
+
+    def reset(self):
+        self.window.reset()
+        self.active = None
+        self.candidate = None
+        self.streak = 0
+
+    def update(self, angles):
+        self.window.push(angles)
+        if self.window.count % self.classify_every or self.window.count < self.model.window // 2:
+            return self.active
+        candidate = self.model.predict(self.window.features())
+        self.streak = self.streak + 1 if candidate == self.candidate else 1
+        self.candidate = candidate
+        if candidate is not None and self.streak >= self.switch_after:
+            self.active = candidate
+        return self.active
+
+class AutoExercise(Exercise):
+    """
+    Exercise that recognizes what is being done. Reports the metrics of the active exercise, under its name,
+    plus metrics["exercise"]; until something is recognized there are no reps, stage or angles.
+    hysteresis: default {"margin", "frames", "band"} for the transitions and form rules of every definition
+    """
+    IDLE_NAME = "Detecting exercise..."
+
+    def __init__(self, model, hysteresis=None, **recognizer_options):
+        super().__init__(self.IDLE_NAME)
+        self.engine = RuleEngine(model.definitions, hysteresis)
+        follow_engine_sides(self, self.engine)
+        self.recognizer = ExerciseRecognizer(model, **recognizer_options)
+        self.active = None
+
+    def process(self, pose):
+        pose = self.as_pose_array(pose)
+        sides = self.visible_sides(pose)
+        if not sides:
+            # Not seen well enough: neither counted nor shown to the recognizer
+            self.form_warnings, self.angles = [], {}
+            return self.angles, None
+        self.side = sides[0]
+        self.engine.process(pose, self.side)
+        self.active = self.recognizer.update(self.engine.angles)
+        if self.active is None:
+            return self.angles, None
+        metrics = self.engine.metrics(self.active)
+        self.name = self.active
+        self.counter = metrics["reps"]
+        self.stage = metrics["stage"]
+        self.form_warnings = metrics["warnings"]
+        self.angles = metrics["angles"]
+        first = next(iter(self.angles.values()), (None, None))
+        return self.angles, first[1]
+
+    def get_metrics(self):
+        metrics = super().get_metrics()
+        metrics["exercise"] = self.active
+        return metrics
+
+    def reset(self):
+        super().reset()
+        self.engine.reset()
+        self.recognizer.reset()
+        self.active = None
+        self.name = self.IDLE_NAME
+
+def evaluate(model, sequences, labels, **recognizer_options):
+    """
+    Scores a model on labelled (frames, 33, 4) sequences.
+    Returns window accuracy, a confusion matrix {true: {predicted: windows}} (None = idle/unknown), and for the
+    online recognizer started fresh on each sequence: frames until the right exercise became active (None if
+    never) and the fraction of frames after that on which it stayed active.
+    """
+    engine = RuleEngine(model.definitions)
+    confusion = {}
+    correct = total = 0
+    sequence_results = []
+    for landmarks, label in zip(sequences, labels):
+        angles = detected_angles(engine, landmarks)
+        row = confusion.setdefault(label, {})
+        for features in window_features(angles, model.window, stride=5):
+            predicted = model.predict(features)
+            row[predicted] = row.get(predicted, 0) + 1
+            correct += predicted == label
+            total += 1
+
+        recognizer = ExerciseRecognizer(model, **recognizer_options)
+        active = np.array([recognizer.update(frame) == label for frame in angles], dtype=bool)
+        first = int(np.argmax(active)) if active.any() else None
+        sequence_results.append({
+            "label": label,
+            "frames_to_recognize": first,
+            "held_fraction": float(active[first:].mean()) if first is not None else 0.0,
+        })
+    return {"window_accuracy": correct / total if total else 0.0, "confusion": confusion,
+            "sequences": sequence_results}
@@ -1,277 +1,412 @@
 import numpy as np
-import mediapipe as mp
-from utils import calculate_angle
+from landmarks import (NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, LEFT_HIP, LEFT_ANKLE, MIRROR,
+                       NUM_LANDMARKS, VISIBILITY, landmarks_to_array)
+from utils import calculate_angles
+
+SIDES = ("left", "right")
 
 class Exercise:
-    def __init__(self, name):
+    # Landmark index triplets [a, b, c] (angle at b) for every angle the exercise needs, on the left side.
+    # The mirrored triplets give the right side; both sides are computed with a single calculate_angles call.
+    TRIPLETS = np.empty((0, 3), dtype=np.intp)
+    # Exercises that look at both sides of the body at once (e.g. the head between the shoulders) set this to
+    # False and list the landmarks that have to be visible
+    BILATERAL = True
+    LANDMARKS = None
+
+    def __init__(self, name, side="auto", min_visibility=0.5, per_side=False, side_margin=0.1, hysteresis=None):
+        """
+        side: "auto" follows the better visible side (switching only when the other one is more visible by
+              side_margin), or "left"/"right" to always use that side
+        min_visibility: frames where the side's landmarks are less visible than this (mean MediaPipe visibility)
+                        are skipped: nothing is counted and no warning is raised
+        per_side: count each visible side separately (alternating movements); counter is the total, and
+                  angle labels are prefixed with "Left"/"Right"
+        hysteresis: {"margin", "frames", "band"} as in rule_engine.py, for every stage transition (see reached())
+                    and form check (see check_form()); {stage: {"margin", "frames"}} overrides one transition.
+                    The default (no hysteresis) reacts to the raw threshold on every frame.
+        """
+        if side not in ("auto",) + SIDES:
+            raise ValueError(f"Unknown side {side!r}, expected 'auto', 'left' or 'right'")
         self.name = name
         self.counter = 0
         self.stage = None
         self.form_warnings = []
         self.angles = {} # Dictionary {label: (value, position)}
+        self.fixed_side = None if side == "auto" else SIDES.index(side)
+        self.min_visibility = min_visibility
+        self.per_side = per_side and self.BILATERAL
+        self.side_margin = side_margin
+        self.side = None # Index into SIDES of the side evaluated last (None until a side was visible)
+        self.visible = True
+        self.skipped_frames = 0
+        self.side_counters = [0, 0]
+        self.side_stages = [None, None]
+        self.hysteresis = {"margin": 0.0, "frames": 1, "band": 0.0}
+        self.hysteresis.update(hysteresis or {})
+        self._runs = {} # (side, stage or message) -> consecutive frames its condition has held
+        self._warned = set() # (side, message) of the form warnings raised on the last evaluated frame
+        sides = (self.TRIPLETS, MIRROR[self.TRIPLETS]) if self.BILATERAL else (self.TRIPLETS,)
+        self.side_triplets = np.stack(sides)
+        landmarks = np.unique(self.TRIPLETS) if self.LANDMARKS is None else np.array(self.LANDMARKS, dtype=np.intp)
+        # Mean visibility of each side's landmarks is one matrix-vector product
+        self.visibility_weights = np.zeros((len(sides), NUM_LANDMARKS), dtype=np.float32)
+        for row, indices in enumerate([landmarks, MIRROR[landmarks]][:len(sides)]):
+            self.visibility_weights[row, indices] = 1.0 / max(len(indices), 1)
 
-    def process(self, landmarks):
+    def process(self, pose):
         """
         Process landmarks to count reps and check form.
-        Should be implemented by subclasses.
+        pose: (33, 4) array of (x, y, z, visibility) from PoseEngine.process_frame.
+              A list of MediaPipe landmarks is also accepted (see as_pose_array).
+        The angles of both sides are computed in one pass; the side(s) to evaluate are chosen from their
+        visibility, and evaluate() runs the exercise logic on them. Frames where no side is visible enough
+        leave the count and stage as they were, with no angles (visible is False).
         Returns:
             angles: dict of {label: (value, position)}
-            keypoint: main keypoint for visualization (deprecated, use angles dict)
+            keypoint: main keypoint for visualization (deprecated, use angles dict), None on skipped frames
+        """
+        pose = self.as_pose_array(pose)
+        self.form_warnings = []
+        self.angles = {}
+        side_angles = calculate_angles(pose[self.side_triplets, :2]) if len(self.TRIPLETS) else [()]
+        sides = self.visible_sides(pose)
+        if not sides:
+            return self.angles, None
+        if not self.per_side:
+            self.side = sides[0]
+            return self.evaluate(pose, side_angles[self.side])
+
+        # Each side keeps its own stage and count; the exercise logic runs once per side on its state
+        total, angles, warnings, keypoint = self.counter, {}, [], None
+        for side in sides:
+            self.side = side
+            self.stage, self.counter = self.side_stages[side], self.side_counters[side]
+            self.angles, self.form_warnings = {}, []
+            _, point = self.evaluate(pose, side_angles[side])
+            keypoint = keypoint or point
+            total += self.counter - self.side_counters[side]
+            self.side_stages[side], self.side_counters[side] = self.stage, self.counter
+            angles.update((f"{SIDES[side].title()} {label}", value) for label, value in self.angles.items())
+            warnings += [message for message in self.form_warnings if message not in warnings]
+        self.counter, self.angles, self.form_warnings = total, angles, warnings
+        return self.angles, keypoint
+
+    def visible_sides(self, pose):
+        """
+        choose_sides() on the pose's landmark visibility. Sets visible and counts the frame as skipped if no side is.
+        """
+        sides = self.choose_sides((self.visibility_weights @ pose[:, VISIBILITY]).tolist())
+        self.visible = bool(sides)
+        if not sides:
+            self.skipped_frames += 1
+        return sides
+
+    def choose_sides(self, visibility):
+        """
+        Indices of the sides to evaluate this frame, given each side's mean landmark visibility (a list).
+        """
+        threshold = self.min_visibility
+        if self.per_side:
+            return [side for side, value in enumerate(visibility) if value >= threshold]
+        if self.fixed_side is not None:
+            return [self.fixed_side] if visibility[self.fixed_side] >= threshold else []
+        best = visibility.index(max(visibility))
+        # Stay on the current side unless the other one is clearly better, so a rep is not split across sides
+        if self.side is not None and visibility[self.side] >= visibility[best] - self.side_margin:
+            best = self.side
+        return [best] if visibility[best] >= threshold else []
+
+    def evaluate(self, pose, angles):
+        """
+        The exercise logic for one side: updates stage, counter, form_warnings and angles.
+        Should be implemented by subclasses.
+        angles: the side's angles, in TRIPLETS order
+        Left-side landmark indices are passed through landmark()/point(), which map them to the side evaluated.
+        Returns (angles, keypoint) like process().
         """
         raise NotImplementedError
 
+    def _run(self, key, holds):
+        run = self._runs[key] = self._runs.get(key, 0) + 1 if holds else 0
+        return run
+
+    def reached(self, stage, angle, above=None, below=None, at_most=None):
+        """
+        Stage transition test: True once the angle has been above `above` (below `below`, at most `at_most`)
+        by the stage's hysteresis margin for its number of frames in a row. Call it on every evaluated frame,
+        before checking the current stage, so the run of frames stays current.
+        """
+        options = {**self.hysteresis, **self.hysteresis.get(stage, {})}
+        margin = options["margin"]
+        if above is not None:
+            holds = angle > above + margin
+        elif below is not None:
+            holds = angle < below - margin
+        else:
+            holds = angle <= at_most - margin
+        return self._run((self.side, stage), holds) >= options["frames"]
+
+    def check_form(self, message, angle, above=None, below=None, outside=None):
+        """
+        Form rule: adds message to form_warnings once the angle has been above `above` (below `below`, outside
+        the (lo, hi) range `outside`) for the hysteresis frames in a row, and keeps it until the angle is back past
+        the threshold by the hysteresis band.
+        """
+        band = self.hysteresis["band"]
+        if above is not None:
+            holds, held = angle > above, angle > above - band
+        elif below is not None:
+            holds, held = angle < below, angle < below + band
+        else:
+            lo, hi = outside
+            holds, held = angle < lo or angle > hi, angle < lo + band or angle > hi - band
+        key = (self.side, message)
+        raised = self._run(key, holds) >= self.hysteresis["frames"] or (key in self._warned and held)
+        if raised:
+            self._warned.add(key)
+            self.form_warnings.append(message)
+        else:
+            self._warned.discard(key)
+        return raised
+
+    @staticmethod
+    def as_pose_array(pose):
+        """
+        Returns pose as a (33, 4) array, converting a list of landmarks if needed.
+        """
+        if pose is None:
+            raise ValueError("No pose landmarks detected")
+        if isinstance(pose, np.ndarray):
+            return pose
+        return landmarks_to_array(pose)
+
+    def landmark(self, index):
+        """
+        The index of a left-side landmark on the side being evaluated.
+        """
+        return int(MIRROR[index]) if self.side == 1 else index
+
+    def point(self, pose, index):
+        """
+        Returns the [x, y] position of a (left-side) landmark on the side being evaluated as a plain list
+        (safe to keep after the pose buffer is reused).
+        """
+        return pose[self.landmark(index), :2].tolist()
+
+    def compute_angles(self, pose):
+        """
+        Computes every angle in TRIPLETS, on the side evaluated last (left before any), in one vectorized pass.
+        """
+        return calculate_angles(pose[self.side_triplets[self.side or 0], :2])
+
     def get_metrics(self):
-        return {
+        metrics = {
             "reps": self.counter,
             "stage": self.stage,
             "warnings": self.form_warnings,
-            "angles": self.angles
+            "angles": self.angles,
+            "side": SIDES[self.side] if self.BILATERAL and self.side is not None else None,
+            "visible": self.visible,
         }
+        if self.per_side:
+            metrics["side_reps"] = dict(zip(SIDES, self.side_counters))
+        return metrics
     
     def reset(self):
         self.counter = 0
         self.stage = None
         self.form_warnings = []
         self.angles = {}
+        self.side = None
+        self.visible = True
+        self.side_counters = [0, 0]
+        self.side_stages = [None, None]
+        self._runs = {}
+        self._warned = set()
 
 class BicepCurl(Exercise):
-    def __init__(self):
-        super().__init__("Bicep Curl")
+    # Curl (Shoulder-Elbow-Wrist), Swing (Elbow-Shoulder-Hip)
+    TRIPLETS = np.array([[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST],
+                         [LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP]])
 
-    def process(self, landmarks):
-        self.form_warnings = []
-        self.angles = {}
-        
-        # Get coordinates
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                    landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        elbow = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].y]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].y]
-        hip = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].x,
-               landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].y]
-        
-        # Main Curl Angle
-        curl_angle = calculate_angle(shoulder, elbow, wrist)
-        self.angles["Curl"] = (curl_angle, elbow)
-        
+    def __init__(self, **options):
+        super().__init__("Bicep Curl", **options)
+
+    def evaluate(self, pose, angles):
+        # Main Curl Angle (Shoulder-Elbow-Wrist)
         # Body Sway Angle (Shoulder-Hip-Vertical or similar, simplified to Shoulder-Hip-Knee if visible, or just check if elbow moves too much)
         # Here we check Elbow-Shoulder-Hip to see if elbow is swinging forward
-        swing_angle = calculate_angle(elbow, shoulder, hip)
-        self.angles["Swing"] = (swing_angle, shoulder)
+        curl_angle, swing_angle = angles
+        elbow = self.point(pose, LEFT_ELBOW)
+        self.angles["Curl"] = (curl_angle, elbow)
+        self.angles["Swing"] = (swing_angle, self.point(pose, LEFT_SHOULDER))
 
         # Curl logic
-        if curl_angle > 160:
+        if self.reached("down", curl_angle, above=160):
             self.stage = "down"
-        if curl_angle < 30 and self.stage == 'down':
+        if self.reached("up", curl_angle, below=30) and self.stage == 'down':
             self.stage = "up"
             self.counter += 1
             
         # Form checks
-        if swing_angle < 10: # Elbow moving too far back/forward relative to body
-             self.form_warnings.append("Keep your elbow fixed at your side!")
+        # Elbow moving too far back/forward relative to body
+        self.check_form("Keep your elbow fixed at your side!", swing_angle, below=10)
             
         return self.angles, elbow
 
 class PushUp(Exercise):
-    def __init__(self):
-        super().__init__("Push Up")
-        
-    def process(self, landmarks):
-        self.form_warnings = []
-        self.angles = {}
-        
-        # Get coordinates
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                    landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        elbow = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].y]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].y]
-        hip = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].x,
-               landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].y]
-        ankle = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_ANKLE.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_ANKLE.value].y]
+    # Elbow (Shoulder-Elbow-Wrist), Body (Shoulder-Hip-Ankle)
+    TRIPLETS = np.array([[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST],
+                         [LEFT_SHOULDER, LEFT_HIP, LEFT_ANKLE]])
+
+    def __init__(self, **options):
+        super().__init__("Push Up", **options)
         
-        # Elbow Angle
-        elbow_angle = calculate_angle(shoulder, elbow, wrist)
+    def evaluate(self, pose, angles):
+        # Elbow Angle + Body Alignment
+        elbow_angle, body_angle = angles
+        elbow = self.point(pose, LEFT_ELBOW)
         self.angles["Elbow"] = (elbow_angle, elbow)
-        
-        # Body Alignment
-        body_angle = calculate_angle(shoulder, hip, ankle)
-        self.angles["Body"] = (body_angle, hip)
+        self.angles["Body"] = (body_angle, self.point(pose, LEFT_HIP))
 
         # Pushup logic
-        if elbow_angle > 160:
+        if self.reached("up", elbow_angle, above=160):
             self.stage = "up"
-        if elbow_angle < 90 and self.stage == 'up':
+        if self.reached("down", elbow_angle, below=90) and self.stage == 'up':
             self.stage = "down"
             self.counter += 1
             
         # Form check
-        if body_angle < 160:
-             self.form_warnings.append("Keep your back straight!")
+        self.check_form("Keep your back straight!", body_angle, below=160)
              
         return self.angles, elbow
 
 class ShoulderPress(Exercise):
-    def __init__(self):
-        super().__init__("Shoulder Press")
+    # Press (Shoulder-Elbow-Wrist), Flare (Elbow-Shoulder-Hip)
+    TRIPLETS = np.array([[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST],
+                         [LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP]])
 
-    def process(self, landmarks):
-        self.form_warnings = []
-        self.angles = {}
-        
-        # Get coordinates
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                    landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        elbow = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].y]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].y]
-        hip = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].x,
-               landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].y]
-        
+    def __init__(self, **options):
+        super().__init__("Shoulder Press", **options)
+
+    def evaluate(self, pose, angles):
         # Press Angle
-        press_angle = calculate_angle(shoulder, elbow, wrist)
-        self.angles["Press"] = (press_angle, elbow)
-        
         # Elbow Flare (Elbow-Shoulder-Hip) - should be around 90 or slightly less, not too high/low
-        flare_angle = calculate_angle(elbow, shoulder, hip)
-        self.angles["Flare"] = (flare_angle, shoulder)
+        press_angle, flare_angle = angles
+        elbow = self.point(pose, LEFT_ELBOW)
+        self.angles["Press"] = (press_angle, elbow)
+        self.angles["Flare"] = (flare_angle, self.point(pose, LEFT_SHOULDER))
         
         # Press logic
-        if press_angle < 70:
+        if self.reached("down", press_angle, below=70):
             self.stage = "down"
-        if press_angle > 160 and self.stage == 'down':
+        if self.reached("up", press_angle, above=160) and self.stage == 'down':
             self.stage = "up"
             self.counter += 1
             
         return self.angles, elbow
 
 class FrontRaise(Exercise):
-    def __init__(self):
-        super().__init__("Front Raise")
+    # Raise (Hip-Shoulder-Wrist)
+    TRIPLETS = np.array([[LEFT_HIP, LEFT_SHOULDER, LEFT_WRIST]])
 
-    def process(self, landmarks):
-        self.form_warnings = []
-        self.angles = {}
-        
-        # Get coordinates
-        hip = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].x,
-               landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].y]
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                    landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].y]
-        
+    def __init__(self, **options):
+        super().__init__("Front Raise", **options)
+
+    def evaluate(self, pose, angles):
         # Raise Angle
-        raise_angle = calculate_angle(hip, shoulder, wrist)
+        raise_angle, = angles
+        shoulder = self.point(pose, LEFT_SHOULDER)
         self.angles["Raise"] = (raise_angle, shoulder)
         
         # Raise logic
-        if raise_angle < 20:
+        if self.reached("down", raise_angle, below=20):
             self.stage = "down"
-        if raise_angle > 80 and self.stage == 'down':
+        if self.reached("up", raise_angle, above=80) and self.stage == 'down':
             self.stage = "up"
             self.counter += 1
             
         # Form: Don't go too high
-        if raise_angle > 100:
-            self.form_warnings.append("Don't raise above shoulder level!")
+        self.check_form("Don't raise above shoulder level!", raise_angle, above=100)
             
         return self.angles, shoulder
 
 class ShoulderRotation(Exercise):
-    def __init__(self):
-        super().__init__("Shoulder Rotation")
-        
-    def process(self, landmarks):
-        self.form_warnings = []
-        self.angles = {}
+    # Elbow Flex (Shoulder-Elbow-Wrist), Rotation (Wrist-Elbow-Hip)
+    TRIPLETS = np.array([[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST],
+                         [LEFT_WRIST, LEFT_ELBOW, LEFT_HIP]])
+
+    def __init__(self, **options):
+        super().__init__("Shoulder Rotation", **options)
         
+    def evaluate(self, pose, angles):
         # External/Internal Rotation
         # Best viewed from front/side with elbow at 90 degrees
         # Points: Wrist, Elbow, Hip (or Shoulder if arm is abducted)
         
-        shoulder = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                    landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        elbow = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value].y]
-        wrist = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].x,
-                 landmarks[mp.solutions.pose.PoseLandmark.LEFT_WRIST.value].y]
-        hip = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].x,
-               landmarks[mp.solutions.pose.PoseLandmark.LEFT_HIP.value].y]
-        
         # 1. Elbow Flexion (should be ~90)
-        elbow_flexion = calculate_angle(shoulder, elbow, wrist)
-        self.angles["Elbow Flex"] = (elbow_flexion, elbow)
-        
         # 2. Rotation Angle (Wrist-Elbow-Hip) - Approximate for 2D
         # If elbow is pinned to side:
         # 0 deg = hand at belly (Internal)
         # 90 deg = hand straight forward (Neutral)
         # 180 deg = hand out to side (External)
-        rotation_angle = calculate_angle(wrist, elbow, hip)
-        self.angles["Rotation"] = (rotation_angle, wrist)
+        elbow_flexion, rotation_angle = angles
+        elbow = self.point(pose, LEFT_ELBOW)
+        self.angles["Elbow Flex"] = (elbow_flexion, elbow)
+        self.angles["Rotation"] = (rotation_angle, self.point(pose, LEFT_WRIST))
         
         # Logic
         # Assume starting neutral/internal and rotating out
-        if rotation_angle < 45:
+        if self.reached("in", rotation_angle, below=45):
             self.stage = "in"
-        if rotation_angle > 80 and self.stage == "in":
+        if self.reached("out", rotation_angle, above=80) and self.stage == "in":
             self.stage = "out"
             self.counter += 1
             
-        if elbow_flexion > 110 or elbow_flexion < 70:
-            self.form_warnings.append("Keep elbow bent at 90 degrees")
+        self.check_form("Keep elbow bent at 90 degrees", elbow_flexion, outside=(70, 110))
             
         return self.angles, elbow
 
 class NeckRotation(Exercise):
-    def __init__(self):
-        super().__init__("Neck Rotation")
-        
-    def process(self, landmarks):
-        self.form_warnings = []
-        self.angles = {}
+    # The head is judged between both shoulders, so there is no side to choose
+    BILATERAL = False
+    LANDMARKS = [NOSE, LEFT_SHOULDER, RIGHT_SHOULDER]
+
+    def __init__(self, **options):
+        super().__init__("Neck Rotation", **options)
         
+    def evaluate(self, pose, angles):
         # Neck Rotation (Side to Side)
         # Using Nose and Shoulders
-        nose = [landmarks[mp.solutions.pose.PoseLandmark.NOSE.value].x,
-                landmarks[mp.solutions.pose.PoseLandmark.NOSE.value].y]
-        l_shoulder = [landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                      landmarks[mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        r_shoulder = [landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                      landmarks[mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value].y]
-        
-        # Calculate angle between Nose and Left Shoulder
-        l_angle = calculate_angle(r_shoulder, l_shoulder, nose) # Angle at L shoulder? No.
+        nose = pose[NOSE, :2]
+        l_shoulder = pose[LEFT_SHOULDER, :2]
+        r_shoulder = pose[RIGHT_SHOULDER, :2]
         
+        # Angle at L shoulder (R shoulder - L shoulder - Nose) was unused, so it is not computed.
         # Better: Angle of Nose relative to the Shoulder line center?
         # Let's use Nose-Shoulder-Shoulder angle?
         # Or simply Nose x-position relative to shoulders.
         
         # Let's try Angle: Nose - MidShoulder - Vertical?
         # MidShoulder
-        mid_shoulder = [(l_shoulder[0] + r_shoulder[0])/2, (l_shoulder[1] + r_shoulder[1])/2]
+        mid_shoulder = (l_shoulder + r_shoulder) / 2
         
         # Angle between Nose, MidShoulder, and a point directly above MidShoulder (Vertical)
-        vertical_point = [mid_shoulder[0], mid_shoulder[1] - 0.5]
+        vertical_point = mid_shoulder - np.array([0, 0.5], dtype=np.float32)
         
-        neck_tilt = calculate_angle(nose, mid_shoulder, vertical_point)
-        self.angles["Neck Tilt"] = (neck_tilt, nose)
+        neck_tilt, = calculate_angles(np.stack([nose, mid_shoulder, vertical_point])[None])
+        self.angles["Neck Tilt"] = (neck_tilt, nose.tolist())
         
         # Logic: Looking Left/Right
         # In 2D, rotation looks like the nose moving towards a shoulder.
         # We can check the distance or angle to each shoulder.
         
-        dist_l = np.linalg.norm(np.array(nose) - np.array(l_shoulder))
-        dist_r = np.linalg.norm(np.array(nose) - np.array(r_shoulder))
+        dist_l = np.linalg.norm(nose - l_shoulder)
+        dist_r = np.linalg.norm(nose - r_shoulder)
         
         # Normalize by shoulder width
-        shoulder_width = np.linalg.norm(np.array(l_shoulder) - np.array(r_shoulder))
+        shoulder_width = np.linalg.norm(l_shoulder - r_shoulder)
         
         # Heuristic
         if dist_l < shoulder_width * 0.4:
@@ -291,11 +426,22 @@ class NeckRotation(Exercise):
         
         # Let's go with: Tilt > 30 deg is a "rep" if we alternate.
         # Simplified: Just count tilts.
-        if neck_tilt > 20:
+        turned, center = self.reached("turned", neck_tilt, above=20), self.reached("center", neck_tilt, at_most=20)
+        if turned:
              if self.stage == "center":
                  self.stage = "turned"
                  self.counter += 1
-        else:
+        elif center:
              self.stage = "center"
 
-        return self.angles, nose
+        return self.angles, self.angles["Neck Tilt"][1]
+
+# Display name -> Exercise class, in the order shown in the app
+EXERCISES = {
+    "Bicep Curl": BicepCurl,
+    "Push Up": PushUp,
+    "Shoulder Press": ShoulderPress,
+    "Front Raise": FrontRaise,
+    "Shoulder Rotation": ShoulderRotation,
+    "Neck Rotation": NeckRotation,
+}
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def state_signature(snapshot, angle_bucket=15, tempo_bucket=0.5):
+    """
+    Quantized key for a coach state snapshot: exercise, stage, warning set and angle buckets, or with a
+    rep summary, tempo and range of motion buckets of the recent reps instead of stage and angles.
+    Reps are left out on purpose; states that only differ by a rep get the same feedback.
+    """
+    rep_summary = snapshot.get("rep_summary")
+    if rep_summary:
+        state = ["reps", int(rep_summary["avg_concentric"] // tempo_bucket),
+                 int(rep_summary["avg_eccentric"] // tempo_bucket), int(rep_summary["avg_range"] // angle_bucket),
+                 rep_summary["range_change"] <= -angle_bucket, rep_summary["warned_reps"] > 0]
+    else:
+        state = [snapshot["stage"], sorted((label, int(value[0] // angle_bucket))
+                                           for label, value in snapshot["angles"].items())]
+    return json.dumps([
+        snapshot["exercise"],
+        sorted(set(snapshot["warnings"])),
+        state,
+    ])
+
+# Deterministic fallback messages, picked by rep count so they rotate without any randomness
+MOTIVATION_TEMPLATES = [
+    "Rep {reps} done, keep that pace!",
+    "Nice and controlled, that's {reps}!",
+    "{reps} reps in, stay strong!",
+    "Great work, {reps} and counting!",
+]
+
+def template_feedback(snapshot):
+    """
+    Instant local feedback used when the cache misses and the API is slow, failing or not configured.
+    """
+    warnings = snapshot["warnings"]
+    if warnings:
+        return f"Form check: {warnings[0]}"
+    reps = snapshot["reps"]
+    rep_summary = snapshot.get("rep_summary")
+    if rep_summary:
+        if rep_summary["range_change"] <= -15:
+            return f"Rep {reps}: your range is getting shorter, go all the way."
+        if rep_summary["last"]["eccentric"] < 0.5:
+            return f"Rep {reps}: slow down on the way back, control it."
+    if reps:
+        return MOTIVATION_TEMPLATES[reps % len(MOTIVATION_TEMPLATES)].format(reps=reps)
+    if snapshot["angles"]:
+        label, (value, _) = next(iter(snapshot["angles"].items()))
+        return f"{snapshot['exercise']}: {label} at {int(value)}°, start your first rep when ready."
+    return f"Get into position for {snapshot['exercise']}."
+
+class FeedbackCache:
+    """
+    Thread-safe LRU cache of coach messages keyed by state_signature, with a TTL and a size bound.
+    If path is given, entries are loaded from and saved to that JSON file so they survive restarts: every
+    save_every puts and on close(). A missing, corrupt or old-format file starts an empty cache (last_error says why).
+    """
+    def __init__(self, max_size=512, ttl=600, path=None, save_every=20):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.save_every = save_every
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict() # key -> (stored_at, message)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock() # One writer of the file at a time
+        self._unsaved = 0
+        self.last_error = None
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, message):
+        with self._lock:
+            self._entries[key] = (time.time(), message)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._unsaved += 1
+            autosave = self.path and self._unsaved >= self.save_every
+        if autosave:
+            self.save()
+
+    def load(self):
+        now = time.time()
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            # File is written oldest first, so LRU order is preserved
+            entries = [(str(key), (float(stored_at), str(message))) for key, stored_at, message in data
+                       if now - float(stored_at) <= self.ttl]
+        except (OSError, ValueError, TypeError) as e:
+            # The cache only saves API calls: start without it rather than fail the app
+            self.last_error = f"{type(e).__name__}: {e}"
+            return
+        with self._lock:
+            self._entries.update(entries)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                data = [[key, stored_at, message] for key, (stored_at, message) in self._entries.items()]
+                self._unsaved = 0
+            # Write then rename, so a crash never leaves a half-written cache file; the temporary name is per
+            # process, for several app processes sharing one file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def close(self):
+        """
+        Saves entries added since the last save. Call on shutdown.
+        """
+        with self._lock:
+            unsaved = self._unsaved
+        if unsaved:
+            self.save()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,339 @@
+"""
+Frame transport between a capture process and pose inference worker processes.
+
+MediaPipe holds the GIL for most of a process() call, so pose inference only scales over cores in separate
+processes. Pickling every 640x480 BGR frame (900 KB) through a queue would cost about as much as the
+inference saves. Instead, frames live in a SharedFrameRing: one shared memory block with a fixed number
+of frame slots. The capture side writes a frame into a free slot (or reads the camera straight into it),
+and only a small FrameDescriptor (slot, seq, timestamp) goes through the task queue. Each worker runs
+PoseEngine.process_frame on a NumPy view of that slot and sends back just the landmarks. A slot is free
+again once its result has been consumed.
+
+    pool = ProcessPosePool((480, 640, 3), workers=4).start()
+    slot = pool.acquire()
+    ok, _ = cap.read(pool.view(slot))   # decoded straight into shared memory
+    pool.submit_slot(slot, time.time())
+    result = pool.get_result()          # {"seq", "timestamp", "image", "pose", ...}, in capture order
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from telemetry import Telemetry
+
+FrameDescriptor = namedtuple("FrameDescriptor", "slot seq timestamp")
+
+class SharedFrameRing:
+    """
+    `slots` frames of one shape and dtype in a single shared memory block.
+    The creating process owns the block (close() unlinks it); workers attach by name with create=False.
+    Which slots are in use is tracked by the writer (see ProcessPosePool), not by the ring.
+    """
+    def __init__(self, slots, shape, dtype=np.uint8, name=None, create=True):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=slots * self.frame_bytes if create else 0)
+        self.name = self.shm.name
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def view(self, slot):
+        """
+        The slot's frame as a NumPy array backed by the shared memory (no copy).
+        """
+        return self.frames[slot]
+
+    def close(self):
+        # Every view has to be gone before the mapping can be closed
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass # A caller still holds a view; the mapping goes away with it
+        if self.owner:
+            self.shm.unlink()
+
+def default_pose_engine():
+    """
+    One PoseEngine per worker process. Consecutive frames of a stream land on different workers, so the
+    engine treats every frame on its own instead of tracking between them.
+    """
+    from pose_engine import PoseEngine
+    return PoseEngine(static_image_mode=True)
+
+def _worker_main(ring_name, slots, shape, dtype, tasks, results, pose_engine_factory, warm_up, current, index):
+    """
+    Worker process: runs the pose engine on every frame named by a task until it receives None.
+    A task is (descriptor, frame); frame is None when the frame is in the shared ring.
+    current[index] holds the seq of the frame taken last, so the pool knows which frame a crashed worker lost.
+    """
+    ring = SharedFrameRing(slots, shape, dtype, name=ring_name, create=False) if ring_name else None
+    try:
+        try:
+            pose_engine = pose_engine_factory()
+            if warm_up and hasattr(pose_engine, "warm_up"):
+                pose_engine.warm_up(size=shape[:2])
+        except Exception as e:
+            results.put(("failed", os.getpid(), None, 0.0, repr(e)))
+            return
+        results.put(("ready", os.getpid(), None, 0.0, None))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            descriptor, frame = task
+            current[index] = descriptor.seq
+            start = time.perf_counter()
+            try:
+                _, _, pose = pose_engine.process_frame(ring.view(descriptor.slot) if frame is None else frame)
+                # The queue pickles in a background thread, after the engine may have reused its buffer
+                pose = None if pose is None else pose.copy()
+                results.put(("result", descriptor, pose, time.perf_counter() - start, None))
+            except Exception as e:
+                results.put(("result", descriptor, None, time.perf_counter() - start, repr(e)))
+    finally:
+        if ring is not None:
+            ring.close()
+
+class ProcessPosePool:
+    """
+    Pose inference on frames of one shape in `workers` processes.
+        shape: frame shape, e.g. (480, 640, 3); frames of another shape are rejected
+        slots: frames in flight at most (default 2 per worker, plus 2 held by the caller); when all are in
+               use, submit() waits or drops the frame, like pipeline.RingBuffer
+        pose_engine_factory: picklable callable returning a PoseEngine-like object, called in each worker
+        transport: "shared" (SharedFrameRing) or "pickle" (frames pickled through the task queue, as a baseline)
+        ordered: get_result() returns results in submission order rather than as workers finish them
+        start_method: multiprocessing start method (None for the platform default)
+    A worker process that dies (crash, OOM kill) is noticed within check_interval seconds: get_result() raises
+    RuntimeError for the frame it had taken, or for every outstanding frame once no worker is left.
+    """
+    def __init__(self, shape, workers=None, slots=None, pose_engine_factory=default_pose_engine, transport="shared",
+                 ordered=True, warm_up=True, telemetry=None, start_method=None):
+        if transport not in ("shared", "pickle"):
+            raise ValueError(f"Unknown transport {transport!r}, expected 'shared' or 'pickle'")
+        self.shape = tuple(shape)
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or 2 * self.workers + 2
+        self.transport = transport
+        self.ordered = ordered
+        self.telemetry = telemetry or Telemetry()
+        self.ready_workers = 0
+        self.dropped = 0
+        context = multiprocessing.get_context(start_method)
+        self.ring = SharedFrameRing(self.slots, self.shape) if transport == "shared" else None
+        # Pickled frames still take a slot, so both transports have the same number of frames in flight
+        self._frames = {}
+        self._free = deque(range(self.slots))
+        self._slot_cond = threading.Condition()
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._submitted = {}
+        self._pending = {}
+        self._next_seq = 0
+        self._seq = 0
+        self._held = None
+        self.check_interval = 0.5
+        self._current = context.Array("q", [-1] * self.workers, lock=False) # Per worker: seq of its frame
+        self._ready_pids = set()
+        self._exited = set() # Indices of the workers found dead
+        self._processes = [
+            context.Process(target=_worker_main, name=f"pose-process-{i}", daemon=True,
+                            args=(self.ring.name if self.ring else None, self.slots, self.shape, np.uint8,
+                                  self._tasks, self._results, pose_engine_factory, warm_up, self._current, i))
+            for i in range(self.workers)]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """
+        Waits until every worker has created (and warmed up) its pose engine. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.ready_workers < self.workers:
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0 or not self._receive(remaining):
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        A free slot number, waiting up to `timeout` seconds for one (0 does not wait); None if none freed up.
+        """
+        with self._slot_cond:
+            if not self._slot_cond.wait_for(lambda: self._free, timeout):
+                return None
+            return self._free.popleft()
+
+    def release(self, slot):
+        with self._slot_cond:
+            self._free.append(slot)
+            self._slot_cond.notify()
+
+    def view(self, slot):
+        """
+        Writable array for the frame in `slot` (a shared memory view with the "shared" transport).
+        """
+        if self.ring is not None:
+            return self.ring.view(slot)
+        frame = self._frames.get(slot)
+        if frame is None:
+            frame = self._frames[slot] = np.empty(self.shape, dtype=np.uint8)
+        return frame
+
+    def submit(self, frame, timestamp=None, block=True, timeout=None):
+        """
+        Copies a frame into a free slot and queues it. Returns its sequence number, or None if it was dropped
+        because no slot was free (block=False, or after `timeout` seconds).
+        """
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the pool's {self.shape}")
+        slot = self.acquire(timeout if block else 0)
+        if slot is None:
+            self.dropped += 1
+            self.telemetry.increment("dropped_frames")
+            return None
+        np.copyto(self.view(slot), frame)
+        return self.submit_slot(slot, timestamp)
+
+    def submit_slot(self, slot, timestamp=None):
+        """
+        Queues the frame already written into `slot` (see acquire and view). Returns its sequence number.
+        """
+        seq = self._seq
+        self._seq += 1
+        descriptor = FrameDescriptor(slot, seq, time.time() if timestamp is None else timestamp)
+        self._submitted[seq] = (time.perf_counter(), descriptor)
+        self._tasks.put((descriptor, None if self.ring is not None else self._frames[slot]))
+        return seq
+
+    def get_result(self, timeout=None):
+        """
+        The next result, or None on timeout. A dict with
+            seq, timestamp: as submitted
+            image: the frame (a view of its slot, valid until the next get_result call, which frees the slot)
+            pose: (33, 4) landmark array, or None if nobody was detected
+            inference_ms: time process_frame took in the worker
+            latency_ms: from submit to this result
+        Raises RuntimeError if the worker failed on the frame or died while it had it.
+        """
+        if self._held is not None:
+            self.release(self._held)
+            self._held = None
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if self._pending and (not self.ordered or self._next_seq in self._pending):
+                seq = self._next_seq if self.ordered else next(iter(self._pending))
+                break
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0 or not self._receive(remaining):
+                return None
+        descriptor, pose, inference_time, error = self._pending.pop(seq)
+        if self.ordered:
+            self._next_seq += 1
+        latency = time.perf_counter() - self._submitted.pop(seq)[0]
+        telemetry = self.telemetry
+        telemetry.record("pose", inference_time)
+        telemetry.record("frame_latency", latency)
+        if error is not None:
+            self.release(descriptor.slot)
+            telemetry.increment("worker_errors")
+            raise RuntimeError(f"Pose worker failed on frame {seq}: {error}")
+        self._held = descriptor.slot
+        return {"seq": seq, "timestamp": descriptor.timestamp, "image": self.view(descriptor.slot), "pose": pose,
+                "inference_ms": inference_time * 1e3, "latency_ms": latency * 1e3}
+
+    def _receive(self, timeout):
+        """
+        Takes one message from the workers, checking every check_interval seconds that they are still alive.
+        False on timeout; True once a message arrived or a frame of a dead worker was failed.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+            wait = self.check_interval if remaining is None else min(remaining, self.check_interval)
+            try:
+                kind, descriptor, pose, inference_time, error = self._results.get(timeout=wait)
+                break
+            except queue.Empty:
+                if self._check_workers():
+                    return True
+                if remaining is not None and remaining <= wait:
+                    return False
+        if kind == "ready":
+            self.ready_workers += 1
+            self._ready_pids.add(descriptor)
+        elif kind == "failed":
+            raise RuntimeError(f"Pose worker {descriptor} could not start: {error}")
+        else:
+            self._pending[descriptor.seq] = (descriptor, pose, inference_time, error)
+        return True
+
+    def _check_workers(self):
+        """
+        Fails the frames lost with worker processes that died: the one each had taken, or every outstanding
+        frame once no worker is left. Their slots are released by get_result(). Returns True if a frame was failed.
+        """
+        lost = []
+        for index, process in enumerate(self._processes):
+            if index in self._exited or process.pid is None or process.is_alive():
+                continue
+            self._exited.add(index)
+            self.telemetry.increment("worker_exits")
+            reason = f"{process.name} exited with code {process.exitcode}"
+            if process.pid not in self._ready_pids:
+                raise RuntimeError(f"Pose worker {process.pid} could not start: {reason}")
+            lost.append((self._current[index], reason))
+        if len(self._exited) == len(self._processes):
+            lost += [(seq, "every pose worker has exited") for seq in self._submitted]
+        failed = False
+        for seq, reason in lost:
+            if seq in self._submitted and seq not in self._pending:
+                self._pending[seq] = (self._submitted[seq][1], None, 0.0, reason)
+                failed = True
+        return failed
+
+    def in_flight(self):
+        return self.slots - len(self._free)
+
+    def stats(self):
+        snapshot = self.telemetry.snapshot()
+        snapshot["workers"] = sum(process.is_alive() for process in self._processes)
+        snapshot["in_flight"] = self.in_flight()
+        snapshot["transport"] = self.transport
+        return snapshot
+
+    def close(self, timeout=2.0):
+        for process in self._processes:
+            if process.is_alive():
+                self._tasks.put(None)
+        for process in self._processes:
+            if process.pid is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+        # Results nobody collected must not keep the interpreter from exiting
+        self._results.cancel_join_thread()
+        self._tasks.cancel_join_thread()
+        self._held = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
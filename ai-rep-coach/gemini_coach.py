@@ -1,70 +1,292 @@
-from google import genai
+import threading
 import time
 import random
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from feedback_cache import FeedbackCache, state_signature, template_feedback
+from rep_analytics import format_rep_summary
+
+# Dynamic Persona/Style, picked at random for every prompt
+COACH_STYLES = [
+    "motivational and high energy",
+    "technical and precise",
+    "supportive and encouraging",
+    "like a drill sergeant"
+]
+
+def start_call(function, *args, name="coach-call"):
+    """
+    Runs function(*args) on a new daemon thread and returns a Future of its result. A call that hangs past its
+    timeout only keeps its own thread: later calls never queue behind it, and it does not block exit.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+class GeminiClient:
+    """
+    Coach backend that calls the Gemini API.
+    Any object with a generate(prompt) -> str method can be used in its place (see FakeCoachClient).
+    """
+    def __init__(self, api_key, model="gemini-2.0-flash"):
+        from google import genai # Takes about half a second; only paid when an API key is given
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+
+    def generate(self, prompt):
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=prompt
+        )
+        return response.text
+
+class FakeCoachClient:
+    """
+    Local stand-in for GeminiClient with configurable latency and failures, for tests and offline development.
+    """
+    def __init__(self, latency=0.0, fail_first=0, response="Nice work, keep it up!"):
+        self.latency = latency
+        self.fail_first = fail_first # Number of initial calls that raise
+        self.response = response
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        time.sleep(self.latency)
+        if len(self.prompts) <= self.fail_first:
+            raise ConnectionError("Fake coach unavailable")
+        return self.response
 
 class GeminiCoach:
-    def __init__(self, api_key):
+    def __init__(self, api_key, client=None, timeout=10.0, max_retries=2, backoff=0.5, cache=None, fallback_after=2.0,
+                 telemetry=None):
+        """
+        api_key: Gemini API key, used to build a GeminiClient when no client is given
+        client: any object with generate(prompt) -> str
+        timeout: seconds to wait for one generate call before giving up on it
+        max_retries: extra attempts after a failed or timed out call, with exponential backoff
+        cache: FeedbackCache shared by coaches (a private in-memory one by default)
+        fallback_after: seconds an API call may take before a local template message is shown meanwhile
+        telemetry: optional Telemetry receiving "coach_api" call latencies and errors
+        """
         self.api_key = api_key
-        if api_key:
-            self.client = genai.Client(api_key=api_key)
-        else:
-            self.client = None
-            
+        if client is None and api_key:
+            client = GeminiClient(api_key)
+        self.client = client
+
         self.last_feedback_time = 0
         self.feedback_cooldown = 8 # Increased cooldown slightly
         self.history = [] # Keep track of last few messages to avoid repetition
 
-    def get_feedback(self, exercise_name, reps, stage, warnings, angles):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.fallback_after = fallback_after
+        self.cache = cache if cache is not None else FeedbackCache()
+        self.last_error = None
+        self.telemetry = telemetry
+        self.stats = {"requests": 0, "coalesced": 0, "failures": 0, "timeouts": 0, "templates": 0,
+                      "responses": 0, "total_latency": 0.0, "last_latency": None}
+
+        # Only the newest snapshot waits to be sent; older ones are overwritten (coalesced)
+        self._pending = None
+        self._latest = None # Newest published message not yet returned by get_feedback
+        self._cond = threading.Condition()
+        self._closed = False
+        self._inflight = None # [snapshot, start time, template already shown]
+        self._worker = None
+        if self.client:
+            self._worker = threading.Thread(target=self._run, name="coach-worker", daemon=True)
+            self._worker.start()
+
+    def get_feedback(self, exercise_name, reps, stage, warnings, angles, rep_summary=None):
         """
-        Generates feedback based on the current exercise state.
+        Non-blocking: at most once per feedback_cooldown, answers the current state from the cache,
+        from a local template (no API key) or queues it for the API worker.
+        rep_summary: optional rep_analytics summary; the prompt then carries rep statistics instead of angles.
+        Returns the newest feedback that arrived since the last call, or None.
         """
-        if not self.client:
-            return "Please enter a valid Gemini API Key in the sidebar to enable the AI Coach."
-
         current_time = time.time()
-        if current_time - self.last_feedback_time < self.feedback_cooldown:
-            return None
-
-        # Dynamic Persona/Style
-        styles = [
-            "motivational and high energy",
-            "technical and precise",
-            "supportive and encouraging",
-            "like a drill sergeant"
-        ]
-        style = random.choice(styles)
-
-        # Context Construction
-        angle_info = ", ".join([f"{k}: {int(v[0])}" for k, v in angles.items()])
-        
+        if current_time - self.last_feedback_time >= self.feedback_cooldown:
+            self.last_feedback_time = current_time
+            snapshot = {
+                "exercise": exercise_name,
+                "reps": reps,
+                "stage": stage,
+                "warnings": list(warnings),
+                "angles": dict(angles),
+                "rep_summary": rep_summary,
+            }
+            cached = self.cache.get(state_signature(snapshot))
+            if cached is not None:
+                self._publish(cached)
+            elif not self.uses_model():
+                self._publish_template(snapshot)
+            else:
+                self.submit(snapshot)
+
+        return self.poll()
+
+    def uses_model(self):
+        """
+        True if states that miss the cache are submit()ted to a model, False if they get a template at once.
+        """
+        return bool(self.client)
+
+    def submit(self, snapshot):
+        """
+        Queues a state snapshot, replacing any snapshot that has not been sent yet.
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.stats["coalesced"] += 1
+            self._pending = snapshot
+            self._cond.notify()
+
+    def poll(self):
+        """
+        Returns the newest published feedback once, then None until a newer one arrives.
+        If the API call in flight is slower than fallback_after, a template message is published meanwhile.
+        """
+        with self._cond:
+            inflight = self._inflight
+            if inflight and not inflight[2] and time.perf_counter() - inflight[1] > self.fallback_after:
+                inflight[2] = True
+                self.stats["templates"] += 1
+                self._latest = template_feedback(inflight[0])
+            feedback, self._latest = self._latest, None
+        return feedback
+
+    def get_stats(self):
+        """
+        Coach counters (requests, failures, templates, latency) merged with the cache hit/miss counters.
+        """
+        stats = dict(self.stats)
+        stats["avg_latency"] = stats["total_latency"] / stats["responses"] if stats["responses"] else None
+        stats.update({f"cache_{name}": value for name, value in self.cache.stats.items()})
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def build_prompt(self, snapshot):
+        """
+        Builds the coach prompt for a state snapshot.
+        """
+        style = random.choice(COACH_STYLES)
+
+        warnings = snapshot["warnings"]
+
+        # Context Construction: per-rep statistics once there are some, the current angles before that
+        rep_summary = snapshot.get("rep_summary")
+        if rep_summary:
+            state_info = f"Recent Reps: {format_rep_summary(rep_summary)}"
+        else:
+            angle_info = ", ".join([f"{k}: {int(v[0])}" for k, v in snapshot["angles"].items()])
+            state_info = f"Current Stage: {snapshot['stage']}\n        Key Angles: {angle_info}"
+
         prompt = f"""
-        You are a fitness coach. The user is doing {exercise_name}.
-        Current Reps: {reps}
-        Current Stage: {stage}
+        You are a fitness coach. The user is doing {snapshot["exercise"]}.
+        Current Reps: {snapshot["reps"]}
         Form Warnings: {', '.join(warnings) if warnings else 'None'}
-        Key Angles: {angle_info}
-        
+        {state_info}
+
         Previous Feedback: {self.history[-3:] if self.history else 'None'}
-        
+
         Task: Provide a short feedback message (under 20 words).
         Style: {style}
-        
+
         Priority:
         1. If there are Form Warnings, correct them immediately.
-        2. If Reps are increasing, motivate them.
-        3. If nothing special, comment on their form or angles.
-        
+        2. If reps are rushed (under about 1s per phase) or the range of motion is shrinking, say so.
+        3. If Reps are increasing, motivate them.
+        4. If nothing special, comment on their form or angles.
+
         Do not repeat previous feedback exactly.
         """
-        
-        try:
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            feedback = response.text
-            self.history.append(feedback)
-            self.last_feedback_time = current_time
-            return feedback
-        except Exception as e:
-            return f"Error connecting to Coach: {str(e)}"
+        return prompt
+
+    def _take_pending(self, block):
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+            snapshot, self._pending = self._pending, None
+            return snapshot
+
+    def _publish(self, feedback):
+        with self._cond:
+            self._latest = feedback
+
+    def _publish_template(self, snapshot):
+        self.stats["templates"] += 1
+        self._publish(template_feedback(snapshot))
+
+    def _run(self):
+        """
+        Worker loop: sends the newest snapshot, retrying with backoff; never touches the frame loop.
+        """
+        while True:
+            snapshot = self._take_pending(block=True)
+            if self._closed:
+                return
+
+            error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                    # A newer state arrived while backing off: retry with that one instead
+                    snapshot = self._take_pending(block=False) or snapshot
+                if self._closed:
+                    return
+
+                self.stats["requests"] += 1
+                start = time.perf_counter()
+                with self._cond:
+                    fallback_shown = bool(self._inflight and self._inflight[2])
+                    self._inflight = [snapshot, start, fallback_shown]
+                # One thread per attempt, so a retry is not stuck behind a call that timed out but is still hanging
+                future = start_call(self.client.generate, self.build_prompt(snapshot))
+                try:
+                    feedback = future.result(timeout=self.timeout)
+                except FutureTimeoutError:
+                    self.stats["timeouts"] += 1
+                    error = TimeoutError(f"no response within {self.timeout}s")
+                    if self.telemetry:
+                        self.telemetry.record_error("coach_api", error)
+                    continue
+                except Exception as e:
+                    self.stats["failures"] += 1
+                    error = e
+                    if self.telemetry:
+                        self.telemetry.record_error("coach_api", e)
+                    continue
+
+                latency = time.perf_counter() - start
+                self.stats["last_latency"] = latency
+                self.stats["total_latency"] += latency
+                self.stats["responses"] += 1
+                if self.telemetry:
+                    self.telemetry.record("coach_api", latency)
+                self.cache.put(state_signature(snapshot), feedback)
+                self.history.append(feedback)
+                self._publish(feedback)
+                break
+            else:
+                # Unreachable or rate limited: keep the user coached with a local message
+                self.last_error = f"Error connecting to Coach: {str(error)}"
+                with self._cond:
+                    fallback_shown = bool(self._inflight and self._inflight[2])
+                if not fallback_shown:
+                    self._publish_template(snapshot)
+
+            with self._cond:
+                self._inflight = None
@@ -0,0 +1,162 @@
+"""
+Temporal smoothing of landmarks between PoseEngine and Exercise.
+
+Per-frame landmarks jitter, most of all with the lightest model, and the exercises threshold raw angles:
+jitter near a threshold flickers stages and form warnings, and a single bad detection can flip a stage and
+count a rep twice. LandmarkFilter smooths x, y, z of every landmark with a One Euro filter (default) or a
+constant-velocity Kalman filter. Both are vectorized over all 33 landmarks, keep their state in arrays
+allocated once, and weight each update by the landmark's visibility, so an occluded landmark mostly keeps
+its filtered position instead of following a poor guess.
+
+Hysteresis on the thresholds themselves (margins, minimum frames, release bands) is configured per stage
+transition in the exercise definitions, see rule_engine.py.
+
+    landmark_filter = LandmarkFilter("one_euro")
+    pose = landmark_filter(pose, timestamp)  # None (nobody detected) resets it
+"""
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, new_pose_array
+
+class OneEuroFilter:
+    """
+    One Euro filter (Casiez et al., CHI 2012) over an array of signals: a low-pass filter whose cutoff rises
+    with speed, so slow movement is smoothed hard and fast movement follows with little lag.
+    min_cutoff (Hz) sets the smoothing at rest, beta how quickly the cutoff grows with speed (units/s).
+    """
+    def __init__(self, shape, min_cutoff=1.0, beta=20.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = np.zeros(shape)
+        self.derivative = np.zeros(shape)
+        self._delta = np.zeros(shape)
+        self._alpha = np.zeros(shape)
+        self.initialized = False
+
+    @staticmethod
+    def smoothing_factor(cutoff, dt):
+        return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+
+    def __call__(self, x, dt, weight=None):
+        """
+        Filters one sample x (same shape as the state); weight in [0, 1] scales each update (None = 1).
+        Returns the filtered value (the filter's own array, updated in place).
+        """
+        if not self.initialized:
+            self.value[:] = x
+            self.derivative[:] = 0
+            self.initialized = True
+            return self.value
+        delta, alpha = self._delta, self._alpha
+        np.subtract(x, self.value, out=delta)
+        self.derivative += self.smoothing_factor(self.d_cutoff, dt) * (delta / dt - self.derivative)
+        # Cutoff grows with speed; alpha = 1 / (1 + 1 / (2 pi cutoff dt))
+        np.abs(self.derivative, out=alpha)
+        alpha *= self.beta
+        alpha += self.min_cutoff
+        alpha *= 2 * np.pi * dt
+        np.divide(alpha, alpha + 1, out=alpha)
+        if weight is not None:
+            alpha *= weight
+        delta *= alpha
+        self.value += delta
+        return self.value
+
+    def reset(self):
+        self.initialized = False
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter per signal, with the 2x2 covariance of every signal held in three arrays.
+    process_noise is the acceleration variance (units/s^2)^2, measurement_noise the variance of one sample;
+    a weight below 1 divides into the measurement noise, so low-weight samples move the estimate less.
+    """
+    def __init__(self, shape, process_noise=10.0, measurement_noise=1e-4):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.value = np.zeros(shape)
+        self.velocity = np.zeros(shape)
+        self.p00 = np.zeros(shape) # Covariance [[p00, p01], [p01, p11]] of (value, velocity)
+        self.p01 = np.zeros(shape)
+        self.p11 = np.zeros(shape)
+        self._gain = np.zeros(shape)
+        self._innovation = np.zeros(shape)
+        self.initialized = False
+
+    def __call__(self, x, dt, weight=None):
+        if not self.initialized:
+            self.value[:] = x
+            self.velocity[:] = 0
+            self.p00[:] = self.measurement_noise
+            self.p01[:] = 0
+            self.p11[:] = 1.0
+            self.initialized = True
+            return self.value
+        q = self.process_noise
+        p00, p01, p11 = self.p00, self.p01, self.p11
+        # Predict
+        self.value += self.velocity * dt
+        p00 += dt * (2 * p01 + dt * p11) + q * dt ** 4 / 4
+        p01 += dt * p11 + q * dt ** 3 / 2
+        p11 += q * dt ** 2
+        # Update with the measurement
+        noise = self.measurement_noise if weight is None else self.measurement_noise / np.maximum(weight, 1e-3)
+        gain, innovation = self._gain, self._innovation
+        np.subtract(x, self.value, out=innovation)
+        np.divide(1.0, p00 + noise, out=gain)
+        velocity_gain = p01 * gain
+        gain *= p00
+        self.value += gain * innovation
+        self.velocity += velocity_gain * innovation
+        p11 -= velocity_gain * p01
+        p01 *= 1 - gain
+        p00 *= 1 - gain
+        return self.value
+
+    def reset(self):
+        self.initialized = False
+
+FILTERS = {"one_euro": OneEuroFilter, "kalman": KalmanFilter}
+
+class LandmarkFilter:
+    """
+    Streaming filter stage: call it with every (33, 4) pose and its timestamp (seconds).
+    Returns a (33, 4) array reused on every call: filtered x, y, z and the raw visibility.
+    Without timestamps frames are assumed `frequency` Hz apart; a gap longer than max_gap seconds, or a
+    frame without a pose, restarts the filter. Each landmark's update is weighted by its visibility,
+    floored at min_weight so a landmark that stays hidden still catches up eventually.
+    """
+    def __init__(self, method="one_euro", frequency=30.0, max_gap=0.5, min_weight=0.05, **params):
+        if method not in FILTERS:
+            raise ValueError(f"Unknown filter {method!r}, expected one of {', '.join(FILTERS)}")
+        self.method = method
+        self.frequency = frequency
+        self.max_gap = max_gap
+        self.min_weight = min_weight
+        self.filter = FILTERS[method]((NUM_LANDMARKS, 3), **params)
+        self.output = new_pose_array()
+        self._weight = np.zeros((NUM_LANDMARKS, 1))
+        self.last_timestamp = None
+
+    def __call__(self, pose, timestamp=None):
+        if pose is None:
+            self.reset()
+            return None
+        dt = 1.0 / self.frequency
+        if timestamp is not None and self.last_timestamp is not None:
+            dt = timestamp - self.last_timestamp
+            if dt > self.max_gap:
+                self.filter.reset()
+            if dt <= 0 or dt > self.max_gap:
+                dt = 1.0 / self.frequency
+        self.last_timestamp = timestamp
+
+        np.clip(pose[:, 3:4], self.min_weight, 1.0, out=self._weight)
+        self.output[:, :3] = self.filter(pose[:, :3], dt, self._weight)
+        self.output[:, 3] = pose[:, 3]
+        return self.output
+
+    def reset(self):
+        self.filter.reset()
+        self.last_timestamp = None
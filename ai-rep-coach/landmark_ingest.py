@@ -0,0 +1,151 @@
+"""
+Landmark ingestion for clients that run pose detection on-device: a compact binary packet format and a
+reorder buffer, so the server can feed Exercise/GeminiCoach without decoding video or running inference.
+
+Packet (little endian), several packets may be concatenated in one request body:
+    2s   magic b"LM"
+    B    version (1)
+    B    flags: 1 = person detected (landmarks follow), 2 = landmarks are float16
+    I    sequence number, increasing by one per camera frame
+    d    capture timestamp in seconds (client clock)
+    33 x 4 float32 (528 bytes) or float16 (264 bytes) of x, y, z, visibility, only if detected
+"""
+import struct
+import time
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, NUM_FIELDS
+
+HEADER = struct.Struct("<2sBBId")
+MAGIC = b"LM"
+VERSION = 1
+FLAG_DETECTED = 1
+FLAG_FLOAT16 = 2
+POSE_VALUES = NUM_LANDMARKS * NUM_FIELDS
+
+def encode_packet(seq, timestamp, pose, half=False):
+    """
+    Encodes one frame; pose is a (33, 4) array, or None when nobody was detected.
+    """
+    if pose is None:
+        return HEADER.pack(MAGIC, VERSION, 0, seq, timestamp)
+    dtype = "<f2" if half else "<f4"
+    flags = FLAG_DETECTED | (FLAG_FLOAT16 if half else 0)
+    return HEADER.pack(MAGIC, VERSION, flags, seq, timestamp) + np.asarray(pose, dtype).tobytes()
+
+def decode_packets(data):
+    """
+    Decodes concatenated packets into a list of (seq, timestamp, pose or None).
+    float32 poses are read-only views into data. Raises ValueError for malformed input.
+    """
+    packets = []
+    offset = 0
+    size = len(data)
+    while offset < size:
+        if size - offset < HEADER.size:
+            raise ValueError(f"Truncated packet header at byte {offset}")
+        magic, version, flags, seq, timestamp = HEADER.unpack_from(data, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} landmark packet at byte {offset}")
+        offset += HEADER.size
+        pose = None
+        if flags & FLAG_DETECTED:
+            dtype = np.dtype("<f2" if flags & FLAG_FLOAT16 else "<f4")
+            if size - offset < POSE_VALUES * dtype.itemsize:
+                raise ValueError(f"Truncated landmarks at byte {offset}")
+            pose = np.frombuffer(data, dtype, POSE_VALUES, offset).reshape(NUM_LANDMARKS, NUM_FIELDS)
+            if dtype.itemsize != 4:
+                pose = pose.astype(np.float32)
+            offset += POSE_VALUES * dtype.itemsize
+        packets.append((seq, timestamp, pose))
+    return packets
+
+class ReorderBuffer:
+    """
+    Puts packets back into sequence order. A packet is held until every earlier sequence number has
+    arrived; a gap is skipped once the oldest held packet has waited `max_delay` seconds or more than
+    `max_pending` packets are held. Packets behind the last released one arrive too late and are dropped.
+    A client that reconnects or restarts its counter shows up as a jump back by more than `max_pending`.
+    Such a packet is held aside: if the next one continues its sequence, the buffer starts over from the two
+    ("restarts"); otherwise, or if nothing follows it within `max_delay`, it was just a very late packet.
+    Sequence 0 after `restart_after` seconds without packets starts over at once.
+    """
+    def __init__(self, max_delay=0.1, max_pending=8, restart_after=1.0):
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.restart_after = restart_after
+        self.next_seq = None
+        self.stats = {"released": 0, "late": 0, "duplicates": 0, "skipped": 0, "restarts": 0}
+        self._pending = {} # seq -> (arrival time, item)
+        self._restart = None # (seq, arrival time, item) of a packet far behind, until the next packet tells
+        self._last_arrival = None
+
+    def push(self, seq, item, now=None):
+        """
+        Adds one packet and returns the items that are now in order (possibly none).
+        """
+        now = time.perf_counter() if now is None else now
+        last_arrival, self._last_arrival = self._last_arrival, now
+        candidate, self._restart = self._restart, None
+        if candidate is not None:
+            if seq == candidate[0]:
+                self._restart = candidate
+                self.stats["duplicates"] += 1
+                return []
+            if abs(seq - candidate[0]) <= self.max_pending:
+                self._start_over(min(seq, candidate[0]))
+                self._pending[candidate[0]] = candidate[1:]
+            else:
+                self.stats["late"] += 1
+        if self.next_seq is not None and seq < self.next_seq:
+            if seq == 0 and now - last_arrival >= self.restart_after:
+                self._start_over(seq)
+            elif self.next_seq - seq > self.max_pending:
+                self._restart = (seq, now, item)
+                return []
+        if self.next_seq is None:
+            self.next_seq = seq
+        if seq < self.next_seq:
+            self.stats["late"] += 1
+            return []
+        if seq in self._pending:
+            self.stats["duplicates"] += 1
+            return []
+        self._pending[seq] = (now, item)
+        return self.release(now)
+
+    def _start_over(self, seq):
+        # A new stream: what is still held belongs to the old one
+        self.stats["restarts"] += 1
+        self.stats["skipped"] += len(self._pending)
+        self._pending = {}
+        self.next_seq = seq
+
+    def release(self, now=None):
+        """
+        Returns the items that are ready, skipping gaps that have waited too long.
+        """
+        now = time.perf_counter() if now is None else now
+        if self._restart is not None and now - self._restart[1] >= self.max_delay:
+            # Nothing came to confirm a restart
+            self._restart = None
+            self.stats["late"] += 1
+        released = []
+        pending = self._pending
+        while pending:
+            if self.next_seq in pending:
+                released.append(pending.pop(self.next_seq)[1])
+                self.next_seq += 1
+                continue
+            oldest = min(pending)
+            if len(pending) > self.max_pending or now - pending[oldest][0] >= self.max_delay:
+                self.stats["skipped"] += oldest - self.next_seq
+                self.next_seq = oldest
+                continue
+            break
+        self.stats["released"] += len(released)
+        return released
+
+    def __len__(self):
+        return len(self._pending)
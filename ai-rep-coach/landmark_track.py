@@ -0,0 +1,158 @@
+"""
+Recorded landmark tracks: pose inference results saved once and replayed into any Exercise without video or model.
+
+A track is a directory (by convention named *.track) holding:
+    landmarks.f32   raw float32 array of shape (frames, 33, 4): x, y, z, visibility; NaN rows = nobody detected
+    timestamps.f64  raw float64 array of shape (frames,): seconds
+    meta.json       format version, frame count, fps and free-form metadata (source, exercise, labels, ...)
+The raw files are append-only while recording and memory-mapped when reading.
+
+Replay from the ai-rep-coach directory:
+    python landmark_track.py recordings/member_42.track --exercise "Bicep Curl"
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, NUM_FIELDS
+
+TRACK_VERSION = 1
+LANDMARKS_FILE = "landmarks.f32"
+TIMESTAMPS_FILE = "timestamps.f64"
+META_FILE = "meta.json"
+
+class TrackWriter:
+    """
+    Appends one pose array (or None when nobody was detected) per frame to a track directory.
+    Usable as a context manager; close() writes meta.json.
+    """
+    def __init__(self, path, fps=None, metadata=None):
+        self.path = path
+        self.fps = fps
+        self.metadata = dict(metadata or {})
+        self.frames = 0
+        os.makedirs(path, exist_ok=True)
+        self._landmarks = open(os.path.join(path, LANDMARKS_FILE), "wb")
+        self._timestamps = open(os.path.join(path, TIMESTAMPS_FILE), "wb")
+        self._missing = np.full((NUM_LANDMARKS, NUM_FIELDS), np.nan, dtype=np.float32)
+
+    def append(self, pose, timestamp=None):
+        if pose is None:
+            pose = self._missing
+        if timestamp is None:
+            timestamp = self.frames / self.fps if self.fps else time.time()
+        self._landmarks.write(np.ascontiguousarray(pose, dtype=np.float32).tobytes())
+        self._timestamps.write(np.float64(timestamp).tobytes())
+        self.frames += 1
+
+    def close(self):
+        if self._landmarks.closed:
+            return
+        self._landmarks.close()
+        self._timestamps.close()
+        meta = {
+            "version": TRACK_VERSION,
+            "frames": self.frames,
+            "shape": [self.frames, NUM_LANDMARKS, NUM_FIELDS],
+            "fps": self.fps,
+            "metadata": self.metadata,
+        }
+        with open(os.path.join(self.path, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class LandmarkTrack:
+    """
+    Read-only, memory-mapped view of a recorded track.
+        track.landmarks: (frames, 33, 4) float32 memmap
+        track.timestamps: (frames,) float64
+        track.detected: (frames,) bool, False where nobody was detected
+    """
+    def __init__(self, path):
+        self.path = path
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            # Recording was interrupted before close(): recover what was flushed
+            self.meta = {"version": TRACK_VERSION, "fps": None, "metadata": {}}
+        if self.meta.get("version", TRACK_VERSION) > TRACK_VERSION:
+            raise ValueError(f"{path}: track format version {self.meta['version']} is newer than supported ({TRACK_VERSION})")
+
+        frame_bytes = NUM_LANDMARKS * NUM_FIELDS * 4
+        # The two files are flushed separately, so an interrupted recording keeps only the frames both hold
+        frames = min(os.path.getsize(os.path.join(path, LANDMARKS_FILE)) // frame_bytes,
+                     os.path.getsize(os.path.join(path, TIMESTAMPS_FILE)) // 8)
+        frames = min(frames, self.meta.get("frames", frames))
+        self.meta["frames"] = frames
+
+        if frames:
+            self.landmarks = np.memmap(os.path.join(path, LANDMARKS_FILE), dtype=np.float32, mode="r",
+                                       shape=(frames, NUM_LANDMARKS, NUM_FIELDS))
+            self.timestamps = np.memmap(os.path.join(path, TIMESTAMPS_FILE), dtype=np.float64, mode="r",
+                                        shape=(frames,))
+        else:
+            self.landmarks = np.empty((0, NUM_LANDMARKS, NUM_FIELDS), dtype=np.float32)
+            self.timestamps = np.empty((0,), dtype=np.float64)
+        self.detected = ~np.isnan(self.landmarks[:, 0, 0])
+
+    @property
+    def fps(self):
+        return self.meta.get("fps")
+
+    @property
+    def metadata(self):
+        return self.meta.get("metadata", {})
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    def __getitem__(self, index):
+        """
+        Returns the (33, 4) pose array of a frame, or None if nobody was detected.
+        """
+        return self.landmarks[index] if self.detected[index] else None
+
+    def replay(self, exercise, on_frame=None):
+        """
+        Feeds every detected frame into exercise.process, exactly as the live loop would.
+        on_frame(index, timestamp, exercise) is called after each detected frame.
+        Returns the exercise.
+        """
+        landmarks, timestamps = self.landmarks, self.timestamps
+        for index in np.flatnonzero(self.detected):
+            exercise.process(landmarks[index])
+            if on_frame:
+                on_frame(index, timestamps[index], exercise)
+        return exercise
+
+def main():
+    from exercises import EXERCISES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tracks", nargs="+", help="Track directories to replay")
+    parser.add_argument("--exercise", default=None, choices=list(EXERCISES),
+                        help="Exercise to score with (default: the one stored in the track metadata)")
+    args = parser.parse_args()
+
+    for path in args.tracks:
+        track = LandmarkTrack(path)
+        exercise_name = args.exercise or track.metadata.get("exercise", "Bicep Curl")
+        start = time.perf_counter()
+        exercise = track.replay(EXERCISES[exercise_name]())
+        elapsed = time.perf_counter() - start
+        fps = len(track) / elapsed if elapsed else float("inf")
+        print(f"{path}: {exercise_name} {exercise.counter} reps, {len(track)} frames "
+              f"({int(track.detected.sum())} detected) replayed at {fps:,.0f} frames/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import numpy as np
+
+# MediaPipe Pose landmark indices (same values as mp.solutions.pose.PoseLandmark),
+# kept as plain ints so the exercise logic can index the pose array without importing mediapipe.
+NOSE = 0
+LEFT_EYE_INNER = 1
+LEFT_EYE = 2
+LEFT_EYE_OUTER = 3
+RIGHT_EYE_INNER = 4
+RIGHT_EYE = 5
+RIGHT_EYE_OUTER = 6
+LEFT_EAR = 7
+RIGHT_EAR = 8
+MOUTH_LEFT = 9
+MOUTH_RIGHT = 10
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_ELBOW = 13
+RIGHT_ELBOW = 14
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_PINKY = 17
+RIGHT_PINKY = 18
+LEFT_INDEX = 19
+RIGHT_INDEX = 20
+LEFT_THUMB = 21
+RIGHT_THUMB = 22
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+LEFT_HEEL = 29
+RIGHT_HEEL = 30
+LEFT_FOOT_INDEX = 31
+RIGHT_FOOT_INDEX = 32
+
+NUM_LANDMARKS = 33
+
+# Skeleton edges (same pairs as mp.solutions.pose.POSE_CONNECTIONS)
+POSE_CONNECTIONS = (
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12), (11, 13), (11, 23),
+    (12, 14), (12, 24), (13, 15), (14, 16), (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22), (17, 19),
+    (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29), (27, 31), (28, 30), (28, 32), (29, 31),
+    (30, 32),
+)
+
+# Index of the same landmark on the other side of the body (landmarks on the midline map to themselves)
+MIRROR = np.arange(NUM_LANDMARKS)
+for _left, _right in ((LEFT_EYE_INNER, RIGHT_EYE_INNER), (LEFT_EYE, RIGHT_EYE), (LEFT_EYE_OUTER, RIGHT_EYE_OUTER),
+                      (LEFT_EAR, RIGHT_EAR), (MOUTH_LEFT, MOUTH_RIGHT), *((i, i + 1) for i in range(LEFT_SHOULDER, 33, 2))):
+    MIRROR[_left], MIRROR[_right] = _right, _left
+del _left, _right
+
+# Columns of the pose array
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+NUM_FIELDS = 4
+
+def new_pose_array():
+    """
+    Allocates an empty (33, 4) float32 pose array: one row per landmark, columns (x, y, z, visibility).
+    """
+    return np.zeros((NUM_LANDMARKS, NUM_FIELDS), dtype=np.float32)
+
+def landmarks_to_array(landmarks, out=None):
+    """
+    Copies MediaPipe landmarks (or any objects with .x/.y and optionally .z/.visibility)
+    into a (33, 4) float32 pose array.
+    If out is given it is filled in place and returned, so one buffer can be reused across frames.
+    """
+    if out is None:
+        out = new_pose_array()
+    # Gather into one flat list and assign once; per-row numpy writes are ~2x slower
+    values = []
+    for lm in landmarks:
+        values += (lm.x, lm.y, getattr(lm, 'z', 0.0), getattr(lm, 'visibility', 1.0))
+    out.reshape(-1)[:len(values)] = values
+    return out
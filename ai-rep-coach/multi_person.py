@@ -0,0 +1,261 @@
+"""
+Multi-person mode: several people in front of one camera, each with their own Exercise and rep counter.
+
+Per frame:
+    1. A person detector (OpenCV HOG by default) runs every `detect_every` frames to find new people.
+    2. An IoU tracker keeps a stable id per person across frames.
+    3. Each tracked person is cropped and passed through their own PoseEngine. Between detections the
+       crop follows the person's landmarks, so the expensive full-frame detection is amortized and each
+       per-person pose pass runs on a small crop in MediaPipe's cheap tracking mode.
+    4. Landmarks are mapped back to full-frame normalized coordinates and fed to the person's Exercise.
+"""
+import itertools
+
+import cv2
+import numpy as np
+
+from landmarks import new_pose_array, X, Y, VISIBILITY
+
+class HogPersonDetector:
+    """
+    OpenCV's HOG + linear SVM people detector. detect(frame) returns (boxes, scores), boxes as
+    float32 (N, 4) x1, y1, x2, y2 in frame pixels.
+    """
+    def __init__(self, width=480, min_score=0.3, nms_threshold=0.4):
+        self.width = width # Detection runs on a copy downscaled to this width
+        self.min_score = min_score
+        self.nms_threshold = nms_threshold
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        small = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA) \
+            if scale < 1 else frame
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if not len(rects):
+            return np.empty((0, 4), np.float32), np.empty(0, np.float32)
+        weights = np.ravel(weights).astype(np.float32)
+        keep = np.ravel(cv2.dnn.NMSBoxes(rects.tolist(), weights.tolist(), self.min_score, self.nms_threshold))
+        boxes = rects[keep].astype(np.float32) / scale
+        boxes[:, 2:] += boxes[:, :2] # x, y, w, h -> x1, y1, x2, y2
+        return boxes, weights[keep]
+
+def iou_matrix(a, b):
+    """
+    Pairwise intersection-over-union of (N, 4) and (M, 4) x1, y1, x2, y2 boxes, as an (N, M) array.
+    """
+    a = np.asarray(a, np.float32).reshape(-1, 1, 4)
+    b = np.asarray(b, np.float32).reshape(1, -1, 4)
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-6)
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = np.asarray(box, np.float32)
+        self.missed = 0 # Consecutive frames without a detection or landmarks
+        self.pose = new_pose_array() # Full-frame normalized landmarks
+
+class IoUTracker:
+    """
+    Greedy IoU association of detections to existing tracks. Unmatched detections start new tracks
+    (up to max_tracks); tracks missing for more than max_missed updates are dropped.
+    """
+    def __init__(self, iou_threshold=0.3, max_missed=30, max_tracks=6):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_tracks = max_tracks
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        """
+        Matches detected boxes against the current tracks. Returns (new track ids, dropped track ids).
+        """
+        tracks = list(self.tracks.values())
+        matched_tracks, matched_boxes = set(), set()
+        ious = None
+        if tracks and len(boxes):
+            ious = iou_matrix([t.box for t in tracks], boxes)
+            # Best pairs first
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                t, b = divmod(int(flat), ious.shape[1])
+                if ious[t, b] < self.iou_threshold:
+                    break
+                if t in matched_tracks or b in matched_boxes:
+                    continue
+                matched_tracks.add(t)
+                matched_boxes.add(b)
+                tracks[t].box = np.asarray(boxes[b], np.float32)
+                tracks[t].missed = 0
+
+        for t, track in enumerate(tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        dropped = self.prune()
+
+        added = []
+        for b in range(len(boxes)):
+            if b in matched_boxes or len(self.tracks) >= self.max_tracks:
+                continue
+            # A second detection of someone already tracked
+            if ious is not None and ious[:, b].max() >= self.iou_threshold:
+                continue
+            track = Track(next(self._ids), boxes[b])
+            self.tracks[track.id] = track
+            added.append(track.id)
+        return added, dropped
+
+    def prune(self):
+        dropped = [track_id for track_id, track in self.tracks.items() if track.missed > self.max_missed]
+        for track_id in dropped:
+            del self.tracks[track_id]
+        return dropped
+
+class MultiPersonEngine:
+    """
+    Runs detection, tracking and per-person pose + exercise logic on each frame.
+    process_frame(frame) returns a list with one dict per tracked person:
+        id: stable track id
+        box: x1, y1, x2, y2 in frame pixels
+        pose: (33, 4) full-frame normalized landmarks (the track's buffer), or None if not found this frame
+        metrics: the person's exercise.get_metrics(), or None if not found this frame
+    """
+    def __init__(self, exercise_cls, detector=None, pose_engine_factory=None, detect_every=10, max_people=6,
+                 margin=0.15, min_visibility=0.5, max_missed=30):
+        """
+        detector: object with detect(frame) -> (boxes, scores); HogPersonDetector by default
+        pose_engine_factory: callable returning a PoseEngine-like object for one person
+                             (default: PoseEngine(inference_size=256))
+        detect_every: run the person detector on every Nth frame; in between, crops follow the landmarks
+        margin: fraction of the box size added around each crop
+        """
+        if pose_engine_factory is None:
+            from pose_engine import PoseEngine
+            pose_engine_factory = lambda: PoseEngine(inference_size=256)
+        self.exercise_cls = exercise_cls
+        self.detector = detector or HogPersonDetector()
+        self.pose_engine_factory = pose_engine_factory
+        self.detect_every = detect_every
+        self.margin = margin
+        self.min_visibility = min_visibility
+        self.tracker = IoUTracker(max_missed=max_missed, max_tracks=max_people)
+        self.pose_engines = {}
+        self.exercises = {} # Kept after a person leaves, so their reps can still be reported
+        self.frame_index = -1
+
+    def process_frame(self, frame):
+        self.frame_index += 1
+        height, width = frame.shape[:2]
+        if self.frame_index % self.detect_every == 0:
+            boxes, _ = self.detector.detect(frame)
+            added, dropped = self.tracker.update(boxes)
+            for track_id in added:
+                self.pose_engines[track_id] = self.pose_engine_factory()
+                self.exercises.setdefault(track_id, self.exercise_cls())
+            for track_id in dropped:
+                self._close_engine(track_id)
+
+        people = []
+        for track in list(self.tracker.tracks.values()):
+            pose = self._track_pose(frame, track, width, height)
+            metrics = None
+            if pose is None:
+                track.missed += 1
+            else:
+                track.missed = 0
+                exercise = self.exercises[track.id]
+                exercise.process(pose)
+                metrics = exercise.get_metrics()
+            people.append({"id": track.id, "box": track.box.copy(), "pose": pose, "metrics": metrics})
+        for track_id in self.tracker.prune():
+            self._close_engine(track_id)
+        return people
+
+    def _track_pose(self, frame, track, width, height):
+        x1, y1, x2, y2 = track.box
+        pad_x, pad_y = (x2 - x1) * self.margin, (y2 - y1) * self.margin
+        cx1, cy1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        cx2, cy2 = min(width, int(x2 + pad_x)), min(height, int(y2 + pad_y))
+        if cx2 - cx1 < 16 or cy2 - cy1 < 16:
+            return None
+        # A view into the frame, no copy
+        _, _, crop_pose = self.pose_engines[track.id].process_frame(frame[cy1:cy2, cx1:cx2])
+        if crop_pose is None:
+            return None
+
+        # Crop-normalized -> frame-normalized
+        pose = track.pose
+        pose[:] = crop_pose
+        pose[:, X] = (cx1 + crop_pose[:, X] * (cx2 - cx1)) / width
+        pose[:, Y] = (cy1 + crop_pose[:, Y] * (cy2 - cy1)) / height
+
+        # Follow the person until the next detection: the box of the visible landmarks
+        visible = pose[:, VISIBILITY] >= self.min_visibility
+        if visible.sum() >= 4:
+            xs, ys = pose[visible, X] * width, pose[visible, Y] * height
+            track.box = np.array((xs.min(), ys.min(), xs.max(), ys.max()), np.float32)
+        return pose
+
+    def _close_engine(self, track_id):
+        engine = self.pose_engines.pop(track_id, None)
+        if engine is not None:
+            engine.close()
+
+    def rep_counts(self):
+        return {track_id: exercise.counter for track_id, exercise in self.exercises.items()}
+
+    def close(self):
+        for track_id in list(self.pose_engines):
+            self._close_engine(track_id)
+
+    @staticmethod
+    def draw(image, people):
+        """
+        Draws each person's box, id and rep count.
+        """
+        for person in people:
+            x1, y1, x2, y2 = person["box"].astype(int).tolist()
+            color = (0, 200, 0) if person["pose"] is not None else (0, 0, 200)
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+            reps = person["metrics"]["reps"] if person["metrics"] else "-"
+            cv2.putText(image, f"#{person['id']} reps: {reps}", (x1, max(15, y1 - 8)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+        return image
+
+def main():
+    import argparse
+    from exercises import EXERCISES
+
+    parser = argparse.ArgumentParser(description="Count reps for every person in a video.")
+    parser.add_argument("video", help="Path to a recorded video")
+    parser.add_argument("--exercise", default="Bicep Curl", choices=list(EXERCISES))
+    parser.add_argument("--detect-every", type=int, default=10, help="Run the person detector on every Nth frame")
+    parser.add_argument("--max-people", type=int, default=6)
+    args = parser.parse_args()
+
+    source = cv2.VideoCapture(args.video)
+    if not source.isOpened():
+        parser.error(f"Could not open {args.video}")
+    engine = MultiPersonEngine(EXERCISES[args.exercise], detect_every=args.detect_every, max_people=args.max_people)
+    try:
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            engine.process_frame(frame)
+    finally:
+        source.release()
+        engine.close()
+
+    for track_id, reps in engine.rep_counts().items():
+        print(f"person #{track_id}: {reps} reps")
+
+if __name__ == "__main__":
+    main()
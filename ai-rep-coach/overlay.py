@@ -0,0 +1,136 @@
+"""
+Rendering stage: draws the skeleton and angle labels on the camera's BGR frame and encodes it for the browser.
+
+Nothing is converted between color spaces. Frames arrive as BGR from OpenCV, the overlay colors are given in
+BGR, and cv2.imencode takes BGR, so the JPEG/WebP bytes go to st.image as they are. Positions are scaled to
+each frame's actual size. The skeleton topology never changes, so it is turned into index arrays once, and
+each frame draws every visible edge and every joint with one cv2.polylines call each, instead of one OpenCV
+call per landmark and per edge through MediaPipe's drawing utilities. FrameEncoder limits how many frames per
+second are drawn and sent at all, and downscales them to max_width before anything is drawn.
+
+    renderer, encoder = OverlayRenderer(), FrameEncoder("jpeg", quality=70, max_fps=15)
+    if encoder.due():
+        image = encoder.fit(result["image"])
+        renderer.draw(image, result["pose"], metrics["angles"])
+        FRAME_WINDOW.image(encoder.encode(image))
+"""
+import time
+
+import cv2
+import numpy as np
+
+from landmarks import POSE_CONNECTIONS, X, Y, VISIBILITY
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+class OverlayRenderer:
+    """
+    Draws the pose and the angle labels onto a BGR frame in place, at the frame's own resolution.
+        antialias: smooth lines (about 3x the drawing cost; hardly visible on a downscaled stream)
+        min_visibility: landmarks below this visibility (and their edges) are not drawn
+    Colors are BGR.
+    """
+    def __init__(self, edge_color=(66, 117, 245), joint_color=(230, 66, 245), text_color=(255, 255, 255),
+                 thickness=2, joint_radius=2, text_scale=0.5, antialias=False, min_visibility=0.5):
+        self.edge_color = edge_color
+        self.joint_color = joint_color
+        self.text_color = text_color
+        self.thickness = thickness
+        self.joint_thickness = 2 * joint_radius + 1
+        self.line_type = cv2.LINE_AA if antialias else cv2.LINE_8
+        self.min_visibility = min_visibility
+        self.text_scale = text_scale
+        self.connections = np.array(POSE_CONNECTIONS)
+        self._scale = np.ones(2, dtype=np.float32)
+
+    def draw(self, image, pose=None, angles=None):
+        """
+        pose: (33, 4) landmark array (normalized coordinates) or None
+        angles: {label: (value, position)} from Exercise.get_metrics()["angles"], positions normalized
+        Returns the image.
+        """
+        height, width = image.shape[:2]
+        self._scale[:] = width, height
+        if pose is not None:
+            self.draw_pose(image, pose)
+        if angles:
+            for label, (value, position) in angles.items():
+                if position is None:
+                    continue
+                # Short labels: cv2.putText is cheaper than stamping pre-rendered glyphs from a cache
+                cv2.putText(image, f"{label}: {int(value)}", (int(position[0] * width), int(position[1] * height)),
+                            FONT, self.text_scale, self.text_color, 2, cv2.LINE_AA)
+        return image
+
+    def draw_pose(self, image, pose):
+        visible = pose[:, VISIBILITY] >= self.min_visibility
+        points = (pose[:, [X, Y]] * self._scale).astype(np.int32)
+        # One polylines call for every edge, and one for every joint (a zero-length thick line is a dot)
+        edges = self.connections[visible[self.connections].all(axis=1)]
+        if len(edges):
+            cv2.polylines(image, points[edges], False, self.edge_color, self.thickness, self.line_type)
+        joints = points[visible]
+        if len(joints):
+            cv2.polylines(image, np.repeat(joints[:, None], 2, axis=1), False, self.joint_color,
+                          self.joint_thickness, self.line_type)
+        return image
+
+ENCODINGS = {"jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY), "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY)}
+
+class FrameEncoder:
+    """
+    Rate-limited, compressed frames for the browser.
+        format: "jpeg" (fast) or "webp" (smaller, several times slower to encode)
+        quality: 1-100
+        max_fps: frames sent per second at most; due() says whether the current one should be
+        max_width: frames wider than this are downscaled before drawing and encoding (None keeps the size)
+    stats: frames sent and skipped, bytes sent and encoding time, for the debug panel.
+    """
+    def __init__(self, format="jpeg", quality=70, max_fps=15, max_width=640):
+        if format not in ENCODINGS:
+            raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(ENCODINGS)}")
+        self.format = format
+        self.extension, flag = ENCODINGS[format]
+        self.params = [flag, int(quality)]
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.max_width = max_width
+        self.next_time = 0.0
+        self.stats = {"sent": 0, "skipped": 0, "bytes": 0, "encode_ms": 0.0}
+
+    def due(self, now=None):
+        """
+        True if a frame should be sent now; otherwise counts it as skipped. Keeps the long-run rate at max_fps.
+        """
+        now = time.perf_counter() if now is None else now
+        if now < self.next_time:
+            self.stats["skipped"] += 1
+            return False
+        # On schedule: the next slot follows this one, so jitter in frame arrival does not lower the rate.
+        # Behind by more than a slot (a stall): restart from now instead of sending a burst to catch up.
+        slot = self.next_time if now - self.next_time < self.interval else now
+        self.next_time = slot + self.interval
+        return True
+
+    def fit(self, image):
+        """
+        The frame at output size: a downscaled copy when wider than max_width, otherwise the frame itself.
+        """
+        width = image.shape[1]
+        if self.max_width and width > self.max_width:
+            height = round(image.shape[0] * self.max_width / width)
+            return cv2.resize(image, (self.max_width, height), interpolation=cv2.INTER_AREA)
+        return image
+
+    def encode(self, image):
+        """
+        Compressed bytes of a BGR frame.
+        """
+        start = time.perf_counter()
+        ok, data = cv2.imencode(self.extension, image, self.params)
+        if not ok:
+            raise ValueError(f"Could not encode a {image.shape} frame as {self.format}")
+        data = data.tobytes()
+        self.stats["encode_ms"] += (time.perf_counter() - start) * 1e3
+        self.stats["sent"] += 1
+        self.stats["bytes"] += len(data)
+        return data
@@ -0,0 +1,333 @@
+import argparse
+import threading
+import time
+from collections import deque
+
+from telemetry import Telemetry
+
+class RingBuffer:
+    """
+    Bounded, thread-safe FIFO between pipeline stages.
+    When full, put() drops the oldest item (latency stays bounded when the consumer falls behind),
+    unless block=True, in which case it waits for space (useful for offline files where every frame matters).
+    """
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item, block=False):
+        with self._cond:
+            if block:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Returns the oldest item, or None on timeout or once the buffer is closed and drained.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __len__(self):
+        return len(self._items)
+
+class StageStats:
+    """
+    Item counter with a rolling fps estimate over the last `window` items.
+    """
+    def __init__(self, window=30):
+        self.count = 0
+        self._times = deque(maxlen=window)
+
+    def tick(self):
+        self.count += 1
+        self._times.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        times = tuple(self._times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+class Pipeline:
+    """
+    Capture -> inference -> render pipeline.
+    A capture thread reads frames, an inference thread runs PoseEngine + Exercise, and the
+    consumer (the Streamlit script thread, or run_headless) pulls results with get_result().
+    Stages are connected by RingBuffers, so a slow stage drops old frames instead of stalling the others.
+
+    Each result is a dict:
+        seq, timestamp: capture order and time
+        image, results: PoseEngine.process_frame output (image is ready for drawing)
+        pose: copy of the (33, 4) landmark array (filtered, with a landmark_filter), or None if nobody was detected
+        metrics: exercise.get_metrics() snapshot, or None if nobody was detected; with a rep_segmenter it
+                 also holds "rep_summary" (rep_analytics summary of the recent reps, None before the first)
+    """
+    def __init__(self, source, pose_engine, exercise, buffer_size=2, drop_frames=True, realtime=False, recorder=None,
+                 telemetry=None, landmark_filter=None, rep_segmenter=None, session_log=None):
+        """
+        source: an opened cv2.VideoCapture (camera or video file)
+        drop_frames: drop the oldest frame when a buffer is full; False applies backpressure instead
+        realtime: pace a video file at its native fps, like a camera would
+        recorder: optional landmark_track.TrackWriter that receives every inferred pose
+        telemetry: Telemetry receiving capture/pose/exercise timings and frame counters (a private one by default)
+        landmark_filter: optional landmark_filter.LandmarkFilter applied between PoseEngine and Exercise
+        rep_segmenter: optional rep_analytics.RepSegmenter fed with every exercise update
+        session_log: optional session_store.SessionLog receiving warnings, poses and the rep_segmenter's completed reps
+        """
+        self.source = source
+        self.pose_engine = pose_engine
+        self.exercise = exercise
+        self.drop_frames = drop_frames
+        self.realtime = realtime
+        self.recorder = recorder
+        self.telemetry = telemetry or Telemetry()
+        self.landmark_filter = landmark_filter
+        self.rep_segmenter = rep_segmenter
+        self.session_log = session_log
+        # Capture times only follow the motion for live sources; a file read at full speed uses its frame times
+        self._file_fps = None
+        import cv2 # The source is a cv2.VideoCapture, so OpenCV is loaded already; kept out of module import
+        if not realtime and hasattr(source, "get") and source.get(cv2.CAP_PROP_FRAME_COUNT) > 0:
+            self._file_fps = source.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.frames = RingBuffer(buffer_size)
+        self.results = RingBuffer(buffer_size)
+        self.stage_stats = {"capture": StageStats(), "inference": StageStats(), "render": StageStats()}
+        self.error = None
+
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="pipeline-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="pipeline-inference", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout)
+
+    @property
+    def finished(self):
+        """
+        True once the source is exhausted (or failed) and every result has been consumed.
+        """
+        return self.results.closed and len(self.results) == 0
+
+    def get_result(self, timeout=None):
+        """
+        Returns the next inference result (see class docstring), or None on timeout / end of stream.
+        Raises the worker's exception if a stage crashed.
+        """
+        result = self.results.get(timeout)
+        if result is None and self.error is not None:
+            raise self.error
+        if result is not None:
+            self.stage_stats["render"].tick()
+            self._update_gauges()
+        return result
+
+    def stats(self):
+        """
+        Per-stage fps and item counts, queue depths and dropped-frame counts.
+        """
+        stats = {name: {"fps": s.fps, "count": s.count} for name, s in self.stage_stats.items()}
+        stats["frame_queue"] = {"depth": len(self.frames), "dropped": self.frames.dropped}
+        stats["result_queue"] = {"depth": len(self.results), "dropped": self.results.dropped}
+        return stats
+
+    def _update_gauges(self):
+        # Kept current by the stages themselves, so /metrics and the JSONL log see them without the debug panel
+        telemetry = self.telemetry
+        telemetry.set_gauge("frame_queue_depth", len(self.frames))
+        telemetry.set_gauge("result_queue_depth", len(self.results))
+        telemetry.set_gauge("dropped_frames", self.frames.dropped + self.results.dropped)
+
+    def _capture_loop(self):
+        seq = 0
+        interval = 0
+        if self.realtime:
+            import cv2
+            fps = self.source.get(cv2.CAP_PROP_FPS)
+            interval = 1.0 / fps if fps > 0 else 0
+        next_time = time.perf_counter()
+        telemetry = self.telemetry
+        try:
+            while not self._stop.is_set():
+                with telemetry.timer("capture"):
+                    ret, frame = self.source.read()
+                if not ret:
+                    break
+                self.stage_stats["capture"].tick()
+                self.frames.put((seq, time.time(), frame), block=not self.drop_frames)
+                self._update_gauges()
+                seq += 1
+                if interval:
+                    next_time += interval
+                    time.sleep(max(0.0, next_time - time.perf_counter()))
+        except Exception as e:
+            self.error = e
+            telemetry.record_error("capture", e)
+        finally:
+            self.frames.close()
+
+    def _inference_loop(self):
+        telemetry = self.telemetry
+        try:
+            while not self._stop.is_set():
+                item = self.frames.get()
+                if item is None:
+                    break
+                seq, timestamp, frame = item
+                with telemetry.timer("pose"):
+                    image, results, pose = self.pose_engine.process_frame(frame)
+                if self.recorder:
+                    self.recorder.append(pose, timestamp)
+                motion_time = seq / self._file_fps if self._file_fps else timestamp
+                if self.landmark_filter is not None:
+                    with telemetry.timer("filter"):
+                        pose = self.landmark_filter(pose, motion_time)
+                metrics = None
+                if pose is None:
+                    telemetry.increment("no_landmarks")
+                else:
+                    with telemetry.timer("exercise"):
+                        self.exercise.process(pose)
+                    metrics = self.exercise.get_metrics()
+                    rep = None
+                    if self.rep_segmenter is not None:
+                        rep = self.rep_segmenter.update(motion_time, metrics)
+                        metrics["rep_summary"] = self.rep_segmenter.summary()
+                    if self.session_log is not None:
+                        # Queued for the store's writer thread, never blocks
+                        self.session_log.update(motion_time, metrics, rep, pose)
+                    # The engine reuses its buffer on the next frame
+                    pose = pose.copy()
+                self.stage_stats["inference"].tick()
+                self.results.put({
+                    "seq": seq,
+                    "timestamp": timestamp,
+                    "image": image,
+                    "results": results,
+                    "pose": pose,
+                    "metrics": metrics,
+                }, block=not self.drop_frames)
+                self._update_gauges()
+        except Exception as e:
+            self.error = e
+            telemetry.record_error("inference", e)
+        finally:
+            self.results.close()
+
+def run_headless(source, pose_engine, exercise, drop_frames=False, realtime=False, on_result=None, recorder=None,
+                 landmark_filter=None, rep_segmenter=None):
+    """
+    Runs the pipeline to the end of a video source without any UI and returns the final stats.
+    on_result: optional callback called with every result (plays the role of the render stage).
+    """
+    pipeline = Pipeline(source, pose_engine, exercise, drop_frames=drop_frames, realtime=realtime,
+                        recorder=recorder, landmark_filter=landmark_filter, rep_segmenter=rep_segmenter).start()
+    try:
+        while True:
+            result = pipeline.get_result(timeout=0.5)
+            if result is None:
+                if pipeline.finished:
+                    break
+                continue
+            if on_result:
+                on_result(result)
+    finally:
+        pipeline.stop()
+    return pipeline.stats()
+
+def main():
+    import cv2
+    from exercises import EXERCISES
+    from pose_engine import PoseEngine
+    from rep_analytics import RepSegmenter
+
+    parser = argparse.ArgumentParser(description="Run the capture/inference pipeline headless on a video file.")
+    parser.add_argument("video", help="Path to a recorded video")
+    parser.add_argument("--exercise", default="Bicep Curl", choices=list(EXERCISES))
+    parser.add_argument("--realtime", action="store_true", help="Pace the file at its native fps and drop frames like a live camera")
+    parser.add_argument("--record", metavar="TRACK_DIR", help="Save the inferred landmarks as a replayable track")
+    parser.add_argument("--inference-size", type=int, help="Downscale frames to this longer side before detection")
+    parser.add_argument("--detect-every", type=int, default=1, help="Run detection on every Nth frame only")
+    parser.add_argument("--latency-budget", type=float, metavar="MS",
+                        help="Pick model complexity and detection interval to stay within this many ms per frame")
+    parser.add_argument("--filter", choices=["one_euro", "kalman"], help="Smooth landmarks before the exercise logic")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=[0, 1, 2])
+    args = parser.parse_args()
+
+    source = cv2.VideoCapture(args.video)
+    if not source.isOpened():
+        parser.error(f"Could not open {args.video}")
+    exercise = EXERCISES[args.exercise]()
+    rep_segmenter = RepSegmenter.for_exercise(args.exercise)
+    recorder = None
+    if args.record:
+        from landmark_track import TrackWriter
+        recorder = TrackWriter(args.record, fps=source.get(cv2.CAP_PROP_FPS) or None,
+                               metadata={"source": args.video, "exercise": args.exercise})
+    try:
+        pose_engine = PoseEngine(model_complexity=args.model_complexity, inference_size=args.inference_size,
+                                 detect_every=args.detect_every, latency_budget_ms=args.latency_budget)
+        landmark_filter = None
+        if args.filter:
+            from landmark_filter import LandmarkFilter
+            landmark_filter = LandmarkFilter(args.filter)
+        stats = run_headless(source, pose_engine, exercise, drop_frames=args.realtime, realtime=args.realtime,
+                             recorder=recorder, landmark_filter=landmark_filter, rep_segmenter=rep_segmenter)
+    finally:
+        source.release()
+        if recorder:
+            recorder.close()
+
+    print(f"{exercise.name}: {exercise.counter} reps")
+    rep_segmenter.flush()
+    for rep in rep_segmenter.recent():
+        print(f"  rep {rep['index']}: {rep['duration']:.2f}s, concentric {rep['concentric']:.2f}s, "
+              f"eccentric {rep['eccentric']:.2f}s, range {rep['min_angle']:.0f}-{rep['max_angle']:.0f} deg"
+              + (f", {'; '.join(rep['warnings'])}" if rep["warnings"] else ""))
+    for name, values in stats.items():
+        print(f"{name}: {values}")
+    if pose_engine.last_error:
+        print(pose_engine.last_error)
+
+if __name__ == "__main__":
+    main()
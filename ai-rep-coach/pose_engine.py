@@ -1,32 +1,164 @@
-import mediapipe as mp
+import time
+
 import cv2
 import numpy as np
+from adaptive import AdaptiveController, LandmarkExtrapolator
+from landmarks import new_pose_array, landmarks_to_array
+
+class PredictedResults:
+    """
+    Stands in for MediaPipe results on frames where detection was skipped.
+    The landmark list is only built if something (e.g. draw_landmarks) asks for it.
+    """
+    def __init__(self, pose):
+        self.pose = pose.copy()
+        self._landmarks = None
+
+    @property
+    def pose_landmarks(self):
+        if self._landmarks is None:
+            from mediapipe.framework.formats import landmark_pb2
+            self._landmarks = landmark_pb2.NormalizedLandmarkList()
+            for x, y, z, visibility in self.pose.tolist():
+                self._landmarks.landmark.add(x=x, y=y, z=z, visibility=visibility)
+        return self._landmarks
 
 class PoseEngine:
-    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=1,
+                 inference_size=None, detect_every=1, latency_budget_ms=None, static_image_mode=False):
+        """
+        inference_size: downscale frames so their longer side is at most this many pixels before detection
+                        (landmarks are normalized, so they map straight back onto the full frame)
+        detect_every: run detection on every Nth frame and extrapolate the landmarks in between
+        latency_budget_ms: pick model_complexity and detect_every automatically to keep the average
+                           inference cost per frame within this budget (overrides both arguments)
+        static_image_mode: treat every frame as unrelated (no tracking between frames), for engines shared
+                           by several video streams
+        """
+        # MediaPipe takes about a second to import, so it is only loaded once an engine is actually created
+        import mediapipe as mp
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=min_detection_confidence,
-            min_tracking_confidence=min_tracking_confidence
-        )
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.inference_size = inference_size
+        self.static_image_mode = static_image_mode
+        self.controller = None
+        if latency_budget_ms:
+            self.controller = AdaptiveController(latency_budget_ms)
+            model_complexity = self.controller.model_complexity
+            detect_every = self.controller.detect_every
+        self.model_complexity = model_complexity
+        self.detect_every = detect_every
+        self.pose = self._create_pose(model_complexity)
         self.mp_drawing = mp.solutions.drawing_utils
+        # Reused every frame; see process_frame
+        self.pose_array = new_pose_array()
+        self.extrapolator = LandmarkExtrapolator(max_gap=max(AdaptiveController.LEVELS[-1][1], detect_every))
+        self.frame_index = -1
+        self.last_detection_ms = None
+        self.last_error = None # Why the adaptive mode could not switch models, if it could not
+
+    def _create_pose(self, model_complexity):
+        return self.mp_pose.Pose(
+            static_image_mode=self.static_image_mode,
+            model_complexity=model_complexity,
+            min_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence
+        )
 
     def process_frame(self, frame):
         """
         Processes a video frame and returns the landmarks.
+        Returns:
+            image: BGR image for drawing (the input frame itself; drawing on it modifies the caller's frame)
+            results: raw MediaPipe results, or PredictedResults on frames where detection was skipped
+            pose: (33, 4) float32 array of (x, y, z, visibility), or None if no person was detected.
+                  This is the engine's preallocated buffer, overwritten on the next call; copy it to keep it.
         """
+        self.frame_index += 1
+        index = self.frame_index
+        if self.detect_every > 1 and index % self.detect_every and self.extrapolator.can_predict(index):
+            pose = self.extrapolator.predict(index, self.pose_array)
+            return frame, PredictedResults(pose), pose
+
+        start = time.perf_counter()
+        # Downscale first, so the color conversion and detection both run on the small image
+        image = frame
+        if self.inference_size:
+            height, width = frame.shape[:2]
+            scale = self.inference_size / max(height, width)
+            if scale < 1:
+                image = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
         # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         image.flags.writeable = False
-      
+
         # Make detection
         results = self.pose.process(image)
-    
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        return image, results
+
+        pose = None
+        if results.pose_landmarks:
+            pose = landmarks_to_array(results.pose_landmarks.landmark, out=self.pose_array)
+        self.extrapolator.update(index, pose)
+
+        elapsed = time.perf_counter() - start
+        self.last_detection_ms = elapsed * 1e3
+        if self.controller and self.controller.update(elapsed):
+            self._apply_level()
+
+        # The original frame is already BGR, so there is no need to convert the RGB copy back for drawing
+        return frame, results, pose
+
+    def warm_up(self, frames=1, size=(480, 640)):
+        """
+        Runs the model on blank frames so the first real frame does not pay for initializing the graph and its
+        TFLite delegates (a few hundred ms), e.g. in a worker before it takes jobs. The adaptive controller never
+        sees these frames. Returns the seconds it took.
+        """
+        start = time.perf_counter()
+        height, width = size
+        if self.inference_size:
+            scale = min(1.0, self.inference_size / max(height, width))
+            height, width = round(height * scale), round(width * scale)
+        blank = np.zeros((height, width, 3), dtype=np.uint8)
+        for _ in range(frames):
+            self.pose.process(blank)
+        # Nobody was detected, so there is no tracking state to clear (and pose.reset() would restart the graph)
+        self.extrapolator.reset()
+        self.frame_index = -1
+        return time.perf_counter() - start
+
+    def _apply_level(self):
+        self.detect_every = self.controller.detect_every
+        if self.controller.model_complexity != self.model_complexity:
+            # Loading another model takes a while (and may download it on first use), but happens rarely
+            try:
+                pose = self._create_pose(self.controller.model_complexity)
+                # Initialize it here, so the controller does not time the model load as a slow frame
+                pose.process(np.zeros((64, 64, 3), dtype=np.uint8))
+            except Exception as e:
+                self.last_error = f"Could not load pose model_complexity={self.controller.model_complexity}: {e}"
+                self.controller.replace_complexity(self.controller.model_complexity, self.model_complexity)
+                self.detect_every = self.controller.detect_every
+                return
+            self.pose.close()
+            self.pose = pose
+            self.model_complexity = self.controller.model_complexity
+            self.extrapolator.reset()
+
+    def reset(self):
+        """
+        Clears MediaPipe's tracking state, e.g. before starting on a new video.
+        """
+        self.pose.reset()
+        self.extrapolator.reset()
+        self.frame_index = -1
+
+    def close(self):
+        """
+        Releases the MediaPipe graph, e.g. when a tracked person leaves the frame.
+        """
+        self.pose.close()
 
     def draw_landmarks(self, image, results):
         """
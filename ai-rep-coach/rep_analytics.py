@@ -0,0 +1,212 @@
+"""
+Per-rep analytics: segments the stream of exercise metrics into reps and keeps a summary of each.
+
+RepSegmenter.update(timestamp, metrics) is called after every Exercise.process. A rep runs from entering the
+start stage (e.g. "down" for a curl) to returning to it after the counter went up, and its record holds:
+    start, end               timestamps (seconds)
+    min_angle, max_angle     range of motion of the counting angle
+    concentric, eccentric    seconds spent moving toward / away from the definition's "concentric" stage: from
+                             leaving one turning point (the last frame within turn_tolerance degrees of it) until
+                             the opposite stage is reached, so pauses at the top and bottom are not counted
+    warnings                 form warnings raised at any point during the rep
+Completed reps go into a fixed-size ring of numpy records, so memory stays constant over a long session
+and each frame costs a few comparisons. summary() is the compact view used by the UI and the coach prompt.
+"""
+import numpy as np
+
+from rule_engine import load_definitions
+
+REP_DTYPE = np.dtype([
+    ("index", np.int32), ("start", np.float64), ("end", np.float64), ("min_angle", np.float32),
+    ("max_angle", np.float32), ("concentric", np.float32), ("eccentric", np.float32),
+    ("warnings", np.uint64), ("frames", np.int32),
+])
+MAX_WARNING_TYPES = 64 # One bit per distinct warning message in a record
+
+class RepSegmenter:
+    """
+    Incremental rep segmentation for one exercise.
+        angle_label: angle in metrics["angles"] to measure (default: the first one)
+        concentric_stage: stage the concentric (lifting) phase moves toward, e.g. "up"; if None the phase
+                          toward the end stage is reported as concentric
+        capacity: completed reps kept
+        turn_tolerance: degrees from the extreme angle that still count as resting at a turning point
+    """
+    def __init__(self, angle_label=None, concentric_stage=None, capacity=64, turn_tolerance=10.0):
+        self.angle_label = angle_label
+        self.concentric_stage = concentric_stage
+        self.capacity = capacity
+        self.turn_tolerance = turn_tolerance
+        self.records = np.zeros(capacity, dtype=REP_DTYPE)
+        self.warning_bits = {} # message -> bit
+        self.reset()
+
+    @classmethod
+    def for_exercise(cls, exercise_name, definitions=None, **options):
+        """
+        Segmenter using the counting angle and concentric stage of an exercise definition, when there is one.
+        """
+        definitions = definitions if definitions is not None else load_definitions()
+        count = definitions.get(exercise_name, {}).get("count", {})
+        return cls(count.get("angle"), count.get("concentric"), **options)
+
+    def reset(self):
+        self.total = 0
+        self.last_reps = 0
+        self.last_stage = None
+        self.last_timestamp = None
+        self.start_stage = None
+        self._open = False
+        self._summary = None
+
+    def _open_rep(self, timestamp, angle):
+        self._open = True
+        self._start = timestamp
+        self._min = self._max = angle
+        self._near_min_time = self._near_max_time = timestamp # Last frame close to the lowest / highest angle
+        self._first_angle = angle
+        self._warnings = 0
+        self._frames = 0
+        self._count_time = None
+        self._toward_end = 0.0
+        self._end_stage = None
+
+    def update(self, timestamp, metrics):
+        """
+        Advances by one frame of Exercise.get_metrics(). Returns the record of a rep completed on this frame, or None.
+        """
+        angles = metrics["angles"]
+        label = self.angle_label if self.angle_label in angles else next(iter(angles), None)
+        if label is None:
+            return None
+        angle = float(angles[label][0])
+        reps, stage = metrics["reps"], metrics["stage"]
+        completed = None
+        self.last_timestamp = timestamp
+
+        if reps < self.last_reps:
+            # Counter reset, or a different exercise took over (auto-detection): start over
+            self._open = False
+            self.start_stage = None
+        if self._open:
+            self._frames += 1
+            self._min = min(self._min, angle)
+            self._max = max(self._max, angle)
+            if angle <= self._min + self.turn_tolerance:
+                self._near_min_time = timestamp
+            if angle >= self._max - self.turn_tolerance:
+                self._near_max_time = timestamp
+            for message in metrics["warnings"]:
+                self._warnings |= self._warning_bit(message)
+
+        if reps > self.last_reps:
+            if self.last_stage is not None and self.last_stage != stage:
+                self.start_stage = self.last_stage
+            if not self._open:
+                self._open_rep(timestamp, angle)
+            # Moving toward the end stage began when the angle left the start-side turning point
+            self._end_is_low = angle < self._first_angle
+            self._count_time = timestamp
+            self._toward_end = timestamp - (self._near_max_time if self._end_is_low else self._near_min_time)
+            self._end_stage = stage
+        elif stage != self.last_stage and stage is not None:
+            if self._open and self._count_time is not None and stage == self.start_stage:
+                completed = self._close_rep(timestamp)
+            if not self._open and (self.start_stage is None or stage == self.start_stage):
+                self._open_rep(timestamp, angle)
+
+        self.last_reps, self.last_stage = reps, stage
+        return completed
+
+    def flush(self, timestamp=None):
+        """
+        Closes a rep that was counted but has not returned to the start stage (e.g. the end of a set).
+        """
+        timestamp = self.last_timestamp if timestamp is None else timestamp
+        if self._open and self._count_time is not None:
+            return self._close_rep(timestamp)
+        return None
+
+    def _warning_bit(self, message):
+        bit = self.warning_bits.get(message)
+        if bit is None:
+            if len(self.warning_bits) >= MAX_WARNING_TYPES:
+                return 0
+            bit = self.warning_bits[message] = 1 << len(self.warning_bits)
+        return bit
+
+    def _close_rep(self, timestamp):
+        # The way back began when the angle left the end-side turning point, after the count
+        turn_time = self._near_min_time if self._end_is_low else self._near_max_time
+        toward_end, returning = self._toward_end, timestamp - max(turn_time, self._count_time)
+        concentric_first = self.concentric_stage is None or self.concentric_stage == self._end_stage
+        record = self.records[self.total % self.capacity]
+        record["index"] = self.total + 1
+        record["start"], record["end"] = self._start, timestamp
+        record["min_angle"], record["max_angle"] = self._min, self._max
+        record["concentric"], record["eccentric"] = (toward_end, returning) if concentric_first else (returning, toward_end)
+        record["warnings"], record["frames"] = self._warnings, self._frames
+        self.total += 1
+        self._open = False
+        self._summary = None
+        return self._as_dict(record)
+
+    def _as_dict(self, record):
+        messages = [message for message, bit in self.warning_bits.items() if int(record["warnings"]) & bit]
+        return {
+            "index": int(record["index"]),
+            "start": float(record["start"]),
+            "end": float(record["end"]),
+            "duration": round(float(record["end"] - record["start"]), 2),
+            "min_angle": round(float(record["min_angle"]), 1),
+            "max_angle": round(float(record["max_angle"]), 1),
+            "range": round(float(record["max_angle"] - record["min_angle"]), 1),
+            "concentric": round(float(record["concentric"]), 2),
+            "eccentric": round(float(record["eccentric"]), 2),
+            "warnings": messages,
+        }
+
+    def recent(self, count=None):
+        """
+        The last `count` completed reps (default: all kept), oldest first, as dicts.
+        """
+        kept = min(self.total, self.capacity)
+        count = kept if count is None else min(count, kept)
+        return [self._as_dict(self.records[index % self.capacity]) for index in range(self.total - count, self.total)]
+
+    def summary(self, window=5):
+        """
+        Compact statistics over the last `window` reps, recomputed only after a rep completes:
+        {"reps", "last", "avg_concentric", "avg_eccentric", "avg_range", "range_change", "warned_reps"} or None.
+        range_change compares the newest rep's range of motion with the oldest in the window (fatigue shows as < 0).
+        """
+        if not self.total:
+            return None
+        if self._summary is None or self._summary[0] != window:
+            kept = min(self.total, self.capacity, window)
+            records = self.records[[index % self.capacity for index in range(self.total - kept, self.total)]]
+            ranges = records["max_angle"] - records["min_angle"]
+            self._summary = window, {
+                "reps": self.total,
+                "last": self._as_dict(records[-1]),
+                "avg_concentric": round(float(records["concentric"].mean()), 2),
+                "avg_eccentric": round(float(records["eccentric"].mean()), 2),
+                "avg_range": round(float(ranges.mean()), 1),
+                "range_change": round(float(ranges[-1] - ranges[0]), 1),
+                "warned_reps": int(np.count_nonzero(records["warnings"])),
+            }
+        return self._summary[1]
+
+def format_rep_summary(summary):
+    """
+    One-line text of a summary() for prompts and the UI.
+    """
+    last = summary["last"]
+    text = (f"last rep {last['concentric']:.1f}s concentric / {last['eccentric']:.1f}s eccentric, "
+            f"range {last['min_angle']:.0f}-{last['max_angle']:.0f} deg; "
+            f"avg {summary['avg_concentric']:.1f}s / {summary['avg_eccentric']:.1f}s, range {summary['avg_range']:.0f} deg")
+    if summary["range_change"] <= -10:
+        text += f", range shrinking by {-summary['range_change']:.0f} deg"
+    if summary["warned_reps"]:
+        text += f", {summary['warned_reps']} recent reps with form warnings"
+    return text
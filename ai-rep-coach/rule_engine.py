@@ -0,0 +1,326 @@
+"""
+Declarative exercises: definitions (exercises.json, or YAML) compiled into one vectorized rule engine.
+
+A definition lists named angles (three points each: a landmark name, or a derived point such as
+{"mid": ["LEFT_SHOULDER", "RIGHT_SHOULDER"], "offset": [0, -0.5]}), a counting rule with two stages
+(hysteresis: entering the start stage arms the counter, reaching the end stage counts a rep) and form rules.
+Conditions are one of "above", "below", "at_least", "at_most", "between" [lo, hi] or "outside" [lo, hi].
+
+Hysteresis is configurable per stage transition and per form rule, on top of the two-stage counting:
+    "margin": degrees past the threshold before a stage is entered (e.g. above 160 with margin 5 needs > 165)
+    "frames": consecutive frames the condition must hold before the stage is entered or the warning raised
+    "band": degrees back past its threshold before a form warning clears (form rules only)
+RuleEngine(definitions, hysteresis={...}) sets defaults for every transition and rule that doesn't set its own.
+The count rule may also name its "concentric" stage (the one the lifting phase moves toward), for rep_analytics.py.
+
+RuleEngine compiles any number of definitions into arrays, so each frame is one small matrix product for the
+points, one calculate_angles call for every angle of every exercise, and array comparisons for every stage
+and form rule. That makes it cheap to track many exercises on the same landmarks (e.g. for auto-detection);
+RuleExercise wraps a single definition behind the usual Exercise interface.
+
+Definitions name left-side landmarks; the engine also evaluates their mirror image (every landmark swapped with
+its right-side counterpart), so RuleExercise and AutoExercise follow the better visible side and skip frames
+where neither side is visible enough, like the hand-written exercises.
+"""
+import json
+import os
+
+import numpy as np
+
+import landmarks
+from exercises import Exercise
+from landmarks import MIRROR, NUM_LANDMARKS
+from utils import calculate_angles
+
+DEFINITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exercises.json")
+
+def load_definitions(path=DEFINITIONS_PATH):
+    """
+    Reads exercise definitions {name: definition} from JSON, or from YAML if PyYAML is installed.
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is needed for YAML exercise definitions (pip install pyyaml)")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def landmark_index(name):
+    index = getattr(landmarks, name, None) if isinstance(name, str) and name.isupper() else None
+    if not isinstance(index, int) or not 0 <= index < NUM_LANDMARKS:
+        raise ValueError(f"Unknown landmark {name!r}")
+    return index
+
+def compile_condition(condition, where):
+    """
+    Returns (lo, hi, negate): the condition holds when (lo < angle < hi) != negate.
+    Inclusive bounds are widened to the next float so every test is a strict comparison.
+    """
+    if "above" in condition:
+        return float(condition["above"]), np.inf, False
+    if "below" in condition:
+        return -np.inf, float(condition["below"]), False
+    if "at_least" in condition:
+        return np.nextafter(float(condition["at_least"]), -np.inf), np.inf, False
+    if "at_most" in condition:
+        return -np.inf, np.nextafter(float(condition["at_most"]), np.inf), False
+    for key, negate in (("between", False), ("outside", True)):
+        if key in condition:
+            lo, hi = map(float, condition[key])
+            return np.nextafter(lo, -np.inf), np.nextafter(hi, np.inf), negate
+    raise ValueError(f"{where}: no condition (above, below, at_least, at_most, between or outside)")
+
+def widen(lo, hi, negate, degrees):
+    """
+    Bounds of a compiled condition that holds `degrees` further out (negative: only well inside it).
+    """
+    if negate:
+        degrees = -degrees
+    return lo - degrees, hi + degrees, negate
+
+def condition_arrays(conditions):
+    """
+    Stacks compiled conditions into (lo, hi, negate) arrays.
+    """
+    return (np.array([c[0] for c in conditions], dtype=np.float64),
+            np.array([c[1] for c in conditions], dtype=np.float64),
+            np.array([c[2] for c in conditions], dtype=bool))
+
+def in_range(values, lo, hi, negate):
+    return ((values > lo) & (values < hi)) != negate
+
+def run_length(runs, holds):
+    """
+    Advances consecutive-frame counters in place: +1 where the condition holds, 0 where it doesn't.
+    """
+    runs += 1
+    runs[~holds] = 0
+    return runs
+
+class RuleEngine:
+    """
+    Tracks the stage, rep count and form warnings of every definition at once.
+        engine = RuleEngine(load_definitions())
+        engine.process(pose)
+        engine.metrics("Squat")
+    hysteresis: default {"margin", "frames", "band"} for transitions and form rules that don't set them.
+    bilateral: False if the definitions only use landmarks of both sides together (mirroring changes nothing);
+               visibility_weights then has a single row instead of one per side.
+    """
+    def __init__(self, definitions, hysteresis=None):
+        self.names = list(definitions)
+        defaults = {"margin": 0.0, "frames": 1, "band": 0.0}
+        defaults.update(hysteresis or {})
+
+        def option(rule, key):
+            return rule.get(key, defaults[key])
+
+        weights, offsets, point_keys = [], [], {}
+
+        def point(spec, where):
+            key = json.dumps(spec, sort_keys=True)
+            if key not in point_keys:
+                row = np.zeros(NUM_LANDMARKS)
+                offset = np.zeros(2)
+                if isinstance(spec, dict):
+                    members = spec.get("mid")
+                    if not members:
+                        raise ValueError(f"{where}: derived points need a 'mid' list of landmarks")
+                    for name in members:
+                        row[landmark_index(name)] += 1.0 / len(members)
+                    offset[:] = spec.get("offset", (0, 0))
+                else:
+                    row[landmark_index(spec)] = 1.0
+                point_keys[key] = len(weights)
+                weights.append(row)
+                offsets.append(offset)
+            return point_keys[key]
+
+        triplets, triplet_keys = [], {}
+        self.angle_columns = [] # Per exercise: {label: angle column}
+        self.label_points = [] # Per exercise: {label: point row used to place the label}
+        self.stage_names = []
+        count_columns, starts, ends, start_frames, end_frames = [], [], [], [], []
+        form_exercise, form_columns, forms, releases, form_frames, self.form_messages = [], [], [], [], [], []
+        for name, definition in definitions.items():
+            columns, label_points = {}, {}
+            for label, angle in definition["angles"].items():
+                where = f"{name}/{label}"
+                if len(angle.get("points", ())) != 3:
+                    raise ValueError(f"{where}: an angle needs three points")
+                rows = tuple(point(spec, where) for spec in angle["points"])
+                if rows not in triplet_keys:
+                    triplet_keys[rows] = len(triplets)
+                    triplets.append(rows)
+                columns[label] = triplet_keys[rows]
+                label_points[label] = point(angle["label_at"], where) if "label_at" in angle else rows[1]
+            self.angle_columns.append(columns)
+            self.label_points.append(label_points)
+
+            count = definition["count"]
+            if count["angle"] not in columns:
+                raise ValueError(f"{name}: count uses unknown angle {count['angle']!r}")
+            count_columns.append(columns[count["angle"]])
+            for key, conditions, frames in (("start", starts, start_frames), ("end", ends, end_frames)):
+                condition = compile_condition(count[key], f"{name}/count/{key}")
+                conditions.append(widen(*condition, -option(count[key], "margin")))
+                frames.append(option(count[key], "frames"))
+            self.stage_names.append((count["start"]["stage"], count["end"]["stage"]))
+
+            for rule in definition.get("form", ()):
+                if rule["angle"] not in columns:
+                    raise ValueError(f"{name}: form rule uses unknown angle {rule['angle']!r}")
+                form_exercise.append(len(self.stage_names) - 1)
+                form_columns.append(columns[rule["angle"]])
+                condition = compile_condition(rule, f"{name}/form")
+                forms.append(condition)
+                releases.append(widen(*condition, option(rule, "band")))
+                form_frames.append(option(rule, "frames"))
+                self.form_messages.append(rule["message"])
+
+        self.weights = np.array(weights).reshape(-1, NUM_LANDMARKS)
+        self.offsets = np.array(offsets).reshape(-1, 2)
+        # Side 1 reads the mirrored landmark of every point
+        self.side_weights = np.stack([self.weights, self.weights[:, MIRROR]])
+        referenced = np.flatnonzero(self.weights.any(axis=0))
+        self.bilateral = not np.array_equal(np.sort(MIRROR[referenced]), referenced)
+        sides = (referenced, MIRROR[referenced]) if self.bilateral else (referenced,)
+        # Mean visibility of each side's landmarks, as Exercise.visibility_weights
+        self.visibility_weights = np.zeros((len(sides), NUM_LANDMARKS), dtype=np.float32)
+        for row, indices in enumerate(sides):
+            self.visibility_weights[row, indices] = 1.0 / max(len(indices), 1)
+        self.triplets = np.array(triplets, dtype=np.intp).reshape(-1, 3)
+        self.count_columns = np.array(count_columns, dtype=np.intp)
+        self.start_lo, self.start_hi, self.start_negate = condition_arrays(starts)
+        self.end_lo, self.end_hi, self.end_negate = condition_arrays(ends)
+        self.start_frames = np.array(start_frames, dtype=np.int64)
+        self.end_frames = np.array(end_frames, dtype=np.int64)
+        self.form_exercise = np.array(form_exercise, dtype=np.intp)
+        self.form_columns = np.array(form_columns, dtype=np.intp)
+        self.form_lo, self.form_hi, self.form_negate = condition_arrays(forms)
+        self.release_lo, self.release_hi, _ = condition_arrays(releases)
+        self.form_frames = np.array(form_frames, dtype=np.int64)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self.reset()
+
+    def reset(self):
+        count = len(self.names)
+        self.stage = np.full(count, -1, dtype=np.int8) # -1 = not started, 0 = start stage, 1 = end stage
+        self.counters = np.zeros(count, dtype=np.int64)
+        self.warnings = np.zeros(len(self.form_columns), dtype=bool)
+        # Consecutive frames each start/end condition and form rule has held, for the "frames" option
+        self.start_run = np.zeros(count, dtype=np.int64)
+        self.end_run = np.zeros(count, dtype=np.int64)
+        self.form_run = np.zeros(len(self.form_columns), dtype=np.int64)
+        self.angles = np.zeros(len(self.triplets))
+        self.points = np.zeros((len(self.weights), 2))
+
+    def compute_points(self, pose, side=0):
+        """
+        (P, 2) positions of every referenced point, or (T, P, 2) for a (T, 33, 4) batch of poses.
+        side: 0 for the landmarks as defined, 1 for their mirror image (the right side)
+        """
+        return np.matmul(self.side_weights[side], pose[..., :2].astype(np.float64)) + self.offsets
+
+    def compute_angles(self, pose, side=0):
+        """
+        Every angle of every definition, (A,) for one pose or (T, A) for a batch, in one calculate_angles call.
+        """
+        points = self.compute_points(pose, side)
+        return calculate_angles(points[..., self.triplets, :]), points
+
+    def update(self, angles):
+        """
+        Advances every stage machine by one frame of angles and evaluates every form rule.
+        Returns a boolean array of the exercises that completed a rep on this frame.
+        """
+        counted_angles = angles[self.count_columns]
+        stage = self.stage
+        stage[run_length(self.start_run, in_range(counted_angles, self.start_lo, self.start_hi, self.start_negate))
+              >= self.start_frames] = 0
+        counted = ((run_length(self.end_run, in_range(counted_angles, self.end_lo, self.end_hi, self.end_negate))
+                    >= self.end_frames) & (stage == 0))
+        stage[counted] = 1
+        self.counters += counted
+        form_angles = angles[self.form_columns]
+        raised = run_length(self.form_run, in_range(form_angles, self.form_lo, self.form_hi, self.form_negate))
+        # A raised warning stays until the angle is back past its threshold by the release band
+        held = self.warnings & in_range(form_angles, self.release_lo, self.release_hi, self.form_negate)
+        self.warnings = (raised >= self.form_frames) | held
+        return counted
+
+    def process(self, pose, side=0):
+        """
+        Updates every exercise from one (33, 4) pose array, on the given side, and returns the boolean array of
+        completed reps.
+        """
+        self.angles, self.points = self.compute_angles(pose, side)
+        return self.update(self.angles)
+
+    def stage_name(self, index):
+        code = self.stage[index]
+        return self.stage_names[index][code] if code >= 0 else None
+
+    def metrics(self, name):
+        """
+        Exercise.get_metrics() style dict for one definition, from the last processed frame.
+        """
+        index = self._index[name]
+        return {
+            "reps": int(self.counters[index]),
+            "stage": self.stage_name(index),
+            "warnings": [self.form_messages[i] for i in np.flatnonzero(self.warnings & (self.form_exercise == index))],
+            "angles": {label: (self.angles[column], self.points[self.label_points[index][label]].tolist())
+                       for label, column in self.angle_columns[index].items()},
+        }
+
+def follow_engine_sides(exercise, engine):
+    """
+    Makes an Exercise choose its side (Exercise.visible_sides) from the landmarks a RuleEngine reads.
+    """
+    exercise.visibility_weights = engine.visibility_weights
+    if not engine.bilateral:
+        exercise.BILATERAL = False
+        exercise.fixed_side = None
+
+class RuleExercise(Exercise):
+    """
+    An Exercise defined by a declarative definition instead of Python code.
+    side, min_visibility, side_margin: as for Exercise (per_side is not supported)
+    """
+    def __init__(self, name, definitions=None, hysteresis=None, side="auto", min_visibility=0.5, side_margin=0.1):
+        super().__init__(name, side=side, min_visibility=min_visibility, side_margin=side_margin)
+        definitions = definitions if definitions is not None else load_definitions()
+        if name not in definitions:
+            raise KeyError(f"No exercise definition named {name!r}")
+        self.engine = RuleEngine({name: definitions[name]}, hysteresis)
+        follow_engine_sides(self, self.engine)
+
+    def process(self, pose):
+        pose = self.as_pose_array(pose)
+        sides = self.visible_sides(pose)
+        if not sides:
+            self.form_warnings, self.angles = [], {}
+            return self.angles, None
+        self.side = sides[0]
+        self.engine.process(pose, self.side)
+        metrics = self.engine.metrics(self.name)
+        self.counter = metrics["reps"]
+        self.stage = metrics["stage"]
+        self.form_warnings = metrics["warnings"]
+        self.angles = metrics["angles"]
+        first = next(iter(self.angles.values()), (None, None))
+        return self.angles, first[1]
+
+    def reset(self):
+        super().reset()
+        self.engine.reset()
+
+def rule_exercises(definitions=None, hysteresis=None):
+    """
+    {name: factory} for every definition, in file order, like exercises.EXERCISES.
+    """
+    definitions = definitions if definitions is not None else load_definitions()
+    return {name: (lambda name=name: RuleExercise(name, definitions, hysteresis)) for name in definitions}
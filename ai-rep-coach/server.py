@@ -0,0 +1,527 @@
+"""
+Multi-session inference server: many clients stream frames over HTTP to one shared pool of pose workers.
+
+    POST   /sessions                  {"exercise": "Bicep Curl"} -> {"session_id": ...}
+    POST   /sessions/<id>/frames      JPEG/PNG body; ?wait=1 waits for this frame's result
+    POST   /sessions/<id>/landmarks   binary landmark packets from on-device detection (landmark_ingest.py)
+    GET    /sessions/<id>             latest metrics of the session
+    DELETE /sessions/<id>
+    GET    /stats                     sessions, queues, dropped frames and stage latencies
+
+Each session keeps its own Exercise state, while the pose workers (one PoseEngine each) are shared.
+Frames are scheduled round-robin across sessions with at most one frame per session in flight, so a
+session sending faster than the workers can keep up only drops its own oldest frames and cannot starve
+the others.
+
+Coach feedback (with --coach-url, or GEMINI_API_KEY set) goes through one CoachDispatcher, which answers the
+sessions waiting for feedback in batched model calls under a shared calls-per-minute limit.
+
+Run from the ai-rep-coach directory:
+    python server.py --port 8600 --workers 4
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from exercises import EXERCISES
+from landmark_ingest import ReorderBuffer, decode_packets
+from rep_analytics import RepSegmenter
+from telemetry import Telemetry
+
+class FairScheduler:
+    """
+    Per-session FIFO queues served round-robin.
+    add() registers a session and remove() forgets it; submit() refuses sessions that are not registered, so a
+    late frame cannot bring back the queue of a session that was just removed.
+    submit() keeps at most `per_session` queued items per session (dropping the oldest, which it returns);
+    next_batch() hands out the head item of up to `max_batch` different sessions; a session is not served
+    again until done() is called for it, so each session's items are processed one at a time and in order.
+    """
+    def __init__(self, per_session=2):
+        self.per_session = per_session
+        self.dropped = 0
+        self._queues = {}
+        self._ready = deque() # Sessions with queued items and nothing in flight, in round-robin order
+        self._scheduled = set() # Sessions in _ready or in flight
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def add(self, key):
+        with self._cond:
+            self._queues.setdefault(key, deque())
+
+    def submit(self, key, item):
+        """
+        Queues an item for a session added with add(). Returns the item dropped to make room, or None.
+        Raises KeyError for a session that was never added or was removed.
+        """
+        with self._cond:
+            queue = self._queues.get(key)
+            if queue is None:
+                raise KeyError(key)
+            dropped = None
+            if len(queue) >= self.per_session:
+                dropped = queue.popleft()
+                self.dropped += 1
+            queue.append(item)
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                self._ready.append(key)
+                self._cond.notify()
+            return dropped
+
+    def next_batch(self, max_batch=1, timeout=None):
+        """
+        Returns a list of (key, item) from distinct sessions; empty on timeout or once closed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready or self._closed, timeout):
+                return []
+            batch = []
+            while self._ready and len(batch) < max_batch:
+                key = self._ready.popleft()
+                queue = self._queues.get(key)
+                if not queue: # Session removed while it was waiting
+                    self._scheduled.discard(key)
+                    continue
+                batch.append((key, queue.popleft()))
+            return batch
+
+    def done(self, key):
+        with self._cond:
+            if self._queues.get(key):
+                self._ready.append(key)
+                self._cond.notify()
+            else:
+                self._scheduled.discard(key)
+
+    def remove(self, key):
+        """
+        Forgets a session and returns its queued items.
+        """
+        with self._cond:
+            return list(self._queues.pop(key, ()))
+
+    def depth(self):
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+class FrameJob:
+    __slots__ = ("frame", "submitted", "done", "result")
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+class Session:
+    def __init__(self, session_id, exercise_name, coach=None):
+        self.id = session_id
+        self.exercise_name = exercise_name
+        self.exercise = EXERCISES[exercise_name]()
+        self.reps = RepSegmenter.for_exercise(exercise_name)
+        self.metrics = self.exercise.get_metrics()
+        self.metrics["rep_summary"] = None
+        self.coach = coach
+        self.feedback = None
+        self.frames = 0
+        self.last_seen = time.time()
+        self.reorder = ReorderBuffer() # For landmark packets, which may arrive out of order
+        self.last_timestamp = None # Client capture time of the newest applied landmark packet
+        self.lock = threading.Lock() # Poses of one session are applied one at a time, in order
+
+    def apply(self, pose, timestamp=None):
+        """
+        Feeds one pose (None if nobody was detected) to the exercise, the rep segmenter and the coach.
+        timestamp: capture time in seconds (default: now). Call with lock held.
+        """
+        self.frames += 1
+        if pose is None:
+            return
+        self.exercise.process(pose)
+        metrics = self.metrics = self.exercise.get_metrics()
+        self.reps.update(time.time() if timestamp is None else timestamp, metrics)
+        metrics["rep_summary"] = self.reps.summary()
+        if self.coach:
+            feedback = self.coach.get_feedback(self.exercise.name, metrics["reps"], metrics["stage"],
+                                               metrics["warnings"], metrics["angles"], metrics["rep_summary"])
+            if feedback:
+                self.feedback = feedback
+
+class InferencePool:
+    """
+    Shared pose workers plus the per-session state they update.
+    Workers take batches of frames from different sessions and run them back to back through their own
+    PoseEngine (MediaPipe's Pose cannot run several images in one call, so a batch amortizes the
+    scheduling rather than the model call).
+    """
+    def __init__(self, workers=None, pose_engine_factory=None, batch_size=4, per_session=2, max_sessions=256,
+                 session_ttl=300, telemetry=None, coach_factory=None, max_ingest=32, warm_up=True):
+        """
+        pose_engine_factory: callable returning a PoseEngine-like object for one worker. The default
+                             engine runs in static image mode, since consecutive frames come from different people.
+        session_ttl: seconds without frames after which a session is closed
+        coach_factory: optional callable returning a GeminiCoach for each new session, such as
+                       CoachDispatcher.register for batched coaching
+        max_ingest: landmark requests applied concurrently; more are turned away as "busy"
+        warm_up: each worker runs its engine's warm_up() (if it has one) before taking frames; see wait_ready()
+        """
+        if pose_engine_factory is None:
+            from pose_engine import PoseEngine
+            pose_engine_factory = lambda: PoseEngine(static_image_mode=True)
+        self.pose_engine_factory = pose_engine_factory
+        self.batch_size = batch_size
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.telemetry = telemetry or Telemetry()
+        self.coach_factory = coach_factory
+        self.warm_up = warm_up
+        self.ready_workers = 0
+        self.failed_workers = [] # (worker name, error) of workers whose engine could not be created or warmed up
+        self._ready = threading.Condition()
+        self.scheduler = FairScheduler(per_session)
+        self._ingest_slots = threading.BoundedSemaphore(max_ingest)
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"pose-worker-{i}", daemon=True)
+                         for i in range(workers or os.cpu_count() or 1)]
+        for thread in self._threads:
+            thread.start()
+
+    def wait_ready(self, timeout=None):
+        """
+        Waits until every worker has created (and warmed up) its pose engine. Returns False on timeout.
+        Raises RuntimeError if a worker failed to start.
+        """
+        with self._ready:
+            ready = self._ready.wait_for(
+                lambda: self.failed_workers or self.ready_workers >= len(self._threads), timeout)
+            if self.failed_workers:
+                name, error = self.failed_workers[0]
+                raise RuntimeError(f"Pose worker {name} could not start: {error}")
+            return ready
+
+    def create_session(self, exercise_name):
+        """
+        Returns the new Session, or None when the server is full.
+        Raises KeyError for an unknown exercise.
+        """
+        if exercise_name not in EXERCISES:
+            raise KeyError(exercise_name)
+        self.expire_sessions()
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                return None
+            session = Session(uuid.uuid4().hex[:12], exercise_name,
+                              coach=self.coach_factory() if self.coach_factory else None)
+            self.sessions[session.id] = session
+            self.scheduler.add(session.id)
+        self.telemetry.set_gauge("sessions", len(self.sessions))
+        return session
+
+    def close_session(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        for job in self.scheduler.remove(session_id):
+            job.finish({"status": "closed"})
+        if session is not None and session.coach:
+            session.coach.close()
+        self.telemetry.set_gauge("sessions", len(self.sessions))
+        return session is not None
+
+    def expire_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        for session_id, session in list(self.sessions.items()):
+            if session.last_seen < cutoff:
+                self.close_session(session_id)
+
+    def submit(self, session_id, frame):
+        """
+        Queues a BGR frame for a session and returns its FrameJob (None for an unknown session).
+        If the session already has `per_session` frames waiting, the oldest one finishes as "dropped".
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        session.last_seen = time.time()
+        job = FrameJob(frame)
+        try:
+            dropped = self.scheduler.submit(session_id, job)
+        except KeyError:
+            return None # Closed since it was looked up
+        if dropped is not None:
+            self.telemetry.increment("dropped_frames")
+            dropped.finish({"status": "dropped"})
+        return job
+
+    def ingest_landmarks(self, session_id, data):
+        """
+        Applies landmark packets (see landmark_ingest.py) from a client that runs pose detection itself.
+        Packets are put back into sequence order; late and duplicate packets are dropped.
+        Returns a result dict, or None for an unknown session. Raises ValueError for malformed packets.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        packets = decode_packets(data)
+        # Backpressure: turn the request away instead of queueing it behind a backlog
+        if not self._ingest_slots.acquire(blocking=False):
+            self.telemetry.increment("ingest_busy")
+            return {"status": "busy"}
+        try:
+            session.last_seen = time.time()
+            telemetry = self.telemetry
+            with session.lock, telemetry.timer("ingest"):
+                reorder = session.reorder
+                late = reorder.stats["late"] + reorder.stats["duplicates"]
+                restarts = reorder.stats["restarts"]
+                now = time.perf_counter()
+                ready = []
+                # Reordering within one request is free; the buffer handles reordering across requests
+                for seq, timestamp, pose in sorted(packets, key=lambda packet: packet[0]):
+                    ready += reorder.push(seq, (timestamp, pose), now)
+                ready += reorder.release(now)
+                for timestamp, pose in ready:
+                    session.apply(pose, timestamp)
+                    session.last_timestamp = timestamp
+                applied = len(ready)
+                late = reorder.stats["late"] + reorder.stats["duplicates"] - late
+                restarts = reorder.stats["restarts"] - restarts
+            telemetry.increment("landmark_packets", len(packets))
+            telemetry.increment("late_packets", late)
+            if restarts:
+                telemetry.increment("landmark_restarts", restarts)
+            return {"status": "ok", "received": len(packets), "applied": applied, "late": late,
+                    "held": len(reorder), "timestamp": session.last_timestamp, "metrics": session.metrics,
+                    "feedback": session.feedback}
+        finally:
+            self._ingest_slots.release()
+
+    def stats(self):
+        self.telemetry.set_gauge("queued_frames", self.scheduler.depth())
+        snapshot = self.telemetry.snapshot()
+        snapshot["sessions"] = len(self.sessions)
+        snapshot["workers"] = len(self._threads)
+        return snapshot
+
+    def close(self):
+        self.scheduler.close()
+        for thread in self._threads:
+            thread.join(2.0)
+
+    def _worker_loop(self):
+        telemetry = self.telemetry
+        try:
+            pose_engine = self.pose_engine_factory()
+            if self.warm_up and hasattr(pose_engine, "warm_up"):
+                with telemetry.timer("warm_up"):
+                    pose_engine.warm_up()
+        except Exception as e:
+            telemetry.record_error("warm_up", e)
+            with self._ready:
+                self.failed_workers.append((threading.current_thread().name, repr(e)))
+                self._ready.notify_all()
+            return
+        with self._ready:
+            self.ready_workers += 1
+            self._ready.notify_all()
+        while True:
+            batch = self.scheduler.next_batch(self.batch_size)
+            if not batch:
+                if self.scheduler.closed:
+                    break
+                continue
+            telemetry.increment("batches")
+            telemetry.increment("batched_frames", len(batch))
+            for session_id, job in batch:
+                try:
+                    self._process(pose_engine, session_id, job)
+                except Exception as e:
+                    telemetry.record_error("worker", e)
+                    job.finish({"status": "error", "error": str(e)})
+                finally:
+                    self.scheduler.done(session_id)
+
+    def _process(self, pose_engine, session_id, job):
+        telemetry = self.telemetry
+        telemetry.record("queue_wait", time.perf_counter() - job.submitted)
+        session = self.sessions.get(session_id)
+        if session is None:
+            job.finish({"status": "closed"})
+            return
+        with telemetry.timer("pose"):
+            _, _, pose = pose_engine.process_frame(job.frame)
+        if pose is None:
+            telemetry.increment("no_landmarks")
+        with session.lock, telemetry.timer("exercise"):
+            session.apply(pose)
+        telemetry.record("frame_latency", time.perf_counter() - job.submitted)
+        job.finish({"status": "ok", "detected": pose is not None, "metrics": session.metrics,
+                    "feedback": session.feedback})
+
+class BackloggedHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128 # The default of 5 resets connections when many clients connect at once
+    daemon_threads = True
+
+class InferenceServer:
+    """
+    HTTP front end for an InferencePool, served from a background thread (see module docstring).
+    """
+    SESSION_PATH = re.compile(r"^/sessions/(\w+)(/frames|/landmarks)?$")
+
+    def __init__(self, pool, host="127.0.0.1", port=8600, wait_timeout=10.0):
+        self.pool = pool
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, so clients do not reconnect for every frame
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if url.path == "/sessions":
+                    try:
+                        options = json.loads(body or b"{}")
+                        session = server.pool.create_session(options.get("exercise", "Bicep Curl"))
+                    except (ValueError, KeyError) as e:
+                        return self.reply(400, {"error": f"Bad session request: {e}"})
+                    if session is None:
+                        return self.reply(503, {"error": "Too many sessions"})
+                    return self.reply(201, {"session_id": session.id, "exercise": session.exercise_name})
+
+                match = server.SESSION_PATH.match(url.path)
+                if not match or not match.group(2):
+                    return self.reply(404, {"error": "Not found"})
+                if match.group(2) == "/landmarks":
+                    try:
+                        result = server.pool.ingest_landmarks(match.group(1), body)
+                    except ValueError as e:
+                        return self.reply(400, {"error": str(e)})
+                    if result is None:
+                        return self.reply(404, {"error": "Unknown session"})
+                    if result["status"] == "busy":
+                        return self.reply(429, result, {"Retry-After": "1"})
+                    return self.reply(200, result)
+                import cv2 # Only frame uploads need OpenCV; landmark-only workers never load it
+                frame = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR) if body else None
+                if frame is None:
+                    return self.reply(400, {"error": "Body is not an encoded image"})
+                job = server.pool.submit(match.group(1), frame)
+                if job is None:
+                    return self.reply(404, {"error": "Unknown session"})
+                if parse_qs(url.query).get("wait", ["0"])[0] in ("0", ""):
+                    return self.reply(202, {"status": "queued"})
+                if not job.done.wait(server.wait_timeout):
+                    return self.reply(504, {"error": "Timed out waiting for the frame"})
+                return self.reply(200, job.result)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    return self.reply(200, server.pool.stats())
+                match = server.SESSION_PATH.match(self.path)
+                session = server.pool.sessions.get(match.group(1)) if match and not match.group(2) else None
+                if session is None:
+                    return self.reply(404, {"error": "Unknown session"})
+                return self.reply(200, {"session_id": session.id, "exercise": session.exercise_name,
+                                        "frames": session.frames, "metrics": session.metrics,
+                                        "feedback": session.feedback})
+
+            def do_DELETE(self):
+                match = server.SESSION_PATH.match(self.path)
+                if not match or match.group(2) or not server.pool.close_session(match.group(1)):
+                    return self.reply(404, {"error": "Unknown session"})
+                return self.reply(200, {"status": "closed"})
+
+            def reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass # One line per frame would drown everything else
+
+        self.wait_timeout = wait_timeout
+        self.httpd = BackloggedHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="inference-server", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve pose inference and rep counting for many clients over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Shared pose workers")
+    parser.add_argument("--batch-size", type=int, default=4, help="Frames from different sessions per worker batch")
+    parser.add_argument("--max-sessions", type=int, default=256)
+    parser.add_argument("--coach-url", help="Coach model endpoint speaking the FakeModelServer protocol "
+                                            "(default: Gemini when GEMINI_API_KEY is set, else no coach)")
+    parser.add_argument("--coach-calls-per-minute", type=float, default=30,
+                        help="Model calls per minute shared by the coaching of all sessions")
+    args = parser.parse_args()
+
+    telemetry = Telemetry()
+    dispatcher = None
+    if args.coach_url or os.getenv("GEMINI_API_KEY"):
+        # One batched model call covers the pending coach feedback of many sessions (coach_dispatcher.py)
+        from coach_dispatcher import CoachDispatcher, HttpModelClient
+        from gemini_coach import GeminiClient
+        client = HttpModelClient(args.coach_url) if args.coach_url else GeminiClient(os.getenv("GEMINI_API_KEY"))
+        dispatcher = CoachDispatcher(client, calls_per_minute=args.coach_calls_per_minute, telemetry=telemetry)
+    pool = InferencePool(workers=args.workers, batch_size=args.batch_size, max_sessions=args.max_sessions,
+                         telemetry=telemetry, coach_factory=dispatcher.register if dispatcher else None)
+    # Load the models before accepting clients, so no session's first frame waits for them
+    start = time.perf_counter()
+    try:
+        pool.wait_ready()
+    except RuntimeError as e:
+        pool.close()
+        raise SystemExit(str(e))
+    print(f"{args.workers} pose workers ready in {time.perf_counter() - start:.1f} s")
+    server = InferenceServer(pool, host=args.host, port=args.port)
+    print(f"Serving on http://{args.host}:{server.port} with {args.workers} pose workers")
+    try:
+        while True:
+            time.sleep(60)
+            pool.expire_sessions()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if dispatcher:
+            dispatcher.close()
+
+if __name__ == "__main__":
+    main()
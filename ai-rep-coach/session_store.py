@@ -0,0 +1,426 @@
+"""
+Workout history: an embedded SQLite store (WAL mode) for sessions, reps, form warnings and optional
+downsampled landmarks.
+
+The frame loop never waits on the disk. add_rep/add_warning/add_landmarks put rows on a queue, and one
+writer thread inserts them in batches: one transaction per batch, every flush_interval seconds or
+batch_size rows, whichever comes first. Readers use their own connection, and WAL lets them run while
+the writer appends. Reps carry their user, exercise and time, so the history queries (per user, per
+exercise, per date range) are each served by an index, without joins.
+
+compact() is the retention job. It rolls reps older than raw_days up into the daily_stats table and
+deletes them, drops landmarks older than landmark_days, then returns the free pages to the file system
+and checkpoints the WAL.
+
+    python session_store.py history --db workouts.db --user alice --days 30
+    python session_store.py compact --db workouts.db --raw-days 90 --landmark-days 7
+"""
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY, user TEXT NOT NULL, exercise TEXT NOT NULL,
+    started REAL NOT NULL, updated REAL NOT NULL, reps INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_user_updated ON sessions (user, updated);
+
+CREATE TABLE IF NOT EXISTS reps (
+    session_id TEXT NOT NULL, user TEXT NOT NULL, exercise TEXT NOT NULL, rep_index INTEGER NOT NULL,
+    start REAL NOT NULL, end REAL NOT NULL, min_angle REAL, max_angle REAL,
+    concentric REAL, eccentric REAL, warnings TEXT
+);
+CREATE INDEX IF NOT EXISTS reps_user_end ON reps (user, end);
+CREATE INDEX IF NOT EXISTS reps_exercise_end ON reps (exercise, end);
+CREATE INDEX IF NOT EXISTS reps_end ON reps (end);
+CREATE INDEX IF NOT EXISTS reps_session ON reps (session_id);
+
+CREATE TABLE IF NOT EXISTS warnings (
+    session_id TEXT NOT NULL, user TEXT NOT NULL, exercise TEXT NOT NULL, time REAL NOT NULL, message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS warnings_user_time ON warnings (user, time);
+CREATE INDEX IF NOT EXISTS warnings_time ON warnings (time);
+
+CREATE TABLE IF NOT EXISTS landmarks (
+    session_id TEXT NOT NULL, time REAL NOT NULL, pose BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS landmarks_session_time ON landmarks (session_id, time);
+CREATE INDEX IF NOT EXISTS landmarks_time ON landmarks (time);
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    user TEXT NOT NULL, exercise TEXT NOT NULL, day TEXT NOT NULL, reps INTEGER NOT NULL,
+    range_sum REAL NOT NULL, concentric_sum REAL NOT NULL, eccentric_sum REAL NOT NULL, warned_reps INTEGER NOT NULL,
+    PRIMARY KEY (user, exercise, day)
+);
+"""
+
+INSERTS = {
+    "rep": "INSERT INTO reps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "warning": "INSERT INTO warnings VALUES (?, ?, ?, ?, ?)",
+    "landmarks": "INSERT INTO landmarks VALUES (?, ?, ?)",
+    "session": "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+# Local calendar day of a unix timestamp, shared by the live queries and the roll-up
+DAY = "date({column}, 'unixepoch', 'localtime')"
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    # Only takes effect on a new database, so it must come first; lets compact() shrink the file
+    connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL") # Durable at checkpoints; a crash loses at most the last batch
+    connection.execute("PRAGMA temp_store=MEMORY")
+    return connection
+
+class SessionStore:
+    """
+    Append-only workout store with a background batch writer.
+        store = SessionStore("workouts.db")
+        session_id = store.start_session("alice", "Bicep Curl")
+        store.add_rep(session_id, rep)  # a rep_analytics record
+        store.history(user="alice", since=time.time() - 86400)
+    """
+    def __init__(self, path, batch_size=512, flush_interval=0.5, max_pending=100000, landmark_interval=0.2):
+        """
+        max_pending: queued rows beyond which new rows are dropped (counted in stats) rather than blocking
+        landmark_interval: minimum seconds between stored landmark frames of a session (downsampling)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.landmark_interval = landmark_interval
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self.last_error = None
+        self._queue = queue.Queue(max_pending)
+        self._sessions = {} # session id -> [user, exercise, started, updated, reps]
+        self._dirty = set() # Sessions whose row is behind _sessions
+        # Guards _sessions, _dirty and stats, which callers and the writer thread both update
+        self._lock = threading.Lock()
+        self._last_landmarks = {} # session id -> time of the last stored landmark frame
+        self._flushed = threading.Condition()
+
+        writer = connect(path)
+        writer.executescript(SCHEMA)
+        writer.commit()
+        self._writer_connection = writer
+        self._reader = connect(path)
+        self._reader_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_loop, name="session-store-writer", daemon=True)
+        self._thread.start()
+
+    # Writing (never blocks the caller)
+
+    def _put(self, kind, row):
+        try:
+            self._queue.put_nowait((kind, row))
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            return False
+        with self._lock:
+            self.stats["queued"] += 1
+        return True
+
+    def start_session(self, user, exercise, session_id=None, started=None):
+        session_id = session_id or uuid.uuid4().hex
+        started = time.time() if started is None else started
+        with self._lock:
+            self._sessions[session_id] = [user, exercise, started, started, 0]
+        self._put("session", session_id)
+        return session_id
+
+    def add_rep(self, session_id, rep, exercise=None):
+        """
+        Stores one completed rep: a rep_analytics record (dict with start, end, min/max_angle,
+        concentric, eccentric, warnings). Also advances the session's rep count and last update time; reps are
+        numbered within the session, so they continue from a resumed session's count.
+        exercise overrides the session's exercise for this rep (Auto Detect sessions).
+        """
+        with self._lock:
+            session = self._sessions[session_id]
+            session[3] = rep["end"]
+            session[4] += 1
+            user, session_exercise, _, _, reps = session
+            # The session row itself is rewritten once per batch, not once per rep
+            self._dirty.add(session_id)
+        self._put("rep", (session_id, user, exercise or session_exercise, reps, rep["start"], rep["end"],
+                          rep.get("min_angle"), rep.get("max_angle"), rep.get("concentric"), rep.get("eccentric"),
+                          json.dumps(rep["warnings"]) if rep.get("warnings") else None))
+
+    def add_warning(self, session_id, timestamp, message, exercise=None):
+        with self._lock:
+            user, session_exercise = self._sessions[session_id][:2]
+        self._put("warning", (session_id, user, exercise or session_exercise, timestamp, message))
+
+    def add_landmarks(self, session_id, timestamp, pose):
+        """
+        Stores a (33, 4) pose as float16, at most one frame per landmark_interval seconds per session.
+        Returns True if the frame was kept.
+        """
+        last = self._last_landmarks.get(session_id)
+        if last is not None and timestamp - last < self.landmark_interval:
+            return False
+        self._last_landmarks[session_id] = timestamp
+        return self._put("landmarks", (session_id, timestamp, np.asarray(pose, dtype=np.float16).tobytes()))
+
+    def flush(self, timeout=10.0):
+        """
+        Waits until everything queued so far is committed. Returns False on timeout.
+        """
+        target = self.stats["queued"]
+        with self._flushed:
+            return self._flushed.wait_for(
+                lambda: self.stats["written"] + self.stats["errors"] >= target or not self._thread.is_alive(), timeout)
+
+    def close(self):
+        self._queue.put(None) # Sentinel: blocks only if the queue is full, at shutdown
+        self._thread.join(30)
+        self._reader.close()
+
+    def _write_loop(self):
+        connection = self._writer_connection
+        while True:
+            batch = []
+            deadline = None
+            closing = False
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.perf_counter() + self.flush_interval
+            if batch:
+                self._write_batch(connection, batch)
+            if closing:
+                connection.close()
+                with self._flushed:
+                    self._flushed.notify_all()
+                return
+
+    def _write_batch(self, connection, batch):
+        rows = {kind: [] for kind in INSERTS}
+        dirty = set()
+        for kind, row in batch:
+            if kind == "session":
+                dirty.add(row)
+            else:
+                rows[kind].append(row)
+        with self._lock:
+            dirty |= self._dirty
+            self._dirty = set()
+            rows["session"] = [(session_id, *self._sessions[session_id]) for session_id in dirty]
+        try:
+            with connection:
+                for kind, values in rows.items():
+                    if values:
+                        connection.executemany(INSERTS[kind], values)
+            with self._lock:
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+        except sqlite3.Error as e:
+            with self._lock:
+                self.stats["errors"] += len(batch)
+            self.last_error = e
+        with self._flushed:
+            self._flushed.notify_all()
+
+    # Queries (reader connection; see uncommitted rows only after flush)
+
+    def _query(self, sql, params=()):
+        with self._reader_lock:
+            cursor = self._reader.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _filters(user, exercise, since, until, time_column):
+        clauses, params = [], []
+        for clause, value in (("user = ?", user), ("exercise = ?", exercise),
+                              (f"{time_column} >= ?", since), (f"{time_column} < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def history(self, user=None, exercise=None, since=None, until=None, limit=1000):
+        """
+        Most recent reps first, filtered by any of user, exercise and an end-time range [since, until).
+        """
+        where, params = self._filters(user, exercise, since, until, "end")
+        rows = self._query(f"SELECT * FROM reps{where} ORDER BY end DESC LIMIT ?", params + [limit])
+        for row in rows:
+            row["warnings"] = json.loads(row["warnings"]) if row["warnings"] else []
+        return rows
+
+    def daily_totals(self, user=None, exercise=None, since=None, until=None):
+        """
+        Per (day, exercise): reps, average range of motion, average tempo and reps with warnings.
+        Days already rolled up by compact() come from daily_stats, newer ones straight from reps. Both honour
+        the exclusive `until` bound; a rolled-up day is kept whole if it starts before `until`.
+        """
+        where, params = self._filters(user, exercise, since, until, "end")
+        day = DAY.format(column="end")
+        live = self._query(f"""
+            SELECT {day} AS day, exercise, COUNT(*) AS reps, SUM(max_angle - min_angle) AS range_sum,
+                   SUM(concentric) AS concentric_sum, SUM(eccentric) AS eccentric_sum,
+                   SUM(warnings IS NOT NULL) AS warned_reps
+            FROM reps{where} GROUP BY day, exercise""", params)
+        where, params = self._filters(user, exercise, None, None, "day")
+        day_clauses = []
+        if since is not None:
+            day_clauses.append(f"day >= {DAY.format(column='?')}")
+            params.append(since)
+        if until is not None:
+            day_clauses.append(f"day < {DAY.format(column='?')}")
+            params.append(until)
+        if day_clauses:
+            where += (" AND " if where else " WHERE ") + " AND ".join(day_clauses)
+        rolled = self._query(f"""
+            SELECT day, exercise, SUM(reps) AS reps, SUM(range_sum) AS range_sum, SUM(concentric_sum) AS concentric_sum,
+                   SUM(eccentric_sum) AS eccentric_sum, SUM(warned_reps) AS warned_reps
+            FROM daily_stats{where} GROUP BY day, exercise""", params)
+
+        totals = {}
+        for row in rolled + live:
+            total = totals.setdefault((row["day"], row["exercise"]), dict.fromkeys(
+                ("reps", "range_sum", "concentric_sum", "eccentric_sum", "warned_reps"), 0))
+            for key in total:
+                total[key] += row[key] or 0
+        result = []
+        for (day, exercise_name), total in sorted(totals.items()):
+            reps = total["reps"] or 1
+            result.append({"day": day, "exercise": exercise_name, "reps": total["reps"],
+                           "avg_range": round(total["range_sum"] / reps, 1),
+                           "avg_concentric": round(total["concentric_sum"] / reps, 2),
+                           "avg_eccentric": round(total["eccentric_sum"] / reps, 2),
+                           "warned_reps": total["warned_reps"]})
+        return result
+
+    def warnings(self, user=None, since=None, until=None, limit=1000):
+        where, params = self._filters(user, None, since, until, "time")
+        return self._query(f"SELECT * FROM warnings{where} ORDER BY time DESC LIMIT ?", params + [limit])
+
+    def landmarks(self, session_id):
+        """
+        (times, (frames, 33, 4) float32 poses) of the landmarks stored for a session.
+        """
+        rows = self._query("SELECT time, pose FROM landmarks WHERE session_id = ? ORDER BY time", (session_id,))
+        times = np.array([row["time"] for row in rows], dtype=np.float64)
+        poses = np.frombuffer(b"".join(row["pose"] for row in rows), dtype=np.float16).reshape(-1, 33, 4)
+        return times, poses.astype(np.float32)
+
+    def resume(self, user, exercise, within=600):
+        """
+        The user's most recent session of this exercise if it was updated in the last `within` seconds
+        (e.g. the page was reloaded mid-set), as a dict with id and reps; None otherwise.
+        """
+        rows = self._query("SELECT * FROM sessions WHERE user = ? AND exercise = ? AND updated >= ? "
+                           "ORDER BY updated DESC LIMIT 1", (user, exercise, time.time() - within))
+        if not rows:
+            return None
+        session = rows[0]
+        with self._lock:
+            self._sessions.setdefault(session["id"],
+                                      [user, exercise, session["started"], session["updated"], session["reps"]])
+        return session
+
+    # Retention
+
+    def compact(self, raw_days=90, landmark_days=7, now=None):
+        """
+        Rolls reps older than raw_days into daily_stats and deletes them, deletes landmarks and warnings past
+        their retention, then frees the deleted pages and checkpoints the WAL. Returns the rows removed.
+        Runs on its own connection; safe while the writer is active.
+        """
+        now = time.time() if now is None else now
+        raw_cutoff = now - raw_days * 86400
+        day = DAY.format(column="end")
+        connection = connect(self.path)
+        try:
+            with connection:
+                connection.execute(f"""
+                    INSERT INTO daily_stats
+                    SELECT user, exercise, {day} AS day, COUNT(*), SUM(max_angle - min_angle), SUM(concentric),
+                           SUM(eccentric), SUM(warnings IS NOT NULL)
+                    FROM reps WHERE end < ? GROUP BY user, exercise, day
+                    ON CONFLICT (user, exercise, day) DO UPDATE SET
+                        reps = reps + excluded.reps, range_sum = range_sum + excluded.range_sum,
+                        concentric_sum = concentric_sum + excluded.concentric_sum,
+                        eccentric_sum = eccentric_sum + excluded.eccentric_sum,
+                        warned_reps = warned_reps + excluded.warned_reps""", (raw_cutoff,))
+                removed = {
+                    "reps": connection.execute("DELETE FROM reps WHERE end < ?", (raw_cutoff,)).rowcount,
+                    "warnings": connection.execute("DELETE FROM warnings WHERE time < ?", (raw_cutoff,)).rowcount,
+                    "landmarks": connection.execute("DELETE FROM landmarks WHERE time < ?",
+                                                    (now - landmark_days * 86400,)).rowcount,
+                }
+            # executescript steps the pragma to completion; execute() would free a single page
+            connection.executescript("PRAGMA incremental_vacuum;")
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return removed
+        finally:
+            connection.close()
+
+class SessionLog:
+    """
+    Feeds one session's stream into a SessionStore: completed reps, each form warning when it appears
+    (not on every frame it stays up) and, with landmarks=True, the downsampled poses.
+    Pipeline calls update() on its inference thread after every exercise update.
+    """
+    def __init__(self, store, session_id, landmarks=False):
+        self.store = store
+        self.session_id = session_id
+        self.landmarks = landmarks
+        self._warnings = ()
+
+    def update(self, timestamp, metrics, rep=None, pose=None):
+        exercise = metrics.get("exercise")
+        if rep is not None:
+            self.store.add_rep(self.session_id, rep, exercise)
+        warnings = metrics["warnings"]
+        if warnings != self._warnings:
+            for message in warnings:
+                if message not in self._warnings:
+                    self.store.add_warning(self.session_id, timestamp, message, exercise)
+            self._warnings = list(warnings)
+        if self.landmarks and pose is not None:
+            self.store.add_landmarks(self.session_id, timestamp, pose)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["history", "compact"])
+    parser.add_argument("--db", default="workouts.db")
+    parser.add_argument("--user")
+    parser.add_argument("--exercise")
+    parser.add_argument("--days", type=float, default=30, help="history: days to show")
+    parser.add_argument("--raw-days", type=float, default=90, help="compact: keep individual reps this long")
+    parser.add_argument("--landmark-days", type=float, default=7, help="compact: keep landmarks this long")
+    args = parser.parse_args()
+
+    store = SessionStore(args.db)
+    try:
+        if args.command == "compact":
+            print(store.compact(args.raw_days, args.landmark_days))
+            return
+        for row in store.daily_totals(args.user, args.exercise, since=time.time() - args.days * 86400):
+            print(f"{row['day']} {row['exercise']:<18} {row['reps']:>5} reps, range {row['avg_range']:.0f} deg, "
+                  f"tempo {row['avg_concentric']:.1f}s / {row['avg_eccentric']:.1f}s, {row['warned_reps']} with warnings")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Lightweight per-stage instrumentation: rolling latency histograms, counters and gauges.
+
+    telemetry = Telemetry()
+    with telemetry.timer("pose"):
+        pose_engine.process_frame(frame)
+    telemetry.increment("no_landmarks")
+    telemetry.snapshot()   # dict for a debug panel or a JSONL log line
+
+Recording a sample is a couple of array writes (no allocation beyond the timer object), so it can stay on
+in production. Snapshots can be appended to a JSONL file (JsonlExporter) or served over HTTP (MetricsServer).
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+class RollingHistogram:
+    """
+    Keeps the last `size` samples in a fixed ring buffer, plus lifetime count/sum/max.
+    Percentiles are computed over the ring only when a snapshot is taken.
+    """
+    def __init__(self, size=512):
+        self.samples = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def summary(self, scale=1e3):
+        """
+        Stats in milliseconds (scale converts from seconds) over the rolling window; count/mean are lifetime.
+        """
+        if not self.count:
+            return {"count": 0}
+        window = self.samples[:min(self.count, len(self.samples))] * scale
+        p50, p90, p99 = np.percentile(window, (50, 90, 99))
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * scale, 3),
+            "p50_ms": round(float(p50), 3),
+            "p90_ms": round(float(p90), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(self.max * scale, 3),
+        }
+
+class StageTimer:
+    """
+    Context manager returned by Telemetry.timer; records the elapsed time of its block.
+    Exceptions are counted as errors of the stage and re-raised.
+    """
+    __slots__ = ("telemetry", "name", "start")
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry.record(self.name, time.perf_counter() - self.start)
+        if exc is not None:
+            self.telemetry.record_error(self.name, exc)
+        return False
+
+class Telemetry:
+    def __init__(self, window=512, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.last_errors = {}
+        self._lock = threading.Lock()
+
+    def timer(self, name):
+        return StageTimer(self, name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(name, RollingHistogram(self.window))
+        histogram.add(seconds)
+
+    def increment(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def record_error(self, stage, error):
+        """
+        Counts an exception against a stage and keeps its message, instead of silently swallowing it.
+        """
+        self.increment(f"errors.{stage}")
+        self.last_errors[stage] = f"{type(error).__name__}: {error}"
+
+    def snapshot(self):
+        return {
+            "time": round(time.time(), 3),
+            "uptime_s": round(time.time() - self.started, 1),
+            "stages": {name: histogram.summary() for name, histogram in list(self.stages.items())},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "last_errors": dict(self.last_errors),
+        }
+
+    def to_prometheus(self, labels=None):
+        """
+        Prometheus text exposition: stage latency quantiles in seconds, counters and gauges.
+        """
+        def label_text(**extra):
+            merged = dict(labels or {})
+            merged.update(extra)
+            return ",".join(f'{key}="{value}"' for key, value in merged.items())
+
+        lines = []
+        for name, histogram in list(self.stages.items()):
+            summary = histogram.summary()
+            if not summary["count"]:
+                continue
+            for quantile, key in (("0.5", "p50_ms"), ("0.9", "p90_ms"), ("0.99", "p99_ms")):
+                lines.append(f"airepcoach_stage_seconds{{{label_text(stage=name, quantile=quantile)}}} "
+                             f"{summary[key] / 1e3}")
+            lines.append(f"airepcoach_stage_seconds_count{{{label_text(stage=name)}}} {histogram.count}")
+            lines.append(f"airepcoach_stage_seconds_sum{{{label_text(stage=name)}}} {histogram.total}")
+        for name, value in list(self.counters.items()):
+            lines.append(f"airepcoach_events_total{{{label_text(event=name)}}} {value}")
+        for name, value in list(self.gauges.items()):
+            lines.append(f"airepcoach_gauge{{{label_text(name=name)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+class JsonlExporter:
+    """
+    Appends a telemetry snapshot as one JSON line at most every `interval` seconds.
+    Call maybe_export() from any loop; it is a no-op until the interval has passed.
+    """
+    def __init__(self, path, telemetry, interval=5.0, extra=None):
+        self.path = path
+        self.telemetry = telemetry
+        self.interval = interval
+        self.extra = dict(extra or {})
+        self._last = time.perf_counter()
+
+    def maybe_export(self):
+        now = time.perf_counter()
+        if now - self._last < self.interval:
+            return False
+        self._last = now
+        self.export()
+        return True
+
+    def export(self):
+        line = dict(self.extra)
+        line.update(self.telemetry.snapshot())
+        with open(self.path, "a") as f:
+            f.write(json.dumps(line) + "\n")
+
+def _copy_items(mapping, attempts=10):
+    # A WeakValueDictionary loses entries whenever a value is collected, and sessions add theirs from other
+    # threads: copying it can fail with "dictionary changed size during iteration", so try again
+    for _ in range(attempts - 1):
+        try:
+            return list(mapping.items())
+        except RuntimeError:
+            pass
+    return list(mapping.items())
+
+class MetricsServer:
+    """
+    Background HTTP endpoint for a registry {name: Telemetry}:
+        /metrics       Prometheus text, each Telemetry labelled with session="<name>"
+        /metrics.json  JSON snapshots
+    """
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                items = _copy_items(registry)
+                if self.path == "/metrics":
+                    body = "".join(t.to_prometheus({"session": name}) for name, t in items)
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps({name: t.snapshot() for name, t in items})
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass # Keep scrapes out of the app logs
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from adaptive import AdaptiveController, LandmarkExtrapolator, replay_with_skipping
+from benchmarks.harness import synthetic_poses
+from exercises import EXERCISES
+from landmark_track import TrackWriter, LandmarkTrack
+from landmarks import new_pose_array, LEFT_WRIST
+
+class TestLandmarkExtrapolator(unittest.TestCase):
+    def test_constant_velocity(self):
+        extrapolator = LandmarkExtrapolator(max_gap=2)
+        pose = new_pose_array()
+        pose[LEFT_WRIST, :2] = (0.5, 0.5)
+        extrapolator.update(0, pose)
+        pose[LEFT_WRIST, :2] = (0.52, 0.5)
+        extrapolator.update(2, pose)
+
+        out = new_pose_array()
+        self.assertTrue(extrapolator.can_predict(3))
+        np.testing.assert_allclose(extrapolator.predict(3, out)[LEFT_WRIST, :2], (0.53, 0.5), atol=1e-6)
+        self.assertFalse(extrapolator.can_predict(5))
+
+        extrapolator.update(6, None)
+        self.assertFalse(extrapolator.can_predict(7))
+
+class TestAdaptiveController(unittest.TestCase):
+    def test_steps_down_when_over_budget_and_back_up(self):
+        controller = AdaptiveController(budget_ms=20, patience=3)
+        self.assertEqual((controller.model_complexity, controller.detect_every), (1, 1))
+        for _ in range(3):
+            controller.update(0.030)
+        self.assertEqual((controller.model_complexity, controller.detect_every), (0, 1))
+        for _ in range(3):
+            controller.update(0.030)
+        self.assertEqual(controller.detect_every, 2) # 15 ms per frame is within budget now
+        for _ in range(10):
+            controller.update(0.030)
+        self.assertEqual(controller.detect_every, 2)
+
+        for _ in range(12): # The smoothed latency needs a few samples to fall under half the budget
+            controller.update(0.005)
+        self.assertEqual((controller.model_complexity, controller.detect_every), (0, 1))
+
+    def test_replace_unavailable_complexity(self):
+        controller = AdaptiveController(budget_ms=20, patience=1)
+        controller.update(0.030)
+        self.assertEqual(controller.model_complexity, 0)
+        controller.replace_complexity(0, 1)
+        self.assertEqual((controller.model_complexity, controller.detect_every), (1, 1))
+        controller.update(0.030)
+        self.assertEqual((controller.model_complexity, controller.detect_every), (1, 2))
+
+class TestReplayWithSkipping(unittest.TestCase):
+    def test_rep_counts_match_full_rate(self):
+        for period in (60, 30):
+            poses = synthetic_poses(600, period=period)
+            expected = replay_with_skipping(poses, EXERCISES["Bicep Curl"](), 1).counter
+            self.assertEqual(expected, 600 // period)
+            for detect_every in (2, 3, 4):
+                curl = replay_with_skipping(poses, EXERCISES["Bicep Curl"](), detect_every)
+                self.assertEqual(curl.counter, expected, f"period={period} detect_every={detect_every}")
+
+    def test_replayed_track_with_dropouts(self):
+        poses = synthetic_poses(300)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "curls.track")
+            with TrackWriter(path, fps=30) as writer:
+                for index, pose in enumerate(poses):
+                    writer.append(None if index % 50 == 7 else pose)
+            track = LandmarkTrack(path)
+            full = track.replay(EXERCISES["Bicep Curl"]()).counter
+            skipped = replay_with_skipping(track.landmarks, EXERCISES["Bicep Curl"](), 3).counter
+            self.assertEqual(full, 5)
+            self.assertEqual(skipped, full)
+            del track
+
+if __name__ == '__main__':
+    unittest.main()
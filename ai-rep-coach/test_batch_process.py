@@ -0,0 +1,49 @@
+import csv
+import os
+import tempfile
+import unittest
+import batch_process
+from batch_process import score_video, write_table, find_videos, process_one
+from test_pipeline import FakePoseEngine, write_video
+
+class TestBatchProcess(unittest.TestCase):
+    def test_score_video_with_stride(self):
+        # 2 curls, 4 frames per position; stride 2 still sees every position
+        brightness = ([0] * 4 + [255] * 4) * 2
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "member.avi")
+            write_video(path, brightness)
+            self.assertEqual(find_videos(tmp), [path])
+
+            rows, summary = score_video(path, "Bicep Curl", stride=2, pose_engine=FakePoseEngine())
+            self.assertEqual(summary["reps"], 2)
+            self.assertEqual(summary["frames"], len(brightness))
+            self.assertEqual(summary["processed_frames"], len(brightness) // 2)
+            self.assertEqual([row["frame"] for row in rows], list(range(0, len(brightness), 2)))
+
+            out = os.path.join(tmp, "member.csv")
+            write_table(rows, out, "csv")
+            with open(out) as f:
+                table = list(csv.DictReader(f))
+            self.assertIn("Curl", table[0])
+            self.assertEqual(table[0]["visible"], "True")
+            self.assertEqual(table[-1]["reps"], "2")
+
+    def test_same_name_in_subfolders(self):
+        batch_process._pose_engine = FakePoseEngine()
+        self.addCleanup(setattr, batch_process, "_pose_engine", None)
+        with tempfile.TemporaryDirectory() as tmp:
+            videos, output = os.path.join(tmp, "uploads"), os.path.join(tmp, "output")
+            os.makedirs(output)
+            for folder, reps in (("a", 1), ("b", 3)):
+                os.makedirs(os.path.join(videos, folder))
+                write_video(os.path.join(videos, folder, "set1.avi"), ([0] * 4 + [255] * 4) * reps)
+            for path in find_videos(videos):
+                summary = process_one((path, videos, "Bicep Curl", 1, output, "csv", False))
+                self.assertNotIn("error", summary)
+            self.assertEqual(sorted(os.listdir(output)), ["a__set1.csv", "b__set1.csv"])
+            with open(os.path.join(output, "b__set1.csv")) as f:
+                self.assertEqual(list(csv.DictReader(f))[-1]["reps"], "3")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+from coach_dispatcher import CoachDispatcher, FakeModelServer, HttpModelClient, RateLimiter, batch_sessions
+from feedback_cache import template_feedback
+from gemini_coach import FakeCoachClient
+from test_gemini_coach import wait_for
+
+def snapshot(reps, warnings=()):
+    return {"exercise": "Bicep Curl", "reps": reps, "stage": "up", "warnings": list(warnings),
+            "angles": {"Curl": (30.0, [0, 0])}}
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_waits(self):
+        limiter = RateLimiter(calls_per_minute=60, burst=2)
+        self.assertEqual(limiter.try_acquire(), 0)
+        self.assertEqual(limiter.try_acquire(), 0)
+        self.assertAlmostEqual(limiter.try_acquire(), 1.0, places=1)
+
+class TestCoachDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeModelServer(latency=0.05)
+        self.addCleanup(self.server.close)
+
+    def dispatcher(self, client=None, **options):
+        dispatcher = CoachDispatcher(client or HttpModelClient(self.server.url), **options)
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_one_call_for_many_sessions(self):
+        dispatcher = self.dispatcher(batch_window=0.1)
+        coaches = [dispatcher.register() for _ in range(12)]
+        for reps, coach in enumerate(coaches):
+            coach.get_feedback("Bicep Curl", reps, "up", [], {"Curl": (30.0 + 20 * reps, [0, 0])})
+        for reps, coach in enumerate(coaches):
+            self.assertEqual(wait_for(coach), f"Coach: {reps} reps, keep it up!")
+        self.assertEqual(self.server.stats()["calls"], 1)
+        self.assertEqual(dispatcher.get_stats()["sessions_per_batch"], 12)
+        self.assertEqual(coaches[3].history, ["Coach: 3 reps, keep it up!"])
+
+    def test_warnings_first_and_rate_limited(self):
+        dispatcher = self.dispatcher(calls_per_minute=120, burst=1, max_batch=2, batch_window=0.05)
+        coaches = [dispatcher.register(f"s{i}") for i in range(4)]
+        for i, coach in enumerate(coaches):
+            coach.submit(snapshot(i, ["Keep your elbow fixed at your side!"] if i >= 2 else []))
+        start = time.perf_counter()
+        while len(self.server.batches) < 2 and time.perf_counter() - start < 3:
+            time.sleep(0.01)
+        # Sessions with warnings go first; the second call waits for the next token (0.5s at 120/min)
+        self.assertEqual(self.server.batches, [["s2", "s3"], ["s0", "s1"]])
+        self.assertGreater(self.server.calls[1] - self.server.calls[0], 0.4)
+
+    def test_coalesces_per_session(self):
+        dispatcher = self.dispatcher(batch_window=0.2)
+        coach = dispatcher.register("s0")
+        for reps in (1, 2, 3):
+            coach.submit(snapshot(reps))
+        self.assertEqual(wait_for(coach), "Coach: 3 reps, keep it up!")
+        self.assertEqual(coach.stats["coalesced"], 2)
+        self.assertEqual(self.server.batches, [["s0"]])
+
+    def test_failed_batch_falls_back_to_templates(self):
+        # An answer without JSON, and a model that cannot be reached
+        for client in (FakeCoachClient(response="Sorry, I cannot help with that."), HttpModelClient("http://127.0.0.1:9/")):
+            dispatcher = CoachDispatcher(client, burst=4, max_retries=1, backoff=0.01, batch_window=0.01)
+            self.addCleanup(dispatcher.close)
+            coaches = [dispatcher.register() for _ in range(3)]
+            for reps, coach in enumerate(coaches):
+                coach.submit(snapshot(reps + 1))
+            for reps, coach in enumerate(coaches):
+                self.assertEqual(wait_for(coach), template_feedback(snapshot(reps + 1)))
+            self.assertEqual(dispatcher.stats["requests"], 2)
+            self.assertEqual(dispatcher.stats["fallbacks"], 3)
+            self.assertTrue(coaches[0].last_error.startswith("Error connecting to Coach"))
+
+    def test_hung_calls_do_not_block_later_batches(self):
+        release = threading.Event()
+        model = HttpModelClient(self.server.url)
+
+        class HangingClient:
+            calls = 0
+
+            def generate(self, prompt):
+                HangingClient.calls += 1
+                if HangingClient.calls <= 4:
+                    release.wait(5) # Never answers within the dispatcher's timeout
+                return model.generate(prompt)
+
+        dispatcher = self.dispatcher(HangingClient(), burst=8, calls_per_minute=600, timeout=0.3, max_retries=1,
+                                     backoff=0.01, batch_window=0.01, fallback_after=10)
+        for reps in (1, 2):
+            coach = dispatcher.register()
+            coach.submit(snapshot(reps))
+            self.assertEqual(wait_for(coach), template_feedback(snapshot(reps)))
+        # Four calls still hang; the next batch gets its own thread and answers
+        coach = dispatcher.register("s2")
+        self.assertTrue(coach.uses_model())
+        coach.submit(snapshot(3))
+        self.assertEqual(wait_for(coach), "Coach: 3 reps, keep it up!")
+        self.assertEqual(dispatcher.stats["timeouts"], 4)
+        release.set()
+
+    def test_closed_session_is_not_sent(self):
+        dispatcher = self.dispatcher(batch_window=0.2)
+        kept, closed = dispatcher.register("kept"), dispatcher.register("closed")
+        kept.submit(snapshot(1))
+        closed.submit(snapshot(2))
+        closed.close()
+        self.assertEqual(wait_for(kept), "Coach: 1 reps, keep it up!")
+        self.assertEqual(self.server.batches, [["kept"]])
+        self.assertIsNone(batch_sessions("Current Reps: 1"))
+
+if __name__ == '__main__':
+    unittest.main()
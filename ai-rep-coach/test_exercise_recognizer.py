@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from benchmarks.harness import synthetic_exercise_poses
+from exercise_recognizer import AutoExercise, RecognizerModel, RollingWindow, evaluate
+from landmarks import LEFT_SHOULDER, LEFT_ANKLE, MIRROR, VISIBILITY
+
+EXERCISE_NAMES = ("Bicep Curl", "Front Raise", "Shoulder Press", "Squat")
+
+def train_model(**options):
+    sequences = [synthetic_exercise_poses(name, 600, seed=seed) for name in EXERCISE_NAMES for seed in (0, 1)]
+    labels = [name for name in EXERCISE_NAMES for _ in (0, 1)]
+    return RecognizerModel.fit(sequences, labels, **options)
+
+class TestRollingWindow(unittest.TestCase):
+    def test_matches_direct_statistics(self):
+        rows = np.random.default_rng(0).uniform(0, 180, (250, 4))
+        changes = np.vstack([np.zeros((1, 4)), np.abs(np.diff(rows, axis=0))]) # No change on the first row
+        window = RollingWindow(4, size=60)
+        for index, row in enumerate(rows):
+            window.push(row)
+            if index in (10, 59, 130, 249):
+                recent = slice(max(0, index - 59), index + 1)
+                expected = np.concatenate([rows[recent].mean(axis=0), rows[recent].std(axis=0),
+                                           changes[recent].mean(axis=0)])
+                np.testing.assert_allclose(window.features(), expected, atol=1e-8)
+
+class TestRecognizer(unittest.TestCase):
+    def test_recognizes_unseen_people(self):
+        model = train_model()
+        sequences = [synthetic_exercise_poses(name, 400, seed=7) for name in EXERCISE_NAMES + ("Idle",)]
+        report = evaluate(model, sequences, list(EXERCISE_NAMES) + [None])
+        self.assertGreater(report["window_accuracy"], 0.95)
+        for result in report["sequences"]:
+            self.assertLess(result["frames_to_recognize"], 60)
+
+    def test_save_and_load(self):
+        model = train_model(window=45)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recognizer.npz")
+            model.save(path)
+            loaded = RecognizerModel.load(path)
+        self.assertEqual((loaded.classes, loaded.window, loaded.definitions), (model.classes, 45, model.definitions))
+        features = np.random.default_rng(1).uniform(0, 90, len(model.mean))
+        np.testing.assert_allclose(loaded.distances(features), model.distances(features))
+
+    def test_auto_exercise_switches(self):
+        exercise = AutoExercise(train_model())
+        self.assertEqual(exercise.name, AutoExercise.IDLE_NAME)
+        for pose in synthetic_exercise_poses("Idle", 100, seed=3):
+            exercise.process(pose)
+        self.assertIsNone(exercise.get_metrics()["exercise"])
+
+        for pose in synthetic_exercise_poses("Bicep Curl", 400, seed=3):
+            exercise.process(pose)
+        self.assertEqual((exercise.name, exercise.get_metrics()["exercise"]), ("Bicep Curl", "Bicep Curl"))
+        self.assertGreaterEqual(exercise.counter, 5) # Reps before recognition count too
+        self.assertIn("Curl", exercise.angles)
+
+        # Resting keeps the exercise; a new one takes over within about a window
+        for pose in synthetic_exercise_poses("Idle", 100, seed=3):
+            exercise.process(pose)
+        self.assertEqual(exercise.name, "Bicep Curl")
+        squats = synthetic_exercise_poses("Squat", 400, seed=4)
+        for index, pose in enumerate(squats):
+            exercise.process(pose)
+            if exercise.name == "Squat":
+                break
+        self.assertLess(index, 90)
+        for pose in squats[index + 1:]:
+            exercise.process(pose)
+        self.assertGreater(exercise.get_metrics()["reps"], 0)
+        self.assertIn("Knee", exercise.get_metrics()["angles"])
+
+        exercise.reset()
+        self.assertEqual((exercise.name, exercise.counter, exercise.active), (AutoExercise.IDLE_NAME, 0, None))
+
+    def test_auto_exercise_mirrored_user(self):
+        # Curls with the right arm, the left side hidden behind the body
+        right = synthetic_exercise_poses("Bicep Curl", 400, seed=3)[:, MIRROR].copy()
+        right[:, LEFT_SHOULDER:LEFT_ANKLE + 1:2, VISIBILITY] = 0.1
+        exercise = AutoExercise(train_model())
+        for pose in right:
+            exercise.process(pose)
+        metrics = exercise.get_metrics()
+        self.assertEqual((metrics["exercise"], metrics["side"]), ("Bicep Curl", "right"))
+        self.assertGreaterEqual(exercise.counter, 5)
+
+        # Nobody visible: frames are skipped, the count stays
+        hidden = right[:20].copy()
+        hidden[..., VISIBILITY] = 0.0
+        for pose in hidden:
+            exercise.process(pose)
+        self.assertEqual(exercise.skipped_frames, len(hidden))
+        self.assertEqual(exercise.get_metrics()["reps"], metrics["reps"])
+        self.assertFalse(exercise.get_metrics()["visible"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
 import unittest
 from exercises import BicepCurl, PushUp, ShoulderPress, FrontRaise
 import mediapipe as mp
+import numpy as np
+from benchmarks.harness import synthetic_exercise_poses
+from landmarks import (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, LEFT_HIP, LEFT_ANKLE, MIRROR, VISIBILITY, new_pose_array,
+                       landmarks_to_array)
 
 class MockLandmark:
     def __init__(self, x, y):
@@ -42,5 +46,98 @@ class TestExercises(unittest.TestCase):
         self.assertEqual(curl.stage, "up")
         self.assertEqual(curl.counter, 1)
 
+    def test_hysteresis(self):
+        pose = new_pose_array()
+        pose[[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, LEFT_HIP], VISIBILITY] = 1.0
+        pose[LEFT_SHOULDER, :2], pose[LEFT_ELBOW, :2], pose[LEFT_HIP, :2] = (0, 0), (0, 1), (0.5, 1)
+        # One rep, then a single glitched frame near the down threshold while the arm stays curled
+        curls = [170, 170, 20, 20, 165, 20, 20]
+        plain, steady = BicepCurl(), BicepCurl(hysteresis={"frames": 2, "up": {"margin": 2}})
+        for angle in curls:
+            theta = np.radians(angle)
+            pose[LEFT_WRIST, :2] = (np.sin(theta), 1 - np.cos(theta))
+            plain.process(pose)
+            steady.process(pose)
+        self.assertEqual(plain.counter, 2) # The glitch re-armed the counter
+        self.assertEqual((steady.counter, steady.stage), (1, "up"))
+
+    def test_push_up_pose_array(self):
+        pushup = PushUp()
+        pose = new_pose_array()
+        pose[:, VISIBILITY] = 1.0
+        pose[LEFT_HIP, :2] = (0.5, 0)
+        pose[LEFT_ANKLE, :2] = (1, 0)
+
+        # Arm straight (180 degrees), body straight
+        pose[LEFT_SHOULDER, :2] = (0, 0)
+        pose[LEFT_ELBOW, :2] = (0, 0.1)
+        pose[LEFT_WRIST, :2] = (0, 0.2)
+        pushup.process(pose)
+        self.assertEqual(pushup.stage, "up")
+        self.assertEqual(pushup.get_metrics()["warnings"], [])
+
+        # The same buffer is rewritten in place, as PoseEngine does every frame
+        pose[LEFT_WRIST, :2] = (0.05, 0.1) # 90 degrees at the elbow, not deep enough yet
+        pushup.process(pose)
+        self.assertEqual(pushup.stage, "up")
+        pose[LEFT_WRIST, :2] = (0.05, 0.0)
+        pushup.process(pose)
+        self.assertEqual(pushup.stage, "down")
+        self.assertEqual(pushup.counter, 1)
+
+        # Angle positions are copies, not views into the reused buffer
+        position = pushup.angles["Elbow"][1]
+        pose[LEFT_ELBOW, :2] = (0.9, 0.9)
+        self.assertAlmostEqual(position[0], 0.0)
+
+    def test_mirrored_user(self):
+        # Left arm curling in a side view, and the same seen from the other side (the right arm curls)
+        left = synthetic_exercise_poses("Bicep Curl", frames=240, seed=0)
+        right = left[:, MIRROR].copy()
+        right[:, LEFT_SHOULDER:LEFT_ANKLE + 1:2, VISIBILITY] = 0.1 # The far side is hidden behind the body
+        expected = BicepCurl()
+        for pose in left:
+            expected.process(pose)
+        self.assertGreater(expected.counter, 1)
+        auto, left_only = BicepCurl(), BicepCurl(side="left")
+        for pose in right:
+            auto.process(pose)
+            left_only.process(pose)
+        self.assertEqual(auto.counter, expected.counter)
+        self.assertEqual(auto.get_metrics()["side"], "right")
+        self.assertAlmostEqual(auto.angles["Curl"][0], expected.angles["Curl"][0], places=4)
+        # Frames where the chosen side cannot be seen are skipped instead of miscounted
+        self.assertEqual((left_only.counter, left_only.skipped_frames), (0, len(right)))
+        self.assertEqual(left_only.process(right[0]), ({}, None))
+        self.assertFalse(left_only.get_metrics()["visible"])
+
+    def test_independent_side_counts(self):
+        # Alternating curls: the left arm curls while the right one hangs, then the other way round
+        left = synthetic_exercise_poses("Bicep Curl", frames=240, seed=0)
+        poses = np.concatenate([left, left[:, MIRROR]])
+        # Same counts as one instance per side, in one pass
+        single, both = BicepCurl(), BicepCurl(per_side=True)
+        sides = {side: BicepCurl(side=side) for side in ("left", "right")}
+        for pose in poses:
+            single.process(pose)
+            both.process(pose)
+            for exercise in sides.values():
+                exercise.process(pose)
+        metrics = both.get_metrics()
+        self.assertEqual(metrics["side_reps"], {side: exercise.counter for side, exercise in sides.items()})
+        self.assertEqual(metrics["reps"], sides["left"].counter + sides["right"].counter)
+        self.assertGreater(sides["right"].counter, 1)
+        self.assertEqual(single.counter, sides["left"].counter) # Stays on the left side, missing the right arm
+        self.assertIn("Left Curl", metrics["angles"])
+        self.assertIn("Right Curl", metrics["angles"])
+
+    def test_landmarks_to_array(self):
+        landmarks = create_mock_landmarks({LEFT_WRIST: (0.25, 0.75)})
+        out = new_pose_array()
+        pose = landmarks_to_array(landmarks, out=out)
+        self.assertIs(pose, out)
+        self.assertEqual(pose.dtype, np.float32)
+        np.testing.assert_allclose(pose[LEFT_WRIST], [0.25, 0.75, 0.0, 1.0])
+
 if __name__ == '__main__':
     unittest.main()
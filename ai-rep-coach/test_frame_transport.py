@@ -0,0 +1,110 @@
+import os
+import unittest
+import numpy as np
+from frame_transport import SharedFrameRing, ProcessPosePool
+from landmarks import new_pose_array
+
+SHAPE = (48, 64, 3)
+
+class BrightnessEngine:
+    """
+    Stands in for PoseEngine in the worker processes: landmark x is the mean brightness of the frame it saw,
+    so the tests can tell which frame a worker actually read. A frame of brightness 13 fails, and one of 66
+    crashes the worker process.
+    """
+    def __init__(self):
+        self.pose_array = new_pose_array()
+
+    def process_frame(self, frame):
+        if frame[0, 0, 0] == 13:
+            raise ValueError("unlucky frame")
+        if frame[0, 0, 0] == 66:
+            os._exit(3)
+        self.pose_array[:, 0] = frame.mean()
+        return frame, None, self.pose_array
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+class TestSharedFrameRing(unittest.TestCase):
+    def test_views_share_memory(self):
+        ring = SharedFrameRing(3, SHAPE)
+        attached = SharedFrameRing(3, SHAPE, name=ring.name, create=False)
+        ring.view(1)[:] = 7
+        self.assertEqual(attached.view(1).mean(), 7)
+        self.assertEqual(attached.view(0).mean(), 0)
+        attached.close()
+        ring.close()
+
+class TestProcessPosePool(unittest.TestCase):
+    def run_frames(self, transport, values, **kwargs):
+        with ProcessPosePool(SHAPE, workers=2, pose_engine_factory=BrightnessEngine, transport=transport,
+                             **kwargs) as pool:
+            self.assertTrue(pool.wait_ready(10))
+            results, full = [], 0
+            for value in values:
+                # The caller frees slots by collecting results; submit only when one is free
+                while pool.submit(frame(value), block=False) is None:
+                    full += 1
+                    results.append(pool.get_result(10))
+            while len(results) < len(values):
+                results.append(pool.get_result(10))
+            self.assertEqual(pool.in_flight(), 1) # Only the slot of the last result is still held
+            self.assertEqual(pool.dropped, full)
+        return results
+
+    def test_results_in_order_from_shared_slots(self):
+        values = list(range(20, 60))
+        for transport in ("shared", "pickle"):
+            results = self.run_frames(transport, values, slots=3)
+            self.assertEqual([result["seq"] for result in results], list(range(len(values))))
+            # Each worker read the frame that was written into its slot
+            self.assertEqual([result["pose"][0, 0] for result in results], values)
+
+    def test_slot_stays_valid_until_next_result(self):
+        with ProcessPosePool(SHAPE, workers=1, slots=2, pose_engine_factory=BrightnessEngine) as pool:
+            slot = pool.acquire()
+            pool.view(slot)[:] = 40 # Written in place, as cap.read(view) would
+            pool.submit_slot(slot)
+            pool.submit(frame(50))
+            self.assertIsNone(pool.acquire(0))
+            result = pool.get_result(10)
+            self.assertEqual(result["image"].mean(), 40)
+            self.assertIsNone(pool.acquire(0)) # Still held by the caller
+            self.assertEqual(pool.get_result(10)["pose"][0, 0], 50)
+            self.assertEqual(pool.acquire(0), slot)
+
+    def test_worker_error(self):
+        with ProcessPosePool(SHAPE, workers=1, pose_engine_factory=BrightnessEngine) as pool:
+            for value in (12, 13, 14):
+                pool.submit(frame(value))
+            self.assertEqual(pool.get_result(10)["pose"][0, 0], 12)
+            with self.assertRaises(RuntimeError):
+                pool.get_result(10)
+            self.assertEqual(pool.get_result(10)["pose"][0, 0], 14)
+            self.assertEqual(pool.in_flight(), 1)
+            with self.assertRaises(ValueError):
+                pool.submit(np.zeros((10, 10, 3), np.uint8))
+
+    def test_worker_crash(self):
+        with ProcessPosePool(SHAPE, workers=2, slots=4, pose_engine_factory=BrightnessEngine) as pool:
+            pool.check_interval = 0.05
+            self.assertTrue(pool.wait_ready(10))
+            for value in (65, 66, 67):
+                pool.submit(frame(value))
+            self.assertEqual(pool.get_result(10)["pose"][0, 0], 65)
+            with self.assertRaisesRegex(RuntimeError, "exited with code 3"):
+                pool.get_result(10) # Instead of waiting for a result that never comes
+            self.assertEqual(pool.get_result(10)["pose"][0, 0], 67)
+            self.assertEqual(pool.in_flight(), 1) # The lost frame's slot is free again
+            # The last worker dies too: what is still queued fails instead of hanging
+            pool.submit(frame(66))
+            pool.submit(frame(70))
+            for _ in range(2):
+                with self.assertRaises(RuntimeError):
+                    pool.get_result(10)
+            self.assertEqual(pool.in_flight(), 0)
+            self.assertEqual(pool.telemetry.snapshot()["counters"]["worker_exits"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
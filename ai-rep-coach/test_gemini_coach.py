@@ -0,0 +1,187 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from gemini_coach import GeminiCoach, FakeCoachClient
+from feedback_cache import FeedbackCache, state_signature, template_feedback
+
+def wait_for(coach, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        feedback = coach.poll()
+        if feedback:
+            return feedback
+        time.sleep(0.005)
+    return None
+
+def snapshot(reps):
+    return {"exercise": "Bicep Curl", "reps": reps, "stage": "up", "warnings": [], "angles": {"Curl": (30.0, [0, 0])}}
+
+class TestGeminiCoach(unittest.TestCase):
+    def test_no_key_uses_template(self):
+        coach = GeminiCoach("")
+        feedback = coach.get_feedback("Bicep Curl", 3, "up", ["Keep your elbow fixed at your side!"], {})
+        self.assertEqual(feedback, "Form check: Keep your elbow fixed at your side!")
+        self.assertEqual(coach.get_stats()["templates"], 1)
+
+    def test_get_feedback_does_not_block(self):
+        client = FakeCoachClient(latency=0.3)
+        coach = GeminiCoach("", client=client)
+        start = time.perf_counter()
+        self.assertIsNone(coach.get_feedback("Bicep Curl", 1, "up", [], {}))
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(wait_for(coach), client.response)
+        self.assertEqual(coach.history, [client.response])
+        coach.close()
+
+    def test_coalesces_to_newest(self):
+        client = FakeCoachClient(latency=0.2)
+        coach = GeminiCoach("", client=client)
+        coach.submit(snapshot(1))
+        time.sleep(0.05) # First request is in flight
+        for reps in (2, 3, 4):
+            coach.submit(snapshot(reps))
+        wait_for(coach)
+        wait_for(coach)
+        self.assertEqual(len(client.prompts), 2)
+        self.assertIn("Current Reps: 4", client.prompts[1])
+        self.assertEqual(coach.stats["coalesced"], 2)
+        coach.close()
+
+    def test_retries_then_succeeds(self):
+        client = FakeCoachClient(fail_first=2)
+        coach = GeminiCoach("", client=client, max_retries=2, backoff=0.01)
+        coach.submit(snapshot(1))
+        self.assertEqual(wait_for(coach), client.response)
+        self.assertEqual(coach.stats["failures"], 2)
+        coach.close()
+
+    def test_timeout_falls_back_to_template(self):
+        client = FakeCoachClient(latency=0.5)
+        coach = GeminiCoach("", client=client, timeout=0.05, max_retries=1, backoff=0.01, fallback_after=10)
+        coach.submit(snapshot(1))
+        self.assertEqual(wait_for(coach), template_feedback(snapshot(1)))
+        self.assertEqual(coach.stats["timeouts"], 2)
+        self.assertTrue(coach.last_error.startswith("Error connecting to Coach"))
+        coach.close()
+
+    def test_hung_calls_do_not_block_later_ones(self):
+        release = threading.Event()
+
+        class HangingClient(FakeCoachClient):
+            def generate(self, prompt):
+                self.prompts.append(prompt)
+                if len(self.prompts) <= 4:
+                    release.wait(5) # Never answers within the coach's timeout
+                return self.response
+
+        client = HangingClient()
+        coach = GeminiCoach("", client=client, timeout=0.05, max_retries=1, backoff=0.01, fallback_after=10)
+        for reps in (1, 2):
+            coach.submit(snapshot(reps))
+            self.assertEqual(wait_for(coach), template_feedback(snapshot(reps)))
+        # Four calls still hang; the next one gets its own thread and answers
+        coach.submit(snapshot(3))
+        self.assertEqual(wait_for(coach), client.response)
+        self.assertEqual(coach.stats["timeouts"], 4)
+        release.set()
+        coach.close()
+
+    def test_slow_api_shows_template_first(self):
+        client = FakeCoachClient(latency=0.3)
+        coach = GeminiCoach("", client=client, fallback_after=0.05)
+        coach.submit(snapshot(2))
+        self.assertEqual(wait_for(coach), template_feedback(snapshot(2)))
+        self.assertEqual(wait_for(coach), client.response)
+        coach.close()
+
+    def test_cache_hit_skips_api(self):
+        client = FakeCoachClient()
+        coach = GeminiCoach("", client=client)
+        coach.feedback_cooldown = 0
+        coach.get_feedback("Bicep Curl", 1, "up", [], {"Curl": (31.0, [0, 0])})
+        self.assertEqual(wait_for(coach), client.response)
+        # Next rep, angle in the same bucket: answered from the cache
+        self.assertEqual(coach.get_feedback("Bicep Curl", 2, "up", [], {"Curl": (33.0, [0, 0])}), client.response)
+        self.assertEqual(len(client.prompts), 1)
+        self.assertEqual(coach.get_stats()["cache_hits"], 1)
+        coach.close()
+
+class TestFeedbackCache(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        cache = FeedbackCache(max_size=2, ttl=60)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C") # Evicts b, the least recently used
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        cache.ttl = -1
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = FeedbackCache(path=path)
+            key = state_signature(snapshot(5))
+            cache.put(key, "Saved")
+            cache.save()
+            self.assertEqual(FeedbackCache(path=path).get(key), "Saved")
+
+    def test_unreadable_file_starts_empty(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            for content in ("{not json", '{"old": "format"}'):
+                with open(path, "w") as f:
+                    f.write(content)
+                cache = FeedbackCache(path=path)
+                self.assertEqual(len(cache), 0)
+                self.assertIsNotNone(cache.last_error)
+            cache.put("a", "A")
+            cache.close() # Saves what the autosave has not
+            self.assertEqual(FeedbackCache(path=path).get("a"), "A")
+
+    def test_concurrent_saves(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = FeedbackCache(path=path, save_every=1)
+            errors = []
+
+            def put_many(prefix):
+                try:
+                    for index in range(50):
+                        cache.put(f"{prefix}{index}", "message")
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=put_many, args=(prefix,)) for prefix in "abcd"]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(len(FeedbackCache(path=path)), 200)
+
+    def test_signature_ignores_reps(self):
+        self.assertEqual(state_signature(snapshot(1)), state_signature(snapshot(9)))
+
+    def test_rep_summary_replaces_angles(self):
+        summary = {"reps": 4, "last": {"concentric": 0.4, "eccentric": 0.3, "min_angle": 25.0, "max_angle": 170.0},
+                   "avg_concentric": 0.5, "avg_eccentric": 0.4, "avg_range": 140.0, "range_change": -20.0,
+                   "warned_reps": 0}
+        state, other_stage = snapshot(4), snapshot(4)
+        state["rep_summary"] = summary
+        other_stage.update(rep_summary=summary, stage="down", angles={"Curl": (160.0, [0, 0])})
+        self.assertEqual(state_signature(state), state_signature(other_stage))
+        self.assertNotEqual(state_signature(state), state_signature(snapshot(4)))
+
+        prompt = GeminiCoach("").build_prompt(state)
+        self.assertIn("Recent Reps: last rep 0.4s concentric / 0.3s eccentric", prompt)
+        self.assertIn("range shrinking by 20", prompt)
+        self.assertNotIn("Key Angles", prompt)
+        self.assertIn("Key Angles: Curl: 30", GeminiCoach("").build_prompt(snapshot(4)))
+        self.assertEqual(template_feedback(state), "Rep 4: your range is getting shorter, go all the way.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY = ("cv2", "mediapipe", "google.genai", "streamlit")
+
+def loaded_after(code):
+    """
+    Heavy modules present in a fresh interpreter after running `code`.
+    """
+    script = f"import sys\n{code}\nprint(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    return subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.split()
+
+class TestLazyImports(unittest.TestCase):
+    def test_core_logic_without_heavy_modules(self):
+        self.assertEqual(loaded_after(
+            "import utils, exercises, rule_engine, rep_analytics, exercise_recognizer, landmark_filter, adaptive, "
+            "feedback_cache, gemini_coach, session_store, landmark_ingest, landmark_track, pipeline, server\n"
+            "from exercises import BicepCurl\n"
+            "from benchmarks.harness import synthetic_poses\n"
+            "curl = BicepCurl()\n"
+            "for pose in synthetic_poses(60): curl.process(pose)\n"
+            "assert curl.counter == 1"), [])
+
+    def test_mediapipe_loaded_with_the_first_engine(self):
+        self.assertEqual(loaded_after("import pose_engine"), ["cv2"])
+
+    def test_genai_loaded_only_for_api_calls(self):
+        self.assertEqual(loaded_after("from gemini_coach import GeminiCoach\nGeminiCoach(None).close()"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from benchmarks.harness import synthetic_poses
+from landmark_filter import LandmarkFilter, OneEuroFilter
+from landmarks import LEFT_WRIST
+
+class TestLandmarkFilter(unittest.TestCase):
+    def test_reduces_jitter(self):
+        clean = synthetic_poses(600, seed=0)
+        noisy = clean.copy()
+        noisy[..., :2] += np.random.default_rng(1).normal(0, 0.01, noisy[..., :2].shape)
+        for method in ("one_euro", "kalman"):
+            landmark_filter = LandmarkFilter(method)
+            filtered = np.array([landmark_filter(pose).copy() for pose in noisy])
+            raw_error = np.abs(noisy[100:, :, :2] - clean[100:, :, :2]).mean()
+            error = np.abs(filtered[100:, :, :2] - clean[100:, :, :2]).mean()
+            self.assertLess(error, 0.75 * raw_error, method)
+            np.testing.assert_array_equal(filtered[:, :, 3], noisy[:, :, 3]) # Visibility passes through
+
+    def test_low_visibility_holds_position(self):
+        pose = synthetic_poses(1)[0].copy()
+        pose[:, 3] = 1.0
+        for method in ("one_euro", "kalman"):
+            landmark_filter = LandmarkFilter(method)
+            for _ in range(10):
+                landmark_filter(pose)
+            start = pose[LEFT_WRIST, :2].copy()
+            moved = pose.copy()
+            moved[LEFT_WRIST, :2] += 0.3
+            moved[LEFT_WRIST, 3] = 0.05 # A guess for a hidden wrist
+            output = landmark_filter(moved)
+            self.assertLess(np.abs(output[LEFT_WRIST, :2] - start).max(), 0.05, method)
+            moved[LEFT_WRIST, 3] = 1.0
+            for _ in range(30):
+                output = landmark_filter(moved)
+            np.testing.assert_allclose(output[LEFT_WRIST, :2], moved[LEFT_WRIST, :2], atol=0.01)
+
+    def test_restarts_after_gaps(self):
+        first, second = synthetic_poses(2, seed=3)
+        second = second.copy()
+        second[:, :2] += 0.2
+        landmark_filter = LandmarkFilter()
+        output = landmark_filter(first, timestamp=0.0)
+        self.assertIs(landmark_filter(second, timestamp=0.033), output) # Same buffer every frame
+        self.assertFalse(np.allclose(output, second))
+        np.testing.assert_allclose(landmark_filter(second, timestamp=2.0), second, atol=1e-6)
+        self.assertIsNone(landmark_filter(None))
+        np.testing.assert_allclose(landmark_filter(first, timestamp=2.1), first, atol=1e-6)
+
+    def test_one_euro_follows_fast_motion(self):
+        one_euro = OneEuroFilter(1, min_cutoff=1.0, beta=20.0)
+        for _ in range(30):
+            one_euro(np.zeros(1), 1 / 30)
+        slow = one_euro(np.full(1, 0.01), 1 / 30)[0]
+        one_euro.reset()
+        for _ in range(30):
+            one_euro(np.zeros(1), 1 / 30)
+        fast = one_euro(np.full(1, 0.3), 1 / 30)[0]
+        self.assertLess(slow / 0.01, fast / 0.3) # Bigger jumps are followed more closely
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            LandmarkFilter("median")
+
+if __name__ == '__main__':
+    unittest.main()
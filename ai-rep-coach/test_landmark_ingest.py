@@ -0,0 +1,109 @@
+import unittest
+import numpy as np
+from benchmarks.harness import synthetic_poses
+from gemini_coach import GeminiCoach
+from landmark_ingest import ReorderBuffer, encode_packet, decode_packets
+from server import InferencePool
+
+class TestPackets(unittest.TestCase):
+    def test_round_trip(self):
+        poses = synthetic_poses(3)
+        data = encode_packet(7, 1.5, poses[0]) + encode_packet(8, 1.55, None) + encode_packet(9, 1.6, poses[2], half=True)
+        self.assertEqual(len(data), 3 * 16 + 528 + 264)
+        (seq, timestamp, pose), missing, half = decode_packets(data)
+        self.assertEqual((seq, timestamp), (7, 1.5))
+        np.testing.assert_array_equal(pose, poses[0])
+        self.assertEqual(missing, (8, 1.55, None))
+        self.assertEqual(half[2].dtype, np.float32)
+        np.testing.assert_allclose(half[2], poses[2], atol=1e-3)
+
+    def test_malformed(self):
+        data = encode_packet(1, 0.0, synthetic_poses(1)[0])
+        with self.assertRaises(ValueError):
+            decode_packets(data[:-4])
+        with self.assertRaises(ValueError):
+            decode_packets(b"XX" + data[2:])
+
+class TestReorderBuffer(unittest.TestCase):
+    def test_restores_order_and_drops_late(self):
+        buffer = ReorderBuffer(max_delay=1.0)
+        self.assertEqual(buffer.push(0, "a", now=0), ["a"])
+        self.assertEqual(buffer.push(2, "c", now=0), [])
+        self.assertEqual(buffer.push(1, "b", now=0), ["b", "c"])
+        self.assertEqual(buffer.push(1, "b again", now=0), [])
+        self.assertEqual(buffer.stats["late"], 1)
+
+    def test_skips_gaps(self):
+        buffer = ReorderBuffer(max_delay=0.1, max_pending=2)
+        buffer.push(0, 0, now=0)
+        self.assertEqual(buffer.push(2, 2, now=0), [])
+        self.assertEqual(buffer.release(now=0.2), [2]) # 1 waited too long
+        self.assertEqual(buffer.push(1, 1, now=0.2), [])
+        for seq in (4, 5, 6):
+            released = buffer.push(seq, seq, now=0.3)
+        self.assertEqual(released, [4, 5, 6]) # More than max_pending held
+        self.assertEqual(buffer.stats["skipped"], 2)
+
+    def test_client_restarts_sequence(self):
+        buffer = ReorderBuffer(max_delay=0.1, max_pending=2, restart_after=1.0)
+        for seq in range(10):
+            buffer.push(seq, seq, now=seq * 0.03)
+        self.assertEqual(buffer.push(12, 12, now=0.3), []) # Held, waiting for 10 and 11
+        # Reconnected with a fresh counter: a jump back, confirmed by the packet after it
+        self.assertEqual(buffer.push(1, "new 1", now=0.31), [])
+        self.assertEqual(buffer.push(0, "new 0", now=0.32), ["new 0", "new 1"])
+        self.assertEqual(buffer.push(2, "new 2", now=0.33), ["new 2"])
+        self.assertEqual((buffer.stats["restarts"], buffer.stats["late"], len(buffer)), (1, 0, 0))
+        # One stale packet far behind is only late
+        buffer = ReorderBuffer(max_delay=0.1, max_pending=2)
+        for seq in range(10):
+            buffer.push(seq, seq, now=0)
+        self.assertEqual(buffer.push(3, "stale", now=0), [])
+        self.assertEqual(buffer.push(10, 10, now=0), [10])
+        self.assertEqual((buffer.stats["restarts"], buffer.stats["late"]), (0, 1))
+        # Counter back at 0 after a pause, however few packets came before
+        self.assertEqual(buffer.push(0, "again", now=2.0), ["again"])
+        self.assertEqual(buffer.stats["restarts"], 1)
+        # A packet far behind followed by silence is settled by release()
+        buffer = ReorderBuffer(max_delay=0.1, max_pending=2)
+        for seq in range(10):
+            buffer.push(seq, seq, now=0)
+        self.assertEqual(buffer.push(3, "stale", now=0), [])
+        self.assertEqual(buffer.release(now=0.05), [])
+        self.assertEqual(buffer.stats["late"], 0)
+        self.assertEqual(buffer.release(now=0.1), [])
+        self.assertEqual(buffer.stats["late"], 1)
+        self.assertEqual(buffer.push(10, 10, now=0.2), [10])
+        self.assertEqual(buffer.stats["late"], 1)
+
+class TestLandmarkSessions(unittest.TestCase):
+    def test_out_of_order_packets_count_reps(self):
+        pool = InferencePool(workers=1, pose_engine_factory=object, coach_factory=lambda: GeminiCoach(None))
+        try:
+            session = pool.create_session("Bicep Curl")
+            packets = [encode_packet(seq, seq / 30, pose, half=seq % 2 == 0)
+                       for seq, pose in enumerate(synthetic_poses(300))]
+            chunks = [packets[start:start + 10] for start in range(0, len(packets), 10)]
+            chunks[2].append(chunks[1].pop(5)) # Packet 15 arrives with the next request
+            rng = np.random.default_rng(0)
+            for index, chunk in enumerate(chunks):
+                order = rng.permutation(len(chunk))
+                result = pool.ingest_landmarks(session.id, b"".join(chunk[i] for i in order))
+                self.assertEqual((result["status"], result["late"]), ("ok", 0))
+                if index == 1:
+                    self.assertEqual((result["applied"], result["held"]), (5, 4))
+
+            self.assertEqual(result["metrics"]["reps"], 5)
+            self.assertEqual(session.frames, 300)
+            self.assertAlmostEqual(result["timestamp"], 299 / 30)
+            self.assertTrue(result["feedback"])
+
+            # Far behind, so it could be a client restarting its counter until the packet after it says otherwise
+            late = pool.ingest_landmarks(session.id, packets[5] + encode_packet(300, 10.0, synthetic_poses(1)[0]))
+            self.assertEqual((late["late"], late["applied"]), (1, 1))
+            self.assertIsNone(pool.ingest_landmarks("missing", packets[0]))
+        finally:
+            pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from exercises import BicepCurl
+from landmark_track import TrackWriter, LandmarkTrack
+from landmarks import LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, VISIBILITY, new_pose_array
+
+def curl_poses(reps, frames_per_position=3):
+    """
+    Yields pose arrays for `reps` bicep curls, with an undetected frame (None) between reps.
+    """
+    pose = new_pose_array()
+    pose[LEFT_SHOULDER, :2] = (0, 0)
+    pose[LEFT_ELBOW, :2] = (0, 1)
+    pose[[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST], VISIBILITY] = 1.0 # The camera sees the left arm
+    for _ in range(reps):
+        for wrist in ((0, 2), (0, 0.1)):
+            pose[LEFT_WRIST, :2] = wrist
+            for _ in range(frames_per_position):
+                yield pose
+        yield None
+
+class TestLandmarkTrack(unittest.TestCase):
+    def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "session.track")
+            with TrackWriter(path, fps=30, metadata={"exercise": "Bicep Curl"}) as writer:
+                for pose in curl_poses(4):
+                    writer.append(pose)
+
+            track = LandmarkTrack(path)
+            self.assertEqual(len(track), 4 * 7)
+            self.assertEqual(int(track.detected.sum()), 4 * 6)
+            self.assertIsNone(track[6])
+            self.assertAlmostEqual(track.timestamps[15], 0.5)
+            self.assertEqual(track.metadata["exercise"], "Bicep Curl")
+            self.assertEqual(track.replay(BicepCurl()).counter, 4)
+            del track
+
+    def test_recovers_unclosed_track(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "crashed.track")
+            writer = TrackWriter(path, fps=30)
+            for pose in curl_poses(2):
+                writer.append(pose)
+            writer._landmarks.flush()
+            writer._timestamps.flush()
+            track = LandmarkTrack(path) # No meta.json yet
+            self.assertEqual(len(track), 14)
+            self.assertEqual(track.replay(BicepCurl()).counter, 2)
+            del track
+            writer.close()
+
+    def test_recovers_shorter_timestamps(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "crashed.track")
+            writer = TrackWriter(path, fps=30)
+            for pose in curl_poses(2):
+                writer.append(pose)
+            writer.close()
+            os.remove(os.path.join(path, "meta.json"))
+            with open(os.path.join(path, "timestamps.f64"), "r+b") as f:
+                f.truncate(10 * 8) # The crash hit before the last timestamps were flushed
+            track = LandmarkTrack(path)
+            self.assertEqual(len(track), 10)
+            self.assertEqual(len(track.timestamps), 10)
+            del track
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import numpy as np
+from exercises import BicepCurl
+from landmarks import LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, LEFT_HIP, NOSE, RIGHT_FOOT_INDEX, new_pose_array
+from multi_person import IoUTracker, MultiPersonEngine, iou_matrix
+
+BOXES = np.array([[40, 80, 160, 320], [240, 80, 360, 320]], np.float32)
+
+class FixedDetector:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        return self.boxes, np.ones(len(self.boxes), np.float32)
+
+class FakeCropEngine:
+    """
+    Per-person stand-in for PoseEngine: the crop brightness encodes the arm position. The outermost
+    landmarks sit where the detection box lies inside the crop, so the followed box stays put.
+    """
+    def __init__(self):
+        self.pose_array = new_pose_array()
+        self.pose_array[:, 3] = 1.0
+        self.pose_array[:, :2] = 0.5
+        edge = 0.15 / 1.3 # margin / (1 + 2 * margin)
+        self.pose_array[NOSE, :2] = (edge, edge)
+        self.pose_array[RIGHT_FOOT_INDEX, :2] = (1 - edge, 1 - edge)
+        self.pose_array[LEFT_SHOULDER, :2] = (0.5, 0.3)
+        self.pose_array[LEFT_ELBOW, :2] = (0.5, 0.5)
+        self.pose_array[LEFT_HIP, :2] = (0.5, 0.8)
+        self.closed = False
+
+    def process_frame(self, frame):
+        center = frame[frame.shape[0] // 2, frame.shape[1] // 2].mean()
+        if center < 10:
+            return frame, None, None
+        curled = center > 127
+        self.pose_array[LEFT_WRIST, :2] = (0.5, 0.32) if curled else (0.5, 0.7)
+        return frame, None, self.pose_array
+
+    def close(self):
+        self.closed = True
+
+def group_frames(frames, periods):
+    """
+    Two people side by side; person i alternates arm down / curled every periods[i] frames.
+    """
+    for index in range(frames):
+        frame = np.zeros((400, 400, 3), np.uint8)
+        for box, period in zip(BOXES.astype(int), periods):
+            x1, y1, x2, y2 = box
+            frame[y1:y2, x1:x2] = 200 if (index // period) % 2 else 60
+        yield frame
+
+class TestIoUTracker(unittest.TestCase):
+    def test_iou_matrix(self):
+        ious = iou_matrix([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+        np.testing.assert_allclose(ious, [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+    def test_ids_follow_moving_boxes(self):
+        tracker = IoUTracker(max_missed=2)
+        added, _ = tracker.update(BOXES)
+        self.assertEqual(added, [1, 2])
+        added, _ = tracker.update(BOXES[::-1] + 10) # Order of detections does not matter
+        self.assertEqual(added, [])
+        np.testing.assert_allclose(tracker.tracks[1].box, BOXES[0] + 10)
+
+        # Duplicate detection of person 1 does not start a new track
+        added, _ = tracker.update(np.vstack([BOXES + 10, BOXES[:1] + 14]))
+        self.assertEqual(added, [])
+
+        for _ in range(2):
+            tracker.update(BOXES[:1] + 10)
+        _, dropped = tracker.update(BOXES[:1] + 10)
+        self.assertEqual(dropped, [2])
+        self.assertEqual(list(tracker.tracks), [1])
+
+class TestMultiPersonEngine(unittest.TestCase):
+    def test_separate_rep_counts(self):
+        detector = FixedDetector(BOXES)
+        engine = MultiPersonEngine(BicepCurl, detector=detector, pose_engine_factory=FakeCropEngine, detect_every=5)
+        for frame in group_frames(96, periods=(4, 8)):
+            people = engine.process_frame(frame)
+
+        self.assertEqual(detector.calls, 20)
+        self.assertEqual(engine.rep_counts(), {1: 12, 2: 6})
+        self.assertEqual([person["id"] for person in people], [1, 2])
+        # Landmarks are mapped back to full-frame normalized coordinates
+        shoulder = people[1]["pose"][LEFT_SHOULDER, :2]
+        crop_y1, crop_height = 80 - 0.15 * 240, 1.3 * 240
+        np.testing.assert_allclose(shoulder, (0.75, (crop_y1 + 0.3 * crop_height) / 400), atol=0.005)
+        np.testing.assert_allclose(people[0]["box"], BOXES[0], atol=2)
+
+    def test_person_leaving_is_dropped(self):
+        detector = FixedDetector(BOXES)
+        engine = MultiPersonEngine(BicepCurl, detector=detector, pose_engine_factory=FakeCropEngine, detect_every=1,
+                                   max_missed=3)
+        frames = list(group_frames(10, periods=(2, 2)))
+        for frame in frames[:5]:
+            engine.process_frame(frame)
+        second = engine.pose_engines[2]
+        detector.boxes = BOXES[:1]
+        for frame in frames[5:]:
+            frame[:, 200:] = 0
+            people = engine.process_frame(frame)
+        self.assertEqual([person["id"] for person in people], [1])
+        self.assertTrue(second.closed)
+        self.assertIn(2, engine.rep_counts())
+
+if __name__ == '__main__':
+    unittest.main()
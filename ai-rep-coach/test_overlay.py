@@ -0,0 +1,64 @@
+import unittest
+import cv2
+import numpy as np
+from benchmarks.harness import synthetic_poses
+from landmarks import LEFT_WRIST, VISIBILITY
+from overlay import OverlayRenderer, FrameEncoder
+
+class TestOverlayRenderer(unittest.TestCase):
+    def test_scales_to_frame_size(self):
+        pose = synthetic_poses(1)[0]
+        for width, height in ((640, 480), (1280, 720)):
+            image = np.zeros((height, width, 3), dtype=np.uint8)
+            OverlayRenderer().draw(image, pose)
+            rows, columns = np.nonzero(image.any(axis=2))
+            visible = pose[pose[:, VISIBILITY] >= 0.5]
+            # The skeleton spans the landmarks' extent at this resolution (plus line thickness)
+            self.assertAlmostEqual(columns.min(), visible[:, 0].min() * width, delta=4)
+            self.assertAlmostEqual(rows.max(), visible[:, 1].max() * height, delta=4)
+
+    def test_hidden_landmarks_not_drawn(self):
+        pose = synthetic_poses(1)[0].copy()
+        pose[:, VISIBILITY] = 0.0
+        pose[LEFT_WRIST, VISIBILITY] = 1.0
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+        OverlayRenderer().draw(image, pose)
+        rows, columns = np.nonzero(image.any(axis=2))
+        x, y = pose[LEFT_WRIST, 0] * 640, pose[LEFT_WRIST, 1] * 480
+        self.assertLessEqual(np.abs(columns - x).max(), 4) # Just the one joint
+        self.assertLessEqual(np.abs(rows - y).max(), 4)
+
+    def test_text_at_scaled_position(self):
+        expected = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(expected, "Left Elbow: 123", (192, 192), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2,
+                    cv2.LINE_AA)
+        image = np.zeros_like(expected)
+        OverlayRenderer().draw(image, angles={"Left Elbow": (123.4, (0.3, 0.4))})
+        np.testing.assert_array_equal(image, expected)
+
+class TestFrameEncoder(unittest.TestCase):
+    def test_rate_limit(self):
+        encoder = FrameEncoder(max_fps=15)
+        sent = sum(encoder.due(index / 30) for index in range(300))
+        self.assertEqual(sent, 150)
+        self.assertEqual(encoder.stats["skipped"], 150)
+        # After a stall it resumes at the normal rate instead of bursting
+        self.assertEqual(sum(encoder.due(100 + index / 30) for index in range(30)), 15)
+
+    def test_encode_keeps_bgr(self):
+        image = np.zeros((720, 1280, 3), dtype=np.uint8)
+        image[..., 2] = 200 # Red in BGR
+        for format in ("jpeg", "webp"):
+            encoder = FrameEncoder(format, quality=80, max_width=640)
+            frame = encoder.fit(image)
+            self.assertEqual(frame.shape, (360, 640, 3))
+            data = encoder.encode(frame)
+            decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            np.testing.assert_allclose(decoded.mean(axis=(0, 1)), (0, 0, 200), atol=3)
+            self.assertEqual(encoder.stats["bytes"], len(data))
+        self.assertIs(FrameEncoder(max_width=None).fit(image), image)
+        with self.assertRaises(ValueError):
+            FrameEncoder("gif")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import time
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from exercises import BicepCurl
+from landmarks import LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, VISIBILITY, new_pose_array
+from pipeline import Pipeline, RingBuffer, run_headless
+from telemetry import Telemetry
+from rep_analytics import RepSegmenter
+
+class FakePoseEngine:
+    """
+    Stands in for PoseEngine: the frame brightness encodes the arm position (dark = arm down, bright = curled).
+    """
+    def __init__(self):
+        self.pose_array = new_pose_array()
+        self.pose_array[LEFT_SHOULDER, :2] = (0, 0)
+        self.pose_array[LEFT_ELBOW, :2] = (0, 1)
+        self.pose_array[[LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST], VISIBILITY] = 1.0 # The camera sees the left arm
+
+    def reset(self):
+        pass
+
+    def process_frame(self, frame):
+        curled = frame.mean() > 127
+        self.pose_array[LEFT_WRIST, :2] = (0, 0.1) if curled else (0, 2)
+        return frame, None, self.pose_array
+
+def write_video(path, brightness):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+    for value in brightness:
+        writer.write(np.full((48, 64, 3), value, np.uint8))
+    writer.release()
+
+class TestRingBuffer(unittest.TestCase):
+    def test_drop_oldest(self):
+        buffer = RingBuffer(2)
+        for i in range(5):
+            buffer.put(i)
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.dropped, 3)
+        self.assertEqual(buffer.get(), 3)
+        self.assertEqual(buffer.get(), 4)
+        self.assertIsNone(buffer.get(timeout=0.01))
+
+    def test_close_drains(self):
+        buffer = RingBuffer(2)
+        buffer.put("a")
+        buffer.close()
+        self.assertFalse(buffer.put("b"))
+        self.assertEqual(buffer.get(), "a")
+        self.assertIsNone(buffer.get())
+
+class TestPipeline(unittest.TestCase):
+    def test_headless_video(self):
+        # 3 curls: 5 frames down, 5 frames up
+        brightness = ([0] * 5 + [255] * 5) * 3
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            write_video(path, brightness)
+            source = cv2.VideoCapture(path)
+            curl = BicepCurl()
+            seqs = []
+            stats = run_headless(source, FakePoseEngine(), curl, on_result=lambda r: seqs.append(r["seq"]))
+            source.release()
+
+        # Without frame dropping every frame goes through, in order
+        self.assertEqual(seqs, list(range(len(brightness))))
+        self.assertEqual(curl.counter, 3)
+        for stage in ("capture", "inference", "render"):
+            self.assertEqual(stats[stage]["count"], len(brightness))
+        self.assertEqual(stats["frame_queue"]["dropped"], 0)
+
+    def test_queue_gauges_without_stats(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            write_video(path, [0] * 20)
+            source = cv2.VideoCapture(path)
+            telemetry = Telemetry()
+            pipeline = Pipeline(source, FakePoseEngine(), BicepCurl(), buffer_size=1, telemetry=telemetry).start()
+            time.sleep(0.2) # Nobody collects results meanwhile, so frames are dropped
+            while pipeline.get_result(timeout=0.5) is not None:
+                pass
+            pipeline.stop()
+            source.release()
+        gauges = telemetry.snapshot()["gauges"]
+        self.assertEqual(gauges["result_queue_depth"], 0)
+        self.assertGreater(gauges["dropped_frames"], 0)
+        self.assertEqual(gauges["dropped_frames"], pipeline.frames.dropped + pipeline.results.dropped)
+
+    def test_rep_summaries(self):
+        brightness = ([0] * 5 + [255] * 5) * 3
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            write_video(path, brightness)
+            source = cv2.VideoCapture(path)
+            segmenter = RepSegmenter.for_exercise("Bicep Curl")
+            summaries = []
+            run_headless(source, FakePoseEngine(), BicepCurl(), rep_segmenter=segmenter,
+                         on_result=lambda r: summaries.append(r["metrics"]["rep_summary"]))
+            source.release()
+
+        self.assertIsNone(summaries[0])
+        self.assertEqual(summaries[-1]["reps"], 2) # The third rep is still waiting to come back down
+        # Timed by the video's frame times (30 fps), not by how fast the file was read
+        self.assertAlmostEqual(summaries[-1]["last"]["duration"], 10 / 30, places=2)
+
+    def test_session_log_without_segmenter(self):
+        class RecordingLog:
+            def __init__(self):
+                self.updates = []
+
+            def update(self, timestamp, metrics, rep=None, pose=None):
+                self.updates.append((metrics["reps"], rep))
+
+        brightness = ([0] * 5 + [255] * 5) * 2
+        log = RecordingLog()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            write_video(path, brightness)
+            source = cv2.VideoCapture(path)
+            pipeline = Pipeline(source, FakePoseEngine(), BicepCurl(), drop_frames=False, session_log=log).start()
+            while not pipeline.finished:
+                pipeline.get_result(timeout=0.5)
+            pipeline.stop()
+            source.release()
+
+        # Warnings and poses still reach the log in per-side mode, where the app runs without a segmenter
+        self.assertEqual(len(log.updates), len(brightness))
+        self.assertTrue(all(rep is None for _, rep in log.updates))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from benchmarks.harness import synthetic_poses, synthetic_exercise_poses
+from exercises import BicepCurl
+from rep_analytics import RepSegmenter, format_rep_summary
+from rule_engine import RuleExercise
+
+def segment(exercise, poses, segmenter, fps=30):
+    completed = []
+    for index, pose in enumerate(poses):
+        exercise.process(pose)
+        rep = segmenter.update(index / fps, exercise.get_metrics())
+        if rep:
+            completed.append(rep)
+    return completed
+
+class TestRepSegmenter(unittest.TestCase):
+    def test_curl_reps(self):
+        segmenter = RepSegmenter.for_exercise("Bicep Curl")
+        reps = segment(BicepCurl(), synthetic_poses(300, period=60), segmenter)
+        self.assertEqual([rep["index"] for rep in reps], [1, 2, 3, 4, 5])
+        for previous, rep in zip(reps, reps[1:]):
+            self.assertEqual(rep["start"], previous["end"]) # Back to back
+            self.assertAlmostEqual(rep["duration"], 2.0, delta=0.1) # One 60 frame period at 30 fps
+        for rep in reps:
+            self.assertLess(rep["min_angle"], 30)
+            self.assertGreater(rep["max_angle"], 160)
+            self.assertGreater(rep["concentric"], 0.2)
+            self.assertLess(rep["concentric"] + rep["eccentric"], rep["duration"])
+        summary = segmenter.summary()
+        self.assertEqual((summary["reps"], summary["last"], summary["warned_reps"]), (5, reps[-1], 0))
+        self.assertIn("concentric", format_rep_summary(summary))
+
+    def test_concentric_follows_the_definition(self):
+        # Squats count on the way down; standing up is the concentric phase
+        squat = RuleExercise("Squat")
+        slow_up = synthetic_exercise_poses("Squat", 240, seed=2)
+        reps = segment(squat, slow_up, RepSegmenter.for_exercise("Squat"))
+        mirrored = segment(RuleExercise("Squat"), slow_up, RepSegmenter("Knee", concentric_stage="down"))
+        self.assertTrue(reps)
+        for rep, swapped in zip(reps, mirrored):
+            self.assertEqual((rep["concentric"], rep["eccentric"]), (swapped["eccentric"], swapped["concentric"]))
+
+    def test_warnings_ring_buffer_and_flush(self):
+        segmenter = RepSegmenter(capacity=3)
+        angles = [170, 20, 170] * 5 + [20]
+        reps = 0
+        for index, angle in enumerate(angles):
+            stage = "up" if angle < 90 else "down"
+            reps += stage == "up"
+            warnings = ["Keep your elbow fixed at your side!"] if index == 10 else []
+            segmenter.update(index, {"reps": reps, "stage": stage, "warnings": warnings,
+                                     "angles": {"Curl": (float(angle), [0, 0])}})
+        self.assertEqual(segmenter.total, 5)
+        self.assertEqual(segmenter.flush()["index"], 6) # Counted but not back down yet
+        recent = segmenter.recent()
+        self.assertEqual([rep["index"] for rep in recent], [4, 5, 6]) # Only the last 3 are kept
+        self.assertEqual(recent[0]["warnings"], ["Keep your elbow fixed at your side!"])
+        self.assertEqual(segmenter.summary(window=2)["warned_reps"], 0)
+        self.assertEqual(segmenter.summary(window=3)["warned_reps"], 1)
+        self.assertIsNone(segmenter.flush())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from benchmarks.harness import synthetic_exercise_poses
+from exercises import EXERCISES, BicepCurl
+from landmarks import LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE, LEFT_ANKLE, MIRROR, VISIBILITY
+from rule_engine import RuleEngine, RuleExercise, compile_condition, in_range, load_definitions, rule_exercises
+
+def random_walk_poses(frames, seed=1):
+    rng = np.random.default_rng(seed)
+    poses = np.cumsum(rng.normal(0, 0.05, (frames, 33, 4)), axis=0).astype(np.float32)
+    poses[..., 3] = 1.0
+    return poses
+
+class TestRuleEngine(unittest.TestCase):
+    def test_matches_exercise_classes(self):
+        poses = random_walk_poses(3000)
+        # Neck Rotation's class also tracks left/right stages from shoulder distances, which the definition leaves out
+        for name in ("Bicep Curl", "Push Up", "Shoulder Press", "Front Raise", "Shoulder Rotation"):
+            reference, rules = EXERCISES[name](), RuleExercise(name)
+            for pose in poses:
+                reference.process(pose)
+                rules.process(pose)
+                expected, actual = reference.get_metrics(), rules.get_metrics()
+                self.assertEqual((actual["reps"], actual["stage"], actual["warnings"]),
+                                 (expected["reps"], expected["stage"], expected["warnings"]), name)
+                for label, (value, position) in expected["angles"].items():
+                    self.assertAlmostEqual(actual["angles"][label][0], value)
+                    np.testing.assert_allclose(actual["angles"][label][1], position, atol=1e-6)
+            self.assertGreater(reference.counter, 0)
+
+    def test_matches_exercise_classes_with_hysteresis(self):
+        poses = random_walk_poses(3000, seed=2)
+        hysteresis = {"margin": 5, "frames": 2, "band": 5}
+        for name in ("Bicep Curl", "Push Up", "Shoulder Press", "Front Raise", "Shoulder Rotation"):
+            reference, rules = EXERCISES[name](hysteresis=hysteresis), RuleExercise(name, hysteresis=hysteresis)
+            for pose in poses:
+                reference.process(pose)
+                rules.process(pose)
+                expected, actual = reference.get_metrics(), rules.get_metrics()
+                self.assertEqual((actual["reps"], actual["stage"], actual["warnings"]),
+                                 (expected["reps"], expected["stage"], expected["warnings"]), name)
+            self.assertGreater(reference.counter, 0, name)
+
+    def test_mirrored_user(self):
+        # The same curls seen from the other side: the right arm curls, the left side is hidden
+        left = synthetic_exercise_poses("Bicep Curl", frames=240, seed=0)
+        right = left[:, MIRROR].copy()
+        right[:, LEFT_SHOULDER:LEFT_ANKLE + 1:2, VISIBILITY] = 0.1
+        reference, rules, left_only = BicepCurl(), RuleExercise("Bicep Curl"), RuleExercise("Bicep Curl", side="left")
+        for pose in right:
+            reference.process(pose)
+            rules.process(pose)
+            left_only.process(pose)
+        self.assertGreater(reference.counter, 1)
+        self.assertEqual(rules.counter, reference.counter)
+        self.assertEqual(rules.get_metrics()["side"], "right")
+        self.assertAlmostEqual(rules.angles["Curl"][0], reference.angles["Curl"][0], places=4)
+        self.assertEqual((left_only.counter, left_only.skipped_frames), (0, len(right)))
+        self.assertFalse(left_only.get_metrics()["visible"])
+        # Definitions that only use both sides together have no side to choose
+        self.assertIsNone(RuleExercise("Neck Rotation").get_metrics()["side"])
+
+    def test_one_engine_tracks_every_definition(self):
+        definitions = load_definitions()
+        engine = RuleEngine(definitions)
+        singles = {name: RuleExercise(name, definitions) for name in definitions}
+        poses = random_walk_poses(500, seed=2)
+        for pose in poses:
+            engine.process(pose)
+            for single in singles.values():
+                single.process(pose)
+        for name, single in singles.items():
+            self.assertEqual(engine.metrics(name)["reps"], single.counter)
+            self.assertEqual(engine.metrics(name)["stage"], single.stage)
+
+        # Shared angles are computed once; a batch of poses gives one row per frame
+        self.assertLess(len(engine.triplets), sum(len(d["angles"]) for d in definitions.values()))
+        batch, _ = engine.compute_angles(poses[:10])
+        self.assertEqual(batch.shape, (10, len(engine.triplets)))
+        np.testing.assert_allclose(batch[3], engine.compute_angles(poses[3])[0])
+
+    def test_conditions(self):
+        angles = np.array([69.0, 70.0, 90.0, 110.0, 111.0])
+        self.assertEqual(in_range(angles, *compile_condition({"outside": [70, 110]}, "t")).tolist(),
+                         [True, False, False, False, True])
+        self.assertEqual(in_range(angles, *compile_condition({"at_most": 70}, "t")).tolist(),
+                         [True, True, False, False, False])
+        self.assertEqual(in_range(angles, *compile_condition({"above": 110}, "t")).tolist(),
+                         [False, False, False, False, True])
+        with self.assertRaises(ValueError):
+            compile_condition({"message": "no threshold"}, "t")
+
+    def test_invalid_definitions(self):
+        definition = {"angles": {"Knee": {"points": ["LEFT_HIP", "LEFT_KNEE", "LEFT_TOE"]}},
+                      "count": {"angle": "Knee", "start": {"stage": "up", "above": 160},
+                                "end": {"stage": "down", "below": 90}}}
+        with self.assertRaises(ValueError):
+            RuleEngine({"Bad": definition})
+
+    def test_hysteresis(self):
+        definition = {"Knee Bend": {
+            "angles": {"Knee": {"points": ["LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"]}},
+            "count": {"angle": "Knee", "start": {"stage": "up", "above": 160},
+                      "end": {"stage": "down", "below": 90, "margin": 5, "frames": 2}},
+            "form": [{"angle": "Knee", "below": 60, "message": "Too deep", "band": 10}],
+        }}
+        engine = RuleEngine(definition)
+        reps, warned = [], []
+        # Angle: bouncing on 88 (inside the margin) never counts, two frames at 80 do
+        for angle in (170, 88, 170, 88, 84, 170, 80, 80, 55, 65, 75, 170):
+            engine.update(np.array([float(angle)]))
+            reps.append(int(engine.counters[0]))
+            warned.append(bool(engine.warnings[0]))
+        self.assertEqual(reps, [0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1])
+        # Raised below 60, cleared only once back above 70
+        self.assertEqual(warned, [False] * 8 + [True, True, False, False])
+
+        # Engine-wide defaults apply where a definition doesn't set its own
+        strict = RuleEngine(definition, hysteresis={"frames": 3})
+        for angle in (170, 170, 170, 80, 80):
+            strict.update(np.array([float(angle)]))
+        self.assertEqual(int(strict.counters[0]), 1)
+
+    def test_new_exercise_from_a_file(self):
+        definitions = {"Knee Bend": {
+            "angles": {"Knee": {"points": ["LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"]}},
+            "count": {"angle": "Knee", "start": {"stage": "up", "above": 160}, "end": {"stage": "down", "below": 90}},
+        }}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "custom.json")
+            with open(path, "w") as f:
+                json.dump(definitions, f)
+            exercise = rule_exercises(load_definitions(path))["Knee Bend"]()
+
+        pose = np.zeros((33, 4), np.float32)
+        pose[LEFT_HIP, :2], pose[LEFT_KNEE, :2] = (0, 0), (0, 1)
+        pose[[LEFT_HIP, LEFT_KNEE, LEFT_ANKLE], VISIBILITY] = 1.0 # The camera sees the left leg
+        for ankle in ((0, 2), (1, 0.5), (0, 2), (1, 0.5)): # Straight, bent, straight, bent
+            pose[LEFT_ANKLE, :2] = ankle
+            exercise.process(pose)
+        self.assertEqual((exercise.counter, exercise.stage), (2, "down"))
+
+if __name__ == '__main__':
+    unittest.main()
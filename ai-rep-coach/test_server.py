@@ -0,0 +1,133 @@
+import json
+import unittest
+import urllib.request
+import cv2
+import numpy as np
+from server import FairScheduler, InferencePool, InferenceServer
+from test_pipeline import FakePoseEngine
+
+def curl_frames(reps):
+    for _ in range(reps):
+        yield np.full((48, 64, 3), 20, np.uint8)
+        yield np.full((48, 64, 3), 230, np.uint8)
+
+class TestFairScheduler(unittest.TestCase):
+    def test_round_robin_and_one_in_flight(self):
+        scheduler = FairScheduler(per_session=10)
+        scheduler.add("busy")
+        scheduler.add("quiet")
+        for i in range(5):
+            scheduler.submit("busy", i)
+        scheduler.submit("quiet", "q")
+
+        batch = scheduler.next_batch(max_batch=4)
+        self.assertEqual(batch, [("busy", 0), ("quiet", "q")])
+        # Nothing else is handed out until the in-flight items are done
+        self.assertEqual(scheduler.next_batch(max_batch=4, timeout=0.01), [])
+        scheduler.done("busy")
+        scheduler.done("quiet")
+        self.assertEqual(scheduler.next_batch(max_batch=4), [("busy", 1)])
+
+    def test_drops_oldest_per_session(self):
+        scheduler = FairScheduler(per_session=2)
+        scheduler.add("a")
+        self.assertIsNone(scheduler.submit("a", 1))
+        self.assertIsNone(scheduler.submit("a", 2))
+        self.assertEqual(scheduler.submit("a", 3), 1)
+        self.assertEqual(scheduler.dropped, 1)
+        self.assertEqual(scheduler.next_batch(), [("a", 2)])
+        self.assertEqual(scheduler.remove("a"), [3])
+
+    def test_removed_session_stays_removed(self):
+        scheduler = FairScheduler()
+        with self.assertRaises(KeyError):
+            scheduler.submit("never added", 1)
+        scheduler.add("a")
+        scheduler.submit("a", 1)
+        self.assertEqual(scheduler.remove("a"), [1])
+        # A frame that was on its way when the session closed does not bring its queue back
+        with self.assertRaises(KeyError):
+            scheduler.submit("a", 2)
+        self.assertEqual((scheduler.depth(), scheduler.next_batch(timeout=0.01)), (0, []))
+
+class TestInferencePool(unittest.TestCase):
+    def setUp(self):
+        self.pool = InferencePool(workers=2, pose_engine_factory=FakePoseEngine, per_session=100)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_sessions_keep_separate_state(self):
+        first = self.pool.create_session("Bicep Curl")
+        second = self.pool.create_session("Bicep Curl")
+        jobs = [self.pool.submit(first.id, frame) for frame in curl_frames(5)]
+        jobs += [self.pool.submit(second.id, frame) for frame in curl_frames(2)]
+        for job in jobs:
+            self.assertTrue(job.done.wait(5))
+        self.assertEqual(first.exercise.counter, 5)
+        self.assertEqual(second.exercise.counter, 2)
+        self.assertEqual(jobs[-1].result["metrics"]["reps"], 2)
+        self.assertIsNone(self.pool.submit("missing", jobs[0].frame))
+
+        self.assertTrue(self.pool.close_session(first.id))
+        self.assertEqual(self.pool.stats()["sessions"], 1)
+
+    def test_workers_warm_up_first(self):
+        warmed = []
+
+        class WarmEngine(FakePoseEngine):
+            def warm_up(self):
+                warmed.append(self)
+
+        pool = InferencePool(workers=3, pose_engine_factory=WarmEngine)
+        try:
+            self.assertTrue(pool.wait_ready(5))
+            self.assertEqual(len(warmed), 3)
+            self.assertTrue(self.pool.wait_ready(5)) # Engines without warm_up are ready once created
+        finally:
+            pool.close()
+
+    def test_worker_start_failure(self):
+        class BrokenEngine(FakePoseEngine):
+            def warm_up(self):
+                raise OSError("model file missing")
+
+        pool = InferencePool(workers=2, pose_engine_factory=BrokenEngine)
+        try:
+            with self.assertRaisesRegex(RuntimeError, "model file missing"):
+                pool.wait_ready(5)
+            self.assertEqual(pool.telemetry.last_errors["warm_up"], "OSError: model file missing")
+        finally:
+            pool.close()
+
+class TestInferenceServer(unittest.TestCase):
+    def test_http_round_trip(self):
+        pool = InferencePool(workers=1, pose_engine_factory=FakePoseEngine)
+        server = InferenceServer(pool, port=0)
+        base = f"http://127.0.0.1:{server.port}"
+
+        def call(path, data=None, method=None):
+            request = urllib.request.Request(base + path, data=data, method=method)
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+
+        try:
+            status, created = call("/sessions", json.dumps({"exercise": "Bicep Curl"}).encode())
+            self.assertEqual(status, 201)
+            session_path = f"/sessions/{created['session_id']}"
+            for frame in curl_frames(3):
+                status, result = call(session_path + "/frames?wait=1", cv2.imencode(".jpg", frame)[1].tobytes())
+                self.assertEqual((status, result["status"]), (200, "ok"))
+            self.assertEqual(result["metrics"]["reps"], 3)
+
+            status, session = call(session_path)
+            self.assertEqual((session["frames"], session["metrics"]["reps"]), (6, 3))
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                call(session_path + "/frames", b"not an image")
+            self.assertEqual(error.exception.code, 400)
+            self.assertEqual(call(session_path, method="DELETE")[0], 200)
+        finally:
+            server.close()
+
+if __name__ == '__main__':
+    unittest.main()
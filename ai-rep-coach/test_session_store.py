@@ -0,0 +1,152 @@
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from benchmarks.harness import synthetic_poses
+from exercises import BicepCurl
+from rep_analytics import RepSegmenter
+from session_store import SessionStore, SessionLog
+
+def make_rep(end, duration=2.0, low=30.0, high=160.0, warnings=()):
+    return {"start": end - duration, "end": end, "min_angle": low, "max_angle": high,
+            "concentric": 0.8, "eccentric": 1.0, "warnings": list(warnings)}
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "workouts.db")
+        self.store = SessionStore(self.path, flush_interval=0.05)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_wal_and_indexes(self):
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        plan = " ".join(row[-1] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM reps WHERE user = 'a' AND end >= 0 ORDER BY end DESC"))
+        self.assertIn("reps_user_end", plan)
+        connection.close()
+
+    def test_history_filters(self):
+        now = time.time()
+        alice = self.store.start_session("alice", "Bicep Curl", started=now - 7200)
+        bob = self.store.start_session("bob", "Squat", started=now - 7200)
+        for index in range(5):
+            warnings = ["Keep elbows in"] if index == 4 else ()
+            self.store.add_rep(alice, make_rep(now - 3600 + index * 3, warnings=warnings))
+        self.store.add_rep(bob, make_rep(now - 100))
+        self.store.add_warning(alice, now - 3590, "Keep elbows in")
+        self.assertTrue(self.store.flush())
+
+        reps = self.store.history(user="alice")
+        self.assertEqual([rep["rep_index"] for rep in reps], [5, 4, 3, 2, 1]) # Newest first
+        self.assertEqual(reps[0]["warnings"], ["Keep elbows in"])
+        self.assertEqual(len(self.store.history(exercise="Squat")), 1)
+        self.assertEqual(len(self.store.history(since=now - 1000)), 1)
+        self.assertEqual(len(self.store.history(user="alice", until=now - 3595)), 2)
+        self.assertEqual(self.store.warnings(user="alice")[0]["message"], "Keep elbows in")
+
+        totals = self.store.daily_totals(user="alice")
+        self.assertEqual(len(totals), 1)
+        self.assertEqual((totals[0]["reps"], totals[0]["avg_range"], totals[0]["warned_reps"]), (5, 130.0, 1))
+
+    def test_resume_continues_counting(self):
+        now = time.time()
+        session_id = self.store.start_session("alice", "Bicep Curl", started=now - 60)
+        for index in range(3):
+            self.store.add_rep(session_id, make_rep(now - 30 + index))
+        self.store.flush()
+
+        # A fresh store, as after a restart: the session is found and numbering carries on
+        reopened = SessionStore(self.path, flush_interval=0.05)
+        session = reopened.resume("alice", "Bicep Curl")
+        self.assertEqual((session["id"], session["reps"]), (session_id, 3))
+        self.assertIsNone(reopened.resume("alice", "Squat"))
+        self.assertIsNone(reopened.resume("alice", "Bicep Curl", within=10))
+        reopened.add_rep(session_id, make_rep(now))
+        reopened.flush()
+        self.assertEqual(reopened.history(user="alice")[0]["rep_index"], 4)
+        reopened.close()
+
+    def test_concurrent_sessions_while_writing(self):
+        store = SessionStore(os.path.join(self.tmp.name, "busy.db"), batch_size=16, flush_interval=0.001)
+        self.addCleanup(store.close)
+        # Switch threads often, so the writer is interrupted while it goes through the dirty sessions
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        now = time.time()
+
+        def member(index):
+            # Many sessions per thread, so the writer keeps swapping the dirty set while reps come in
+            sessions = [store.start_session(f"user{index}", "Bicep Curl", started=now) for _ in range(20)]
+            for rep in range(50):
+                for session_id in sessions:
+                    store.add_rep(session_id, make_rep(now + rep + 1))
+
+        threads = [threading.Thread(target=member, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(store.flush())
+        self.assertTrue(store._thread.is_alive())
+        self.assertEqual(store.stats["written"], store.stats["queued"])
+        counts = store._query("SELECT COUNT(*) AS sessions, SUM(reps) AS reps FROM sessions")[0]
+        self.assertEqual((counts["sessions"], counts["reps"]), (80, 80 * 50))
+
+    def test_landmarks_downsampled(self):
+        session_id = self.store.start_session("alice", "Bicep Curl")
+        poses = synthetic_poses(30)
+        kept = [self.store.add_landmarks(session_id, index / 30, pose) for index, pose in enumerate(poses)]
+        self.assertEqual(sum(kept), 5) # 1 s at 30 fps, one frame per 0.2 s
+        self.store.flush()
+        times, stored = self.store.landmarks(session_id)
+        self.assertEqual(stored.shape, (5, 33, 4))
+        np.testing.assert_allclose(stored[1], poses[6], atol=1e-2)
+
+    def test_compact_rolls_up_old_reps(self):
+        now = time.time()
+        session_id = self.store.start_session("alice", "Bicep Curl", started=now - 200 * 86400)
+        for days_ago in (200, 200, 5):
+            self.store.add_rep(session_id, make_rep(now - days_ago * 86400))
+        self.store.add_landmarks(session_id, now - 30 * 86400, synthetic_poses(1)[0])
+        self.store.flush()
+        before = self.store.daily_totals(user="alice")
+
+        removed = self.store.compact(raw_days=90, landmark_days=7, now=now)
+        self.assertEqual((removed["reps"], removed["landmarks"]), (2, 1))
+        self.assertEqual(len(self.store.history(user="alice")), 1)
+        # The old day is still in the totals, now from the roll-up
+        self.assertEqual(self.store.daily_totals(user="alice"), before)
+        self.assertEqual(sum(row["reps"] for row in self.store.daily_totals(since=now - 300 * 86400)), 3)
+        # until is exclusive for rolled-up days too: midnight of the old day leaves it out
+        old_day = datetime.datetime.fromtimestamp(now - 200 * 86400).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.assertEqual(self.store.daily_totals(user="alice", until=old_day.timestamp()), [])
+        next_day = (old_day + datetime.timedelta(days=1)).timestamp()
+        self.assertEqual([row["reps"] for row in self.store.daily_totals(user="alice", until=next_day)], [2])
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(connection.execute("PRAGMA freelist_count").fetchone()[0], 0) # Deleted pages given back
+        connection.close()
+
+    def test_session_log_from_segmenter(self):
+        session_id = self.store.start_session("alice", "Bicep Curl")
+        log = SessionLog(self.store, session_id)
+        exercise, segmenter = BicepCurl(), RepSegmenter.for_exercise("Bicep Curl")
+        for index, pose in enumerate(synthetic_poses(300, period=60)):
+            exercise.process(pose)
+            metrics = exercise.get_metrics()
+            log.update(index / 30, metrics, segmenter.update(index / 30, metrics))
+        self.store.flush()
+        reps = self.store.history(user="alice")
+        self.assertEqual(len(reps), segmenter.total)
+        self.assertEqual(reps[0]["end"], segmenter.recent(1)[0]["end"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from telemetry import RollingHistogram, Telemetry, JsonlExporter, MetricsServer
+
+class TestTelemetry(unittest.TestCase):
+    def test_rolling_window(self):
+        histogram = RollingHistogram(size=4)
+        for value in (1.0, 1.0, 1.0, 1.0, 0.002, 0.002, 0.002, 0.002):
+            histogram.add(value)
+        summary = histogram.summary()
+        # Percentiles only cover the last 4 samples; count and max are lifetime
+        self.assertEqual(summary["p99_ms"], 2.0)
+        self.assertEqual(summary["count"], 8)
+        self.assertEqual(summary["max_ms"], 1000.0)
+
+    def test_timer_counts_errors(self):
+        telemetry = Telemetry()
+        with self.assertRaises(ValueError):
+            with telemetry.timer("exercise"):
+                raise ValueError("bad landmarks")
+        snapshot = telemetry.snapshot()
+        self.assertEqual(snapshot["stages"]["exercise"]["count"], 1)
+        self.assertEqual(snapshot["counters"]["errors.exercise"], 1)
+        self.assertEqual(snapshot["last_errors"]["exercise"], "ValueError: bad landmarks")
+
+    def test_jsonl_export(self):
+        telemetry = Telemetry()
+        telemetry.increment("no_landmarks", 3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "telemetry.jsonl")
+            exporter = JsonlExporter(path, telemetry, interval=0, extra={"session": "abc"})
+            self.assertTrue(exporter.maybe_export())
+            exporter.export()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]["session"], "abc")
+        self.assertEqual(lines[0]["counters"]["no_landmarks"], 3)
+
+    def test_metrics_server(self):
+        telemetry = Telemetry()
+        telemetry.record("pose", 0.02)
+        server = MetricsServer({"s1": telemetry}, port=0)
+        try:
+            base = f"http://127.0.0.1:{server.port}"
+            text = urllib.request.urlopen(base + "/metrics").read().decode()
+            data = json.loads(urllib.request.urlopen(base + "/metrics.json").read())
+        finally:
+            server.close()
+        self.assertIn('airepcoach_stage_seconds_count{session="s1",stage="pose"} 1', text)
+        self.assertEqual(data["s1"]["stages"]["pose"]["p50_ms"], 20.0)
+
+    def test_metrics_server_retries_changing_registry(self):
+        class ChangingRegistry(dict):
+            # Like a WeakValueDictionary that a session changes while it is being copied
+            failures = 2
+
+            def items(self):
+                if self.failures:
+                    self.failures -= 1
+                    raise RuntimeError("dictionary changed size during iteration")
+                return super().items()
+
+        server = MetricsServer(ChangingRegistry(s1=Telemetry()), port=0)
+        try:
+            data = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics.json").read())
+        finally:
+            server.close()
+        self.assertEqual(list(data), ["s1"])
+
+if __name__ == '__main__':
+    unittest.main()
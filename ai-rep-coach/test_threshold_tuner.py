@@ -0,0 +1,81 @@
+import csv
+import os
+import tempfile
+import unittest
+import numpy as np
+from benchmarks.harness import synthetic_exercise_poses
+from exercise_recognizer import detected_angles
+from exercises import BicepCurl
+from landmark_track import TrackWriter
+from rule_engine import RuleEngine, load_definitions
+from threshold_tuner import parameter_grid, sweep, sweep_counts, loop_counts, load_recordings, read_csv_angles, tune
+
+def write_angle_table(path, curl):
+    # Per-frame table as batch_process.py writes it
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["frame", "detected", "reps", "Curl", "Swing"])
+        writer.writeheader()
+        for index, value in enumerate(curl):
+            writer.writerow({"frame": index, "detected": True, "reps": 0, "Curl": round(value, 2), "Swing": 30.0})
+
+class TestThresholdTuner(unittest.TestCase):
+    def setUp(self):
+        self.definition = load_definitions()["Bicep Curl"]
+
+    def test_sweep_matches_looping_rule_exercise(self):
+        poses = synthetic_exercise_poses("Bicep Curl", frames=400, seed=3)
+        poses[::7, :, :2] += 0.02 # Jitter that the hold frames have to ride out
+        poses[50:60] = np.nan # Nobody detected
+        rng = np.random.default_rng(0)
+        params = parameter_grid(self.definition, span=30, step=5)[rng.choice(117, 25, replace=False)]
+        angles = detected_angles(RuleEngine({"Bicep Curl": self.definition}), poses)
+        counts = sweep_counts(self.definition, params, [angles])
+        np.testing.assert_array_equal(counts, loop_counts("Bicep Curl", self.definition, params, [poses]))
+        self.assertGreater(counts.max(), 0)
+        # Chunks in worker processes give the same counts
+        np.testing.assert_array_equal(sweep(self.definition, params, [angles], workers=2, chunk=10), counts)
+
+    def test_csv_skips_frames_without_angles(self):
+        engine = RuleEngine({"Bicep Curl": self.definition})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "set.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["frame", "detected", "visible", "reps", "Curl", "Swing"])
+                writer.writeheader()
+                writer.writerow({"frame": 0, "detected": True, "visible": True, "Curl": 170.0, "Swing": 30.0})
+                writer.writerow({"frame": 1, "detected": True, "visible": False}) # Skipped by the exercise
+                writer.writerow({"frame": 2, "detected": False})
+                writer.writerow({"frame": 3, "detected": True, "Curl": 20.0}) # Written before "visible" existed
+                writer.writerow({"frame": 4, "detected": True, "visible": True, "Curl": 20.0, "Swing": 30.0})
+            angles = read_csv_angles(path, engine)
+        np.testing.assert_allclose(angles[:, engine.angle_columns[0]["Curl"]], [170.0, 20.0])
+
+    def test_tunes_thresholds_to_partial_range(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            specs = []
+            # Curls that only go from 150 down to 45 degrees: the default (above 160, below 30) never counts
+            for index, reps in enumerate((6, 9)):
+                t = np.arange(reps * 40)
+                path = os.path.join(tmp, f"set{index}.csv")
+                write_angle_table(path, 97.5 + 52.5 * np.cos(2 * np.pi * t / 40))
+                specs.append(f"{path}={reps}")
+            # A full-range landmark track, labelled in its metadata with what the BicepCurl class counts
+            poses = synthetic_exercise_poses("Bicep Curl", frames=300, seed=1)
+            curl = BicepCurl()
+            for pose in poses:
+                curl.process(pose)
+            with TrackWriter(os.path.join(tmp, "full.track"), fps=30,
+                             metadata={"exercise": "Bicep Curl", "reps": curl.counter}) as writer:
+                for pose in poses:
+                    writer.append(pose)
+            recordings = load_recordings(specs, "Bicep Curl")["Bicep Curl"]
+            recordings += load_recordings([os.path.join(tmp, "full.track")])["Bicep Curl"]
+            params, counts, order = tune("Bicep Curl", self.definition, recordings, workers=1)
+            start, end, frames = params[order[0]]
+            self.assertGreater(curl.counter, 2)
+            self.assertEqual(counts[order[0]].tolist(), [6, 9, curl.counter])
+            self.assertLess(start, 150)
+            self.assertGreater(end, 45)
+
+if __name__ == '__main__':
+    unittest.main()
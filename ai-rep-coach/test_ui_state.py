@@ -0,0 +1,62 @@
+import unittest
+from ui_state import UIState, panel_updates
+
+class RecordingPlaceholder:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, method):
+        return lambda *content: self.calls.append((method, content))
+
+def metrics(reps=0, stage="down", warnings=(), curl=160.0):
+    return {"reps": reps, "stage": stage, "warnings": list(warnings), "angles": {"Curl": (curl, [0, 0])}}
+
+class TestUIState(unittest.TestCase):
+    def setUp(self):
+        self.placeholders = {key: RecordingPlaceholder() for key in ("reps", "stage", "angles", "feedback")}
+        self.ui = UIState(self.placeholders, rates={"angles": 4})
+
+    def render(self, frame_metrics, now):
+        for key, method, content in panel_updates(frame_metrics):
+            self.ui.show(key, method, *content, now=now)
+        self.ui.flush(now=now)
+
+    def test_sends_only_changes(self):
+        for frame in range(30):
+            self.render(metrics(), now=frame / 30)
+        self.assertEqual(self.ui.stats["sent"], 4)
+        self.render(metrics(reps=1), now=1.0)
+        self.assertEqual(self.placeholders["reps"].calls, [("metric", ("Reps", 0)), ("metric", ("Reps", 1))])
+        # The same content through another widget method is a change
+        self.assertTrue(self.ui.show("feedback", "warning", "Form looks good!", now=1.0))
+
+    def test_angles_throttled_reps_and_warnings_immediate(self):
+        for frame in range(30):
+            warnings = ["Keep your elbow fixed at your side!"] if frame >= 10 else []
+            self.render(metrics(reps=frame // 3, warnings=warnings, curl=160.0 - frame), now=frame / 30)
+        self.assertEqual(len(self.placeholders["reps"].calls), 10)
+        self.assertEqual([method for method, _ in self.placeholders["feedback"].calls], ["success", "error"])
+        # 1 s at 4 updates per second
+        angles = self.placeholders["angles"].calls
+        self.assertEqual(len(angles), 4)
+        # The newest held angle text goes out once its slot comes, even if it does not change again
+        self.render(metrics(reps=9, warnings=["Keep your elbow fixed at your side!"], curl=131.0), now=1.01)
+        self.assertEqual(len(angles), 4)
+        self.ui.flush(now=1.5)
+        self.assertEqual(angles[-1], ("markdown", ("**Curl**: 131°\n\n",)))
+        self.assertGreater(self.ui.stats["throttled"], 20)
+
+    def test_panel_updates(self):
+        state = metrics(reps=3, stage="up")
+        state.update(side="right", rep_summary=None)
+        self.assertEqual(panel_updates(state, "Bicep Curl"), [
+            ("reps", "metric", ("Reps", 3)),
+            ("stage", "text", ("Bicep Curl | Stage: up (right side)",)),
+            ("angles", "markdown", ("**Curl**: 160°\n\n",)),
+            ("feedback", "success", ("Form looks good!",)),
+        ])
+        state["side_reps"] = {"left": 2, "right": 1}
+        self.assertEqual(panel_updates(state)[1], ("stage", "text", ("Stage: up | left: 2, right: 1",)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+from utils import calculate_angle, calculate_angles, draw_angle
+
+class TestCalculateAngles(unittest.TestCase):
+    def test_matches_scalar_2d(self):
+        rng = np.random.default_rng(42)
+        triplets = rng.random((200, 3, 2))
+        expected = [calculate_angle(a, b, c) for a, b, c in triplets]
+        np.testing.assert_allclose(calculate_angles(triplets), expected, atol=1e-9)
+
+    def test_3d_uses_z(self):
+        # Right angle that is only visible once depth is taken into account
+        triplets = np.array([[[1, 0, 0], [0, 0, 0], [0, 0, 1]]], dtype=float)
+        np.testing.assert_allclose(calculate_angles(triplets), [90.0])
+        np.testing.assert_allclose(calculate_angles(triplets[..., :2]), [0.0])
+
+    def test_leading_axes(self):
+        # (frames, joints, 3, 2) -> (frames, joints)
+        triplets = np.tile(np.array([[0, 0], [0, 1], [0, 2]], dtype=float), (5, 4, 1, 1))
+        angles = calculate_angles(triplets)
+        self.assertEqual(angles.shape, (5, 4))
+        np.testing.assert_allclose(angles, 180.0)
+
+    def test_bad_shape(self):
+        with self.assertRaises(ValueError):
+            calculate_angles(np.zeros((4, 2, 2)))
+
+class TestDrawAngle(unittest.TestCase):
+    def test_scales_to_frame_size(self):
+        for width, height in ((640, 480), (1280, 720)):
+            image = np.zeros((height, width, 3), dtype=np.uint8)
+            draw_angle(image, 90, (0.5, 0.5))
+            rows, columns = np.nonzero(image.any(axis=2))
+            self.assertAlmostEqual(columns.min(), width / 2, delta=3)
+            self.assertAlmostEqual(rows.max(), height / 2, delta=3) # The position is the text baseline
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+"""
+Tunes the rep counting thresholds of the exercise definitions (exercises.json) on labelled recordings.
+
+Each exercise counts a rep when its angle enters the start stage (e.g. Curl above 160) and then the end stage
+(Curl below 30). This tool tries every combination on a grid around the current thresholds, plus how many
+consecutive frames each stage must hold (the "frames" hysteresis option), and compares the counts with the
+true rep count of every recording.
+
+Combinations are not replayed one by one. They become variants of the definition, and a single RuleEngine
+advances all their stage machines together, one array operation per frame for thousands of combinations.
+Chunks of combinations run in parallel worker processes. The angles of a recording are computed once,
+whatever the number of combinations.
+
+A recording is a landmark track (landmark_track.py) or a per-frame CSV from batch_process.py. The exercise
+comes from the track metadata or --exercise. The true rep count comes from the track metadata ("reps") or
+is given as PATH=REPS.
+
+Usage (from the ai-rep-coach directory):
+    python threshold_tuner.py recordings/*.track --output tuned.json
+    python threshold_tuner.py results/set1.csv=12 results/set2.csv=10 --exercise "Bicep Curl" --span 40 --step 2
+The output file holds the definitions with the best thresholds, for rule_engine.load_definitions.
+"""
+import argparse
+import copy
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from exercise_recognizer import detected_angles
+from landmark_track import LandmarkTrack
+from rule_engine import RuleEngine, RuleExercise, load_definitions, DEFINITIONS_PATH
+
+SINGLE_BOUNDS = ("above", "below", "at_least", "at_most")
+
+def threshold_key(condition, where):
+    """
+    Which key of a stage condition holds its threshold; conditions with two bounds are not tuned.
+    """
+    for key in SINGLE_BOUNDS:
+        if key in condition:
+            return key
+    raise ValueError(f"{where}: only above/below/at_least/at_most thresholds can be tuned")
+
+def current_thresholds(definition):
+    """
+    (start threshold, end threshold) of a definition's count rule.
+    """
+    count = definition["count"]
+    return tuple(float(count[key][threshold_key(count[key], key)]) for key in ("start", "end"))
+
+def parameter_grid(definition, span=30, step=2, frames=(1, 2, 3)):
+    """
+    (C, 3) array of (start threshold, end threshold, frames): every combination within `span` degrees of the
+    current thresholds, in `step` degree steps.
+    """
+    offsets = np.arange(-span, span + step / 2, step)
+    start, end = current_thresholds(definition)
+    starts, ends = start + offsets, end + offsets
+    grid = np.stack(np.meshgrid(starts, ends, frames, indexing="ij"), axis=-1).reshape(-1, 3)
+    return grid[(grid[:, 0] >= 0) & (grid[:, 1] >= 0) & (grid[:, 0] <= 180) & (grid[:, 1] <= 180)]
+
+def apply_params(definition, params):
+    """
+    A copy of the definition counting with (start threshold, end threshold, frames); form rules are dropped.
+    """
+    start, end, frames = params
+    definition = copy.deepcopy(definition)
+    definition.pop("form", None)
+    for key, value in (("start", start), ("end", end)):
+        condition = definition["count"][key]
+        condition[threshold_key(condition, key)] = float(value)
+        condition["frames"] = int(frames)
+    return definition
+
+def sweep_counts(definition, params, recordings):
+    """
+    (C, R) rep counts of every parameter row on every recording's (T, A) angles, all rows at once.
+    """
+    engine = RuleEngine({str(index): apply_params(definition, row) for index, row in enumerate(params)})
+    counts = np.zeros((len(params), len(recordings)), dtype=np.int64)
+    for column, angles in enumerate(recordings):
+        engine.reset()
+        update = engine.update
+        for row in angles:
+            update(row)
+        counts[:, column] = engine.counters
+    return counts
+
+def _sweep_chunk(args):
+    return sweep_counts(*args)
+
+def sweep(definition, params, recordings, workers=None, chunk=256):
+    """
+    sweep_counts split into chunks of `chunk` rows over `workers` processes (1: in this process).
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [(definition, params[i:i + chunk], recordings) for i in range(0, len(params), chunk)]
+    if workers == 1 or len(chunks) == 1:
+        return np.concatenate([sweep_counts(*job) for job in chunks])
+    with multiprocessing.Pool(min(workers, len(chunks))) as pool:
+        return np.concatenate(pool.map(_sweep_chunk, chunks))
+
+def loop_counts(name, definition, params, landmarks):
+    """
+    The same counts by replaying every recording through one RuleExercise per parameter row (the baseline).
+    landmarks: list of (frames, 33, 4) recordings.
+    """
+    counts = np.zeros((len(params), len(landmarks)), dtype=np.int64)
+    for row, values in enumerate(params):
+        definitions = {name: apply_params(definition, values)}
+        for column, recording in enumerate(landmarks):
+            exercise = RuleExercise(name, definitions)
+            for pose in recording:
+                if not np.isnan(pose[0, 0]):
+                    exercise.process(pose)
+            counts[row, column] = exercise.counter
+    return counts
+
+def rank(counts, reps, params, definition):
+    """
+    Row order from best to worst: total absolute count error, then exact recordings, then the smallest change
+    from the current thresholds and the fewest frames.
+    """
+    errors = np.abs(counts - reps).sum(axis=1)
+    exact = (counts == reps).sum(axis=1)
+    current = current_thresholds(definition)
+    change = np.abs(params[:, 0] - current[0]) + np.abs(params[:, 1] - current[1])
+    return np.lexsort((params[:, 2], change, -exact, errors))
+
+def read_csv_angles(path, engine):
+    """
+    (T, A) angles of the detected frames in a batch_process.py per-frame table (columns named by angle label).
+    Frames the exercise skipped as not visible (no angles) are left out, like undetected ones.
+    """
+    columns = engine.angle_columns[0]
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("detected", "True") != "True" or row.get("visible", "True") != "True":
+                continue
+            if any(not row.get(label) for label in columns):
+                continue
+            angles = np.zeros(len(engine.triplets))
+            for label, column in columns.items():
+                angles[column] = float(row[label])
+            rows.append(angles)
+    return np.array(rows).reshape(-1, len(engine.triplets))
+
+def load_recordings(specs, exercise=None):
+    """
+    Returns {exercise: [(path, reps, track landmarks or None, CSV path or None)]} for PATH or PATH=REPS specs.
+    """
+    recordings = {}
+    for spec in specs:
+        path, _, reps = spec.partition("=")
+        track = None if path.endswith(".csv") else LandmarkTrack(path)
+        metadata = track.metadata if track else {}
+        name = exercise or metadata.get("exercise")
+        reps = reps or metadata.get("reps")
+        if not name or reps in (None, ""):
+            print(f"{path}: no exercise or rep count (use --exercise, or PATH=REPS), skipped")
+            continue
+        landmarks = np.asarray(track.landmarks) if track else None
+        recordings.setdefault(name, []).append((path, int(reps), landmarks, path if not track else None))
+    return recordings
+
+def tune(name, definition, recordings, span=30, step=2, frames=(1, 2, 3), workers=None):
+    """
+    Sweeps the grid for one exercise. Returns (params, counts, order): rows of parameter_grid, their (C, R) counts
+    and the row order from best to worst.
+    """
+    engine = RuleEngine({name: definition})
+    angles = [detected_angles(engine, landmarks) if landmarks is not None else read_csv_angles(csv_path, engine)
+              for _, _, landmarks, csv_path in recordings]
+    params = parameter_grid(definition, span, step, frames)
+    counts = sweep(definition, params, angles, workers)
+    reps = np.array([recording[1] for recording in recordings])
+    return params, counts, rank(counts, reps, params, definition)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="Track directories or batch_process CSVs, as PATH or PATH=REPS")
+    parser.add_argument("--exercise", default=None, help="Exercise of every recording (default: from the track metadata)")
+    parser.add_argument("--definitions", default=DEFINITIONS_PATH, help="Exercise definitions (JSON or YAML)")
+    parser.add_argument("--span", type=float, default=30, help="Degrees around each current threshold to try")
+    parser.add_argument("--step", type=float, default=2, help="Degrees between tried thresholds")
+    parser.add_argument("--frames", nargs="+", type=int, default=[1, 2, 3], help="Stage hold frames to try")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--top", type=int, default=5, help="Combinations listed per exercise")
+    parser.add_argument("--compare-loop", type=int, default=0, metavar="N",
+                        help="Also time N combinations replayed one by one through RuleExercise")
+    parser.add_argument("--output", default=None, help="Write the definitions with the best thresholds here")
+    args = parser.parse_args()
+
+    definitions = load_definitions(args.definitions)
+    recordings = load_recordings(args.recordings, args.exercise)
+    if not recordings:
+        parser.error("no labelled recordings")
+    tuned = copy.deepcopy(definitions)
+    for name, items in recordings.items():
+        if name not in definitions:
+            print(f"{name}: no definition, skipped")
+            continue
+        definition = definitions[name]
+        start = time.perf_counter()
+        params, counts, order = tune(name, definition, items, args.span, args.step, args.frames, args.workers)
+        elapsed = time.perf_counter() - start
+        reps = np.array([item[1] for item in items])
+        frames = sum(len(item[2]) if item[2] is not None else 0 for item in items)
+        print(f"\n{name}: {len(params)} combinations x {len(items)} recordings in {elapsed:.2f}s "
+              f"({args.workers} workers), true reps {reps.tolist()}")
+        print(f"{'':<8} {'start':>8} {'end':>8} {'frames':>7} {'abs error':>10} {'exact':>7}  counts")
+        current = np.flatnonzero((params == (*current_thresholds(definition), 1)).all(axis=1))
+        for label, row in [("current", row) for row in current] + [(f"#{i + 1}", row) for i, row in
+                                                                    enumerate(order[:args.top])]:
+            start_value, end_value, hold = params[row]
+            error = np.abs(counts[row] - reps).sum()
+            exact = (counts[row] == reps).sum()
+            print(f"{label:<8} {start_value:>8g} {end_value:>8g} {int(hold):>7} {error:>10} {exact:>4}/{len(reps)}  "
+                  f"{counts[row].tolist()}")
+        best = params[order[0]]
+        tuned[name] = apply_params(definition, best)
+        if "form" in definition:
+            tuned[name]["form"] = copy.deepcopy(definition["form"])
+        if args.compare_loop and frames:
+            sample = params[:args.compare_loop]
+            start = time.perf_counter()
+            looped = loop_counts(name, definition, sample, [item[2] for item in items])
+            per_row = (time.perf_counter() - start) / len(sample)
+            assert np.array_equal(looped, counts[:len(sample)]), "looped and vectorized counts differ"
+            print(f"Looping RuleExercise: {per_row * 1e3:.1f} ms per combination, "
+                  f"~{per_row * len(params):.1f}s for the grid ({per_row * len(params) / elapsed:.0f}x slower)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(tuned, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+if __name__ == "__main__":
+    main()
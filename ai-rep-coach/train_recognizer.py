@@ -0,0 +1,98 @@
+"""
+Trains and evaluates the exercise recognizer (exercise_recognizer.py) on recorded landmark tracks.
+
+A track's label is the "exercise" in its metadata (set by pipeline.py --record and batch_process.py --tracks),
+or --label for every track given. Each track is split in time: the first part trains the model and the last
+--test-fraction is held out to report window accuracy, the confusion matrix, how many frames the online
+recognizer needs to lock onto the right exercise and its per-frame cost.
+
+Usage (from the ai-rep-coach directory):
+    python train_recognizer.py recordings/*.track --output recognizer.npz
+    python train_recognizer.py recordings/*.track --test-fraction 0.3 --window 90
+Use the model in the app by setting RECOGNIZER_MODEL=recognizer.npz (the "Auto Detect" exercise).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from exercise_recognizer import RecognizerModel, ExerciseRecognizer, detected_angles, evaluate
+from landmark_track import LandmarkTrack
+from rule_engine import RuleEngine, load_definitions, DEFINITIONS_PATH
+
+def split_tracks(paths, label=None, test_fraction=0.25):
+    """
+    Returns (train sequences, train labels, test sequences, test labels), splitting every track in time.
+    """
+    train, train_labels, test, test_labels = [], [], [], []
+    for path in paths:
+        track = LandmarkTrack(path)
+        name = label or track.metadata.get("exercise")
+        if not name:
+            print(f"{path}: no exercise in the track metadata, skipped (use --label)")
+            continue
+        landmarks = np.asarray(track.landmarks)
+        cut = int(len(landmarks) * (1 - test_fraction))
+        train.append(landmarks[:cut])
+        train_labels.append(name)
+        if cut < len(landmarks):
+            test.append(landmarks[cut:])
+            test_labels.append(name)
+    return train, train_labels, test, test_labels
+
+def per_frame_cost(model, sequences):
+    """
+    Microseconds per ExerciseRecognizer.update, (mean, max), over the given sequences.
+    """
+    engine = RuleEngine(model.definitions)
+    latencies = []
+    for landmarks in sequences:
+        recognizer = ExerciseRecognizer(model)
+        for row in detected_angles(engine, landmarks):
+            start = time.perf_counter()
+            recognizer.update(row)
+            latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies or [0.0]) * 1e6
+    return latencies.mean(), latencies.max()
+
+def print_report(report):
+    names = sorted(report["confusion"], key=str)
+    predicted = sorted({p for row in report["confusion"].values() for p in row}, key=str)
+    print(f"\nWindow accuracy: {report['window_accuracy']:.1%}")
+    print(f"{'true / predicted':<20}" + "".join(f"{str(p)[:14]:>16}" for p in predicted))
+    for name in names:
+        row = report["confusion"][name]
+        print(f"{str(name)[:18]:<20}" + "".join(f"{row.get(p, 0):>16}" for p in predicted))
+    print()
+    for result in report["sequences"]:
+        frames = result["frames_to_recognize"]
+        locked = f"after {frames} frames, held {result['held_fraction']:.0%}" if frames is not None else "never"
+        print(f"{result['label']}: recognized {locked}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tracks", nargs="+", help="Labelled track directories")
+    parser.add_argument("--label", default=None, help="Exercise of every track (default: from the track metadata)")
+    parser.add_argument("--definitions", default=DEFINITIONS_PATH, help="Exercise definitions (JSON or YAML)")
+    parser.add_argument("--window", type=int, default=60, help="Frames per rolling window")
+    parser.add_argument("--stride", type=int, default=5, help="Frames between training windows")
+    parser.add_argument("--test-fraction", type=float, default=0.25, help="Held-out end of every track")
+    parser.add_argument("--min-std", type=float, default=10.0, help="Degrees of variation below which a window is idle")
+    parser.add_argument("--output", default="recognizer.npz", help="Model file")
+    args = parser.parse_args()
+
+    train, train_labels, test, test_labels = split_tracks(args.tracks, args.label, args.test_fraction)
+    if not train:
+        parser.error("no labelled tracks")
+    model = RecognizerModel.fit(train, train_labels, load_definitions(args.definitions), window=args.window,
+                                stride=args.stride, min_std=args.min_std)
+    print(f"Trained on {len(train)} tracks: {', '.join(model.classes)}")
+    if test:
+        print_report(evaluate(model, test, test_labels))
+        mean_us, max_us = per_frame_cost(model, test)
+        print(f"\nRecognizer cost per frame: {mean_us:.1f} us mean, {max_us:.1f} us max")
+    model.save(args.output)
+    print(f"Saved {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Diff-based, rate-limited updates of the Streamlit metrics panel.
+
+Every call on a Streamlit placeholder (metric, text, markdown, ...) becomes a delta message on the session's
+websocket, serialized on the server and re-rendered in the browser, whether or not the content changed.
+At camera rate that is a few hundred messages per second per session for a panel that mostly shows the same
+rep count and stage. UIState remembers what each widget last showed and only sends what changed. Widgets
+whose content changes on nearly every frame but matters little (the live angles, the debug panel) get a
+maximum update rate; the newest content waits for the next due slot and flush() sends it, so the last
+value always shows. Keys without a rate (reps, stage, form warnings, coach message) still go out on the
+frame they change.
+
+    ui = UIState({"reps": reps_placeholder, "angles": angles_placeholder, ...}, rates={"angles": 4})
+    for key, method, content in panel_updates(metrics):
+        ui.show(key, method, *content)
+    ui.flush()
+"""
+import time
+
+from rep_analytics import format_rep_summary
+
+class UIState:
+    """
+    Sends placeholder updates that change what a widget shows, and at most `rates[key]` per second for rated keys.
+        placeholders: {key: Streamlit placeholder (st.empty()) or any object with the same methods}
+        rates: {key: updates per second at most}; other keys update on every change
+        telemetry: optional Telemetry counting "ui_messages" and "ui_skipped"
+    stats: messages sent, updates skipped as unchanged and updates held back by a rate.
+    """
+    def __init__(self, placeholders, rates=None, telemetry=None):
+        self.placeholders = placeholders
+        self.rates = rates or {}
+        self.telemetry = telemetry
+        self.stats = {"sent": 0, "unchanged": 0, "throttled": 0}
+        self._shown = {} # key -> (method, content) last sent
+        self._next_time = {} # key -> earliest perf_counter time of the next update of a rated key
+        self._held = {} # key -> (method, content) newer than what a rated key shows, sent by flush()
+
+    def due(self, key, now=None):
+        """
+        True if a rated key may update now (always True for keys without a rate). Lets the caller skip
+        building content, like the debug panel's, that would only be held back.
+        """
+        now = time.perf_counter() if now is None else now
+        return now >= self._next_time.get(key, 0.0)
+
+    def show(self, key, method, *content, now=None):
+        """
+        Calls placeholders[key].<method>(*content) unless the widget already shows that, or its rate is used up
+        (then the content is held for flush()). Returns True if a message was sent.
+        """
+        update = (method, content)
+        if self._shown.get(key) == update:
+            self._held.pop(key, None)
+            self._skip("unchanged")
+            return False
+        now = time.perf_counter() if now is None else now
+        if not self.due(key, now):
+            self._held[key] = update
+            self._skip("throttled")
+            return False
+        self._send(key, update, now)
+        return True
+
+    def flush(self, now=None):
+        """
+        Sends held content of rated keys whose next slot has come. Call once per frame, after the show() calls.
+        """
+        if not self._held:
+            return
+        now = time.perf_counter() if now is None else now
+        for key in [key for key in self._held if self.due(key, now)]:
+            self._send(key, self._held.pop(key), now)
+
+    def _send(self, key, update, now):
+        method, content = update
+        getattr(self.placeholders[key], method)(*content)
+        self._shown[key] = update
+        rate = self.rates.get(key)
+        if rate:
+            self._next_time[key] = now + 1.0 / rate
+        self.stats["sent"] += 1
+        if self.telemetry:
+            self.telemetry.increment("ui_messages")
+
+    def _skip(self, reason):
+        self.stats[reason] += 1
+        if self.telemetry:
+            self.telemetry.increment("ui_skipped")
+
+def panel_updates(metrics, exercise_name=None):
+    """
+    (key, placeholder method, content) of every metrics panel widget for one frame's metrics, in display order.
+    exercise_name: shown before the stage (Auto Detect, where metrics carry the recognized "exercise").
+    """
+    updates = [("reps", "metric", ("Reps", metrics["reps"]))]
+    if metrics.get("rep_summary"):
+        updates.append(("rep_stats", "caption", (format_rep_summary(metrics["rep_summary"]),)))
+    stage_text = f"Stage: {metrics['stage']}"
+    if metrics.get("side_reps"):
+        stage_text += " | " + ", ".join(f"{side}: {reps}" for side, reps in metrics["side_reps"].items())
+    elif metrics.get("side"):
+        stage_text += f" ({metrics['side']} side)"
+    if exercise_name:
+        stage_text = f"{exercise_name} | {stage_text}"
+    updates.append(("stage", "text", (stage_text,)))
+    angle_text = "".join(f"**{label}**: {int(value)}°\n\n" for label, (value, _) in metrics["angles"].items())
+    updates.append(("angles", "markdown", (angle_text,)))
+    if metrics["warnings"]:
+        updates.append(("feedback", "error", (f"⚠️ {metrics['warnings'][0]}",)))
+    else:
+        updates.append(("feedback", "success", ("Form looks good!",)))
+    return updates
@@ -1,5 +1,4 @@
 import numpy as np
-import cv2
 
 def calculate_angle(a, b, c):
     """
@@ -19,16 +18,51 @@ def calculate_angle(a, b, c):
         
     return angle
 
+def calculate_angles(triplets):
+    """
+    Vectorized version of calculate_angle.
+    triplets: array of shape (..., 3, 2) or (..., 3, 3) holding [a, b, c] point
+    triplets as (x, y) or (x, y, z). The leading axes can cover joints, frames or
+    sessions; all angles are computed in one pass.
+    Returns an array of shape (...) with the angles at b in degrees [0, 180].
+    """
+    triplets = np.ascontiguousarray(triplets, dtype=np.float64)
+    if triplets.shape[-2:] not in ((3, 2), (3, 3)):
+        raise ValueError(f"Expected triplets of shape (..., 3, 2) or (..., 3, 3), got {triplets.shape}")
+
+    if triplets.shape[-1] == 2:
+        # View each (x, y) pair as a complex number: the angle of bc * conj(ba) is the angle between them.
+        # Fewest numpy calls, which is what matters for the handful of joints in a single frame.
+        z = triplets.view(np.complex128)[..., 0]
+        b = z[..., 1]
+        return np.abs(np.angle((z[..., 2] - b) * np.conj(z[..., 0] - b), deg=True))
+
+    ba = triplets[..., 0, :] - triplets[..., 1, :]
+    bc = triplets[..., 2, :] - triplets[..., 1, :]
+
+    # Written out per component: einsum/np.cross carry too much overhead for the few joints of a single frame
+    dot = ba[..., 0] * bc[..., 0] + ba[..., 1] * bc[..., 1] + ba[..., 2] * bc[..., 2]
+    cross_x = ba[..., 1] * bc[..., 2] - ba[..., 2] * bc[..., 1]
+    cross_y = ba[..., 2] * bc[..., 0] - ba[..., 0] * bc[..., 2]
+    cross_z = ba[..., 0] * bc[..., 1] - ba[..., 1] * bc[..., 0]
+    cross = np.sqrt(cross_x * cross_x + cross_y * cross_y + cross_z * cross_z)
+
+    # atan2(|cross|, dot) is the unsigned angle between ba and bc, already in [0, 180]
+    return np.degrees(np.arctan2(cross, dot))
+
 def draw_angle(image, angle, position, label=None, color=(255, 255, 255)):
     """
-    Draws the angle value on the image at the specified position.
+    Draws the angle value on the image at the specified (normalized) position, scaled to the image size.
+    For the live overlay see overlay.OverlayRenderer, which draws the labels and skeleton in one pass per frame.
     """
+    import cv2 # Only drawing needs OpenCV; the angle math stays importable without it
     text = str(int(angle))
     if label:
         text = f"{label}: {int(angle)}"
-        
-    cv2.putText(image, text, 
-                tuple(np.multiply(position, [640, 480]).astype(int)), 
+
+    height, width = image.shape[:2]
+    cv2.putText(image, text,
+                (int(position[0] * width), int(position[1] * height)),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2, cv2.LINE_AA)
 
 def draw_angles(image, angles_dict):